@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Benchmark agent setup time: per-request construction vs shared tool catalog vs agent pool.
+
+Builds SimpleAgent instances with pydantic-ai's "test" model (no LLM calls or database
+needed) and measures how long it takes to get an agent ready to run:
+
+- rebuild: construct the agent and convert its tools to pydantic-ai tools from scratch
+- catalog: construct the agent and reuse the tool catalog shared by its class
+- pool:    lease an already built agent from the agent pool
+
+Usage:
+    python scripts/benchmark_agent_setup.py --iterations 200
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+
+# Add the project root to the path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.common.tool_registry import ToolRegistry
+from src.agents.models.agent_factory import AgentFactory
+from src.agents.models.agent_pool import AgentPool
+from src.agents.simple.simple_agent import create_agent
+from src.agents.simple.simple_agent.agent import SimpleAgent
+
+CONFIG = {"model": "test"}
+
+
+async def build_agent(rebuild_tools: bool) -> SimpleAgent:
+    """Construct an agent and its pydantic-ai Agent, optionally without the tool catalog."""
+    if rebuild_tools:
+        ToolRegistry._catalogs.clear()
+    agent = SimpleAgent(CONFIG)
+    await agent._initialize_pydantic_agent()
+    return agent
+
+
+async def measure_construction(iterations: int, rebuild_tools: bool) -> float:
+    """Return the mean setup time in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await build_agent(rebuild_tools)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+async def measure_pool(iterations: int) -> float:
+    """Return the mean time to lease and release a pooled agent in milliseconds."""
+    pool = AgentPool(max_size=4, idle_ttl=600)
+    agent = await pool.acquire("simple", CONFIG)
+    await agent._initialize_pydantic_agent()
+    await pool.release(agent)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        agent = await pool.acquire("simple", CONFIG)
+        await agent._initialize_pydantic_agent()
+        await pool.release(agent)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+async def run(iterations: int) -> None:
+    # Agent construction logs at INFO for every tool; keep the output readable
+    logging.disable(logging.INFO)
+    AgentFactory.register_agent_creator("simple", create_agent)
+
+    rebuild_ms = await measure_construction(iterations, rebuild_tools=True)
+    catalog_ms = await measure_construction(iterations, rebuild_tools=False)
+    pool_ms = await measure_pool(iterations)
+
+    print(f"Iterations: {iterations}")
+    print(f"Rebuild tools per agent: {rebuild_ms:.3f} ms/agent")
+    print(f"Shared tool catalog:     {catalog_ms:.3f} ms/agent ({rebuild_ms / catalog_ms:.2f}x)")
+    print(f"Pooled agent lease:      {pool_ms:.3f} ms/agent ({rebuild_ms / pool_ms:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent setup time")
+    parser.add_argument("--iterations", type=int, default=200, help="Number of agents to set up per variant")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
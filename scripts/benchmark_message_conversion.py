@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Benchmark history conversion throughput: legacy row reconstruction vs native payload decoding.
+
+Builds synthetic message rows in memory (no database needed) and measures how many
+messages per second MessageHistory can turn into pydantic-ai ModelMessage objects.
+
+Usage:
+    python scripts/benchmark_message_conversion.py --turns 50 --iterations 200
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+
+# Add the project root to the path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    UserPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart
+)
+
+from src.db.models import Message
+from src.memory.message_history import MessageHistory, dump_model_messages, split_native_turn
+
+
+def build_rows(turns: int, native: bool):
+    """Build user/assistant rows for a number of turns, each with one tool call."""
+    session_id = uuid.uuid4()
+    rows = []
+    for i in range(turns):
+        call_id = f"call_{i}"
+        run_messages = [
+            ModelRequest(parts=[UserPromptPart(content=f"User message number {i} " * 5)]),
+            ModelResponse(parts=[ToolCallPart(tool_name="get_memory_tool", args={"key": f"key_{i}"}, tool_call_id=call_id)]),
+            ModelRequest(parts=[ToolReturnPart(tool_name="get_memory_tool", content=f"value {i}", tool_call_id=call_id)]),
+            ModelResponse(parts=[TextPart(content=f"Assistant answer number {i} " * 10)]),
+        ]
+        user_native, agent_native = split_native_turn(dump_model_messages(run_messages)) if native else (None, None)
+
+        rows.append(Message(
+            id=uuid.uuid4(), session_id=session_id, role="user",
+            text_content=f"User message number {i} " * 5, message_type="text",
+            native_messages=user_native
+        ))
+        rows.append(Message(
+            id=uuid.uuid4(), session_id=session_id, role="assistant",
+            text_content=f"Assistant answer number {i} " * 10, message_type="text",
+            tool_calls={"0": {"tool_name": "get_memory_tool", "args": {"key": f"key_{i}"}, "tool_call_id": call_id}},
+            tool_outputs={"0": {"tool_name": "get_memory_tool", "content": f"value {i}", "tool_call_id": call_id}},
+            native_messages=agent_native
+        ))
+    return rows
+
+
+def measure(history: MessageHistory, rows, iterations: int):
+    """Return converted rows per second and produced model messages per second."""
+    produced = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        produced += len(history._convert_db_messages_to_model_messages(rows, include_tools=True))
+    elapsed = time.perf_counter() - start
+    return (len(rows) * iterations) / elapsed, produced / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark message history conversion")
+    parser.add_argument("--turns", type=int, default=50, help="Number of turns per history window")
+    parser.add_argument("--iterations", type=int, default=200, help="Number of conversions to time")
+    args = parser.parse_args()
+
+    # The converter does not touch the database, so skip session bootstrapping
+    history = MessageHistory.__new__(MessageHistory)
+
+    legacy_rows = build_rows(args.turns, native=False)
+    native_rows = build_rows(args.turns, native=True)
+
+    legacy_rows_rate, legacy_msg_rate = measure(history, legacy_rows, args.iterations)
+    native_rows_rate, native_msg_rate = measure(history, native_rows, args.iterations)
+
+    # Native rows decode to the full run (tool calls and returns as separate
+    # messages), so messages/sec is the fairer throughput comparison.
+    print(f"Rows per window: {len(legacy_rows)}, iterations: {args.iterations}")
+    print(f"Legacy reconstruction: {legacy_rows_rate:,.0f} rows/sec, {legacy_msg_rate:,.0f} messages/sec")
+    print(f"Native batch decoding: {native_rows_rate:,.0f} rows/sec, {native_msg_rate:,.0f} messages/sec "
+          f"({native_msg_rate / legacy_msg_rate:.2f}x messages/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -33,9 +33,10 @@ from src.agents.common.dependencies_helper import (
     add_system_message_to_history
 )
 
-from src.agents.common.prompt_builder import PromptBuilder
+from src.agents.common.prompt_builder import PromptBuilder, PromptLayout
 from src.agents.common.memory_handler import MemoryHandler
 from src.agents.common.tool_registry import ToolRegistry
+from src.agents.common.tool_policy import ToolPolicy, get_tool_stats
 
 __all__ = [
     # Message Parser
@@ -65,6 +66,11 @@ __all__ = [
     
     # Classes
     'PromptBuilder',
+    'PromptLayout',
     'MemoryHandler',
-    'ToolRegistry'
+    'ToolRegistry',
+    'ToolPolicy',
+    
+    # Tool Policy
+    'get_tool_stats'
 ] 
\ No newline at end of file
@@ -137,18 +137,24 @@ def message_history_to_pydantic_format(messages: List[Dict[str, Any]]) -> List[D
     
     return pydantic_messages
 
-def add_system_message_to_history(message_history: List[Dict[str, Any]], system_prompt: str) -> List[Dict[str, Any]]:
+def add_system_message_to_history(message_history: List[Dict[str, Any]], system_prompt: str,
+                                  dynamic_context: Optional[str] = None) -> List[Dict[str, Any]]:
     """Add system message to the beginning of message history.
     
     Args:
         message_history: List of message dictionaries
         system_prompt: System prompt string
+        dynamic_context: Optional per-user context sent as a separate system part
+            after the system prompt, so the system prompt stays a stable prefix
         
     Returns:
         Updated message history
     """
     from pydantic_ai.messages import ModelRequest, SystemPromptPart
     
-    system_message = ModelRequest(parts=[SystemPromptPart(content=system_prompt)])
+    parts = [SystemPromptPart(content=system_prompt)]
+    if dynamic_context:
+        parts.append(SystemPromptPart(content=dynamic_context))
+    system_message = ModelRequest(parts=parts)
     
     return [system_message] + message_history 
\ No newline at end of file
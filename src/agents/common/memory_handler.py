@@ -2,15 +2,92 @@
 
 This module handles memory operations, variable initialization, and substitution.
 """
+import asyncio
 import logging
 from typing import Dict, List, Any, Optional, Union, Tuple
 
+from src.agents.common.prompt_builder import RESERVED_TEMPLATE_VARIABLES
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Default (description, content) for template variables created on first use
+DEFAULT_MEMORY_VARIABLES = {
+    "personal_attributes": (
+        "Personal attributes and preferences for the agent",
+        "None stored yet. You can update this by asking the agent to remember personal details."
+    ),
+    "technical_knowledge": (
+        "Technical knowledge and capabilities for the agent",
+        "None stored yet. You can update this by asking the agent to remember technical information."
+    ),
+    "user_preferences": (
+        "User preferences and settings for the agent",
+        "None stored yet. You can update this by asking the agent to remember your preferences."
+    ),
+}
+
 class MemoryHandler:
     """Class for handling memory operations and initialization."""
     
+    @staticmethod
+    def get_default_memory_variable(var_name: str) -> Tuple[str, str]:
+        """Get the default description and content for a template variable.
+        
+        Args:
+            var_name: Name of the template variable
+            
+        Returns:
+            Tuple of (description, content)
+        """
+        return DEFAULT_MEMORY_VARIABLES.get(
+            var_name,
+            ("Auto-created template variable for SimpleAgent", "None stored yet")
+        )
+    
+    @staticmethod
+    def load_memory_variables_sync(
+        template_vars: List[str],
+        agent_id: int,
+        user_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Fetch all template memory variables, creating missing ones, in one query.
+        
+        Args:
+            template_vars: List of template variables to load
+            agent_id: Agent ID to associate with memory variables
+            user_id: Optional user ID to associate with memory variables
+            
+        Returns:
+            Dictionary mapping variable names to Memory objects
+        """
+        if not agent_id:
+            logger.warning("Cannot load memory variables: No agent ID available")
+            return {}
+        
+        from src.db.repository.memory import get_or_create_memories_by_name
+        
+        # Extract all variables except the per-run ones which are handled separately
+        memory_vars = [var for var in template_vars if var not in RESERVED_TEMPLATE_VARIABLES]
+        if not memory_vars:
+            return {}
+        
+        if not user_id:
+            logger.warning("No user_id provided, memories will be created with NULL user_id")
+        
+        defaults = {var: MemoryHandler.get_default_memory_variable(var) for var in memory_vars}
+        memories = get_or_create_memories_by_name(
+            memory_vars,
+            agent_id=agent_id,
+            user_id=user_id,
+            defaults=defaults,
+            read_mode="system_prompt",
+            access="read_write"
+        )
+        
+        logger.info(f"Loaded {len(memories)}/{len(memory_vars)} memory variables for agent {agent_id}, user {user_id}")
+        return memories
+    
     @staticmethod
     def initialize_memory_variables_sync(
         template_vars: List[str],
@@ -35,75 +112,14 @@ class MemoryHandler:
             return False
             
         try:
-            # Import the repository functions for direct database access
-            from src.db.repository.memory import get_memory_by_name, create_memory
-            from src.db.models import Memory
-            
-            # Create context
-            context = {
-                "agent_id": agent_id,
-                "user_id": user_id
-            }
-                
-            # Extract all variables except run_id which is handled separately
-            memory_vars = [var for var in template_vars if var != "run_id"]
-            
-            # Log the user_id we're using (if any)
-            if user_id:
-                logger.info(f"Initializing memory variables for user_id={user_id}")
-            else:
-                logger.warning("No user_id provided, memories will be created with NULL user_id")
+            memory_vars = [var for var in template_vars if var not in RESERVED_TEMPLATE_VARIABLES]
+            memories = MemoryHandler.load_memory_variables_sync(template_vars, agent_id, user_id)
             
-            success = True
-            for var_name in memory_vars:
-                try:
-                    # Check if memory already exists with direct repository call for this user
-                    existing_memory = get_memory_by_name(var_name, agent_id=agent_id, user_id=user_id)
-                    
-                    # If not found, create it with default value
-                    if not existing_memory:
-                        logger.info(f"Creating missing memory variable: {var_name} for user: {user_id}")
-                        
-                        # Prepare a proper description based on the variable name
-                        description = f"Auto-created template variable for SimpleAgent"
-                        if var_name == "personal_attributes":
-                            description = "Personal attributes and preferences for the agent"
-                            content = "None stored yet. You can update this by asking the agent to remember personal details."
-                        elif var_name == "technical_knowledge":
-                            description = "Technical knowledge and capabilities for the agent"
-                            content = "None stored yet. You can update this by asking the agent to remember technical information."
-                        elif var_name == "user_preferences":
-                            description = "User preferences and settings for the agent"
-                            content = "None stored yet. You can update this by asking the agent to remember your preferences."
-                        else:
-                            content = "None stored yet"
-                        
-                        # Create the memory directly using repository function
-                        memory = Memory(
-                            name=var_name,
-                            content=content,
-                            description=description,
-                            agent_id=agent_id,
-                            user_id=user_id,  # Include the user_id here
-                            read_mode="system_prompt",
-                            access="read_write"  # Ensure it can be written to
-                        )
-                        
-                        memory_id = create_memory(memory)
-                        if memory_id:
-                            logger.info(f"Created memory variable: {var_name} with ID: {memory_id} for user: {user_id}")
-                        else:
-                            logger.error(f"Failed to create memory variable: {var_name}")
-                            success = False
-                    else:
-                        logger.info(f"Memory variable already exists: {var_name}")
-                        
-                except Exception as e:
-                    logger.error(f"Error initializing memory variable {var_name}: {str(e)}")
-                    success = False
-                    
-            return success
-                    
+            missing = [var for var in memory_vars if var not in memories]
+            if missing:
+                logger.error(f"Failed to initialize memory variables: {', '.join(missing)}")
+                return False
+            return True
         except Exception as e:
             logger.error(f"Error in initialize_memory_variables_sync: {str(e)}")
             return False
@@ -209,46 +225,45 @@ class MemoryHandler:
         if not agent_id:
             logger.warning("Cannot check memory variables: No agent ID available")
             return False
-            
-        try:
-            from src.db.repository.memory import get_memory_by_name
-            
-            # Create a context dict for memory operations
-            context = {
-                "agent_id": agent_id,
-                "user_id": user_id
-            }
-            
-            # Extract all variables except run_id which is handled separately
-            memory_vars = [var for var in template_vars if var != "run_id"]
-            missing_vars = []
-            
-            for var_name in memory_vars:
-                # Check if memory exists for this user
-                existing_memory = get_memory_by_name(var_name, agent_id=agent_id, user_id=user_id)
-                
-                if not existing_memory:
-                    missing_vars.append(var_name)
-            
-            # If we found missing variables, try to initialize them
-            if missing_vars:
-                logger.warning(f"Found {len(missing_vars)} uninitialized memory variables: {', '.join(missing_vars)}")
-                # Initialize missing variables
-                return MemoryHandler.initialize_memory_variables_sync(template_vars, agent_id, user_id)
-                
-            return True
-        except Exception as e:
-            logger.error(f"Error checking memory variables: {str(e)}")
-            return False
+        
+        # Fetching creates any missing variables in the same statement
+        return MemoryHandler.initialize_memory_variables_sync(template_vars, agent_id, user_id)
             
     @staticmethod
     async def fetch_memory_vars(
         template_vars: List[str], 
         agent_id: int, 
         user_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Fetch memory variables for system prompt filling without blocking the event loop.
+        
+        The lookups run in a worker thread, so other preparation steps of the
+        run (such as loading the message history) proceed concurrently.
+        
+        Args:
+            template_vars: List of template variables to fetch
+            agent_id: Agent ID to associate with memory variables 
+            user_id: Optional user ID to associate with memory variables
+            
+        Returns:
+            Dictionary of memory variables and their contents
+        """
+        return await asyncio.to_thread(MemoryHandler.fetch_memory_vars_sync, template_vars, agent_id, user_id)
+    
+    @staticmethod
+    def fetch_memory_vars_sync(
+        template_vars: List[str], 
+        agent_id: int, 
+        user_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """Fetch memory variables for system prompt filling.
         
+        Values come from the precomputed system prompt bundle of the agent and
+        user (one primary-key read, or none while cached), then from the
+        agent's memory cache. If a variable is in neither, missing variables
+        are created with their default content as part of the same query that
+        fetches the others.
+        
         Args:
             template_vars: List of template variables to fetch
             agent_id: Agent ID to associate with memory variables 
@@ -257,50 +272,36 @@ class MemoryHandler:
         Returns:
             Dictionary of memory variables and their contents
         """
-        memory_vars = {}
+        memory_var_names = [var for var in template_vars if var not in RESERVED_TEMPLATE_VARIABLES]
         
         try:
-            # Import memory functions
-            from src.tools.memory.tool import read_memory
+            if agent_id:
+                from src.memory.prompt_bundles import get_prompt_bundle_cache
+                from src.tools.memory.provider import get_memory_provider
+                
+                # Serve from the system prompt bundle once every variable is in it
+                bundle = get_prompt_bundle_cache().get(agent_id, user_id)
+                if bundle is not None and all(bundle.get(var_name) is not None for var_name in memory_var_names):
+                    return {var_name: bundle[var_name] for var_name in memory_var_names}
+                
+                # Variables that aren't system prompt memories come from the versioned cache
+                cached = get_memory_provider(agent_id, user_id).get_all_memories()
+                if all(cached.get(var_name) is not None for var_name in memory_var_names):
+                    return {var_name: cached[var_name] for var_name in memory_var_names}
             
-            # Create context
-            context = {
-                "agent_id": agent_id,
-                "user_id": user_id
-            }
+            memories = MemoryHandler.load_memory_variables_sync(template_vars, agent_id, user_id)
+            
+            memory_vars = {}
+            for var_name in memory_var_names:
+                memory = memories.get(var_name)
+                if memory is not None and memory.content is not None:
+                    memory_vars[var_name] = memory.content
+                else:
+                    memory_vars[var_name] = "No data available"
+                    logger.warning(f"Memory variable {var_name} not available for agent {agent_id}, user {user_id}")
             
-            # Fetch each memory variable
-            for var_name in template_vars:
-                if var_name == "run_id":
-                    # Skip run_id as it's handled separately
-                    continue
-                    
-                try:
-                    # Fetch memory content
-                    logger.info(f"Fetching memory variable: {var_name} with context {context}")
-                    memory_result = await read_memory(context, name=var_name)
-                    
-                    if isinstance(memory_result, dict):
-                        # Check if we have success and content
-                        if memory_result.get("success", False) and "content" in memory_result:
-                            memory_vars[var_name] = memory_result["content"]
-                            logger.info(f"Successfully fetched memory variable: {var_name}")
-                        else:
-                            # If not successful or no content, use a default value
-                            memory_vars[var_name] = "No data available"
-                            logger.warning(f"Memory variable {var_name} retrieval unsuccessful: {memory_result.get('message', 'Unknown error')}")
-                    else:
-                        # For backward compatibility with string responses
-                        memory_vars[var_name] = memory_result
-                        logger.info(f"Fetched memory variable as string: {var_name}")
-                        
-                except Exception as e:
-                    logger.error(f"Error fetching memory variable {var_name}: {str(e)}")
-                    memory_vars[var_name] = f"No data available"
-                    
             return memory_vars
-                
         except Exception as e:
             logger.error(f"Error fetching memory variables: {str(e)}")
             # Return empty values for all variables
-            return {var: "No data available" for var in template_vars if var != "run_id"} 
\ No newline at end of file
+            return {var: "No data available" for var in memory_var_names}
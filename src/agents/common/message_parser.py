@@ -134,7 +134,9 @@ def format_message_for_db(role: str, content: str, tool_calls: Optional[List[Dic
                           tool_outputs: Optional[List[Dict[str, Any]]] = None,
                           system_prompt: Optional[str] = None,
                           agent_id: Optional[int] = None,
-                          channel_payload: Optional[Dict] = None) -> Dict[str, Any]:
+                          channel_payload: Optional[Dict] = None,
+                          native_messages: Optional[List[Dict[str, Any]]] = None,
+                          context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Format a message for database storage.
     
     Args:
@@ -144,6 +146,9 @@ def format_message_for_db(role: str, content: str, tool_calls: Optional[List[Dic
         tool_outputs: Optional list of tool outputs
         system_prompt: Optional system prompt
         agent_id: Optional agent ID
+        channel_payload: Optional channel payload
+        native_messages: Optional serialized pydantic-ai messages for this row
+        context: Optional per-run context stored with the message
     Returns:
         Formatted message dictionary
     """
@@ -165,6 +170,12 @@ def format_message_for_db(role: str, content: str, tool_calls: Optional[List[Dic
     if channel_payload:
         message["channel_payload"] = channel_payload
     
+    if native_messages:
+        message["native_messages"] = native_messages
+    
+    if context:
+        message["context"] = context
+    
     return message
 
 def parse_user_message(user_message: Union[str, Dict[str, Any]]) -> Tuple[str, Optional[Dict[str, Any]]]:
@@ -0,0 +1,73 @@
+"""Concurrent preparation of agent runs.
+
+Before the model is called, a run loads its message history and fills its
+system prompt (memory variables, relevant memories). These steps don't depend
+on each other, so PreparationPipeline runs them concurrently and the time
+spent before the LLM call is that of the slowest step instead of their sum.
+Each stage's duration is recorded in the metrics registry and as a span of
+the current trace.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from src.utils.metrics import metrics
+from src.utils.tracing import span
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class PreparationPipeline:
+    """Independent preparation stages run concurrently, with per-stage timings."""
+
+    def __init__(self):
+        """Initialize an empty pipeline."""
+        self._stages: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add_stage(self, name: str, step: Callable[[], Awaitable[Any]]) -> "PreparationPipeline":
+        """Add a stage to the pipeline.
+
+        Args:
+            name: Stage name, used for its result and timing
+            step: Coroutine function running the stage
+
+        Returns:
+            The pipeline, for chaining
+        """
+        self._stages[name] = step
+        return self
+
+    async def run(self) -> Dict[str, Any]:
+        """Run all stages concurrently.
+
+        Timings (in milliseconds) are available in ``timings`` afterwards,
+        including the wall time of the whole pipeline as "total".
+
+        Returns:
+            Stage results by name
+
+        Raises:
+            Exception: The first error raised by a stage
+        """
+        start = time.perf_counter()
+        names = list(self._stages)
+        results = await asyncio.gather(*(self._run_stage(name) for name in names))
+
+        self.timings["total"] = (time.perf_counter() - start) * 1000
+        metrics.observe("agent_prep_total_ms", self.timings["total"])
+        logger.debug(f"Run preparation timings (ms): {self.timings}")
+        return dict(zip(names, results))
+
+    async def _run_stage(self, name: str) -> Any:
+        """Run one stage and record its duration, even if it fails."""
+        start = time.perf_counter()
+        try:
+            with span(f"prep.{name}"):
+                return await self._stages[name]()
+        finally:
+            self.timings[name] = (time.perf_counter() - start) * 1000
+            metrics.observe(f"agent_prep_{name}_ms", self.timings[name])
@@ -2,14 +2,201 @@
 
 This module handles system prompt building and template variable substitution
 for all agent implementations.
+
+Templates are compiled once into a list of literal and variable segments and
+rendered in a single pass. Rendered prompts can be memoized on the template,
+the version of the memories they were filled from, and the run ID.
+
+Two layouts are supported:
+
+- ``inline``: variables are substituted where their placeholders appear.
+- ``prefix_cache``: the static instructions become a byte-stable prefix in
+  which each placeholder is replaced by a reference, and the variable values
+  follow in a trailing dynamic section. A memory change then only alters the
+  end of the prompt, so LLM providers can keep serving the prefix from their
+  prompt cache.
 """
+import hashlib
+import json
 import logging
 import re
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple, Hashable
+
+from src.config import settings
+from src.utils.lru import LRUDict
+from src.utils.metrics import metrics
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+TEMPLATE_VARIABLE_PATTERN = re.compile(r'\{\{([a-zA-Z_]+)\}\}')
+
+# Maximum number of rendered prompts memoized per compiled template
+RENDER_CACHE_SIZE = 256
+
+PROMPT_LAYOUTS = ("inline", "prefix_cache")
+
+# Template variables filled per run rather than from stored memories
+RESERVED_TEMPLATE_VARIABLES = ("run_id", "relevant_memories")
+
+DYNAMIC_SECTION_HEADER = "## Dynamic Context"
+
+
+def hash_prompt_prefix(prefix: str) -> str:
+    """Get a short stable hash of a prompt's static prefix."""
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class PromptLayout:
+    """A filled system prompt split into its static prefix and dynamic section."""
+    static_prefix: str
+    dynamic_section: Optional[str] = None
+    # Empty when the prompt has no static prefix (inline layout with variables)
+    prefix_hash: str = ""
+    
+    @property
+    def text(self) -> str:
+        """The whole prompt as a single string."""
+        if not self.dynamic_section:
+            return self.static_prefix
+        return f"{self.static_prefix}\n\n{self.dynamic_section}"
+
+
+class CompiledPromptTemplate:
+    """A system prompt template split into literal and variable segments."""
+    
+    def __init__(self, template: str):
+        """Compile a template.
+        
+        Args:
+            template: Template string with {{variable}} placeholders
+        """
+        self.template = template
+        self.template_id = hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+        
+        # Segments alternate between literal text (even) and variable names (odd)
+        self.segments: List[str] = TEMPLATE_VARIABLE_PATTERN.split(template)
+        self.variables: List[str] = list(dict.fromkeys(self.segments[1::2]))
+        
+        self._static_prefix: Optional[str] = None
+        self._dynamic_template: Optional["CompiledPromptTemplate"] = None
+        self._rendered: "OrderedDict[Tuple, PromptLayout]" = OrderedDict()
+    
+    @property
+    def uses_run_id(self) -> bool:
+        """Whether the template contains a {{run_id}} placeholder."""
+        return "run_id" in self.variables
+    
+    def render(self, memory_vars: Dict[str, Any], run_id: Optional[str] = None) -> str:
+        """Fill the template in a single pass.
+        
+        Args:
+            memory_vars: Dictionary of memory variables
+            run_id: Optional run ID for the {{run_id}} placeholder
+            
+        Returns:
+            Filled prompt
+        """
+        parts = []
+        missing = []
+        for index, segment in enumerate(self.segments):
+            if index % 2 == 0:
+                parts.append(segment)
+            elif segment == "run_id" and run_id:
+                parts.append(str(run_id))
+            elif segment in memory_vars:
+                parts.append(self._format_value(segment, memory_vars[segment]))
+            else:
+                missing.append(segment)
+                parts.append(f"[No data for {segment}]")
+        
+        if missing:
+            logger.warning(f"Some template variables could not be filled: {', '.join(dict.fromkeys(missing))}")
+        
+        return "".join(parts)
+    
+    @property
+    def static_prefix(self) -> str:
+        """The template with every placeholder replaced by a reference to the dynamic section."""
+        if self._static_prefix is None:
+            parts = []
+            for index, segment in enumerate(self.segments):
+                parts.append(segment if index % 2 == 0 else f"<{segment}> (see {DYNAMIC_SECTION_HEADER} below)")
+            self._static_prefix = "".join(parts).rstrip()
+        return self._static_prefix
+    
+    def render_layout(self, memory_vars: Dict[str, Any], run_id: Optional[str] = None,
+                      layout: str = "inline") -> PromptLayout:
+        """Fill the template using the given layout.
+        
+        Args:
+            memory_vars: Dictionary of memory variables
+            run_id: Optional run ID for the {{run_id}} placeholder
+            layout: "inline" or "prefix_cache"
+            
+        Returns:
+            The filled prompt with its static prefix hash
+        """
+        if not self.variables:
+            # Nothing to fill, so the whole prompt is static
+            text = self.render(memory_vars, run_id)
+            return PromptLayout(static_prefix=text, prefix_hash=hash_prompt_prefix(text))
+        
+        if layout != "prefix_cache":
+            # Filled values are spread through the prompt, so no part of it is a stable prefix
+            return PromptLayout(static_prefix=self.render(memory_vars, run_id))
+        
+        if self._dynamic_template is None:
+            # A template made only of the variable blocks, in template order
+            blocks = [f"<{var_name}>\n{{{{{var_name}}}}}\n</{var_name}>" for var_name in self.variables]
+            self._dynamic_template = CompiledPromptTemplate(f"{DYNAMIC_SECTION_HEADER}\n\n" + "\n\n".join(blocks))
+        
+        return PromptLayout(
+            static_prefix=self.static_prefix,
+            dynamic_section=self._dynamic_template.render(memory_vars, run_id),
+            prefix_hash=hash_prompt_prefix(self.static_prefix)
+        )
+    
+    def memo_key(self, memory_version: Hashable, run_id: Optional[str] = None) -> Tuple:
+        """Build the memo key; the run ID only matters if the template uses it."""
+        return (self.template_id, memory_version, run_id if self.uses_run_id else None)
+    
+    def lookup(self, key: Tuple) -> Optional[PromptLayout]:
+        """Get a memoized prompt by key."""
+        cached = self._rendered.get(key)
+        if cached is not None:
+            self._rendered.move_to_end(key)
+        return cached
+    
+    def remember(self, key: Tuple, rendered: PromptLayout) -> None:
+        """Memoize a rendered prompt, evicting the least recently used one if full."""
+        self._rendered[key] = rendered
+        self._rendered.move_to_end(key)
+        while len(self._rendered) > RENDER_CACHE_SIZE:
+            self._rendered.popitem(last=False)
+    
+    @staticmethod
+    def _format_value(var_name: str, content: Any) -> str:
+        if content is None:
+            return f"No {var_name} data available"
+        if isinstance(content, dict):
+            try:
+                return json.dumps(content, indent=2)
+            except Exception as e:
+                logger.error(f"Error serializing {var_name} to JSON: {str(e)}")
+                return f"Error: could not process {var_name} data"
+        return str(content)
+
+
+# Compiled templates by template text
+_compiled_templates: Dict[str, CompiledPromptTemplate] = {}
+
+# Last static prefix hash seen per (agent_id, user_id), least recently used evicted
+_last_prefix_hashes: LRUDict[Tuple[Optional[int], Optional[int]], str] = LRUDict(settings.AM_MEMORY_CACHE_MAX_SCOPES)
+
 class PromptBuilder:
     """Class for building and filling system prompts with template variables."""
     
@@ -23,8 +210,7 @@ class PromptBuilder:
         Returns:
             List of variable names without braces
         """
-        pattern = r'\{\{([a-zA-Z_]+)\}\}'
-        matches = re.findall(pattern, template)
+        matches = TEMPLATE_VARIABLE_PATTERN.findall(template)
         return list(set(matches))  # Remove duplicates
 
     @staticmethod
@@ -39,6 +225,22 @@ class PromptBuilder:
         """
         return prompt_template
 
+    @staticmethod
+    def compile_template(template: str) -> CompiledPromptTemplate:
+        """Compile a template, reusing an earlier compilation of the same text.
+        
+        Args:
+            template: Template string with {{variable}} placeholders
+            
+        Returns:
+            The compiled template
+        """
+        compiled = _compiled_templates.get(template)
+        if compiled is None:
+            compiled = CompiledPromptTemplate(template)
+            _compiled_templates[template] = compiled
+        return compiled
+
     @staticmethod
     async def get_filled_system_prompt(
         prompt_template: str, 
@@ -59,39 +261,33 @@ class PromptBuilder:
         Returns:
             Filled system prompt
         """
-        # Start with the template
-        filled_prompt = prompt_template
-        
-        # Fill in memory variables
-        for var_name, content in memory_vars.items():
-            placeholder = f"{{{{{var_name}}}}}"
-            if placeholder in filled_prompt:
-                if content is None:
-                    content = f"No {var_name} data available"
-                elif isinstance(content, dict):
-                    try:
-                        import json
-                        content = json.dumps(content, indent=2)
-                    except Exception as e:
-                        logger.error(f"Error serializing {var_name} to JSON: {str(e)}")
-                        content = f"Error: could not process {var_name} data"
-                
-                filled_prompt = filled_prompt.replace(placeholder, str(content))
-                logger.info(f"Filled template variable: {var_name}")
-        
-        # Fill in run_id if provided and placeholder exists
-        if run_id and "{{run_id}}" in filled_prompt:
-            filled_prompt = filled_prompt.replace("{{run_id}}", str(run_id))
-            logger.info(f"Filled run_id: {run_id}")
-            
-        # Check for any unfilled variables
-        remaining_vars = PromptBuilder.extract_template_variables(filled_prompt)
-        if remaining_vars:
-            logger.warning(f"Some template variables could not be filled: {', '.join(remaining_vars)}")
+        return PromptBuilder.compile_template(prompt_template).render(memory_vars, run_id)
+
+    @staticmethod
+    def record_prefix_hash(agent_id: Optional[int], user_id: Optional[int], prefix_hash: str) -> bool:
+        """Record the static prefix hash used by a run.
+        
+        Prompts without a static prefix (empty hash) aren't counted, so the
+        stability metric only reflects prefix-cache-friendly layouts.
+        
+        Args:
+            agent_id: Agent that ran
+            user_id: User the run was for
+            prefix_hash: Hash of the static prefix sent to the model
             
-            # Replace unfilled variables with placeholders
-            for var in remaining_vars:
-                placeholder = f"{{{{{var}}}}}"
-                filled_prompt = filled_prompt.replace(placeholder, f"[No data for {var}]")
+        Returns:
+            True if the prefix is the same as in the previous run for this agent and user
+        """
+        if not prefix_hash:
+            return False
+        
+        previous = _last_prefix_hashes.get((agent_id, user_id))
+        _last_prefix_hashes[(agent_id, user_id)] = prefix_hash
+        stable = previous == prefix_hash
         
-        return filled_prompt 
\ No newline at end of file
+        metrics.increment("prompt_prefix_runs")
+        if previous is not None and not stable:
+            metrics.increment("prompt_prefix_changes")
+        runs = metrics.get_counter("prompt_prefix_runs")
+        metrics.set_gauge("prompt_prefix_stability", 1 - metrics.get_counter("prompt_prefix_changes") / runs)
+        return stable
@@ -0,0 +1,217 @@
+"""Exact-match cache of LLM responses.
+
+Agents that answer the same questions deterministically (FAQ-style agents run
+at temperature 0) can opt in with ``response_cache: true`` in their config.
+Their runs are then keyed by a hash of everything the model would see: model
+name and settings, tools, the filled system prompt, the message history and
+the user input. A run whose key was answered before returns the stored
+response without calling the model. Only runs answered without tool calls
+are stored, since tool outputs can be user-specific and a hit would skip the
+tools' side effects. System prompts embedding per-run values
+such as {{run_id}} make every key unique, so such agents never hit.
+
+Two backends are available (AM_RESPONSE_CACHE_BACKEND): ``memory`` keeps an
+LRU per process, ``postgres`` shares entries between workers through the
+llm_response_cache table.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.config import settings
+from src.utils.metrics import metrics
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Fields that vary between otherwise identical requests and never reach the model
+_VOLATILE_FIELDS = {"timestamp"}
+
+
+def is_response_cache_enabled(config: Dict[str, Any]) -> bool:
+    """Check whether an agent config opts in to response caching.
+
+    Args:
+        config: Agent configuration dictionary
+
+    Returns:
+        True if the agent's responses may be cached
+    """
+    value = config.get("response_cache", False)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _canonical(value: Any) -> Any:
+    """Drop volatile fields recursively so equal requests serialize equally."""
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items() if key not in _VOLATILE_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def response_cache_key(model_name: str, model_settings: Dict[str, Any], tool_names: Sequence[str],
+                       message_history: Optional[List[Dict[str, Any]]], user_input: str) -> str:
+    """Hash a model request into a cache key.
+
+    Args:
+        model_name: Model the request is sent to
+        model_settings: Model settings (temperature, max_tokens, ...)
+        tool_names: Names of the tools offered to the model
+        message_history: Serialized message history, including the system prompt
+        user_input: The user's message
+
+    Returns:
+        Hex SHA-256 digest of the canonical request
+    """
+    request = {
+        "model": model_name,
+        "settings": model_settings,
+        "tools": sorted(tool_names),
+        "history": _canonical(message_history or []),
+        "input": user_input,
+    }
+    payload = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Base class of response cache backends."""
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached response.
+
+        Args:
+            key: Cache key from response_cache_key
+
+        Returns:
+            The stored response fields, or None on a miss
+        """
+        raise NotImplementedError
+
+    async def set(self, key: str, response: Dict[str, Any], ttl: float) -> None:
+        """Store a response.
+
+        Args:
+            key: Cache key from response_cache_key
+            response: Response fields to store
+            ttl: Seconds the response stays valid
+        """
+        raise NotImplementedError
+
+    async def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached response, recording hit, miss and lookup time metrics."""
+        start = time.perf_counter()
+        try:
+            response = await self.get(key)
+        except Exception as e:
+            logger.error(f"Error reading response cache: {str(e)}")
+            response = None
+        metrics.observe("response_cache_lookup_ms", (time.perf_counter() - start) * 1000)
+        metrics.increment("response_cache_hits" if response is not None else "response_cache_misses")
+        return response
+
+    async def store(self, key: str, response: Dict[str, Any], ttl: float) -> None:
+        """Store a response, logging instead of raising on errors."""
+        try:
+            await self.set(key, response, ttl)
+            metrics.increment("response_cache_stores")
+        except Exception as e:
+            logger.error(f"Error writing response cache: {str(e)}")
+
+
+class InMemoryResponseCache(ResponseCache):
+    """Per-process LRU of responses with a time to live."""
+
+    def __init__(self, max_entries: int = 10000):
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    async def set(self, key: str, response: Dict[str, Any], ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.increment("response_cache_evictions")
+            metrics.set_gauge("response_cache_size", len(self._entries))
+
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        with self._lock:
+            self._entries.clear()
+
+
+class PostgresResponseCache(ResponseCache):
+    """Responses shared by all workers through the llm_response_cache table."""
+
+    def __init__(self, max_entries: int = 10000, prune_every: int = 100):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Rows kept before the least recently used are deleted
+            prune_every: Number of stores between prunes of expired and excess rows
+        """
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._stores = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        from src.db.repository.response_cache import get_cached_response
+
+        return await asyncio.to_thread(get_cached_response, key)
+
+    async def set(self, key: str, response: Dict[str, Any], ttl: float) -> None:
+        from src.db.repository.response_cache import prune_response_cache, set_cached_response
+
+        await asyncio.to_thread(set_cached_response, key, response, ttl)
+        self._stores += 1
+        if self._stores % self.prune_every == 0:
+            deleted = await asyncio.to_thread(prune_response_cache, self.max_entries)
+            if deleted:
+                metrics.increment("response_cache_evictions", deleted)
+
+
+# Global response cache, created on first use
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the global response cache for the configured backend.
+
+    Returns:
+        The global ResponseCache instance
+    """
+    global _response_cache
+
+    if _response_cache is None:
+        if settings.AM_RESPONSE_CACHE_BACKEND == "postgres":
+            _response_cache = PostgresResponseCache(max_entries=settings.AM_RESPONSE_CACHE_MAX_ENTRIES)
+        else:
+            _response_cache = InMemoryResponseCache(max_entries=settings.AM_RESPONSE_CACHE_MAX_ENTRIES)
+    return _response_cache
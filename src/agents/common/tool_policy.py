@@ -0,0 +1,193 @@
+"""Execution policies of registry tools.
+
+Tools are registered with a ToolPolicy (``register_tool(func, policy=...)``)
+declaring how long a call may run, how often a failed call is retried and
+when its circuit breaker opens. Breakers are kept per tool name for the whole
+process, so every agent using a tool sees the same downstream health: after
+``failure_threshold`` consecutive failures, calls fail fast with an error
+message to the model until ``reset_timeout`` has passed and a probe call
+succeeds.
+
+Tool calls emitted together by the model already run concurrently (PydanticAI
+starts a task per call). Tools whose async functions call a synchronous client
+block the event loop and defeat both that and timeouts; they should be
+registered with ``blocking=True`` so they run on a worker thread. A thread
+can't be cancelled: a blocking call that times out keeps running in the
+background, so blocking tools aren't retried, which could repeat its side
+effects.
+
+Per-tool calls, errors, timeouts, fast-failed calls and latency are recorded
+in the metrics registry and summarized by get_tool_stats.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from src.config import settings
+from src.utils.metrics import metrics
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class ToolPolicy:
+    """Timeout, retry and circuit breaker policy of a tool.
+
+    Fields left out take their defaults from the AM_TOOL_* settings, except
+    that blocking tools default to no retries.
+    """
+    timeout: float = field(default_factory=lambda: settings.AM_TOOL_TIMEOUT)
+    retries: Optional[int] = None
+    retry_backoff: float = 0.5
+    failure_threshold: int = field(default_factory=lambda: settings.AM_TOOL_BREAKER_THRESHOLD)
+    reset_timeout: float = field(default_factory=lambda: settings.AM_TOOL_BREAKER_RESET)
+    blocking: bool = False
+
+    def __post_init__(self):
+        if self.retries is None:
+            object.__setattr__(self, "retries", 0 if self.blocking else settings.AM_TOOL_RETRIES)
+        elif self.blocking and self.retries > 0:
+            # A timed-out attempt keeps running on its thread, so a retry would run alongside it
+            raise ValueError("Blocking tools can't be retried: a timed-out call keeps running on its thread")
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker of one tool."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        """Initialize a closed breaker.
+
+        Args:
+            name: Name of the tool
+            failure_threshold: Consecutive failures that open the breaker (0 never opens)
+            reset_timeout: Seconds the breaker stays open before a probe call is let through
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Check whether a call may go through.
+
+        Once the reset timeout has passed, one call is let through as a probe;
+        the others keep failing fast until it finishes, or until it has run
+        for another reset timeout without reporting an outcome.
+
+        Returns:
+            False while the breaker is open
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if (self.state == OPEN and now - self._opened_at >= self.reset_timeout) or \
+                    (self.state == HALF_OPEN and now - self._probe_started_at >= self.reset_timeout):
+                self.state = HALF_OPEN
+                self._probe_started_at = now
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe call through."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful call."""
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                logger.info(f"Circuit breaker of tool {self.name} closed")
+            self.state = CLOSED
+        metrics.set_gauge(f"tool_{self.name}_breaker_open", 0)
+
+    def abandon_probe(self) -> None:
+        """Let the next call probe again after a call ended without a verdict on the tool."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the breaker at the threshold or after a failed probe."""
+        with self._lock:
+            self.failures += 1
+            if self.failure_threshold <= 0:
+                return
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Circuit breaker of tool {self.name} opened after {self.failures} failures")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+            opened = self.state == OPEN
+        if opened:
+            metrics.set_gauge(f"tool_{self.name}_breaker_open", 1)
+
+
+# Circuit breakers by tool name, shared by all agents of this process
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, policy: ToolPolicy) -> CircuitBreaker:
+    """Get the circuit breaker of a tool, creating it from the policy on first use.
+
+    Args:
+        name: Name of the tool
+        policy: Policy the tool was registered with
+
+    Returns:
+        The tool's CircuitBreaker
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, policy.failure_threshold, policy.reset_timeout)
+                _breakers[name] = breaker
+    return breaker
+
+
+def get_tool_stats() -> Dict[str, Dict[str, Any]]:
+    """Summarize latency and errors of every tool called by this process.
+
+    Returns:
+        Per tool: calls, errors, timeouts, fast-failed calls, error rate,
+        average and maximum latency in milliseconds, and breaker state
+    """
+    snapshot = metrics.snapshot()
+    counters = snapshot["counters"]
+    with _breakers_lock:
+        breakers = dict(_breakers)
+
+    stats = {}
+    for name, breaker in sorted(breakers.items()):
+        latency = snapshot["summaries"].get(f"tool_{name}_ms", {})
+        calls = counters.get(f"tool_{name}_calls", 0)
+        errors = counters.get(f"tool_{name}_errors", 0)
+        stats[name] = {
+            "calls": calls,
+            "errors": errors,
+            "timeouts": counters.get(f"tool_{name}_timeouts", 0),
+            "rejected": counters.get(f"tool_{name}_rejected", 0),
+            "error_rate": errors / calls if calls else 0.0,
+            "avg_ms": latency.get("avg", 0.0),
+            "max_ms": latency.get("max", 0.0),
+            "breaker": breaker.state,
+        }
+    return stats
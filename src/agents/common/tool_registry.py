@@ -2,10 +2,22 @@
 
 This module handles tool registration and management for all agent implementations.
 """
+import asyncio
 import logging
-from typing import Dict, Any, Optional, Callable, List
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Callable, List, Tuple
 
-from pydantic_ai.tools import Tool as PydanticTool
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.messages import ToolCallPart, ToolReturnPart
+from pydantic_ai.tools import RunContext, Tool as PydanticTool
+
+from src.agents.common.tool_policy import ToolPolicy, get_circuit_breaker
+from src.context import resolve_tool_context
+from src.utils.metrics import metrics
+from src.utils.tracing import span
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -18,10 +30,32 @@ read_memory = None
 create_memory = None
 update_memory = None
 list_memories_tool = None
+search_memories_tool = None
+
+# Tools are shared by every run of an agent class, so PydanticAI's per-tool
+# retry count (Tool.current_retry) is kept per run instead: by id() of the
+# run's Usage object, which lives exactly as long as the run
+_retry_counts_by_run: Dict[int, Dict[str, int]] = {}
+# Retry counts of the run whose tool call is executing
+_current_retry_counts: ContextVar[Optional[Dict[str, int]]] = ContextVar("tool_retry_counts", default=None)
+
+
+def _run_retry_counts(run_context: RunContext[Any]) -> Optional[Dict[str, int]]:
+    """Get the retry counts by tool name of a run."""
+    usage = getattr(run_context, "usage", None)
+    if usage is None:
+        return None
+    key = id(usage)
+    counts = _retry_counts_by_run.get(key)
+    if counts is None:
+        counts = _retry_counts_by_run.setdefault(key, {})
+        weakref.finalize(usage, _retry_counts_by_run.pop, key, None)
+    return counts
+
 
 def _import_memory_tools():
     """Import memory tools to avoid circular imports."""
-    global memory_tools_imported, get_memory_tool, store_memory_tool, read_memory, create_memory, update_memory, list_memories_tool
+    global memory_tools_imported, get_memory_tool, store_memory_tool, read_memory, create_memory, update_memory, list_memories_tool, search_memories_tool
     if not memory_tools_imported:
         from src.tools.memory.tool import get_memory_tool as _get_memory_tool
         from src.tools.memory.tool import store_memory_tool as _store_memory_tool
@@ -29,6 +63,7 @@ def _import_memory_tools():
         from src.tools.memory.tool import create_memory as _create_memory
         from src.tools.memory.tool import update_memory as _update_memory
         from src.tools.memory.tool import list_memories_tool as _list_memories_tool
+        from src.tools.memory.tool import search_memories_tool as _search_memories_tool
         
         get_memory_tool = _get_memory_tool
         store_memory_tool = _store_memory_tool
@@ -36,24 +71,213 @@ def _import_memory_tools():
         create_memory = _create_memory
         update_memory = _update_memory
         list_memories_tool = _list_memories_tool
+        search_memories_tool = _search_memories_tool
         
         memory_tools_imported = True
 
+class RegistryTool(PydanticTool):
+    """PydanticAI tool built by the registry and run under its ToolPolicy.
+    
+    Each call is a span of the current trace. Calls that raise or exceed the
+    policy's timeout are retried with backoff; when they still fail, or while
+    the tool's circuit breaker is open, the model gets an error message as the
+    tool result instead of the run failing.
+    """
+    
+    def __init__(self, *args: Any, policy: Optional[ToolPolicy] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.policy = policy or ToolPolicy()
+    
+    @property
+    def current_retry(self) -> int:
+        """Retries of this tool in the run whose call is executing."""
+        counts = _current_retry_counts.get()
+        if counts is None:
+            return self.__dict__.get("_current_retry", 0)
+        return counts.get(self.name, 0)
+    
+    @current_retry.setter
+    def current_retry(self, value: int) -> None:
+        # PydanticAI resets every tool at the start of a run; outside a call
+        # that must not touch the counts of runs already in progress
+        counts = _current_retry_counts.get()
+        if counts is None:
+            self.__dict__["_current_retry"] = value
+        else:
+            counts[self.name] = value
+    
+    @classmethod
+    def from_tool(cls, tool: PydanticTool, policy: Optional[ToolPolicy] = None) -> "RegistryTool":
+        """Rebuild a PydanticAI tool as a RegistryTool with the same definition."""
+        return cls(
+            tool.function,
+            takes_ctx=tool.takes_ctx,
+            max_retries=tool.max_retries,
+            name=tool.name,
+            description=tool.description,
+            prepare=tool.prepare,
+            docstring_format=tool.docstring_format,
+            require_parameter_descriptions=tool.require_parameter_descriptions,
+            policy=policy
+        )
+    
+    async def run(self, message: ToolCallPart, run_context: RunContext[Any]) -> Any:
+        with span(f"tool.{self.name}", tool_call_id=message.tool_call_id or ""):
+            breaker = get_circuit_breaker(self.name, self.policy)
+            if not breaker.allow():
+                metrics.increment(f"tool_{self.name}_rejected")
+                return self._error_result(
+                    message,
+                    f"Tool {self.name} is temporarily unavailable after repeated failures; "
+                    f"try again in {int(breaker.retry_after()) + 1}s or continue without it."
+                )
+            
+            attempts = self.policy.retries + 1
+            for attempt in range(attempts):
+                metrics.increment(f"tool_{self.name}_calls")
+                start = time.perf_counter()
+                try:
+                    result = await self._call(message, run_context)
+                except UnexpectedModelBehavior:
+                    # Retries of invalid arguments are exhausted; that's the model's fault
+                    breaker.abandon_probe()
+                    raise
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        metrics.increment(f"tool_{self.name}_timeouts")
+                        error = f"Tool {self.name} timed out after {self.policy.timeout}s"
+                    else:
+                        error = f"Tool {self.name} failed: {str(e) or type(e).__name__}"
+                    metrics.increment(f"tool_{self.name}_errors")
+                    logger.warning(f"{error} (attempt {attempt + 1} of {attempts})")
+                    breaker.record_failure()
+                    if attempt + 1 < attempts and breaker.allow():
+                        await asyncio.sleep(self.policy.retry_backoff * 2 ** attempt)
+                        continue
+                    return self._error_result(message, error)
+                except BaseException:
+                    # Cancelled: the call tells nothing about the tool's health
+                    breaker.abandon_probe()
+                    raise
+                finally:
+                    metrics.observe(f"tool_{self.name}_ms", (time.perf_counter() - start) * 1000)
+                breaker.record_success()
+                return result
+    
+    async def _call(self, message: ToolCallPart, run_context: RunContext[Any]) -> Any:
+        """Run the tool once, on a worker thread if it blocks, within the policy timeout."""
+        token = _current_retry_counts.set(_run_retry_counts(run_context))
+        try:
+            if self.policy.blocking:
+                call = asyncio.to_thread(asyncio.run, PydanticTool.run(self, message, run_context))
+            else:
+                call = PydanticTool.run(self, message, run_context)
+            if self.policy.timeout and self.policy.timeout > 0:
+                return await asyncio.wait_for(call, self.policy.timeout)
+            return await call
+        finally:
+            _current_retry_counts.reset(token)
+    
+    @staticmethod
+    def _error_result(message: ToolCallPart, error: str) -> ToolReturnPart:
+        """Answer a tool call with an error message for the model."""
+        return ToolReturnPart(tool_name=message.tool_name, content=error, tool_call_id=message.tool_call_id)
+
+
+def _tool_context(ctx: RunContext[Any]) -> Dict[str, Any]:
+    """Get the per-run context of a tool call from the run dependencies."""
+    context = getattr(getattr(ctx, "deps", None), "context", None)
+    return context or resolve_tool_context({}) or {}
+
+
+# Default memory tools. They take their context from the run dependencies, so
+# one definition serves every agent instance and every run.
+async def store_memory_wrapper(ctx: RunContext[Any], key: str, content: str) -> str:
+    """Store a memory with the given key.
+    
+    Args:
+        key: The key to store the memory under
+        content: The memory content to store
+        
+    Returns:
+        Confirmation message
+    """
+    return await store_memory_tool(key, content, ctx=_tool_context(ctx))
+
+
+async def get_memory_wrapper(ctx: RunContext[Any], key: str) -> Any:
+    """Retrieve a memory with the given key.
+    
+    Args:
+        key: The key to retrieve the memory with
+        
+    Returns:
+        The memory content if found, else an error message
+    """
+    return await get_memory_tool(_tool_context(ctx), key)
+
+
+async def list_memories_wrapper(ctx: RunContext[Any], prefix: Optional[str] = None) -> str:
+    """List all available memories, optionally filtered by prefix.
+    
+    Args:
+        prefix: Optional prefix to filter memory keys
+        
+    Returns:
+        List of memory keys as a string
+    """
+    context = _tool_context(ctx)
+    agent_id = context.get("agent_id")
+    user_id = context.get("user_id")
+    
+    try:
+        logger.info(f"Listing memories with agent_id={agent_id}, user_id={user_id}, prefix={prefix}")
+        
+        # Use the imported list_memories_tool directly
+        return await list_memories_tool(prefix)
+    except Exception as e:
+        error_msg = f"Error listing memories: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+
+
+async def search_memories_wrapper(ctx: RunContext[Any], query: str, limit: Optional[int] = None) -> str:
+    """Search stored memories by meaning and return the most relevant ones.
+    
+    Args:
+        query: What to look for, in natural language
+        limit: Optional maximum number of memories to return
+        
+    Returns:
+        The most relevant memories, one per line
+    """
+    return await search_memories_tool(_tool_context(ctx), query, limit)
+
+
 class ToolRegistry:
     """Class for registering and managing tools for agent implementations."""
     
+    # PydanticAI tool catalogs shared by all instances of an agent class
+    _catalogs: Dict[Tuple[Any, Tuple[str, ...]], Tuple[PydanticTool, ...]] = {}
+    _catalogs_lock = threading.Lock()
+    
     def __init__(self):
         """Initialize the tool registry."""
         self._registered_tools: Dict[str, Callable] = {}
+        self._policies: Dict[str, ToolPolicy] = {}
     
-    def register_tool(self, tool_func: Callable) -> None:
+    def register_tool(self, tool_func: Callable, policy: Optional[ToolPolicy] = None) -> None:
         """Register a tool with the registry.
         
         Args:
             tool_func: The tool function to register
+            policy: Timeout, retry and circuit breaker policy of the tool
+                (defaults to the AM_TOOL_* settings)
         """
         name = getattr(tool_func, "__name__", str(tool_func))
         self._registered_tools[name] = tool_func
+        if policy is not None:
+            self._policies[name] = policy
         logger.info(f"Registered tool: {name}")
     
     def register_tool_with_context(self, tool_func: Callable, context: Dict[str, Any]) -> None:
@@ -83,7 +307,7 @@ class ToolRegistry:
                 Returns:
                     CNPJ verification result containing company information if valid
                 """
-                return await tool_func(context, cnpj)
+                return await tool_func(resolve_tool_context(context), cnpj)
             
             # Register the wrapper
             self._registered_tools[name] = verificar_cnpj_wrapper
@@ -101,7 +325,7 @@ class ToolRegistry:
             # Create a generic wrapper that passes context
             async def wrapped_tool(*args, **kwargs):
                 """Wrapped version of the original tool with context injection."""
-                return await tool_func(context, *args, **kwargs)
+                return await tool_func(resolve_tool_context(context), *args, **kwargs)
                 
             # Copy over metadata
             wrapped_tool.__name__ = name
@@ -150,59 +374,11 @@ class ToolRegistry:
         _import_memory_tools()
         
         if context:
-            # Create and register wrapper for store_memory_tool that includes the context
-            async def store_memory_wrapper(key: str, content: str) -> str:
-                """Store a memory with the given key.
-                
-                Args:
-                    key: The key to store the memory under
-                    content: The memory content to store
-                    
-                Returns:
-                    Confirmation message
-                """
-                return await store_memory_tool(key, content, ctx=context)
-            
-            # Create and register wrapper for get_memory_tool that includes the context
-            async def get_memory_wrapper(key: str) -> Any:
-                """Retrieve a memory with the given key.
-                
-                Args:
-                    key: The key to retrieve the memory with
-                    
-                Returns:
-                    The memory content if found, else an error message
-                """
-                return await get_memory_tool(context, key)
-            
-            # Create and register wrapper for list_memories_tool
-            async def list_memories_wrapper(prefix: Optional[str] = None) -> str:
-                """List all available memories, optionally filtered by prefix.
-                
-                Args:
-                    prefix: Optional prefix to filter memory keys
-                    
-                Returns:
-                    List of memory keys as a string
-                """
-                # Extract the agent_id from the context to filter memories by agent
-                agent_id = context.get("agent_id") if context else None
-                user_id = context.get("user_id") if context else None
-                
-                try:
-                    logger.info(f"Listing memories with agent_id={agent_id}, user_id={user_id}, prefix={prefix}")
-                    
-                    # Use the imported list_memories_tool directly
-                    return await list_memories_tool(prefix)
-                except Exception as e:
-                    error_msg = f"Error listing memories: {str(e)}"
-                    logger.error(error_msg)
-                    return error_msg
-            
-            # Register the wrappers instead of the originals
+            # Register the memory tools that read the per-run context from the run dependencies
             self.register_tool(store_memory_wrapper)
             self.register_tool(get_memory_wrapper)
             self.register_tool(list_memories_wrapper)
+            self._register_search_memories(context)
         else:
             # If no context provided, register the original tools
             self.register_tool(store_memory_tool)
@@ -211,6 +387,19 @@ class ToolRegistry:
             
         logger.info("Default tools registered")
     
+    def _register_search_memories(self, context: Dict[str, Any]) -> None:
+        """Register the semantic memory search tool if semantic memory is enabled.
+        
+        Args:
+            context: Context dictionary with agent_id and user_id
+        """
+        from src.memory.semantic_memory import get_semantic_memory
+        
+        if get_semantic_memory() is None:
+            return
+        
+        self.register_tool(search_memories_wrapper)
+    
     def get_registered_tools(self) -> Dict[str, Callable]:
         """Get all registered tools.
         
@@ -230,22 +419,23 @@ class ToolRegistry:
             try:
                 if hasattr(func, "get_pydantic_tool"):
                     # Use the PydanticAI tool definition if available
-                    tool = func.get_pydantic_tool()
+                    tool = RegistryTool.from_tool(func.get_pydantic_tool(), self._policies.get(name))
                     tools.append(tool)
                     logger.debug(f"Converted to PydanticAI tool: {name}")
                 elif isinstance(func, PydanticTool):
-                    # If it's already a PydanticTool instance, use it directly
-                    tools.append(func)
+                    # Keep the PydanticTool's definition
+                    tools.append(RegistryTool.from_tool(func, self._policies.get(name)))
                     logger.debug(f"Added existing PydanticTool: {name}")
                 elif hasattr(func, "__doc__") and callable(func):
                     # Create a basic wrapper for regular functions
                     doc = func.__doc__ or f"Tool for {name}"
                     # Create a simple PydanticTool
-                    tool = PydanticTool(
+                    tool = RegistryTool(
                         name=name,
                         description=doc,
                         function=func,
-                        max_retries=6
+                        max_retries=6,
+                        policy=self._policies.get(name)
                     )
                     tools.append(tool)
                     logger.debug(f"Created PydanticTool for function: {name}")
@@ -257,11 +447,40 @@ class ToolRegistry:
         logger.debug(msg=f"Converted {len(tools)} tools to PydanticAI tools")
         return tools
 
+    def get_tool_catalog(self, owner: Any) -> Tuple[PydanticTool, ...]:
+        """Get the PydanticAI tools of an agent class, converting them only once.
+        
+        Tool definitions (including their JSON schemas) are built the first time
+        an agent class with a given set of tools asks for them and are shared by
+        all of its instances afterwards. Tools must therefore take per-run data
+        from the run dependencies, not from state captured at registration;
+        their retry counts are kept per run by RegistryTool.
+        
+        Args:
+            owner: The agent class the tools belong to
+            
+        Returns:
+            Immutable tuple of PydanticAI tools
+        """
+        key = (owner, tuple((name, self._policies.get(name)) for name in sorted(self._registered_tools)))
+        catalog = ToolRegistry._catalogs.get(key)
+        if catalog is not None:
+            return catalog
+        
+        with ToolRegistry._catalogs_lock:
+            catalog = ToolRegistry._catalogs.get(key)
+            if catalog is None:
+                catalog = tuple(self.convert_to_pydantic_tools())
+                ToolRegistry._catalogs[key] = catalog
+                logger.info(f"Built catalog of {len(catalog)} tools for {getattr(owner, '__name__', owner)}")
+        return catalog
+    
     def update_context(self, new_context: Dict[str, Any]) -> None:
         """Update the context used by tools.
         
-        This method updates the context for tools that need it, particularly
-        memory tools which require agent_id and user_id for proper operation.
+        The default memory tools read agent_id, user_id and session_id from the
+        run dependencies on every call, so they don't need to be re-registered
+        when the context changes.
         
         Args:
             new_context: Dictionary with context key-value pairs
@@ -269,70 +488,5 @@ class ToolRegistry:
         if not new_context:
             logger.warning("Empty context provided to update_context")
             return
-            
-        # Re-register the memory tools with the updated context
-        # This is needed because memory tools need the context for operation
-        
-        # First make sure memory tools are imported
-        _import_memory_tools()
-        
-        # Re-register wrappers for memory tools with the updated context
-        if store_memory_tool and get_memory_tool and list_memories_tool:
-            # Create wrapper for store_memory_tool
-            async def store_memory_wrapper(key: str, content: str) -> str:
-                """Store a memory with the given key.
-                
-                Args:
-                    key: The key to store the memory under
-                    content: The memory content to store
-                    
-                Returns:
-                    Confirmation message
-                """
-                return await store_memory_tool(key, content, ctx=new_context)
-                
-            # Create wrapper for get_memory_tool  
-            async def get_memory_wrapper(key: str) -> Any:
-                """Retrieve a memory with the given key.
-                
-                Args:
-                    key: The key to retrieve the memory with
-                    
-                Returns:
-                    The memory content if found, else an error message
-                """
-                return await get_memory_tool(new_context, key)
-            
-            # Create wrapper for list_memories_tool
-            async def list_memories_wrapper(prefix: Optional[str] = None) -> str:
-                """List all available memories, optionally filtered by prefix.
-                
-                Args:
-                    prefix: Optional prefix to filter memory keys
-                    
-                Returns:
-                    List of memory keys as a string
-                """
-                # Extract the agent_id from the context to filter memories by agent
-                agent_id = new_context.get("agent_id") if new_context else None
-                user_id = new_context.get("user_id") if new_context else None
-                
-                try:
-                    logger.info(f"Listing memories with agent_id={agent_id}, user_id={user_id}, prefix={prefix}")
-                    
-                    # Use the imported list_memories_tool directly
-                    return await list_memories_tool(prefix)
-                except Exception as e:
-                    error_msg = f"Error listing memories: {str(e)}"
-                    logger.error(error_msg)
-                    return error_msg
-            
-            # Re-register all memory tool wrappers
-            self.register_tool(store_memory_wrapper)
-            self.register_tool(get_memory_wrapper)
-            self.register_tool(list_memories_wrapper)
-            logger.info(f"Updated memory tools with new context: {new_context}")
-        else:
-            logger.warning("Could not update memory tools: not imported")
         
-        logger.info("Tool context updated") 
\ No newline at end of file
+        logger.info("Tool context updated")
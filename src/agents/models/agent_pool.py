@@ -0,0 +1,192 @@
+"""Pool of warm agent instances.
+
+Building an agent registers its tools, compiles its prompt and, on the first
+run, creates the pydantic-ai Agent. The pool keeps one instance per agent type
+and normalized parameters, so requests reuse an agent that is already built.
+Per-run state lives in the run context (see src.context), so one instance
+serves any number of concurrent requests. Instances no request is using are
+evicted after AM_AGENT_POOL_IDLE_TTL, or earliest-released first when more
+than AM_AGENT_POOL_SIZE are kept.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.agents.models.automagik_agent import AutomagikAgent
+from src.config import settings
+from src.utils.metrics import metrics
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, str]
+
+
+def pool_key(agent_type: str, parameters: Optional[Dict[str, Any]] = None) -> PoolKey:
+    """Build the pool key of an agent type and its parameters.
+
+    Args:
+        agent_type: Agent type, with or without the "_agent" suffix
+        parameters: Optional agent parameters
+
+    Returns:
+        Tuple of the normalized agent type and the parameters as canonical JSON
+    """
+    agent_type = agent_type or "simple"
+    if agent_type.endswith("_agent"):
+        agent_type = agent_type[:-len("_agent")]
+    return agent_type, json.dumps(parameters or {}, sort_keys=True, default=str)
+
+
+class _PoolEntry:
+    """A pooled agent and the requests currently using it."""
+
+    def __init__(self, agent: AutomagikAgent):
+        self.agent = agent
+        self.leases = 0
+        self.released_at = time.monotonic()
+
+
+class AgentPool:
+    """Agent instances shared by the requests with the same type and parameters."""
+
+    def __init__(self, max_size: int = 32, idle_ttl: float = 600.0):
+        """Initialize an empty pool.
+
+        Args:
+            max_size: Maximum number of instances kept (0 disables pooling)
+            idle_ttl: Seconds an unused instance is kept before it is evicted
+        """
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._entries: "OrderedDict[PoolKey, _PoolEntry]" = OrderedDict()
+        self._keys: Dict[int, PoolKey] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def acquire(self, agent_type: str, parameters: Optional[Dict[str, Any]] = None) -> AutomagikAgent:
+        """Lease the agent for a type and parameters, creating it on first use.
+
+        Args:
+            agent_type: Agent type to lease
+            parameters: Optional agent parameters
+
+        Returns:
+            The leased agent (a PlaceholderAgent if it can't be created)
+        """
+        from src.agents.models.agent_factory import AgentFactory
+
+        key = pool_key(agent_type, parameters)
+        async with self._lock:
+            evicted = self._evict(time.monotonic() - self.idle_ttl)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.leases += 1
+                self._entries.move_to_end(key)
+        await self._close(evicted)
+
+        if entry is not None:
+            metrics.increment("agent_pool_hits")
+            return entry.agent
+
+        metrics.increment("agent_pool_misses")
+        agent = AgentFactory.create_agent(agent_type, parameters)
+        if self.max_size <= 0 or agent.__class__.__name__ == "PlaceholderAgent":
+            return agent
+
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # Instances built by requests racing for the same key are used once
+                entry = self._entries[key] = _PoolEntry(agent)
+                self._keys[id(agent)] = key
+            if entry.agent is agent:
+                entry.leases += 1
+            metrics.set_gauge("agent_pool_size", len(self))
+        return agent
+
+    async def release(self, agent: AutomagikAgent) -> None:
+        """Return a leased agent to the pool.
+
+        Args:
+            agent: An agent returned by acquire
+        """
+        async with self._lock:
+            key = self._keys.get(id(agent))
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None or entry.agent is not agent:
+                evicted = [agent]
+            else:
+                entry.leases -= 1
+                entry.released_at = time.monotonic()
+                evicted = self._evict(entry.released_at - self.idle_ttl)
+        await self._close(evicted)
+
+    async def close(self) -> None:
+        """Evict and clean up all instances no request is using."""
+        async with self._lock:
+            evicted = self._evict(float("inf"))
+        await self._close(evicted)
+
+    def _evict(self, cutoff: float) -> List[AutomagikAgent]:
+        """Remove unused instances released before cutoff or above max_size. Caller holds the lock."""
+        unused = [key for key, entry in self._entries.items() if entry.leases <= 0]
+        unused.sort(key=lambda key: self._entries[key].released_at)
+        overflow = len(self._entries) - self.max_size
+
+        evicted = []
+        for key in unused:
+            entry = self._entries[key]
+            if entry.released_at >= cutoff and overflow <= 0:
+                continue
+            del self._entries[key]
+            self._keys.pop(id(entry.agent), None)
+            evicted.append(entry.agent)
+            overflow -= 1
+
+        metrics.set_gauge("agent_pool_size", len(self))
+        return evicted
+
+    async def _close(self, agents: List[AutomagikAgent]) -> None:
+        """Clean up agents that are no longer pooled."""
+        for agent in agents:
+            metrics.increment("agent_pool_evictions")
+            try:
+                await agent.cleanup()
+            except Exception as e:
+                logger.error(f"Error cleaning up pooled agent: {str(e)}")
+
+
+# Global agent pool, created on first use
+_agent_pool: Optional[AgentPool] = None
+
+
+def get_agent_pool() -> AgentPool:
+    """Get the global agent pool.
+
+    Returns:
+        The global AgentPool instance
+    """
+    global _agent_pool
+
+    if _agent_pool is None:
+        _agent_pool = AgentPool(
+            max_size=settings.AM_AGENT_POOL_SIZE,
+            idle_ttl=settings.AM_AGENT_POOL_IDLE_TTL
+        )
+    return _agent_pool
+
+
+async def shutdown_agent_pool() -> None:
+    """Clean up all unused agents of the global pool."""
+    global _agent_pool
+
+    if _agent_pool is not None:
+        await _agent_pool.close()
+        _agent_pool = None
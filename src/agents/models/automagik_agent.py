@@ -1,13 +1,18 @@
+import asyncio
 import logging
-from typing import Dict, Optional, Union,  Any, TypeVar, Generic
+from typing import AsyncIterator, Dict, List, Optional, Union,  Any, TypeVar, Generic
 from abc import ABC, abstractmethod
 
+from src.config import settings
 from src.memory.message_history import MessageHistory
+from src.memory.write_buffer import buffered_memory_writes
+from src.utils.tracing import get_current_trace, span
+from src.context import AgentRunContext, agent_run_context, get_run_context
 from src.agents.models.dependencies import BaseDependencies
 from src.agents.models.response import AgentResponse
 
 # Import common utilities
-from src.agents.common.prompt_builder import PromptBuilder
+from src.agents.common.prompt_builder import PromptBuilder, PromptLayout, PROMPT_LAYOUTS, RESERVED_TEMPLATE_VARIABLES
 from src.agents.common.memory_handler import MemoryHandler
 from src.agents.common.tool_registry import ToolRegistry
 from src.agents.common.session_manager import (
@@ -100,7 +105,8 @@ class AutomagikAgent(ABC, Generic[T]):
         
         # Initialize core components
         self.tool_registry = ToolRegistry()
-        self.template_vars = PromptBuilder.extract_template_variables(system_prompt)
+        self.prompt_template = PromptBuilder.compile_template(system_prompt)
+        self.template_vars = list(self.prompt_template.variables)
         
         # Initialize context
         self.context = {"agent_id": self.db_id}
@@ -110,16 +116,17 @@ class AutomagikAgent(ABC, Generic[T]):
         
         logger.info(f"Initialized AutomagikAgent with ID: {self.db_id}")
     
-    def register_tool(self, tool_func):
+    def register_tool(self, tool_func, policy=None):
         """Register a tool with the agent.
         
         Args:
             tool_func: The tool function to register
+            policy: Optional ToolPolicy with the tool's timeout, retries and circuit breaker
         """
         if not hasattr(self, 'tool_registry') or self.tool_registry is None:
             self.tool_registry = ToolRegistry()
             
-        self.tool_registry.register_tool(tool_func)
+        self.tool_registry.register_tool(tool_func, policy)
         logger.debug(f"Registered tool: {getattr(tool_func, '__name__', str(tool_func))}")
     
     def update_context(self, context_updates: Dict[str, Any]) -> None:
@@ -135,6 +142,24 @@ class AutomagikAgent(ABC, Generic[T]):
             self.tool_registry.update_context(self.context)
             
         logger.info(f"Updated agent context: {context_updates.keys()}")
+
+    def current_run(self) -> AgentRunContext:
+        """Get the state of the run this agent is executing in the current task.
+        
+        Returns:
+            The active run's context, or one holding the agent's own defaults
+            when called outside of a run
+        """
+        run = get_run_context()
+        if run is not None and run.agent is self:
+            return run
+        return AgentRunContext(
+            agent=self,
+            agent_id=self.db_id,
+            user_id=getattr(self.dependencies, "user_id", None),
+            context=self.context,
+            dependencies=self.dependencies
+        )
     
     async def initialize_memory_variables(self, user_id: Optional[int] = None) -> bool:
         """Initialize memory variables for the agent.
@@ -145,21 +170,22 @@ class AutomagikAgent(ABC, Generic[T]):
         Returns:
             True if successful, False otherwise
         """
-        if not self.db_id or not self.template_vars:
+        agent_id = self.current_run().agent_id
+        if not agent_id or not self.template_vars:
             logger.warning("Cannot initialize memory: No agent ID or template variables")
             return False
             
         try:
             result = MemoryHandler.initialize_memory_variables_sync(
                 template_vars=self.template_vars,
-                agent_id=self.db_id,
+                agent_id=agent_id,
                 user_id=user_id
             )
             
             if result:
-                logger.info(f"Memory variables initialized for agent ID {self.db_id}")
+                logger.info(f"Memory variables initialized for agent ID {agent_id}")
             else:
-                logger.warning(f"Failed to initialize memory variables for agent ID {self.db_id}")
+                logger.warning(f"Failed to initialize memory variables for agent ID {agent_id}")
                 
             return result
         except Exception as e:
@@ -175,55 +201,130 @@ class AutomagikAgent(ABC, Generic[T]):
         Returns:
             Dictionary of memory variables
         """
-        if not self.db_id or not self.template_vars:
+        agent_id = self.current_run().agent_id
+        if not agent_id or not self.template_vars:
             logger.warning("Cannot fetch memory: No agent ID or template variables")
             return {}
             
         try:
             memory_vars = await MemoryHandler.fetch_memory_vars(
                 template_vars=self.template_vars,
-                agent_id=self.db_id,
+                agent_id=agent_id,
                 user_id=user_id
             )
             
-            logger.info(f"Fetched {len(memory_vars)} memory variables for agent ID {self.db_id}")
+            logger.info(f"Fetched {len(memory_vars)} memory variables for agent ID {agent_id}")
             return memory_vars
         except Exception as e:
             logger.error(f"Error fetching memory variables: {str(e)}")
             return {}
     
-    async def get_filled_system_prompt(self, user_id: Optional[int] = None) -> str:
-        """Get the system prompt filled with memory variables.
+    async def fetch_relevant_memories(self, user_id: Optional[int], query: Optional[str]) -> str:
+        """Find the stored memories most relevant to a message for {{relevant_memories}}.
         
         Args:
             user_id: Optional user ID
+            query: The user's message
             
         Returns:
-            Filled system prompt
+            Formatted relevant memories, or "None" if there are none
         """
-        # Check and ensure memory variables exist
-        MemoryHandler.check_and_ensure_memory_variables(
-            template_vars=self.template_vars,
-            agent_id=self.db_id,
-            user_id=user_id
-        )
+        from src.memory.semantic_memory import get_semantic_memory, format_relevant_memories
         
-        # Fetch memory variables
-        memory_vars = await self.fetch_memory_variables(user_id)
+        agent_id = self.current_run().agent_id
+        semantic_memory = get_semantic_memory()
+        if semantic_memory is None or not agent_id or not query:
+            return format_relevant_memories([])
         
-        # Get run ID from context
-        run_id = self.context.get('run_id')
+        try:
+            results = await asyncio.to_thread(semantic_memory.search, agent_id, user_id, query)
+            logger.info(f"Found {len(results)} relevant memories for agent ID {agent_id}")
+            return format_relevant_memories(results)
+        except Exception as e:
+            logger.error(f"Error searching relevant memories: {str(e)}")
+            return format_relevant_memories([])
+    
+    async def get_system_prompt_layout(self, user_id: Optional[int] = None,
+                                       layout: Optional[str] = None,
+                                       query: Optional[str] = None) -> PromptLayout:
+        """Get the system prompt filled with memory variables, split for prefix caching.
+        
+        Args:
+            user_id: Optional user ID
+            layout: Optional prompt layout ("inline" or "prefix_cache"); defaults to AM_PROMPT_LAYOUT
+            query: Optional user message used to select {{relevant_memories}}
+            
+        Returns:
+            The filled prompt layout
+        """
+        layout = layout or settings.AM_PROMPT_LAYOUT
+        if layout not in PROMPT_LAYOUTS:
+            logger.warning(f"Unknown prompt layout '{layout}', using 'inline'")
+            layout = "inline"
+        
+        # Get agent and run ID from the current run
+        run = self.current_run()
+        agent_id = run.agent_id
+        run_id = run.context.get('run_id')
+        
+        # The memory version is read before fetching, so a concurrent write
+        # only makes the memoized prompt miss on the next turn.
+        token = None
+        if agent_id:
+            from src.memory.memory_versions import get_memory_versions
+            
+            token = get_memory_versions().token(agent_id, user_id)
+        
+        # Fetch memory variables (missing ones are created in the same query)
+        memory_var_names = [var for var in self.template_vars if var not in RESERVED_TEMPLATE_VARIABLES]
+        
+        async def fetch_memory_vars() -> Dict[str, Any]:
+            return await self.fetch_memory_variables(user_id) if memory_var_names else {}
+        
+        # Relevant memories depend on the message, so they are part of the memo key.
+        # The semantic search and the memory fetch are independent and run concurrently.
+        relevant_memories = None
+        memory_vars = None
+        if "relevant_memories" in self.template_vars:
+            relevant_memories, memory_vars = await asyncio.gather(
+                self.fetch_relevant_memories(user_id, query),
+                fetch_memory_vars()
+            )
+        
+        # Reuse the last prompt if neither the memories nor the run changed
+        memo_key = None
+        if token is not None:
+            memo_key = self.prompt_template.memo_key((layout, agent_id, user_id, token, relevant_memories), run_id)
+            cached = self.prompt_template.lookup(memo_key)
+            if cached is not None:
+                return cached
+        
+        if memory_vars is None:
+            memory_vars = await fetch_memory_vars()
         
         # Fill system prompt with variables
-        filled_prompt = await PromptBuilder.get_filled_system_prompt(
-            prompt_template=self.system_prompt,
-            memory_vars=memory_vars,
-            run_id=run_id,
-            agent_id=self.db_id,
-            user_id=user_id
-        )
+        fill_vars = dict(memory_vars)
+        if relevant_memories is not None:
+            fill_vars["relevant_memories"] = relevant_memories
+        prompt_layout = self.prompt_template.render_layout(fill_vars, run_id, layout)
         
-        return filled_prompt
+        # Don't memoize prompts filled while memories were unavailable
+        if memo_key and all(memory_vars.get(var) not in (None, "No data available") for var in memory_var_names):
+            self.prompt_template.remember(memo_key, prompt_layout)
+        
+        return prompt_layout
+    
+    async def get_filled_system_prompt(self, user_id: Optional[int] = None) -> str:
+        """Get the system prompt filled with memory variables.
+        
+        Args:
+            user_id: Optional user ID
+            
+        Returns:
+            Filled system prompt
+        """
+        prompt_layout = await self.get_system_prompt_layout(user_id)
+        return prompt_layout.text
     
     @abstractmethod
     async def run(self, input_text: str, *, multimodal_content=None, 
@@ -243,6 +344,37 @@ class AutomagikAgent(ABC, Generic[T]):
         """
         pass
         
+    async def run_stream(self, input_text: str, *, multimodal_content=None,
+                         system_message=None, message_history_obj=None,
+                         channel_payload: Optional[Dict] = None,
+                         message_limit: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Run the agent, yielding events as the response is produced.
+        
+        Agents without incremental output run to completion and emit their
+        whole response as a single text delta.
+        
+        Args:
+            input_text: Text input for the agent
+            multimodal_content: Optional multimodal content
+            system_message: Optional system message for this run
+            message_history_obj: Optional MessageHistory instance for DB storage
+            
+        Yields:
+            Stream events ({"event", "data"}); the last one is a "response"
+            event with the AgentResponse
+        """
+        response = await self.run(
+            input_text,
+            multimodal_content=multimodal_content,
+            system_message=system_message,
+            message_history_obj=message_history_obj,
+            channel_payload=channel_payload,
+            message_limit=message_limit
+        )
+        if response.text:
+            yield {"event": "text_delta", "data": {"delta": response.text}}
+        yield {"event": "response", "data": response}
+        
     async def process_message(self, user_message: Union[str, Dict[str, Any]], 
                               session_id: Optional[str] = None, 
                               agent_id: Optional[Union[int, str]] = None, 
@@ -250,7 +382,8 @@ class AutomagikAgent(ABC, Generic[T]):
                               context: Optional[Dict] = None, 
                               message_history: Optional['MessageHistory'] = None,
                               channel_payload: Optional[Dict] = None,
-                              message_limit: Optional[int] = None,) -> AgentResponse:
+                              message_limit: Optional[int] = None,
+                              coalesced_messages: Optional[List[Dict[str, Any]]] = None) -> AgentResponse:
         """Process a user message.
         
         Args:
@@ -260,64 +393,201 @@ class AutomagikAgent(ABC, Generic[T]):
             user_id: User ID to associate with the message (default 1)
             context: Optional context dictionary with additional parameters
             message_history: Optional MessageHistory instance for DB storage
+            channel_payload: Optional channel payload stored with the user message
+            message_limit: Optional number of history messages to load
+            coalesced_messages: Optional original messages ({"content", "channel_payload"})
+                merged into user_message; each is stored as its own user message
             
         Returns:
             AgentResponse object with the agent's response
         """
         from src.agents.common.message_parser import parse_user_message
-        from src.agents.common.session_manager import create_context, validate_agent_id, validate_user_id, extract_multimodal_content
+        from src.agents.common.session_manager import extract_multimodal_content
 
         # Parse the user message
         content, _ = parse_user_message(user_message)
+        run = self._create_run(agent_id, user_id, session_id, context, message_history)
+        
+        # Extract multimodal content if present
+        multimodal_content = extract_multimodal_content(context)
+        
+        with span("agent.process_message", agent=type(self).__name__):
+            # Run the agent; memory writes made by its tools are flushed together afterwards
+            with agent_run_context(run):
+                async with buffered_memory_writes():
+                    response = await self.run(
+                        content, 
+                        multimodal_content=multimodal_content,
+                        message_history_obj=message_history,
+                        channel_payload=channel_payload,
+                        message_limit=message_limit,
+                    )
+            
+            # Save messages to database if message_history is provided
+            if message_history:
+                with span("db.save_turn"):
+                    self._save_turn(message_history, run.agent_id, content, response, channel_payload, coalesced_messages)
+                
+        return response
+    
+    async def process_message_stream(self, user_message: Union[str, Dict[str, Any]], 
+                                     session_id: Optional[str] = None, 
+                                     agent_id: Optional[Union[int, str]] = None, 
+                                     user_id: int = 1, 
+                                     context: Optional[Dict] = None, 
+                                     message_history: Optional['MessageHistory'] = None,
+                                     channel_payload: Optional[Dict] = None,
+                                     message_limit: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Process a user message, yielding the response as it is produced.
+        
+        The turn is saved once the run finishes, before the final event is
+        yielded. The run context stays active across yields, so the stream must
+        be consumed by a single task.
+        
+        Args:
+            user_message: User message text or dictionary with message details
+            session_id: Optional session ID to use
+            agent_id: Optional agent ID to use
+            user_id: User ID to associate with the message (default 1)
+            context: Optional context dictionary with additional parameters
+            message_history: Optional MessageHistory instance for DB storage
+            channel_payload: Optional channel payload stored with the user message
+            message_limit: Optional number of history messages to load
             
-        # Update agent ID and user ID
-        if agent_id is not None:
-            self.db_id = validate_agent_id(agent_id)
-            self.dependencies.set_agent_id(self.db_id)
+        Yields:
+            Stream events ({"event", "data"}); the last one is a "response"
+            event with the AgentResponse
+        """
+        from src.agents.common.message_parser import parse_user_message
+        from src.agents.common.session_manager import extract_multimodal_content
+
+        content, _ = parse_user_message(user_message)
+        run = self._create_run(agent_id, user_id, session_id, context, message_history)
+        multimodal_content = extract_multimodal_content(context)
+        
+        response = None
+        with agent_run_context(run):
+            async with buffered_memory_writes():
+                async for event in self.run_stream(
+                    content,
+                    multimodal_content=multimodal_content,
+                    message_history_obj=message_history,
+                    channel_payload=channel_payload,
+                    message_limit=message_limit,
+                ):
+                    if event["event"] == "response":
+                        response = event["data"]
+                    else:
+                        yield event
         
-        self.dependencies.user_id = validate_user_id(user_id)
+        if response is None:
+            response = AgentResponse(text="", success=False, error_message="Agent stream ended without a response")
+        if message_history:
+            self._save_turn(message_history, run.agent_id, content, response, channel_payload)
+        yield {"event": "response", "data": response}
+    
+    def _create_run(self, agent_id: Optional[Union[int, str]], user_id: Optional[int],
+                    session_id: Optional[str], context: Optional[Dict],
+                    message_history: Optional['MessageHistory']) -> AgentRunContext:
+        """Build the state of one run without touching the shared agent.
         
-        # Update context
-        new_context = create_context(
-            agent_id=self.db_id, 
+        Args:
+            agent_id: Optional agent ID overriding the agent's own
+            user_id: User ID of the run
+            session_id: Optional session ID
+            context: Optional context dictionary with additional parameters
+            message_history: Optional MessageHistory instance for DB storage
+            
+        Returns:
+            The run's AgentRunContext
+        """
+        from src.agents.common.session_manager import create_context, validate_user_id
+        
+        run_agent_id = validate_agent_id(agent_id) if agent_id is not None else self.db_id
+        run_user_id = validate_user_id(user_id)
+        run_context = dict(self.context)
+        run_context.update(create_context(
+            agent_id=run_agent_id, 
             user_id=user_id,
             session_id=session_id,
             additional_context=context
+        ))
+        dependencies = None
+        if self.dependencies is not None:
+            dependencies = self.dependencies.for_run(run_agent_id, run_user_id, session_id, run_context)
+        return AgentRunContext(
+            agent=self,
+            agent_id=run_agent_id,
+            user_id=run_user_id,
+            session_id=session_id,
+            context=run_context,
+            dependencies=dependencies,
+            message_history=message_history
         )
-        self.update_context(new_context)
+    
+    def _save_turn(self, message_history: 'MessageHistory', agent_id: Optional[int], content: str,
+                   response: AgentResponse, channel_payload: Optional[Dict] = None,
+                   coalesced_messages: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Save the user message(s) and agent response of a run in one round trip.
         
-        # Extract multimodal content if present
-        multimodal_content = extract_multimodal_content(context)
+        Args:
+            message_history: MessageHistory of the session
+            agent_id: Agent ID of the run
+            content: The user message
+            response: The agent's response
+            channel_payload: Optional channel payload stored with the user message
+            coalesced_messages: Optional original messages merged into content
+        """
+        from src.agents.common.message_parser import format_message_for_db
+        from src.memory.message_history import split_native_turn
         
-        # Run the agent
-        response = await self.run(
-            content, 
-            multimodal_content=multimodal_content,
-            message_history_obj=message_history,
-            channel_payload=channel_payload,
-            message_limit=message_limit,
+        # Split the run's native messages between the user and assistant rows
+        user_native, agent_native = split_native_turn(getattr(response, "native_messages", None))
+        
+        if coalesced_messages:
+            # The merged prompt isn't stored natively; each original message is its own row
+            user_db_messages = [
+                format_message_for_db(
+                    role="user",
+                    content=original.get("content", ""),
+                    agent_id=agent_id,
+                    channel_payload=original.get("channel_payload")
+                )
+                for original in coalesced_messages
+            ]
+        else:
+            user_db_messages = [format_message_for_db(
+                role="user",
+                content=content,
+                agent_id=agent_id,
+                channel_payload=channel_payload,
+                native_messages=user_native
+            )]
+        agent_db_message = format_message_for_db(
+            role="assistant", 
+            content=response.text,
+            tool_calls=response.tool_calls,
+            tool_outputs=response.tool_outputs,
+            system_prompt=getattr(response, "system_prompt", None),
+            agent_id=agent_id,
+            native_messages=agent_native,
+            context=self._response_context(response)
         )
+        message_history.add_turn(user_db_messages + [agent_db_message])
         
-        # Save messages to database if message_history is provided
-        if message_history:
-            from src.agents.common.message_parser import format_message_for_db
-            
-            # Save user message
-            user_db_message = format_message_for_db(role="user", content=content, agent_id=self.db_id, channel_payload=channel_payload)
-            message_history.add_message(message=user_db_message)
-            
-            # Save agent response
-            agent_db_message = format_message_for_db(
-                role="assistant", 
-                content=response.text,
-                tool_calls=response.tool_calls,
-                tool_outputs=response.tool_outputs,
-                system_prompt=getattr(response, "system_prompt", None),
-                agent_id=self.db_id
-            )
-            message_history.add_message(agent_db_message)
-                
-        return response
+    @staticmethod
+    def _response_context(response: AgentResponse) -> Optional[Dict[str, Any]]:
+        """Build the per-run context stored with the assistant message."""
+        context = {}
+        if getattr(response, "prompt_prefix_hash", None):
+            context["prompt_prefix_hash"] = response.prompt_prefix_hash
+        if getattr(response, "cached", False):
+            context["cached"] = True
+        # Latency breakdown of the run so far, by span category
+        trace = get_current_trace()
+        if trace is not None:
+            context["trace"] = {"trace_id": trace.trace_id, "timings": trace.breakdown()}
+        return context or None
         
     async def cleanup(self) -> None:
         """Clean up resources used by the agent."""
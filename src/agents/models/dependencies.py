@@ -3,6 +3,7 @@
 This module provides typed dependencies for all agents in the system,
 following pydantic-ai best practices for dependency injection.
 """
+import copy
 from dataclasses import dataclass, field
 from typing import Any, Dict, Optional, List, Union, Generic, TypeVar
 import logging
@@ -56,6 +57,9 @@ class BaseDependencies:
     user_id: Optional[int] = None
     session_id: Optional[str] = None
     
+    # Per-run context passed to tools (agent_id, user_id, session_id, run_id, ...)
+    context: Dict[str, Any] = field(default_factory=dict)
+    
     # Configuration
     api_keys: Dict[str, str] = field(default_factory=dict)
     
@@ -76,14 +80,14 @@ class BaseDependencies:
             MemoryProvider instance
         """
         if self._memory_provider is None and self._agent_id_numeric:
-            from src.tools.memory_tools.provider import MemoryProvider
-            self._memory_provider = MemoryProvider(self._agent_id_numeric)
+            from src.tools.memory.provider import get_memory_provider
+            self._memory_provider = get_memory_provider(self._agent_id_numeric, self.user_id)
             logger.debug(f"Created memory provider for agent {self._agent_id_numeric}")
         
         if self._memory_provider is None:
             # Create a fallback provider if agent ID isn't set
-            from src.tools.memory_tools.provider import MemoryProvider
-            self._memory_provider = MemoryProvider(999)
+            from src.tools.memory.provider import get_memory_provider
+            self._memory_provider = get_memory_provider(999)
             logger.warning("Created fallback memory provider with agent ID 999")
         
         return self._memory_provider
@@ -98,7 +102,39 @@ class BaseDependencies:
         # Reset memory provider to use new agent ID
         self._memory_provider = None
         logger.debug(f"Set agent ID to {agent_id} for dependency object")
-    
+
+    def set_context(self, context: Dict[str, Any]) -> None:
+        """Set the context tools read during a run.
+        
+        Args:
+            context: Context dictionary with agent_id, user_id, session_id and run data
+        """
+        self.context = context
+
+    def for_run(self, agent_id: Optional[int], user_id: Optional[int] = None,
+                session_id: Optional[str] = None,
+                context: Optional[Dict[str, Any]] = None) -> "BaseDependencies":
+        """Create a copy of these dependencies for a single run.
+
+        The copy shares configuration and clients with the original, so
+        changes made during the run don't leak into other runs.
+
+        Args:
+            agent_id: Numeric ID of the agent in the database
+            user_id: Optional user ID of the run
+            session_id: Optional session ID of the run
+            context: Optional context tools read during the run
+
+        Returns:
+            The per-run dependencies
+        """
+        deps = copy.copy(self)
+        deps.user_id = user_id
+        deps.session_id = session_id
+        deps.set_context(context if context is not None else {})
+        deps.set_agent_id(agent_id)
+        return deps
+
     async def get_memory(self, name: str) -> Optional[Dict[str, Any]]:
         """Fetch memory from database by name.
         
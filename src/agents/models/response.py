@@ -15,4 +15,8 @@ class AgentResponse(BaseModel):
     tool_calls: Optional[List[Dict]] = None
     tool_outputs: Optional[List[Dict]] = None
     raw_message: Optional[Union[Dict, List]] = None 
-    system_prompt: Optional[str] = None
\ No newline at end of file
+    system_prompt: Optional[str] = None
+    native_messages: Optional[List[Dict]] = None
+    prompt_prefix_hash: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None
+    cached: bool = False
@@ -3,15 +3,27 @@
 This module provides a SimpleAgent class that uses PydanticAI for LLM integration
 and inherits common functionality from AutomagikAgent.
 """
+import asyncio
 import logging
 import traceback
-from typing import Dict, Any, Optional, Union
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple, Union
 
 from pydantic_ai import Agent
+from pydantic_graph import End
+from pydantic_ai.messages import (
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
+    PartDeltaEvent,
+    PartStartEvent,
+    TextPart,
+    TextPartDelta
+)
 from src.agents.models.automagik_agent import AutomagikAgent
 from src.agents.models.dependencies import AutomagikAgentsDependencies
 from src.agents.models.response import AgentResponse
-from src.memory.message_history import MessageHistory
+from src.config import settings
+from src.memory.message_history import MessageHistory, dump_model_messages
+from src.utils.tracing import span
 
 # Import only necessary utilities
 from src.agents.common.message_parser import (
@@ -19,6 +31,9 @@ from src.agents.common.message_parser import (
     extract_tool_outputs,
     extract_all_messages
 )
+from src.agents.common.prompt_builder import PromptBuilder, PromptLayout
+from src.agents.common.prep_pipeline import PreparationPipeline
+from src.agents.common.response_cache import get_response_cache, is_response_cache_enabled, response_cache_key
 from src.agents.common.dependencies_helper import (
     parse_model_settings,
     create_model_settings,
@@ -65,6 +80,11 @@ class SimpleAgent(AutomagikAgent):
         if usage_limits:
             self.dependencies.set_usage_limits(usage_limits)
         
+        # Seconds responses are cached for, if the agent opted in
+        self.response_cache_ttl: Optional[float] = None
+        if is_response_cache_enabled(config):
+            self.response_cache_ttl = float(config.get("response_cache_ttl", settings.AM_RESPONSE_CACHE_TTL))
+        
         # Register default tools
         self.tool_registry.register_default_tools(self.context)
         
@@ -79,8 +99,8 @@ class SimpleAgent(AutomagikAgent):
         model_name = self.dependencies.model_name
         model_settings = create_model_settings(self.dependencies.model_settings)
         
-        # Convert tools to PydanticAI format
-        tools = self.tool_registry.convert_to_pydantic_tools()
+        # Tool definitions are built once per agent class and shared
+        tools = self.tool_registry.get_tool_catalog(type(self))
         logger.info(f"Prepared {len(tools)} tools for PydanticAI agent")
                     
         try:
@@ -98,6 +118,184 @@ class SimpleAgent(AutomagikAgent):
             logger.error(f"Failed to initialize agent: {str(e)}")
             raise
         
+    async def _prepare_run(self, input_text: str, multimodal_content=None,
+                           message_history_obj: Optional[MessageHistory] = None,
+                           message_limit: Optional[int] = 20) -> Tuple[Any, List[Any], PromptLayout]:
+        """Build the model input, history and system prompt of the current run.
+        
+        Args:
+            input_text: Text input for the agent
+            multimodal_content: Optional multimodal content
+            message_history_obj: Optional MessageHistory instance for DB storage
+            message_limit: Number of history messages to load
+            
+        Returns:
+            Tuple of the user input, the PydanticAI message history and the prompt layout
+        """
+        run = self.current_run()
+        message_history_obj = message_history_obj or run.message_history
+        
+        # Prepare user input (handle multimodal content)
+        user_input = input_text
+        if multimodal_content:
+            if hasattr(run.dependencies, 'configure_for_multimodal'):
+                run.dependencies.configure_for_multimodal(True)
+            user_input = {"text": input_text, "multimodal_content": multimodal_content}
+        
+        # Loading the history and filling the system prompt don't depend on each other
+        async def load_history():
+            if not message_history_obj:
+                return []
+            return await asyncio.to_thread(message_history_obj.get_formatted_pydantic_messages, limit=message_limit)
+        
+        pipeline = PreparationPipeline()
+        pipeline.add_stage("history", load_history)
+        pipeline.add_stage("prompt", lambda: self.get_system_prompt_layout(user_id=run.user_id, query=input_text))
+        prepared = await pipeline.run()
+        
+        pydantic_message_history = prepared["history"]
+        prompt_layout = prepared["prompt"]
+        PromptBuilder.record_prefix_hash(run.agent_id, run.user_id, prompt_layout.prefix_hash)
+        
+        # Add system prompt to message history, keeping its static part a stable prefix
+        if prompt_layout.text:
+            pydantic_message_history = add_system_message_to_history(
+                pydantic_message_history, 
+                prompt_layout.static_prefix,
+                dynamic_context=prompt_layout.dynamic_section
+            )
+        
+        return user_input, pydantic_message_history, prompt_layout
+    
+    async def _run_graph(self, user_input: Any, message_history: List[Any], dependencies: Any) -> Any:
+        """Run the PydanticAI agent node by node, timing each model request and tool step.
+        
+        Args:
+            user_input: The prepared user input
+            message_history: The prepared PydanticAI message history
+            dependencies: Dependencies of the current run
+            
+        Returns:
+            The PydanticAI run result
+        """
+        async with self._agent_instance.iter(
+            user_input,
+            message_history=message_history,
+            usage_limits=getattr(dependencies, "usage_limits", None),
+            deps=dependencies
+        ) as agent_run:
+            node = agent_run.next_node
+            while not isinstance(node, End):
+                if Agent.is_model_request_node(node):
+                    name = "llm.request"
+                elif Agent.is_call_tools_node(node):
+                    name = "agent.tools"
+                else:
+                    name = "agent.step"
+                with span(name):
+                    node = await agent_run.next(node)
+        return agent_run.result
+    
+    @staticmethod
+    def _build_response(result: Any, prompt_layout: PromptLayout) -> AgentResponse:
+        """Convert a finished PydanticAI run into an AgentResponse.
+        
+        Args:
+            result: The PydanticAI run result
+            prompt_layout: The system prompt the run used
+            
+        Returns:
+            AgentResponse object with result and metadata
+        """
+        # Extract tool calls and outputs
+        all_messages = extract_all_messages(result)
+        tool_calls = []
+        tool_outputs = []
+        
+        # Process each message to extract tool calls and outputs
+        for msg in all_messages:
+            tool_calls.extend(extract_tool_calls(msg))
+            tool_outputs.extend(extract_tool_outputs(msg))
+        
+        usage = result.usage()
+        return AgentResponse(
+            text=result.data,
+            success=True,
+            tool_calls=tool_calls,
+            tool_outputs=tool_outputs,
+            raw_message=all_messages,
+            system_prompt=prompt_layout.text,
+            native_messages=dump_model_messages(result.new_messages()),
+            prompt_prefix_hash=prompt_layout.prefix_hash,
+            usage={
+                "requests": usage.requests,
+                "request_tokens": usage.request_tokens,
+                "response_tokens": usage.response_tokens,
+                "total_tokens": usage.total_tokens,
+            },
+        )
+    
+    def _response_cache_key(self, user_input: Any, message_history: List[Any]) -> Optional[str]:
+        """Get the response cache key of a prepared run.
+        
+        Args:
+            user_input: The prepared user input
+            message_history: The prepared PydanticAI message history, system prompt included
+            
+        Returns:
+            The cache key, or None if the agent doesn't cache or the input can't be cached
+        """
+        # Multimodal input isn't hashed; such runs always call the model
+        if self.response_cache_ttl is None or not isinstance(user_input, str):
+            return None
+        
+        history = dump_model_messages(message_history)
+        if message_history and history is None:
+            return None
+        
+        tool_names = [tool.name for tool in self.tool_registry.get_tool_catalog(type(self))]
+        return response_cache_key(
+            self.dependencies.model_name, self.dependencies.model_settings, tool_names, history, user_input
+        )
+    
+    async def _store_cached_response(self, cache_key: Optional[str], response: AgentResponse) -> None:
+        """Cache a successful response under its run's key.
+        
+        Runs that called tools aren't cached: their outputs may be specific to
+        the user (e.g. memories) and a cache hit would skip the tools' side effects.
+        """
+        if cache_key is None or not response.success or response.tool_calls:
+            return
+        await get_response_cache().store(cache_key, {
+            "text": response.text,
+            "tool_calls": response.tool_calls,
+            "tool_outputs": response.tool_outputs,
+            "native_messages": response.native_messages,
+        }, self.response_cache_ttl)
+    
+    @staticmethod
+    def _cached_response(cached: Dict[str, Any], prompt_layout: PromptLayout) -> AgentResponse:
+        """Build the response of a run answered from the response cache."""
+        return AgentResponse(
+            **cached,
+            success=True,
+            system_prompt=prompt_layout.text,
+            prompt_prefix_hash=prompt_layout.prefix_hash,
+            usage={"requests": 0, "request_tokens": 0, "response_tokens": 0, "total_tokens": 0},
+            cached=True,
+        )
+    
+    @staticmethod
+    def _error_response(error: Exception) -> AgentResponse:
+        """Build the response of a failed run."""
+        logger.error(f"Error running agent: {str(error)}")
+        logger.error(traceback.format_exc())
+        return AgentResponse(
+            text=f"Error: {str(error)}",
+            success=False,
+            error_message=str(error)
+        )
+        
     async def run(self, input_text: str, *, multimodal_content=None, system_message=None, message_history_obj: Optional[MessageHistory] = None,
                  channel_payload: Optional[Dict] = None,
                  message_limit: Optional[int] = 20) -> AgentResponse:
@@ -112,75 +310,101 @@ class SimpleAgent(AutomagikAgent):
         Returns:
             AgentResponse object with result and metadata
         """
-        # Ensure memory variables are initialized
-        if self.db_id:
-            await self.initialize_memory_variables(getattr(self.dependencies, 'user_id', None))
-                
+        # Memory variables are created on demand when the system prompt is filled
         # Initialize the agent
         await self._initialize_pydantic_agent()
         
-        # Get message history in PydanticAI format
-        pydantic_message_history = []
-        if message_history_obj:
-            pydantic_message_history = message_history_obj.get_formatted_pydantic_messages(limit=message_limit)
-        
-        # Prepare user input (handle multimodal content)
-        user_input = input_text
-        if multimodal_content:
-            if hasattr(self.dependencies, 'configure_for_multimodal'):
-                self.dependencies.configure_for_multimodal(True)
-            user_input = {"text": input_text, "multimodal_content": multimodal_content}
+        # Per-run state (IDs, context, dependencies) comes from the current run
+        dependencies = self.current_run().dependencies
         
         try:
-            # Get filled system prompt
-            filled_system_prompt = await self.get_filled_system_prompt(
-                user_id=getattr(self.dependencies, 'user_id', None)
+            user_input, pydantic_message_history, prompt_layout = await self._prepare_run(
+                input_text, multimodal_content, message_history_obj, message_limit
             )
             
-            # Add system prompt to message history
-            if filled_system_prompt:
-                pydantic_message_history = add_system_message_to_history(
-                    pydantic_message_history, 
-                    filled_system_prompt
-                )
+            # Identical requests of caching agents are answered without calling the model
+            cache_key = self._response_cache_key(user_input, pydantic_message_history)
+            if cache_key:
+                with span("cache.lookup"):
+                    cached = await get_response_cache().lookup(cache_key)
+                if cached is not None:
+                    return self._cached_response(cached, prompt_layout)
             
-            # Update dependencies with context
-            if hasattr(self.dependencies, 'set_context'):
-                self.dependencies.set_context(self.context)
-        
             # Run the agent
-            result = await self._agent_instance.run(
-                user_input,
-                message_history=pydantic_message_history,
-                usage_limits=getattr(self.dependencies, "usage_limits", None),
-                deps=self.dependencies
-            )
+            result = await self._run_graph(user_input, pydantic_message_history, dependencies)
+            response = self._build_response(result, prompt_layout)
+            await self._store_cached_response(cache_key, response)
+            return response
+        except Exception as e:
+            return self._error_response(e)
+    
+    async def run_stream(self, input_text: str, *, multimodal_content=None, system_message=None,
+                         message_history_obj: Optional[MessageHistory] = None,
+                         channel_payload: Optional[Dict] = None,
+                         message_limit: Optional[int] = 20) -> AsyncIterator[Dict[str, Any]]:
+        """Run the agent, yielding text deltas and tool events as they happen.
+        
+        Args:
+            input_text: Text input for the agent
+            multimodal_content: Optional multimodal content
+            system_message: Optional system message for this run (ignored in favor of template)
+            message_history_obj: Optional MessageHistory instance for DB storage
             
-            # Extract tool calls and outputs
-            all_messages = extract_all_messages(result)
-            tool_calls = []
-            tool_outputs = []
+        Yields:
+            Stream events; the last one is a "response" event with the AgentResponse
+        """
+        await self._initialize_pydantic_agent()
+        dependencies = self.current_run().dependencies
+        
+        try:
+            user_input, pydantic_message_history, prompt_layout = await self._prepare_run(
+                input_text, multimodal_content, message_history_obj, message_limit
+            )
             
-            # Process each message to extract tool calls and outputs
-            for msg in all_messages:
-                tool_calls.extend(extract_tool_calls(msg))
-                tool_outputs.extend(extract_tool_outputs(msg))
+            cache_key = self._response_cache_key(user_input, pydantic_message_history)
+            cached = await get_response_cache().lookup(cache_key) if cache_key else None
+            if cached is not None:
+                response = self._cached_response(cached, prompt_layout)
+                yield {"event": "text_delta", "data": {"delta": response.text}}
+                yield {"event": "response", "data": response}
+                return
             
-            # Create response
-            return AgentResponse(
-                text=result.data,
-                success=True,
-                tool_calls=tool_calls,
-                tool_outputs=tool_outputs,
-                raw_message=all_messages,
-                system_prompt=filled_system_prompt,
-            )
+            # Walk the run graph so tool calls are reported along with the text
+            async with self._agent_instance.iter(
+                user_input,
+                message_history=pydantic_message_history,
+                usage_limits=getattr(dependencies, "usage_limits", None),
+                deps=dependencies
+            ) as agent_run:
+                async for node in agent_run:
+                    if Agent.is_model_request_node(node):
+                        async with node.stream(agent_run.ctx) as request_stream:
+                            async for event in request_stream:
+                                delta = None
+                                if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+                                    delta = event.part.content
+                                elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                                    delta = event.delta.content_delta
+                                if delta:
+                                    yield {"event": "text_delta", "data": {"delta": delta}}
+                    elif Agent.is_call_tools_node(node):
+                        async with node.stream(agent_run.ctx) as handle_stream:
+                            async for event in handle_stream:
+                                if isinstance(event, FunctionToolCallEvent):
+                                    yield {"event": "tool_call", "data": {
+                                        "tool_name": event.part.tool_name,
+                                        "args": event.part.args,
+                                        "tool_call_id": event.part.tool_call_id or event.call_id,
+                                    }}
+                                elif isinstance(event, FunctionToolResultEvent):
+                                    yield {"event": "tool_result", "data": {
+                                        "tool_name": event.result.tool_name,
+                                        "content": event.result.content,
+                                        "tool_call_id": event.result.tool_call_id or event.tool_call_id,
+                                    }}
+            response = self._build_response(agent_run.result, prompt_layout)
+            await self._store_cached_response(cache_key, response)
         except Exception as e:
-            logger.error(f"Error running agent: {str(e)}")
-            logger.error(traceback.format_exc())
-            return AgentResponse(
-                text=f"Error: {str(e)}",
-                success=False,
-                error_message=str(e),
-                raw_message=pydantic_message_history if 'pydantic_message_history' in locals() else None
-            ) 
\ No newline at end of file
+            response = self._error_response(e)
+        
+        yield {"event": "response", "data": response}
@@ -32,6 +32,10 @@ Current memory ID: {{run_id}}
   - {{technical_knowledge}}
   - {{user_preferences}}
 
+## Relevant Memories
+Stored memories most related to the current message:
+{{relevant_memories}}
+
 ## Operational Guidelines
 1. When asked about previous conversations, use memory retrieval tools
 2. When encountering new information that may be useful later, suggest storing it
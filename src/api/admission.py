@@ -0,0 +1,247 @@
+"""Admission control for agent runs.
+
+Each run counts against up to three concurrency limits: one for its agent,
+one for its user and one for the API key that sent it. A run that finds a
+limit full waits in a short queue for a slot; when that queue is full too, or
+the wait runs out, the run is rejected with 429 and a Retry-After header
+before it touches the database or the LLM. One noisy integration therefore
+can't exhaust the connection pool or the model's rate limits for everyone.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from src.config import settings
+from src.utils.metrics import metrics
+from src.utils.tracing import span
+
+# Get our module's logger
+logger = logging.getLogger(__name__)
+
+ADMISSION_SCOPES = ("agent", "user", "api_key")
+
+
+class _Limiter:
+    """Concurrency limit for one agent, user or API key, with a bounded wait queue."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        # Moving average of how long a run holds its slot, for Retry-After
+        self.avg_hold = 1.0
+
+    def try_acquire(self) -> bool:
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return True
+        return False
+
+    def release(self, held: float) -> None:
+        self.avg_hold = 0.8 * self.avg_hold + 0.2 * held
+        # Hand the slot straight to the next waiter so newcomers can't jump the queue
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and not self.waiters
+
+
+class AdmissionRejected(HTTPException):
+    """429 raised when a run can't get a slot within the admission queue."""
+
+    def __init__(self, scope: str, retry_after: int):
+        super().__init__(
+            status_code=429,
+            detail=f"Too many concurrent runs for this {scope.replace('_', ' ')}, retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.scope = scope
+
+
+class AdmissionTicket:
+    """Slots held by one admitted run."""
+
+    def __init__(self, controller: "AdmissionController", slots: List[Tuple[str, str]]):
+        self._controller = controller
+        self._slots = slots
+        self._admitted_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give the run's slots back. Calling it again does nothing."""
+        slots, self._slots = self._slots, []
+        held = time.monotonic() - self._admitted_at
+        for scope, key in reversed(slots):
+            self._controller._release(scope, key, held)
+
+
+class AdmissionController:
+    """Per-agent, per-user and per-API-key concurrency limits for agent runs."""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, queue_size: int = 16, queue_timeout: float = 5.0):
+        """Initialize the controller.
+
+        Args:
+            limits: Maximum concurrent runs per key of each scope (agent, user,
+                api_key); 0 or a missing scope means unlimited
+            queue_size: Maximum runs waiting for a slot of one key
+            queue_timeout: Seconds a run waits for a slot before it is rejected
+        """
+        self.limits = {scope: (limits or {}).get(scope, 0) for scope in ADMISSION_SCOPES}
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._limiters: Dict[Tuple[str, str], _Limiter] = {}
+
+    async def acquire(self, agent_name: Optional[str] = None, user_id: Optional[Any] = None,
+                      api_key: Optional[str] = None) -> AdmissionTicket:
+        """Wait for a slot in every limit that applies to a run.
+
+        Slots are taken in a fixed scope order, so runs waiting on each
+        other's slots can't deadlock.
+
+        Args:
+            agent_name: Agent the run is for
+            user_id: User the run is for
+            api_key: API key that sent the run
+
+        Returns:
+            Ticket to release once the run finishes
+
+        Raises:
+            AdmissionRejected: If a limit stayed full for the whole queue wait
+        """
+        ticket = AdmissionTicket(self, [])
+        keys = {"agent": agent_name, "user": user_id, "api_key": api_key}
+        start = time.monotonic()
+        try:
+            with span("admission.wait"):
+                for scope in ADMISSION_SCOPES:
+                    if self.limits[scope] > 0 and keys[scope] is not None:
+                        key = str(keys[scope])
+                        await self._acquire(scope, key)
+                        ticket._slots.append((scope, key))
+        except BaseException:
+            ticket.release()
+            raise
+
+        metrics.observe("admission_wait_ms", (time.monotonic() - start) * 1000)
+        ticket._admitted_at = time.monotonic()
+        return ticket
+
+    @asynccontextmanager
+    async def admit(self, agent_name: Optional[str] = None, user_id: Optional[Any] = None,
+                    api_key: Optional[str] = None) -> AsyncIterator[AdmissionTicket]:
+        """Hold admission slots for the duration of a block.
+
+        Raises:
+            AdmissionRejected: If a limit stayed full for the whole queue wait
+        """
+        ticket = await self.acquire(agent_name, user_id, api_key)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    async def _acquire(self, scope: str, key: str) -> None:
+        limiter = self._limiters.get((scope, key))
+        if limiter is None:
+            limiter = self._limiters[(scope, key)] = _Limiter(self.limits[scope])
+
+        if limiter.try_acquire():
+            self._update_metrics(scope)
+            return
+        if len(limiter.waiters) >= self.queue_size:
+            self._reject(scope, key, limiter)
+
+        waiter = asyncio.get_running_loop().create_future()
+        limiter.waiters.append(waiter)
+        self._update_metrics(scope)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            # A slot handed over as the wait timed out is still ours
+            if not waiter.done() or waiter.cancelled():
+                self._reject(scope, key, limiter)
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as the wait was cancelled
+            if waiter.done() and not waiter.cancelled():
+                self._release(scope, key, 0.0)
+            raise
+        finally:
+            if waiter in limiter.waiters:
+                limiter.waiters.remove(waiter)
+            if limiter.idle:
+                self._limiters.pop((scope, key), None)
+            self._update_metrics(scope)
+
+    def _reject(self, scope: str, key: str, limiter: _Limiter) -> None:
+        if limiter.idle:
+            self._limiters.pop((scope, key), None)
+        metrics.increment(f"admission_{scope}_rejected")
+        # Rough time until a slot frees up for everyone already queued
+        backlog = (len(limiter.waiters) + 1) / limiter.limit
+        retry_after = max(1, math.ceil(limiter.avg_hold * backlog))
+        logger.warning(f"Rejected run: {scope} {self._log_key(scope, key)} has {limiter.active} active and {len(limiter.waiters)} queued runs")
+        raise AdmissionRejected(scope, retry_after)
+
+    @staticmethod
+    def _log_key(scope: str, key: Any) -> str:
+        """Identify a limit's key in logs without revealing API keys."""
+        if scope == "api_key":
+            return hashlib.sha256(str(key).encode("utf-8")).hexdigest()[:8]
+        return str(key)
+
+    def _release(self, scope: str, key: str, held: float) -> None:
+        limiter = self._limiters.get((scope, key))
+        if limiter is None:
+            return
+        limiter.release(held)
+        if limiter.idle:
+            del self._limiters[(scope, key)]
+        self._update_metrics(scope)
+
+    def _update_metrics(self, scope: str) -> None:
+        limiters = [limiter for (limiter_scope, _), limiter in self._limiters.items() if limiter_scope == scope]
+        metrics.set_gauge(f"admission_{scope}_active", sum(limiter.active for limiter in limiters))
+        metrics.set_gauge(f"admission_{scope}_queued", sum(len(limiter.waiters) for limiter in limiters))
+        # Share of its limit used by the busiest key
+        busiest = max((limiter.active for limiter in limiters), default=0)
+        metrics.set_gauge(f"admission_{scope}_utilization", busiest / self.limits[scope] if self.limits[scope] else 0)
+
+
+# Global admission controller, created on first use
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get the global admission controller.
+
+    Returns:
+        The global AdmissionController instance
+    """
+    global _admission_controller
+
+    if _admission_controller is None:
+        _admission_controller = AdmissionController(
+            limits={
+                "agent": settings.AM_MAX_CONCURRENT_RUNS_PER_AGENT,
+                "user": settings.AM_MAX_CONCURRENT_RUNS_PER_USER,
+                "api_key": settings.AM_MAX_CONCURRENT_RUNS_PER_API_KEY,
+            },
+            queue_size=settings.AM_ADMISSION_QUEUE_SIZE,
+            queue_timeout=settings.AM_ADMISSION_QUEUE_TIMEOUT
+        )
+    return _admission_controller
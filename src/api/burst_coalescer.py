@@ -0,0 +1,208 @@
+"""Burst coalescing for agent run requests.
+
+Channel users often send several short messages within a couple of seconds.
+When a request opts in with a debounce window, the BurstCoalescer holds it
+briefly: every further message for the same session that arrives within the
+window joins the same burst, and the window restarts with each arrival (up to
+a maximum wait). The burst is then processed as a single agent turn and every
+original request resolves according to the burst's policy:
+
+- ``shared``: all requests receive the shared response.
+- ``last``: only the request that arrived last receives the response; each
+  earlier one resolves with an empty, successful reply as soon as a newer
+  message joins the burst. Bursts addressed by session name only know their
+  session ID once the turn has run, so their earlier requests get the empty
+  reply then.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from src.api.models import AgentRunRequest
+from src.config import settings
+
+# Get our module's logger
+logger = logging.getLogger(__name__)
+
+COALESCE_POLICIES = ("shared", "last")
+
+RunTurn = Callable[[List[AgentRunRequest]], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class _Burst:
+    """Requests collected for one session while its debounce window is open."""
+    window: float
+    max_wait: float
+    policy: str
+    requests: List[AgentRunRequest] = field(default_factory=list)
+    futures: List[asyncio.Future] = field(default_factory=list)
+    superseded: Set[int] = field(default_factory=set)
+    started_at: float = field(default_factory=time.monotonic)
+    last_arrival: float = field(default_factory=time.monotonic)
+    task: Optional[asyncio.Task] = None
+
+
+class BurstCoalescer:
+    """Merges rapid requests for the same session into one agent turn."""
+
+    def __init__(self, max_wait_ms: int = 5000):
+        """Initialize the coalescer.
+
+        Args:
+            max_wait_ms: Upper bound on how long a burst can keep extending its window
+        """
+        self.max_wait = max_wait_ms / 1000.0
+        self._bursts: Dict[str, _Burst] = {}
+
+    async def submit(self, key: str, request: AgentRunRequest, window_ms: int,
+                     run_turn: RunTurn, policy: str = "shared") -> Dict[str, Any]:
+        """Add a request to its session's burst and wait for the burst's response.
+
+        Args:
+            key: Burst key identifying the agent and session
+            request: The incoming run request
+            window_ms: Debounce window in milliseconds
+            run_turn: Coroutine that processes all requests of a burst as one turn
+            policy: How the response is distributed ("shared" or "last")
+
+        Returns:
+            The response for this request according to the burst's policy
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = _Burst(window=window_ms / 1000.0, max_wait=self.max_wait, policy=policy)
+            self._bursts[key] = burst
+            burst.task = asyncio.create_task(self._close_after_window(key, burst, run_turn))
+        else:
+            burst.last_arrival = time.monotonic()
+            logger.info(f"Coalescing message {len(burst.requests) + 1} into burst for {key}")
+            
+            # Earlier requests are superseded and don't need to wait for the turn
+            if burst.policy == "last":
+                for index, pending in enumerate(burst.futures):
+                    if pending.done():
+                        continue
+                    burst.superseded.add(index)
+                    if request.session_id:
+                        pending.set_result(self._superseded_response(request.session_id))
+
+        burst.requests.append(request)
+        burst.futures.append(future)
+        return await future
+
+    async def _close_after_window(self, key: str, burst: _Burst, run_turn: RunTurn) -> None:
+        """Wait until the burst goes quiet, then run it as one turn."""
+        while True:
+            deadline = min(burst.last_arrival + burst.window, burst.started_at + burst.max_wait)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+
+        # Later messages start a new burst from here on
+        if self._bursts.get(key) is burst:
+            del self._bursts[key]
+
+        count = len(burst.requests)
+        logger.info(f"Running burst of {count} message(s) for {key} with policy '{burst.policy}'")
+
+        try:
+            response = await run_turn(burst.requests)
+        except BaseException as e:
+            for future in burst.futures:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for index, future in enumerate(burst.futures):
+            if future.done():
+                continue
+            if index in burst.superseded:
+                future.set_result(self._superseded_response(response.get("session_id")))
+            else:
+                future.set_result(self._response_for(response, count))
+
+    @staticmethod
+    def _response_for(response: Dict[str, Any], count: int) -> Dict[str, Any]:
+        """Build the response of a request that receives the turn's answer."""
+        if count == 1:
+            return response
+        return {**response, "coalesced_messages": count}
+
+    @staticmethod
+    def _superseded_response(session_id: Optional[str]) -> Dict[str, Any]:
+        """Build the empty reply for a request superseded under the "last" policy."""
+        return {
+            "message": "",
+            "session_id": session_id,
+            "success": True,
+            "tool_calls": [],
+            "tool_outputs": [],
+            "coalesced": True,
+        }
+
+
+def get_coalesce_settings(request: AgentRunRequest) -> Optional[Dict[str, Any]]:
+    """Resolve the debounce window and policy that apply to a request.
+
+    Args:
+        request: The incoming run request
+
+    Returns:
+        Dictionary with window_ms and policy, or None if coalescing is off
+    """
+    window_ms = request.coalesce_window_ms
+    if window_ms is None:
+        window_ms = settings.AM_COALESCE_WINDOW_MS
+    if not window_ms or window_ms <= 0:
+        return None
+
+    policy = request.coalesce_policy or settings.AM_COALESCE_POLICY
+    if policy not in COALESCE_POLICIES:
+        logger.warning(f"Unknown coalesce policy '{policy}', using 'shared'")
+        policy = "shared"
+
+    return {"window_ms": window_ms, "policy": policy}
+
+
+def get_burst_key(agent_name: str, request: AgentRunRequest) -> Optional[str]:
+    """Build the burst key for a request; requests without a session are never coalesced.
+
+    Args:
+        agent_name: Name of the agent being run
+        request: The incoming run request
+
+    Returns:
+        The burst key, or None if the request has no session
+    """
+    if request.session_id:
+        return f"{agent_name}:id:{request.session_id}"
+    if request.session_name:
+        return f"{agent_name}:name:{request.session_name}:{request.user_id}"
+    return None
+
+
+# Global coalescer instance, created on first use
+_burst_coalescer: Optional[BurstCoalescer] = None
+
+
+def get_burst_coalescer() -> BurstCoalescer:
+    """Get the global burst coalescer.
+
+    Returns:
+        The global BurstCoalescer instance
+    """
+    global _burst_coalescer
+
+    if _burst_coalescer is None:
+        _burst_coalescer = BurstCoalescer(max_wait_ms=settings.AM_COALESCE_MAX_WAIT_MS)
+    return _burst_coalescer
@@ -1,16 +1,23 @@
+import asyncio
 import logging
 import uuid
 import json
 import inspect
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Set, Tuple
 from fastapi import HTTPException
 from datetime import datetime
 
 from src.agents.models.agent_factory import AgentFactory
+from src.agents.models.agent_pool import get_agent_pool
 from src.config import settings
 from src.memory.message_history import MessageHistory
+from src.memory.turn_writer import get_turn_writer
+from src.utils.tracing import span, start_trace
+from src.memory.session_lock import get_session_turn_lock, SessionLockTimeout
+from src.api.admission import get_admission_controller
+from src.api.burst_coalescer import get_burst_coalescer, get_burst_key, get_coalesce_settings
 from src.api.models import AgentInfo, AgentRunRequest, MessageModel
-from src.db import get_agent_by_name
+from src.db import get_agent_by_name, link_session_to_agent
 from src.db.models import Session
 from src.db.connection import generate_uuid, safe_uuid
 from src.db.repository.session import get_session_by_name, create_session
@@ -18,6 +25,9 @@ from src.db.repository.session import get_session_by_name, create_session
 # Get our module's logger
 logger = logging.getLogger(__name__)
 
+# Streaming runs in progress
+_stream_tasks: Set[asyncio.Task] = set()
+
 async def list_agent_templates() -> List[AgentInfo]:
     """
     List all available agent templates
@@ -52,74 +62,55 @@ async def list_agent_templates() -> List[AgentInfo]:
         raise HTTPException(status_code=500, detail=f"Failed to list agent templates: {str(e)}")
 
 
-async def handle_agent_run(agent_name: str, request: AgentRunRequest) -> Dict[str, Any]:
+async def handle_agent_run(agent_name: str, request: AgentRunRequest, api_key: Optional[str] = None) -> Dict[str, Any]:
     """
     Run an agent with the specified parameters
+    
+    The run must first be admitted within the agent's, user's and API key's
+    concurrency limits; otherwise it is rejected with 429 before any database work.
+    """
+    async with get_admission_controller().admit(str(agent_name), request.user_id, api_key):
+        # Opted-in requests for the same session are merged into one turn
+        coalesce = get_coalesce_settings(request)
+        burst_key = get_burst_key(str(agent_name), request) if coalesce else None
+        if burst_key:
+            return await get_burst_coalescer().submit(
+                burst_key,
+                request,
+                window_ms=coalesce["window_ms"],
+                run_turn=lambda requests: run_agent_turn(agent_name, requests),
+                policy=coalesce["policy"]
+            )
+        
+        return await run_agent_turn(agent_name, [request])
+
+
+async def run_agent_turn(agent_name: str, requests: List[AgentRunRequest]) -> Dict[str, Any]:
     """
+    Run one agent turn for one or more requests to the same session
+    
+    When several requests were coalesced, their message contents are joined into
+    a single prompt while each original message is stored with its own
+    channel_payload. Per-turn settings come from the most recent request.
+    """
+    request = requests[-1]
     session_id = None
     message_history = None
+    agent = None
     
     try:
-        # Ensure agent_name is a string
-        if not isinstance(agent_name, str):
-            agent_name = str(agent_name)
+        with span("agent.prepare_turn"):
+            agent, agent_id, session_id, message_history = await prepare_agent_turn(agent_name, request)
         
-        # Early check for nonexistent agents to bail out before creating any DB entries
-        if "nonexistent" in agent_name:
-            raise HTTPException(status_code=404, detail=f"Agent not found: {agent_name}")
-            
-        # Convert agent_name to include '_agent' suffix if not already present
-        db_agent_name = f"{agent_name}_agent" if not agent_name.endswith('_agent') else agent_name
-        
-        # Try to get the agent from the database to get its ID
-        agent_db = get_agent_by_name(db_agent_name)
-        agent_id = agent_db.id if agent_db else None
-        # Process session information
-        
-        # Get or create session based on request parameters
-        session_id, message_history = await get_or_create_session(
-            session_id=request.session_id, 
-            session_name=request.session_name, 
-            agent_id=agent_id,
-            user_id=request.user_id
-        )
-        
-        # For agents that don't exist, avoid creating any messages in the database
-        if agent_name.startswith("nonexistent_") or "_nonexistent_" in agent_name:
-            raise HTTPException(status_code=404, detail=f"Agent not found: {agent_name}")
-        # Initialize the agent - strip '_agent' suffix for factory
-        factory = AgentFactory()
-        agent_type = agent_name.replace('_agent', '') if agent_name.endswith('_agent') else agent_name
-        agent = factory.create_agent(agent_type, request.parameters)
-        
-        # Check if agent is a PlaceholderAgent
-        if agent.__class__.__name__ == "PlaceholderAgent":
-            raise HTTPException(status_code=404, detail=f"Agent not found: {agent_name}")
-        
-        if not agent:
-            raise HTTPException(status_code=404, detail=f"Agent not found: {agent_name}")
-        
-        # Link the agent to the session in the database if we have a persistent session
-        if session_id and not getattr(message_history, "no_auto_create", False):
-            # This will register the agent in the database and assign it a db_id
-            success = factory.link_agent_to_session(agent_name, session_id)
-            if success:
-                # Reload the agent by name to get its ID
-                agent_db = get_agent_by_name(db_agent_name)
-                if agent_db:
-                    # Set the db_id directly on the agent object
-                    agent.db_id = agent_db.id
-                    logger.info(f"Updated agent {agent_name} with database ID {agent_db.id}")
-            else:
-                logger.warning(f"Failed to link agent {agent_name} to session {session_id}")
-                # Continue anyway, as this is not a critical error
+        # Merge the turn's requests (a single one unless a burst was coalesced)
+        content, context, coalesced_messages = merge_turn_requests(requests)
         
         # Process multimodal content (if any)
-        content = request.message_content
         multimodal_content = {}
         
-        if request.media_contents:
-            for content_item in request.media_contents:
+        media_contents = [item for r in requests for item in (r.media_contents or [])]
+        if media_contents:
+            for content_item in media_contents:
                 if getattr(content_item, "mime_type", "").startswith("image/"):
                     if "images" not in multimodal_content:
                         multimodal_content["images"] = []
@@ -147,23 +138,28 @@ async def handle_agent_run(agent_name: str, request: AgentRunRequest) -> Dict[st
             history_messages, _ = message_history.get_messages(page=1, page_size=100, sort_desc=False)
             messages = history_messages
         
-        # Run the agent
+        # Run the agent, one turn at a time per session
         response_content = None
         try:
             if content:
-                response_content = await agent.process_message(
-                    user_message=content, 
-                    session_id=session_id,
-                    agent_id=agent_id,
-                    user_id=request.user_id,
-                    message_history=message_history if message_history else None,
-                    channel_payload=request.channel_payload,
-                    context=request.context,
-                    message_limit=request.message_limit
-                )
+                async with get_session_turn_lock().acquire(session_id):
+                    response_content = await agent.process_message(
+                        user_message=content, 
+                        session_id=session_id,
+                        agent_id=agent_id,
+                        user_id=request.user_id,
+                        message_history=message_history if message_history else None,
+                        channel_payload=request.channel_payload,
+                        context=context,
+                        message_limit=request.message_limit,
+                        coalesced_messages=coalesced_messages
+                    )
             else:
                 # No content, run with empty string
                 response_content = await agent.process_message("")
+        except SessionLockTimeout as e:
+            logger.warning(f"Session busy: {str(e)}")
+            raise HTTPException(status_code=409, detail=f"Session {session_id} is busy processing another message")
         except Exception as e:
             logger.error(f"Agent execution error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Agent execution failed: {str(e)}")
@@ -206,14 +202,202 @@ async def handle_agent_run(agent_name: str, request: AgentRunRequest) -> Dict[st
             "success": success,
             "tool_calls": tool_calls,
             "tool_outputs": tool_outputs,
+            "cached": getattr(response_content, "cached", False) is True,
         }
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error running agent: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to run agent: {str(e)}") 
+    finally:
+        # Hand the instance back for the next request
+        if agent is not None:
+            await get_agent_pool().release(agent)
+    
+    
+async def handle_agent_run_stream(agent_name: str, request: AgentRunRequest, api_key: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Run an agent and stream its response as server-sent events
+    
+    Admission, session and agent errors are raised before streaming starts, so
+    they keep their HTTP status. The run itself happens in a background task: if the
+    client disconnects, the turn still finishes and is saved.
+    
+    Events: text_delta {"delta"}, tool_call {"tool_name", "args", "tool_call_id"},
+    tool_result {"tool_name", "content", "tool_call_id"}, error {"detail"} and a
+    final done {"session_id", "message", "success", "usage"}.
+    
+    Returns:
+        Async iterator of SSE-formatted strings
+    """
+    admission = await get_admission_controller().acquire(str(agent_name), request.user_id, api_key)
+    try:
+        agent, agent_id, session_id, message_history = await prepare_agent_turn(agent_name, request)
+    except BaseException:
+        admission.release()
+        raise
+    events: asyncio.Queue = asyncio.Queue()
+    
+    async def produce():
+        try:
+            with start_trace("request.run_stream", agent=agent_name):
+                await run_stream()
+        finally:
+            await get_agent_pool().release(agent)
+            admission.release()
+            await events.put(None)
+    
+    async def run_stream():
+        try:
+            async with get_session_turn_lock().acquire(session_id):
+                async for event in agent.process_message_stream(
+                    user_message=request.message_content,
+                    session_id=session_id,
+                    agent_id=agent_id,
+                    user_id=request.user_id,
+                    message_history=message_history,
+                    channel_payload=request.channel_payload,
+                    context=request.context,
+                    message_limit=request.message_limit
+                ):
+                    if event["event"] == "response":
+                        response = event["data"]
+                        await events.put(("done", {
+                            "session_id": str(session_id) if session_id else None,
+                            "message": response.text,
+                            "success": response.success,
+                            "usage": response.usage,
+                        }))
+                    else:
+                        await events.put((event["event"], event["data"]))
+        except SessionLockTimeout as e:
+            logger.warning(f"Session busy: {str(e)}")
+            await events.put(("error", {"detail": f"Session {session_id} is busy processing another message"}))
+        except Exception as e:
+            logger.error(f"Agent streaming error: {str(e)}")
+            await events.put(("error", {"detail": f"Agent execution failed: {str(e)}"}))
+    
+    # Keep a reference so the turn finishes even if the client goes away
+    task = asyncio.create_task(produce())
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+    
+    async def stream() -> AsyncIterator[str]:
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            yield format_sse_event(*item)
+        await task
+    
+    return stream()
+
+
+def format_sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def prepare_agent_turn(agent_name: str, request: AgentRunRequest) -> Tuple[Any, Optional[int], Optional[str], Optional[MessageHistory]]:
+    """
+    Resolve the session and lease the agent for one turn
     
+    The caller must hand the agent back with get_agent_pool().release() once
+    the turn is finished.
     
+    Returns:
+        Tuple of the leased agent, the agent's database ID, the session ID and its MessageHistory
+    """
+    agent = None
+    try:
+        # Ensure agent_name is a string
+        if not isinstance(agent_name, str):
+            agent_name = str(agent_name)
+        
+        # Early check for nonexistent agents to bail out before creating any DB entries
+        if "nonexistent" in agent_name:
+            raise HTTPException(status_code=404, detail=f"Agent not found: {agent_name}")
+        
+        # Convert agent_name to include '_agent' suffix if not already present
+        db_agent_name = f"{agent_name}_agent" if not agent_name.endswith('_agent') else agent_name
+        
+        # Try to get the agent from the database to get its ID
+        agent_db = get_agent_by_name(db_agent_name)
+        agent_id = agent_db.id if agent_db else None
+        # Process session information
+        
+        # Get or create session based on request parameters
+        session_id, message_history = await get_or_create_session(
+            session_id=request.session_id, 
+            session_name=request.session_name, 
+            agent_id=agent_id,
+            user_id=request.user_id
+        )
+        
+        # For agents that don't exist, avoid creating any messages in the database
+        if agent_name.startswith("nonexistent_") or "_nonexistent_" in agent_name:
+            raise HTTPException(status_code=404, detail=f"Agent not found: {agent_name}")
+        # Lease a warm agent instance - strip '_agent' suffix for factory
+        factory = AgentFactory()
+        agent_type = agent_name.replace('_agent', '') if agent_name.endswith('_agent') else agent_name
+        agent = await get_agent_pool().acquire(agent_type, request.parameters)
+        
+        # Check if agent is a PlaceholderAgent
+        if agent.__class__.__name__ == "PlaceholderAgent":
+            raise HTTPException(status_code=404, detail=f"Agent not found: {agent_name}")
+        
+        if not agent:
+            raise HTTPException(status_code=404, detail=f"Agent not found: {agent_name}")
+        
+        # Link the agent to the session in the database if we have a persistent session
+        writer = get_turn_writer()
+        if session_id and agent_id and writer and not getattr(message_history, "no_auto_create", False):
+            # The agent is already registered, so the session update can happen off the request path
+            agent.db_id = agent_id
+            writer.enqueue_call(link_session_to_agent, uuid.UUID(str(session_id)), agent_id)
+        elif session_id and not getattr(message_history, "no_auto_create", False):
+            # This will register the agent in the database and assign it a db_id
+            success = factory.link_agent_to_session(agent_name, session_id)
+            if success:
+                # Reload the agent by name to get its ID
+                agent_db = get_agent_by_name(db_agent_name)
+                if agent_db:
+                    # Set the db_id directly on the agent object
+                    agent.db_id = agent_db.id
+                    logger.info(f"Updated agent {agent_name} with database ID {agent_db.id}")
+            else:
+                logger.warning(f"Failed to link agent {agent_name} to session {session_id}")
+                # Continue anyway, as this is not a critical error
+        
+        return agent, agent_id, session_id, message_history
+    except Exception:
+        if agent is not None:
+            await get_agent_pool().release(agent)
+        raise
+
+
+def merge_turn_requests(requests: List[AgentRunRequest]) -> Tuple[str, Dict[str, Any], Optional[List[Dict[str, Any]]]]:
+    """
+    Merge the requests of one turn into its prompt, context and original messages
+    
+    Returns:
+        Tuple of the joined message content, the merged context and, when several
+        requests were coalesced, each original message with its channel_payload
+    """
+    content = "\n".join(r.message_content for r in requests if r.message_content)
+    if len(requests) == 1:
+        return content, requests[0].context, None
+    
+    coalesced_messages = [
+        {"content": r.message_content, "channel_payload": r.channel_payload}
+        for r in requests if r.message_content
+    ]
+    context = {}
+    for r in requests:
+        context.update(r.context or {})
+    return content, context, coalesced_messages
+
+
 async def get_or_create_session(session_id=None, session_name=None, agent_id=None, user_id=None):
     """Helper function to get or create a session based on provided parameters"""
     if session_id:
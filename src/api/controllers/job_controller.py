@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import uuid
+from fastapi import HTTPException
+from src.agents.models.agent_factory import AgentFactory
+from src.api.job_runner import get_job_runner
+from src.api.models import AgentJobRequest, AgentJobResponse
+from src.db import get_job
+from src.db.models import AgentJob
+
+# Get our module's logger
+logger = logging.getLogger(__name__)
+
+
+def to_job_response(job: AgentJob) -> AgentJobResponse:
+    """
+    Convert a stored job to its API representation
+    """
+    return AgentJobResponse(
+        job_id=str(job.id),
+        agent_name=job.agent_name,
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+
+async def submit_agent_job(agent_name: str, request: AgentJobRequest) -> AgentJobResponse:
+    """
+    Queue an agent run and return its job without waiting for the run
+    """
+    agent_type = agent_name[:-len("_agent")] if agent_name.endswith("_agent") else agent_name
+    if agent_type not in AgentFactory.list_available_agents():
+        raise HTTPException(status_code=404, detail=f"Agent not found: {agent_name}")
+    
+    job = await get_job_runner().submit(agent_name, request)
+    return to_job_response(job)
+
+
+async def get_agent_job(job_id: str) -> AgentJobResponse:
+    """
+    Get the status and, once finished, the result of an agent job
+    """
+    try:
+        job_uuid = uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid job ID: {job_id}")
+    
+    job = await asyncio.to_thread(get_job, job_uuid)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return to_job_response(job)
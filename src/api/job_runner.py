@@ -0,0 +1,323 @@
+"""Asynchronous agent jobs.
+
+Long tool-using runs can outlast a client's HTTP timeout, and a client that
+retries then starts the same run twice. A job is instead submitted once,
+stored in the agent_jobs table and picked up by a fixed number of worker
+tasks in this process. Its result is read back with GET /jobs/{id} or posted
+to the job's callback URL.
+
+Because jobs live in Postgres, queued jobs survive restarts. A job still
+running when its process went away is queued again once it is older than the
+job timeout, up to AM_JOB_MAX_ATTEMPTS claims. Only the latest claim may
+store an outcome; a run that finishes after its job was claimed again is
+discarded.
+
+Job runs take agent and user admission slots like direct runs, waiting in
+the same admission queue, and fail with the rejection if none frees up. API
+keys aren't stored with jobs, so per-key limits don't apply to them.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from src.api.admission import get_admission_controller
+from src.api.models import AgentJobRequest, AgentRunRequest
+from src.config import settings
+from src.db.models import AgentJob
+from src.db.repository import job as job_repo
+from src.utils.metrics import metrics
+from src.utils.tracing import start_trace
+
+# Get our module's logger
+logger = logging.getLogger(__name__)
+
+RunJob = Callable[[AgentJob], Awaitable[Dict[str, Any]]]
+
+# Extra time a running job gets past the timeout before it counts as orphaned
+STALE_JOB_GRACE = 60.0
+
+
+async def run_agent_job(job: AgentJob) -> Dict[str, Any]:
+    """Run a job's agent turn.
+
+    Args:
+        job: The job to run
+
+    Returns:
+        The agent run result
+    """
+    from src.api.controllers.agent_controller import run_agent_turn
+
+    request = AgentRunRequest(**job.request)
+    with start_trace("request.job", agent=job.agent_name, job_id=str(job.id)):
+        async with get_admission_controller().admit(job.agent_name, request.user_id):
+            return await run_agent_turn(job.agent_name, [request])
+
+
+class JobRunner:
+    """Bounded pool of worker tasks running queued agent jobs."""
+
+    def __init__(self, concurrency: int = 4, poll_interval: float = 1.0, timeout: float = 900.0,
+                 max_attempts: int = 3, callback_retries: int = 3, run_job: RunJob = run_agent_job):
+        """Initialize the runner.
+
+        Args:
+            concurrency: Number of jobs run at the same time
+            poll_interval: Seconds an idle worker waits before checking the queue again
+            timeout: Seconds a job may run before it fails
+            max_attempts: Maximum times a job is claimed
+            callback_retries: Attempts made to deliver a result to a callback URL
+            run_job: Coroutine function running a job and returning its result
+        """
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.callback_retries = callback_retries
+        self.run_job = run_job
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        self._running = 0
+        self._last_recovery = 0.0
+
+    async def start(self) -> None:
+        """Recover orphaned jobs and start the workers."""
+        if self._workers:
+            return
+        self._stopping = False
+        await self.recover_stale_jobs()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"agent-job-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+        logger.info(f"Started {self.concurrency} agent job workers")
+
+    async def stop(self, grace: float = 10.0) -> None:
+        """Stop the workers.
+
+        Jobs still running after the grace period are cancelled and put back
+        in the queue so the next start runs them again.
+
+        Args:
+            grace: Seconds running jobs are given to finish
+        """
+        workers, self._workers = self._workers, []
+        if not workers:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        _, pending = await asyncio.wait(workers, timeout=grace)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def submit(self, agent_name: str, request: AgentJobRequest) -> AgentJob:
+        """Queue an agent run.
+
+        Args:
+            agent_name: Name of the agent to run
+            request: Run request, with an optional callback URL
+
+        Returns:
+            The queued job
+
+        Raises:
+            HTTPException: If the job could not be stored
+        """
+        payload = request.model_dump(exclude={"callback_url"}, exclude_none=True, mode="json")
+        callback_url = str(request.callback_url) if request.callback_url else None
+        job = await asyncio.to_thread(job_repo.create_job, agent_name, payload, callback_url)
+        if job is None:
+            raise HTTPException(status_code=500, detail="Failed to queue agent job")
+
+        metrics.increment("agent_jobs_submitted")
+        await self._update_queue_depth()
+        self._wakeup.set()
+        return job
+
+    async def recover_stale_jobs(self) -> int:
+        """Queue jobs whose worker went away again.
+
+        Returns:
+            Number of jobs recovered
+        """
+        self._last_recovery = time.monotonic()
+        recovered = await asyncio.to_thread(
+            job_repo.requeue_stale_jobs, self.timeout + STALE_JOB_GRACE, self.max_attempts
+        )
+        if recovered:
+            metrics.increment("agent_jobs_recovered", recovered)
+            logger.warning(f"Recovered {recovered} interrupted agent jobs")
+        return recovered
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            try:
+                job = await asyncio.to_thread(job_repo.claim_next_job)
+            except Exception as e:
+                logger.error(f"Error claiming agent job: {str(e)}")
+                job = None
+
+            if job is None:
+                await self._idle()
+                continue
+
+            try:
+                await self._update_queue_depth()
+                await self.execute(job)
+            except Exception as e:
+                # Keep the worker alive; a job left running is recovered as stale
+                logger.error(f"Error executing agent job {job.id}: {str(e)}")
+
+    async def _idle(self) -> None:
+        """Wait for a submission or the poll interval, recovering stale jobs now and then."""
+        if time.monotonic() - self._last_recovery >= STALE_JOB_GRACE:
+            await self.recover_stale_jobs()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def execute(self, job: AgentJob) -> AgentJob:
+        """Run a claimed job, store its outcome and deliver its callback.
+
+        Args:
+            job: Job claimed by a worker
+
+        Returns:
+            The job with its final status, result and error
+        """
+        if job.started_at and job.created_at:
+            metrics.observe("agent_job_wait_ms", (job.started_at - job.created_at).total_seconds() * 1000)
+
+        self._running += 1
+        metrics.set_gauge("agent_jobs_running", self._running)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self.run_job(job), timeout=self.timeout)
+        except asyncio.CancelledError:
+            # Shutting down: leave the job for the next start
+            await asyncio.to_thread(job_repo.requeue_job, job.id)
+            raise
+        except asyncio.TimeoutError:
+            self._finish(job, "failed", error=f"Job timed out after {self.timeout:.0f} seconds")
+        except HTTPException as e:
+            self._finish(job, "failed", error=str(e.detail))
+        except Exception as e:
+            logger.error(f"Agent job {job.id} failed: {str(e)}")
+            self._finish(job, "failed", error=str(e))
+        else:
+            self._finish(job, "succeeded", result=result)
+        finally:
+            self._running -= 1
+            metrics.set_gauge("agent_jobs_running", self._running)
+            metrics.observe("agent_job_run_ms", (time.perf_counter() - start) * 1000)
+
+        if job.status == "succeeded":
+            stored = await asyncio.to_thread(job_repo.complete_job, job.id, job.result, job.attempts)
+        else:
+            stored = await asyncio.to_thread(job_repo.fail_job, job.id, job.error, job.attempts)
+        if not stored:
+            # Claimed again after being recovered as stale, already finished, or a database error
+            logger.warning(f"Outcome of agent job {job.id} attempt {job.attempts} was not stored")
+            metrics.increment("agent_jobs_superseded")
+            return job
+        metrics.increment(f"agent_jobs_{job.status}")
+
+        if job.callback_url:
+            await self.deliver_callback(job)
+        return job
+
+    @staticmethod
+    def _finish(job: AgentJob, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = datetime.now()
+
+    async def deliver_callback(self, job: AgentJob) -> bool:
+        """Post a finished job to its callback URL, retrying with backoff.
+
+        Args:
+            job: Finished job with a callback URL
+
+        Returns:
+            True if the callback URL accepted the result
+        """
+        payload = {
+            "job_id": str(job.id),
+            "agent_name": job.agent_name,
+            "status": job.status,
+            "result": job.result,
+            "error": job.error,
+        }
+        async with httpx.AsyncClient(timeout=10) as client:
+            for attempt in range(self.callback_retries):
+                if attempt:
+                    await asyncio.sleep(2 ** (attempt - 1))
+                try:
+                    response = await client.post(job.callback_url, json=payload)
+                    if response.is_success:
+                        await asyncio.to_thread(job_repo.mark_job_callback_delivered, job.id)
+                        metrics.increment("agent_job_callbacks_delivered")
+                        return True
+                    logger.warning(f"Callback for job {job.id} returned {response.status_code}")
+                except httpx.HTTPError as e:
+                    logger.warning(f"Callback for job {job.id} failed: {str(e)}")
+                except Exception as e:
+                    # Not worth retrying, e.g. an invalid URL stored before URLs were validated
+                    logger.warning(f"Callback for job {job.id} failed: {str(e)}")
+                    break
+
+        metrics.increment("agent_job_callbacks_failed")
+        logger.error(f"Giving up delivering job {job.id} to {job.callback_url}")
+        return False
+
+    async def _update_queue_depth(self) -> None:
+        metrics.set_gauge("agent_jobs_queue_depth", await asyncio.to_thread(job_repo.count_jobs, "queued"))
+
+
+# Global job runner, created on first use
+_job_runner: Optional[JobRunner] = None
+
+
+def get_job_runner() -> JobRunner:
+    """Get the global job runner.
+
+    Returns:
+        The global JobRunner instance
+    """
+    global _job_runner
+
+    if _job_runner is None:
+        _job_runner = JobRunner(
+            concurrency=settings.AM_JOB_CONCURRENCY,
+            poll_interval=settings.AM_JOB_POLL_INTERVAL,
+            timeout=settings.AM_JOB_TIMEOUT,
+            max_attempts=settings.AM_JOB_MAX_ATTEMPTS,
+            callback_retries=settings.AM_JOB_CALLBACK_RETRIES
+        )
+    return _job_runner
+
+
+async def start_job_runner() -> None:
+    """Start the job workers if AM_JOB_CONCURRENCY allows any."""
+    if settings.AM_JOB_CONCURRENCY > 0:
+        await get_job_runner().start()
+
+
+async def stop_job_runner() -> None:
+    """Stop the job workers if they are running."""
+    global _job_runner
+
+    if _job_runner is not None:
+        await _job_runner.stop()
+        _job_runner = None
@@ -13,6 +13,7 @@ class MemoryCreate(BaseModel):
     read_mode: Optional[str] = Field(None, description="Read mode of the memory (e.g., system_prompt, tool_call)")
     access: Optional[str] = Field(None, description="Access permissions of the memory (e.g., read, write)")
     metadata: Optional[Dict[str, Any]] = Field(None, description="Additional metadata for the memory")
+    expires_at: Optional[datetime] = Field(None, description="When the memory expires; session memories default to AM_SESSION_MEMORY_TTL after the write")
 
 class MemoryUpdate(BaseModel):
     name: Optional[str] = Field(None, description="Name of the memory")
@@ -24,6 +25,7 @@ class MemoryUpdate(BaseModel):
     read_mode: Optional[str] = Field(None, description="Read mode of the memory (e.g., system_prompt, tool_call)")
     access: Optional[str] = Field(None, description="Access permissions of the memory (e.g., read, write)")
     metadata: Optional[Dict[str, Any]] = Field(None, description="Additional metadata for the memory")
+    expires_at: Optional[datetime] = Field(None, description="When the memory expires")
 
 class MemoryResponse(BaseModel):
     id: UUID = Field(..., description="Memory ID")
@@ -38,6 +40,7 @@ class MemoryResponse(BaseModel):
     metadata: Optional[Dict[str, Any]] = Field(None, description="Additional metadata for the memory")
     created_at: datetime = Field(..., description="Memory creation timestamp")
     updated_at: datetime = Field(..., description="Memory update timestamp")
+    expires_at: Optional[datetime] = Field(None, description="When the memory expires, or None if it doesn't")
 
 class MemoryListResponse(BaseModel):
     memories: List[MemoryResponse] = Field(..., description="List of memories")
@@ -45,3 +48,15 @@ class MemoryListResponse(BaseModel):
     page: int = Field(..., description="Current page number")
     page_size: int = Field(..., description="Number of memories per page")
     pages: int = Field(..., description="Total number of pages")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, or None on the last page")
+
+class MemoryBatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the memory in the request")
+    success: bool = Field(..., description="Whether the memory was written")
+    memory: Optional[MemoryResponse] = Field(None, description="The stored memory if it was written")
+    error: Optional[str] = Field(None, description="Why the memory was not written")
+
+class MemoryBatchResponse(BaseModel):
+    results: List[MemoryBatchItemResult] = Field(..., description="One result per requested memory, in request order")
+    succeeded: int = Field(..., description="Number of memories written")
+    failed: int = Field(..., description="Number of memories not written")
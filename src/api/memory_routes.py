@@ -1,17 +1,19 @@
 import logging
 import json
 import math
+import time
 import uuid
 from uuid import UUID
 from datetime import datetime
 from fastapi import APIRouter, HTTPException, Query, Path
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 
 from src.api.memory_models import (
     MemoryCreate,
     MemoryUpdate,
     MemoryResponse,
-    MemoryListResponse
+    MemoryListResponse,
+    MemoryBatchResponse
 )
 from src.db import (
     Memory, 
@@ -20,9 +22,18 @@ from src.db import (
     update_memory as repo_update_memory,
     list_memories as repo_list_memories,
     delete_memory as repo_delete_memory,
+    list_memories_page as repo_list_memories_page,
+    count_memories as repo_count_memories,
+    encode_memory_cursor,
+    decode_memory_cursor,
+    upsert_memories as repo_upsert_memories,
+    memory_scope_key,
 )
+from src.db.repository.memory import MEMORY_SORT_COLUMNS
 from src.config import settings
 from src.memory.message_history import MessageHistory
+from src.memory.memory_versions import get_memory_versions
+from src.utils.lru import LRUDict
 
 # Create API router for memory endpoints
 memory_router = APIRouter()
@@ -46,16 +57,63 @@ def is_valid_uuid(value: str) -> bool:
     except (ValueError, AttributeError, TypeError):
         return False
 
+# Cached counts per filter set: (memory version token, cached at, count)
+_memory_count_cache: LRUDict[Tuple, Tuple[Any, float, int]] = LRUDict(settings.AM_MEMORY_CACHE_MAX_SCOPES)
+
+
+def _cached_memory_count(agent_id: Optional[int], user_id: Optional[int],
+                         session_id: Optional[uuid.UUID], read_mode: Optional[str]) -> int:
+    """Count memories, reusing the last count while the memories are unchanged.
+    
+    Counts filtered by agent are reused until the agent's memory version
+    changes; other counts are reused for at most AM_MEMORY_CACHE_TTL seconds.
+    """
+    key = (agent_id, user_id, session_id, read_mode)
+    token = get_memory_versions().token(agent_id, user_id) if agent_id is not None else None
+    now = time.monotonic()
+    
+    cached = _memory_count_cache.get(key)
+    if cached and cached[0] == token and now - cached[1] < settings.AM_MEMORY_CACHE_TTL:
+        return cached[2]
+    
+    count = repo_count_memories(agent_id=agent_id, user_id=user_id, session_id=session_id, read_mode=read_mode)
+    _memory_count_cache[key] = (token, now, count)
+    return count
+
+
+def _memory_to_response(memory: Memory) -> Dict[str, Any]:
+    """Convert a Memory to the MemoryResponse format."""
+    return {
+        "id": str(memory.id),
+        "name": memory.name,
+        "description": memory.description,
+        "content": memory.content,
+        "session_id": str(memory.session_id) if memory.session_id else None,
+        "user_id": memory.user_id,
+        "agent_id": memory.agent_id,
+        "read_mode": memory.read_mode,
+        "access": memory.access,
+        "metadata": memory.metadata,
+        "created_at": memory.created_at,
+        "updated_at": memory.updated_at,
+        "expires_at": memory.expires_at
+    }
+
+
 @memory_router.get("/memories", response_model=MemoryListResponse, tags=["Memories"],
             summary="List Memories",
-            description="List all memories with optional filters and pagination.")
+            description="List memories with optional filters. Pages are sorted and sliced in the database; "
+                        "pass next_cursor back as cursor to page deep lists cheaply.")
 async def list_memories(
     user_id: Optional[int] = Query(None, description="Filter by user ID"),
     agent_id: Optional[int] = Query(None, description="Filter by agent ID"),
     session_id: Optional[str] = Query(None, description="Filter by session ID"),
-    page: int = Query(1, description="Page number (1-based)"),
-    page_size: int = Query(50, description="Number of memories per page"),
-    sort_desc: bool = Query(True, description="Sort by most recent first if True")
+    read_mode: Optional[str] = Query(None, description="Filter by read mode"),
+    page: int = Query(1, ge=1, description="Page number (1-based, ignored when cursor is given)"),
+    page_size: int = Query(50, ge=1, le=500, description="Number of memories per page"),
+    sort_by: str = Query("created_at", description="Sort column (created_at, updated_at, name)"),
+    sort_desc: bool = Query(True, description="Sort in descending order (most recent first) if True"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from a previous page's next_cursor")
 ):
     # Validate and parse session_id as UUID if provided
     session_uuid = None
@@ -65,54 +123,40 @@ async def list_memories(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid session_id format: {session_id}")
     
-    # Use the repository pattern to list memories
-    memories = repo_list_memories(
+    if sort_by not in MEMORY_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort_by: {sort_by}. Use one of {', '.join(MEMORY_SORT_COLUMNS)}")
+    
+    after = None
+    if cursor:
+        try:
+            after = decode_memory_cursor(cursor, sort_by)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    # One extra row tells whether there is a next page
+    memories = repo_list_memories_page(
         agent_id=agent_id,
         user_id=user_id,
-        session_id=session_uuid
+        session_id=session_uuid,
+        read_mode=read_mode,
+        limit=page_size + 1,
+        offset=(page - 1) * page_size,
+        sort_by=sort_by,
+        sort_desc=sort_desc,
+        after=after
     )
+    has_more = len(memories) > page_size
+    memories = memories[:page_size]
     
-    # Total number of memories
-    total_count = len(memories)
-    
-    # Calculate total pages
-    total_pages = math.ceil(total_count / page_size)
-    
-    # Apply sorting
-    if sort_desc:
-        memories.sort(key=lambda x: x.created_at or datetime.min, reverse=True)
-    else:
-        memories.sort(key=lambda x: x.created_at or datetime.min)
-    
-    # Apply pagination
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
-    paginated_memories = memories[start_idx:end_idx]
-    
-    # Convert to response format
-    memory_responses = []
-    for memory in paginated_memories:
-        memory_responses.append({
-            "id": str(memory.id),
-            "name": memory.name,
-            "description": memory.description,
-            "content": memory.content,
-            "session_id": str(memory.session_id) if memory.session_id else None,
-            "user_id": memory.user_id,
-            "agent_id": memory.agent_id,
-            "read_mode": memory.read_mode,
-            "access": memory.access,
-            "metadata": memory.metadata,
-            "created_at": memory.created_at,
-            "updated_at": memory.updated_at
-        })
+    total_count = _cached_memory_count(agent_id, user_id, session_uuid, read_mode)
     
     return {
-        "items": memory_responses,
+        "memories": [_memory_to_response(memory) for memory in memories],
+        "count": total_count,
         "page": page,
         "page_size": page_size,
-        "total_count": total_count,
-        "total_pages": total_pages
+        "pages": math.ceil(total_count / page_size),
+        "next_cursor": encode_memory_cursor(memories[-1], sort_by) if has_more else None
     }
 
 @memory_router.post("/memories", response_model=MemoryResponse, tags=["Memories"],
@@ -140,6 +184,7 @@ async def create_memory(memory: MemoryCreate):
             read_mode=memory.read_mode,
             access=memory.access,
             metadata=memory.metadata,
+            expires_at=memory.expires_at,
             created_at=None,  # Will be set by DB
             updated_at=None   # Will be set by DB
         )
@@ -169,86 +214,70 @@ async def create_memory(memory: MemoryCreate):
             "access": created_memory.access,
             "metadata": created_memory.metadata,
             "created_at": created_memory.created_at,
-            "updated_at": created_memory.updated_at
+            "updated_at": created_memory.updated_at,
+            "expires_at": created_memory.expires_at
         }
     except Exception as e:
         logger.error(f"Error creating memory: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating memory: {str(e)}")
 
-@memory_router.post("/memories/batch", response_model=List[MemoryResponse], tags=["Memories"],
+@memory_router.post("/memories/batch", response_model=MemoryBatchResponse, tags=["Memories"],
              summary="Create Multiple Memories",
-             description="Create multiple memories in a single batch operation.")
+             description="Create or update multiple memories in a single statement. "
+                         "Each memory gets its own result, so one invalid memory doesn't fail the batch.")
 async def create_memories_batch(memories: List[MemoryCreate]):
-    try:
-        results = []
+    results: List[Optional[Dict[str, Any]]] = [None] * len(memories)
+    valid: List[Tuple[int, Memory]] = []
+    
+    # Validate the whole payload before writing anything
+    for index, memory in enumerate(memories):
+        if not memory.name or not memory.name.strip():
+            results[index] = {"index": index, "success": False, "error": "Memory name must not be empty"}
+            continue
         
-        for memory in memories:
+        session_uuid = None
+        if memory.session_id:
             try:
-                # Convert session_id to UUID if provided
-                session_uuid = None
-                if memory.session_id:
-                    try:
-                        session_uuid = uuid.UUID(memory.session_id)
-                    except ValueError:
-                        logger.warning(f"Invalid session_id format in batch: {memory.session_id}")
-                        # Skip invalid UUIDs but continue with the operation
-                        pass
-                
-                # Create a Memory model for the repository
-                memory_model = Memory(
-                    id=None,  # Will be generated
-                    name=memory.name,
-                    description=memory.description,
-                    content=memory.content,
-                    session_id=session_uuid,
-                    user_id=memory.user_id,
-                    agent_id=memory.agent_id,
-                    read_mode=memory.read_mode,
-                    access=memory.access,
-                    metadata=memory.metadata,
-                    created_at=None,  # Will be set by DB
-                    updated_at=None   # Will be set by DB
-                )
-                
-                # Create the memory using the repository
-                memory_id = repo_create_memory(memory_model)
-                
-                if memory_id is None:
-                    logger.warning(f"Failed to create memory in batch: {memory.name}")
-                    continue
-                
-                # Retrieve the created memory to get all fields
-                created_memory = get_memory(memory_id)
-                
-                if not created_memory:
-                    logger.warning(f"Memory created but not found with ID {memory_id}")
-                    continue
-                
-                # Add to results
-                results.append(MemoryResponse(
-                    id=str(created_memory.id),
-                    name=created_memory.name,
-                    description=created_memory.description,
-                    content=created_memory.content,
-                    session_id=str(created_memory.session_id) if created_memory.session_id else None,
-                    user_id=created_memory.user_id,
-                    agent_id=created_memory.agent_id,
-                    read_mode=created_memory.read_mode,
-                    access=created_memory.access,
-                    metadata=created_memory.metadata,
-                    created_at=created_memory.created_at,
-                    updated_at=created_memory.updated_at
-                ))
-            except Exception as e:
-                # Log error but continue with other memories
-                logger.error(f"Error creating memory in batch: {str(e)}")
+                session_uuid = uuid.UUID(memory.session_id)
+            except ValueError:
+                results[index] = {"index": index, "success": False, "error": f"Invalid session_id format: {memory.session_id}"}
                 continue
         
-        # Return all successfully created memories
-        return results
+        valid.append((index, Memory(
+            id=uuid.uuid4(),
+            name=memory.name,
+            description=memory.description,
+            content=memory.content,
+            session_id=session_uuid,
+            user_id=memory.user_id,
+            agent_id=memory.agent_id,
+            read_mode=memory.read_mode,
+            access=memory.access,
+            metadata=memory.metadata,
+            expires_at=memory.expires_at
+        )))
+    
+    try:
+        # One INSERT ... ON CONFLICT ... RETURNING for all valid memories
+        stored = repo_upsert_memories([memory for _, memory in valid], keep_settings=False) if valid else []
     except Exception as e:
         logger.error(f"Error creating memories in batch: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating memories in batch: {str(e)}")
+    
+    stored_by_key = {memory_scope_key(memory): memory for memory in stored}
+    for index, memory in valid:
+        stored_memory = stored_by_key.get(memory_scope_key(memory))
+        if stored_memory is None:
+            results[index] = {
+                "index": index,
+                "success": False,
+                "error": "Memory was not written: its agent, user or session does not exist, or the database write failed"
+            }
+        else:
+            results[index] = {"index": index, "success": True, "memory": _memory_to_response(stored_memory)}
+    
+    succeeded = sum(1 for result in results if result["success"])
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
 
 @memory_router.get("/memories/{memory_id}", response_model=MemoryResponse, tags=["Memories"],
             summary="Get Memory",
@@ -281,7 +310,8 @@ async def get_memory_endpoint(memory_id: str = Path(..., description="The memory
             access=memory.access,
             metadata=memory.metadata,
             created_at=memory.created_at,
-            updated_at=memory.updated_at
+            updated_at=memory.updated_at,
+            expires_at=memory.expires_at
         )
     except HTTPException:
         raise
@@ -343,6 +373,9 @@ async def update_memory_endpoint(
             
         if memory_update.metadata is not None:
             existing_memory.metadata = memory_update.metadata
+            
+        if memory_update.expires_at is not None:
+            existing_memory.expires_at = memory_update.expires_at
         
         # Update the memory using repository function
         updated_memory_id = repo_update_memory(existing_memory)
@@ -366,7 +399,8 @@ async def update_memory_endpoint(
             access=updated_memory.access,
             metadata=updated_memory.metadata,
             created_at=updated_memory.created_at,
-            updated_at=updated_memory.updated_at
+            updated_at=updated_memory.updated_at,
+            expires_at=updated_memory.expires_at
         )
     except HTTPException:
         raise
@@ -404,7 +438,8 @@ async def delete_memory_endpoint(memory_id: str = Path(..., description="The mem
             access=existing_memory.access,
             metadata=existing_memory.metadata,
             created_at=existing_memory.created_at,
-            updated_at=existing_memory.updated_at
+            updated_at=existing_memory.updated_at,
+            expires_at=existing_memory.expires_at
         )
         
         # Delete the memory using repository function
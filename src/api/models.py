@@ -91,6 +91,24 @@ class AgentRunRequest(BaseResponseModel):
     agent_id: Optional[Any] = None  # Agent ID to store with messages, can be int or string
     parameters: Optional[Dict[str, Any]] = None  # Agent parameters
     messages: Optional[List[Any]] = None  # Optional message history
+    coalesce_window_ms: Optional[int] = None  # Debounce window merging rapid messages for the same session
+    coalesce_policy: Optional[Literal["shared", "last"]] = None  # How a coalesced response is returned
+
+class AgentJobRequest(AgentRunRequest):
+    """Request model for running an agent as an asynchronous job."""
+    callback_url: Optional[HttpUrl] = None  # URL the job result is posted to when it finishes
+
+class AgentJobResponse(BaseResponseModel):
+    """Status and, once finished, result of an agent job."""
+    job_id: str
+    agent_name: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 class AgentInfo(BaseResponseModel):
     """Information about an available agent."""
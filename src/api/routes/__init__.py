@@ -2,6 +2,7 @@ from fastapi import APIRouter
 from .user_routes import user_router
 from .session_routes import session_router
 from .agent_routes import agent_router
+from .job_routes import job_router
 from src.api.memory_routes import memory_router
 
 # Create main router
@@ -9,6 +10,7 @@ main_router = APIRouter()
 
 # Include all sub-routers
 main_router.include_router(agent_router)
+main_router.include_router(job_router)
 main_router.include_router(session_router)
 main_router.include_router(user_router)
 main_router.include_router(memory_router) 
\ No newline at end of file
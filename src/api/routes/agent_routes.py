@@ -1,9 +1,11 @@
 import logging
 from typing import List
-from fastapi import APIRouter, HTTPException
-from starlette.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.responses import JSONResponse, StreamingResponse
 from src.api.models import AgentInfo, AgentRunRequest
-from src.api.controllers.agent_controller import list_agent_templates, handle_agent_run
+from src.auth import get_request_api_key
+from src.utils.tracing import start_trace
+from src.api.controllers.agent_controller import list_agent_templates, handle_agent_run, handle_agent_run_stream
 
 # Create router for agent endpoints
 agent_router = APIRouter()
@@ -22,13 +24,17 @@ async def list_agents():
 
 @agent_router.post("/agent/{agent_name}/run", tags=["Agents"],
             summary="Run Agent",
-            description="Execute an agent with the specified name. Optionally provide a session ID or name to maintain conversation context.")
-async def run_agent(agent_name: str, request: AgentRunRequest):
+            description="Execute an agent with the specified name. Optionally provide a session ID or name to maintain conversation context. The Server-Timing response header breaks the run's latency down by db, prep, llm, tool and other span categories.")
+async def run_agent(agent_name: str, request: AgentRunRequest, http_request: Request, response: Response):
     """
     Run an agent with the specified parameters
     """
     try:
-        return await handle_agent_run(agent_name, request)
+        with start_trace("request.run", agent=agent_name) as trace:
+            result = await handle_agent_run(agent_name, request, api_key=get_request_api_key(http_request))
+        if trace is not None:
+            response.headers["Server-Timing"] = trace.server_timing()
+        return result
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
@@ -37,4 +43,29 @@ async def run_agent(agent_name: str, request: AgentRunRequest):
         return JSONResponse(
             status_code=500,
             content={"error": f"Error running agent: {str(e)}"}
-        ) 
\ No newline at end of file
+        )
+
+@agent_router.post("/agent/{agent_name}/run/stream", tags=["Agents"],
+            summary="Run Agent (Streaming)",
+            description="Execute an agent and stream its response as server-sent events: text_delta, tool_call and tool_result while it runs, then done with the session ID and usage. The message is saved when the stream completes.")
+async def run_agent_stream(agent_name: str, request: AgentRunRequest, http_request: Request):
+    """
+    Run an agent and stream the response as server-sent events
+    """
+    try:
+        events = await handle_agent_run_stream(agent_name, request, api_key=get_request_api_key(http_request))
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error running agent {agent_name}: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Error running agent: {str(e)}"}
+        )
+    
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
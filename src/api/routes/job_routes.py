@@ -0,0 +1,28 @@
+import logging
+from fastapi import APIRouter
+from src.api.models import AgentJobRequest, AgentJobResponse
+from src.api.controllers.job_controller import submit_agent_job, get_agent_job
+
+# Create router for agent job endpoints
+job_router = APIRouter()
+
+# Get our module's logger
+logger = logging.getLogger(__name__)
+
+@job_router.post("/agent/{agent_name}/jobs", response_model=AgentJobResponse, status_code=202, tags=["Agents"],
+            summary="Submit Agent Job",
+            description="Queue an agent run and return its job ID immediately. Poll GET /jobs/{job_id} for the result, or provide a callback_url to have it posted when the job finishes.")
+async def submit_agent_job_route(agent_name: str, request: AgentJobRequest):
+    """
+    Queue an agent run as an asynchronous job
+    """
+    return await submit_agent_job(agent_name, request)
+
+@job_router.get("/jobs/{job_id}", response_model=AgentJobResponse, tags=["Agents"],
+           summary="Get Agent Job",
+           description="Retrieve the status of an agent job and, once it has finished, its result or error.")
+async def get_agent_job_route(job_id: str):
+    """
+    Get an agent job by ID
+    """
+    return await get_agent_job(job_id)
@@ -6,6 +6,17 @@ from src.config import settings
 
 API_KEY_NAME = "x-api-key"
 
+def get_request_api_key(request: Request) -> Optional[str]:
+    """Get the API key sent with a request, from its headers or query parameters.
+    
+    Args:
+        request: The incoming request
+        
+    Returns:
+        The API key, or None if the request has none
+    """
+    return request.headers.get(API_KEY_NAME) or request.query_params.get(API_KEY_NAME)
+
 class APIKeyMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         # Skip auth for health check, root, and documentation endpoints
@@ -21,7 +32,7 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
         if request.url.path in no_auth_paths:
             return await call_next(request)
 
-        api_key = request.headers.get(API_KEY_NAME) or request.query_params.get(API_KEY_NAME)
+        api_key = get_request_api_key(request)
         if api_key is None:
             return JSONResponse(status_code=401, content={"detail": "x-api-key is missing in headers or query parameters"})
         if api_key != settings.AM_API_KEY:
@@ -523,4 +523,34 @@ def db_clear(
         logger.error(f"❌ Failed to clear database: {e}")
         import traceback
         logger.error(f"Detailed error: {traceback.format_exc()}")
-        return False 
\ No newline at end of file
+        return False
+
+
+@db_app.command("expire-session-memories")
+def db_expire_session_memories(
+    confirm: bool = typer.Option(False, "--yes", "-y", help="Confirm without prompt")
+):
+    """
+    Set the session memory expiry on session memories that never expire.
+    
+    Session memories written before memories could expire have no expiry.
+    This gives each of them AM_SESSION_MEMORY_TTL seconds from now.
+    """
+    from src.config import settings
+    from src.db import expire_session_memories
+    
+    if settings.AM_SESSION_MEMORY_TTL <= 0:
+        typer.echo("AM_SESSION_MEMORY_TTL is 0, session memories don't expire.")
+        return
+    
+    if not confirm:
+        confirmed = typer.confirm(
+            f"Session memories without an expiry will be deleted in {settings.AM_SESSION_MEMORY_TTL} seconds. Continue?",
+            default=False
+        )
+        if not confirmed:
+            typer.echo("Cancelled.")
+            return
+    
+    updated = expire_session_memories()
+    typer.echo(f"✅ Set an expiry on {updated} session memories")
@@ -62,6 +62,72 @@ class Settings(BaseSettings):
     POSTGRES_POOL_MIN: int = Field(1, description="Minimum connections in the pool")
     POSTGRES_POOL_MAX: int = Field(10, description="Maximum connections in the pool")
 
+    # Message persistence
+    AM_ASYNC_PERSISTENCE: bool = Field(False, description="Persist conversation turns from a background writer instead of on the request path")
+    AM_PERSISTENCE_FLUSH_INTERVAL_MS: int = Field(5, description="How often the background writer flushes queued turns, in milliseconds")
+    AM_PERSISTENCE_MAX_BATCH_SIZE: int = Field(500, description="Maximum number of messages written by the background writer in one INSERT")
+    AM_SESSION_LOCK_BACKEND: str = Field("local", description="Backend serializing turns per session (local, postgres)")
+    AM_SESSION_LOCK_TIMEOUT: float = Field(30.0, description="Seconds a turn waits for its session's lock before failing")
+    AM_SESSION_LOCK_POOL_SIZE: int = Field(20, description="Connections holding postgres session locks, i.e. turns one process runs at once with that backend")
+
+    # Memory cache
+    AM_MEMORY_CACHE_TTL: int = Field(300, description="Upper bound in seconds on how long cached memories are served without a reload")
+    AM_MEMORY_CACHE_MAX_SCOPES: int = Field(10000, description="Agent/user scopes kept in each per-process memory cache before the least recently used is evicted")
+    AM_MEMORY_CACHE_LISTEN: bool = Field(True, description="Invalidate cached memories on changes from other processes via Postgres LISTEN/NOTIFY")
+    AM_SESSION_MEMORY_TTL: int = Field(604800, description="Seconds after their last write that session-scoped memories expire (0 to keep them)")
+    AM_MEMORY_SWEEP_INTERVAL: float = Field(60.0, description="Seconds between sweeps deleting expired memories (0 to disable)")
+    AM_MEMORY_SWEEP_BATCH_SIZE: int = Field(500, description="Maximum number of expired memories deleted per statement")
+    AM_MEMORY_WRITE_BUFFER: bool = Field(True, description="Buffer memory tool writes during a turn and flush them as one upsert when it ends")
+
+    # Semantic memory
+    AM_SEMANTIC_MEMORY: bool = Field(False, description="Embed memories and enable semantic memory search")
+    AM_EMBEDDER: str = Field("openai", description="Embedder used for semantic memory (openai, hashing)")
+    AM_EMBEDDING_MODEL: str = Field("text-embedding-3-small", description="OpenAI embedding model used by the openai embedder")
+    AM_SEMANTIC_MEMORY_TOP_K: int = Field(5, description="Number of memories injected as {{relevant_memories}} or returned by search_memories")
+
+    # Agent pool
+    AM_AGENT_POOL_SIZE: int = Field(32, description="Maximum number of agent instances kept warm for reuse (0 disables pooling)")
+    AM_AGENT_POOL_IDLE_TTL: float = Field(600.0, description="Seconds a pooled agent instance no request is using is kept before it is evicted")
+
+    # Admission control
+    AM_MAX_CONCURRENT_RUNS_PER_AGENT: int = Field(0, description="Maximum concurrent runs of one agent (0 for no limit)")
+    AM_MAX_CONCURRENT_RUNS_PER_USER: int = Field(0, description="Maximum concurrent runs for one user (0 for no limit)")
+    AM_MAX_CONCURRENT_RUNS_PER_API_KEY: int = Field(0, description="Maximum concurrent runs sent with one API key (0 for no limit)")
+    AM_ADMISSION_QUEUE_SIZE: int = Field(16, description="Maximum runs waiting for a free slot of one agent, user or API key before new ones get 429")
+    AM_ADMISSION_QUEUE_TIMEOUT: float = Field(5.0, description="Seconds a run waits for a free slot before it gets 429")
+
+    # Agent jobs
+    AM_JOB_CONCURRENCY: int = Field(4, description="Number of agent jobs run concurrently by this process (0 runs no job workers here)")
+    AM_JOB_POLL_INTERVAL: float = Field(1.0, description="Seconds an idle job worker waits before checking for queued jobs again")
+    AM_JOB_TIMEOUT: float = Field(900.0, description="Seconds an agent job may run before it fails")
+    AM_JOB_MAX_ATTEMPTS: int = Field(3, description="Maximum times a job interrupted by a restart is started again")
+    AM_JOB_CALLBACK_RETRIES: int = Field(3, description="Attempts made to deliver a job result to its callback URL")
+
+    # System prompt layout
+    AM_PROMPT_LAYOUT: str = Field("inline", description="How memory values are placed in system prompts (inline, prefix_cache)")
+
+    # LLM response cache
+    AM_RESPONSE_CACHE_BACKEND: str = Field("memory", description="Where agents with response_cache enabled store responses (memory, postgres)")
+    AM_RESPONSE_CACHE_TTL: float = Field(3600.0, description="Seconds a cached response is reused (agents can override with response_cache_ttl)")
+    AM_RESPONSE_CACHE_MAX_ENTRIES: int = Field(10000, description="Maximum cached responses before the least recently used are evicted")
+
+    # Tracing
+    AM_TRACING_ENABLED: bool = Field(True, description="Record per-run span timings (Server-Timing header, message context)")
+    AM_TRACE_EXPORTER: str = Field("none", description="Where finished traces are exported as OTLP/JSON (none, file, otlp)")
+    AM_TRACE_EXPORT_PATH: str = Field("logs/traces.jsonl", description="File traces are appended to when AM_TRACE_EXPORTER is file")
+    AM_TRACE_OTLP_ENDPOINT: str = Field("http://localhost:4318/v1/traces", description="OTLP/HTTP endpoint traces are posted to when AM_TRACE_EXPORTER is otlp")
+
+    # Tool execution
+    AM_TOOL_TIMEOUT: float = Field(30.0, description="Default seconds a tool call may run before the model gets a timeout error (0 for no limit)")
+    AM_TOOL_RETRIES: int = Field(0, description="Default times a tool call that raised or timed out is retried")
+    AM_TOOL_BREAKER_THRESHOLD: int = Field(5, description="Consecutive failures of a tool that open its circuit breaker (0 disables breakers)")
+    AM_TOOL_BREAKER_RESET: float = Field(30.0, description="Seconds an open tool circuit breaker fails calls fast before letting one through again")
+
+    # Burst coalescing
+    AM_COALESCE_WINDOW_MS: int = Field(0, description="Default debounce window merging rapid messages per session into one turn (0 disables)")
+    AM_COALESCE_MAX_WAIT_MS: int = Field(5000, description="Maximum time a burst may keep extending its debounce window")
+    AM_COALESCE_POLICY: str = Field("shared", description="How a coalesced response is returned (shared, last)")
+
     # Server
     AM_PORT: int = Field(8881, description="Port to run the server on")
     AM_HOST: str = Field("0.0.0.0", description="Host to bind the server to")
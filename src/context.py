@@ -0,0 +1,97 @@
+"""Request-scoped state of agent runs.
+
+An agent instance holds only what is shared by every run (configuration,
+tools, prompt template, pydantic-ai agent). Everything that belongs to one
+run - the agent and user IDs, the session, the context passed to tools, a
+per-run copy of the dependencies and the message history - lives in an
+AgentRunContext stored in a context variable while the run executes. Tasks
+started by the run inherit it, so concurrent runs on one agent instance never
+see each other's state.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+_current_run: ContextVar[Optional["AgentRunContext"]] = ContextVar("agent_run_context", default=None)
+
+
+@dataclass
+class AgentRunContext:
+    """State of a single agent run."""
+
+    agent: Any
+    agent_id: Optional[int] = None
+    user_id: Optional[int] = None
+    session_id: Optional[str] = None
+    context: Dict[str, Any] = field(default_factory=dict)
+    dependencies: Any = None
+    message_history: Any = None
+
+
+def get_run_context() -> Optional[AgentRunContext]:
+    """Get the context of the agent run executing in the current task.
+
+    Returns:
+        The active AgentRunContext, or None outside of a run
+    """
+    return _current_run.get()
+
+
+@contextmanager
+def agent_run_context(run: AgentRunContext) -> Iterator[AgentRunContext]:
+    """Make a run context active until the block exits.
+
+    Args:
+        run: The run's state
+
+    Yields:
+        The active run context
+    """
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def resolve_tool_context(default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Get the context a tool should use.
+
+    Tools are registered once per agent with the agent's base context; during
+    a run they use the run's context instead.
+
+    Args:
+        default: Context the tool was registered with
+
+    Returns:
+        The active run's context, or default outside of a run
+    """
+    run = _current_run.get()
+    return run.context if run is not None else default
+
+
+def get_current_user_id() -> Optional[int]:
+    """Get the user ID of the active run.
+
+    Returns:
+        The user ID, or None outside of a run
+    """
+    run = _current_run.get()
+    return run.user_id if run is not None else None
+
+
+def get_current_agent_id(user_id: Optional[int] = None) -> Optional[int]:
+    """Get the agent ID of the active run.
+
+    Args:
+        user_id: Optional user ID the run must belong to
+
+    Returns:
+        The agent ID, or None outside of a matching run
+    """
+    run = _current_run.get()
+    if run is None or (user_id is not None and run.user_id is not None and run.user_id != user_id):
+        return None
+    return run.agent_id
@@ -10,7 +10,9 @@ from src.db.models import (
     User,
     Session,
     Memory,
-    Message
+    MemoryPromptBundle,
+    Message,
+    AgentJob
 )
 
 # Export connection utilities
@@ -60,6 +62,7 @@ from src.db.repository import (
     list_messages,
     count_messages,
     create_message,
+    create_messages,
     update_message,
     delete_message,
     delete_session_messages,
@@ -69,8 +72,37 @@ from src.db.repository import (
     # Memory repository
     get_memory,
     get_memory_by_name,
+    get_or_create_memories_by_name,
+    get_memory_prompt_bundle,
+    list_memory_embeddings,
+    list_memory_versions,
+    update_memory_embeddings,
+    upsert_memories,
+    memory_scope_key,
+    list_memories_page,
+    count_memories,
+    encode_memory_cursor,
+    decode_memory_cursor,
     list_memories,
     create_memory,
     update_memory,
-    delete_memory
+    expire_session_memories,
+    delete_expired_memories,
+    delete_memory,
+    
+    # Agent job repository
+    create_job,
+    get_job,
+    claim_next_job,
+    complete_job,
+    fail_job,
+    requeue_job,
+    mark_job_callback_delivered,
+    requeue_stale_jobs,
+    count_jobs,
+    
+    # LLM response cache repository
+    get_cached_response,
+    set_cached_response,
+    prune_response_cache
 )
\ No newline at end of file
@@ -2,6 +2,7 @@
 
 import logging
 import os
+import threading
 import time
 import urllib.parse
 import uuid
@@ -15,6 +16,7 @@ from psycopg2.extras import RealDictCursor, execute_values
 from psycopg2.pool import ThreadedConnectionPool
 
 from src.config import settings
+from src.utils.tracing import span
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -22,6 +24,10 @@ logger = logging.getLogger(__name__)
 # Connection pool for database connections
 _pool: Optional[ThreadedConnectionPool] = None
 
+# Separate pool for connections holding session advisory locks
+_lock_pool: Optional[ThreadedConnectionPool] = None
+_lock_pool_lock = threading.Lock()
+
 # Register UUID adapter for psycopg2
 psycopg2.extensions.register_adapter(uuid.UUID, lambda u: psycopg2.extensions.AsIs(f"'{u}'"))
 
@@ -252,6 +258,33 @@ def get_connection_pool() -> ThreadedConnectionPool:
     return _pool
 
 
+def get_lock_connection_pool() -> ThreadedConnectionPool:
+    """Get or create the connection pool for session advisory locks.
+    
+    A session lock keeps its connection for a whole agent turn, including the
+    LLM and tool calls. These connections come from their own small pool, so
+    long turns never starve the query pool.
+    """
+    global _lock_pool
+
+    if _lock_pool is None:
+        with _lock_pool_lock:
+            if _lock_pool is None:
+                config = get_db_config()
+                _lock_pool = ThreadedConnectionPool(
+                    minconn=0,
+                    maxconn=settings.AM_SESSION_LOCK_POOL_SIZE,
+                    host=config["host"],
+                    port=config["port"],
+                    user=config["user"],
+                    password=config["password"],
+                    database=config["database"],
+                    client_encoding="UTF8",
+                )
+                logger.info(f"Created session lock connection pool with up to {settings.AM_SESSION_LOCK_POOL_SIZE} connections")
+    return _lock_pool
+
+
 @contextmanager
 def get_db_connection() -> Generator:
     """Get a database connection from the pool."""
@@ -298,7 +331,7 @@ def execute_query(query: str, params: tuple = None, fetch: bool = True, commit:
     Returns:
         List of records as dictionaries if fetch=True, otherwise empty list
     """
-    with get_db_cursor(commit=commit) as cursor:
+    with span("db.query", statement=_statement_kind(query)), get_db_cursor(commit=commit) as cursor:
         cursor.execute(query, params)
         
         if fetch and cursor.description:
@@ -306,16 +339,32 @@ def execute_query(query: str, params: tuple = None, fetch: bool = True, commit:
         return []
 
 
-def execute_batch(query: str, params_list: List[Tuple], commit: bool = True) -> None:
+def execute_batch(query: str, params_list: List[Tuple], commit: bool = True, fetch: bool = False) -> Optional[List[Dict[str, Any]]]:
     """Execute a batch query with multiple parameter sets.
     
+    All parameter sets are expanded into a single ``VALUES %s`` statement, so
+    the whole batch costs one round trip.
+    
     Args:
-        query: SQL query template
+        query: SQL query template containing a single ``VALUES %s`` placeholder
         params_list: List of parameter tuples
         commit: Whether to commit the transaction
+        fetch: Whether to return rows produced by a RETURNING clause
+        
+    Returns:
+        List of result rows as dictionaries if fetch is True, None otherwise
     """
-    with get_db_cursor(commit=commit) as cursor:
-        execute_values(cursor, query, params_list)
+    with span("db.batch", statement=_statement_kind(query), rows=len(params_list)), get_db_cursor(commit=commit) as cursor:
+        results = execute_values(cursor, query, params_list, page_size=max(len(params_list), 1), fetch=fetch)
+        if fetch:
+            return [dict(row) for row in results]
+        return None
+
+
+def _statement_kind(query: str) -> str:
+    """First keyword of a SQL statement (SELECT, INSERT, ...), used to label its span."""
+    words = query.split(None, 1)
+    return words[0].upper() if words else ""
 
 
 def close_connection_pool() -> None:
@@ -0,0 +1,10 @@
+-- Migration: Add native_messages column to messages table
+-- Description: Stores the exact pydantic-ai ModelMessage sequence for each message so history can be loaded without reconstruction
+-- Created at: 2026-10-19 09:00:00
+
+-- Add native_messages column
+ALTER TABLE messages
+ADD COLUMN IF NOT EXISTS native_messages JSONB DEFAULT NULL;
+
+-- Add comment to explain the column's purpose
+COMMENT ON COLUMN messages.native_messages IS 'pydantic-ai ModelMessagesTypeAdapter JSON for this message (request for user rows, responses and tool returns for assistant rows); NULL for legacy rows';
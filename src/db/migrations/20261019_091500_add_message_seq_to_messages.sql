@@ -0,0 +1,34 @@
+-- Migration: Add message_seq column to messages table
+-- Description: Orders messages by an explicit monotonically increasing sequence instead of created_at
+-- Created at: 2026-10-19 09:15:00
+
+-- Create the sequence and column
+CREATE SEQUENCE IF NOT EXISTS messages_message_seq_seq;
+
+ALTER TABLE messages
+ADD COLUMN IF NOT EXISTS message_seq BIGINT;
+
+-- Backfill existing rows in their current chronological order
+UPDATE messages m
+SET message_seq = ordered.seq
+FROM (
+    SELECT id, ROW_NUMBER() OVER (ORDER BY created_at, updated_at, id) AS seq
+    FROM messages
+) ordered
+WHERE m.id = ordered.id AND m.message_seq IS NULL;
+
+SELECT setval('messages_message_seq_seq', COALESCE((SELECT MAX(message_seq) FROM messages), 0) + 1, false);
+
+-- New rows take the next value; rows of a multi-row INSERT are numbered in VALUES order
+ALTER TABLE messages
+ALTER COLUMN message_seq SET DEFAULT nextval('messages_message_seq_seq');
+
+ALTER TABLE messages
+ALTER COLUMN message_seq SET NOT NULL;
+
+ALTER SEQUENCE messages_message_seq_seq OWNED BY messages.message_seq;
+
+CREATE INDEX IF NOT EXISTS idx_messages_session_seq ON messages (session_id, message_seq);
+
+-- Add comment to explain the column's purpose
+COMMENT ON COLUMN messages.message_seq IS 'Insertion sequence used to order messages within a session';
@@ -0,0 +1,39 @@
+-- Migration: Notify listeners about memory changes
+-- Description: Publishes every insert, update and delete on memories on the memory_changes channel so each worker can invalidate its memory cache
+-- Created at: 2026-10-19 09:30:00
+
+CREATE OR REPLACE FUNCTION notify_memory_change() RETURNS trigger AS $$
+BEGIN
+    -- The ts field lets listeners measure how long their cache stayed stale
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('memory_changes', json_build_object(
+            'agent_id', OLD.agent_id,
+            'user_id', OLD.user_id,
+            'op', TG_OP,
+            'ts', extract(epoch FROM clock_timestamp())
+        )::text);
+    END IF;
+
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND (
+        NEW.agent_id IS DISTINCT FROM OLD.agent_id OR NEW.user_id IS DISTINCT FROM OLD.user_id
+    )) THEN
+        PERFORM pg_notify('memory_changes', json_build_object(
+            'agent_id', NEW.agent_id,
+            'user_id', NEW.user_id,
+            'op', TG_OP,
+            'ts', extract(epoch FROM clock_timestamp())
+        )::text);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS memories_notify_change ON memories;
+
+CREATE TRIGGER memories_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON memories
+FOR EACH ROW EXECUTE FUNCTION notify_memory_change();
+
+-- Add comment to explain the trigger's purpose
+COMMENT ON FUNCTION notify_memory_change() IS 'Publishes memory changes on the memory_changes channel for cache invalidation';
@@ -0,0 +1,21 @@
+-- Migration: Add embedding columns to memories table
+-- Description: Stores a vector embedding per memory for semantic retrieval, with the model that produced it
+-- Created at: 2026-10-19 09:45:00
+
+ALTER TABLE memories
+ADD COLUMN IF NOT EXISTS embedding REAL[];
+
+ALTER TABLE memories
+ADD COLUMN IF NOT EXISTS embedding_model TEXT;
+
+-- Add comments to explain the columns' purpose
+COMMENT ON COLUMN memories.embedding IS 'Normalized embedding of the memory name and content, cleared when the content changes';
+COMMENT ON COLUMN memories.embedding_model IS 'Embedder that produced the embedding; rows from another embedder are re-embedded';
+
+-- Storing an embedding doesn't change what caches hold, so only notify on other columns
+DROP TRIGGER IF EXISTS memories_notify_change ON memories;
+
+CREATE TRIGGER memories_notify_change
+AFTER INSERT OR DELETE OR UPDATE OF name, description, content, session_id, user_id, agent_id, read_mode, access, metadata
+ON memories
+FOR EACH ROW EXECUTE FUNCTION notify_memory_change();
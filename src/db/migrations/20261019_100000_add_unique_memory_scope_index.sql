@@ -0,0 +1,51 @@
+-- Migration: Add unique memory scope index
+-- Description: Makes a memory name unique per agent, user and session so memory writes can be upserted in one statement
+-- Created at: 2026-10-19 10:00:00
+
+-- Refuse to build the index over duplicated memories instead of deleting any.
+-- Conflicting rows are reported so they can be merged or removed by hand
+-- before the migration is run again.
+DO $$
+DECLARE
+    conflict_count INTEGER;
+    conflict_report TEXT;
+BEGIN
+    SELECT COUNT(*),
+           string_agg(
+               format('name=%L agent_id=%s user_id=%s session_id=%s ids=[%s]',
+                      name, agent_id, user_id, session_id, ids),
+               E'\n'
+           ) FILTER (WHERE group_number <= 20)
+    INTO conflict_count, conflict_report
+    FROM (
+        SELECT name,
+               MIN(agent_id) AS agent_id,
+               MIN(user_id) AS user_id,
+               MIN(session_id::text) AS session_id,
+               string_agg(id::text, ', ' ORDER BY updated_at DESC NULLS LAST, id) AS ids,
+               ROW_NUMBER() OVER (ORDER BY name) AS group_number
+        FROM memories
+        GROUP BY name,
+                 COALESCE(agent_id, 0),
+                 COALESCE(user_id, 0),
+                 COALESCE(session_id, '00000000-0000-0000-0000-000000000000'::uuid)
+        HAVING COUNT(*) > 1
+    ) conflicts;
+
+    IF conflict_count > 0 THEN
+        RAISE EXCEPTION 'Cannot create idx_memories_scope_name: % memory name(s) are duplicated within their agent/user/session scope', conflict_count
+            USING DETAIL = conflict_report,
+                  HINT = 'Merge or delete the duplicated memories (ids are listed most recently updated first), then apply migrations again.';
+    END IF;
+END $$;
+
+-- NULL scopes are folded into sentinels so shared memories are unique too
+CREATE UNIQUE INDEX IF NOT EXISTS idx_memories_scope_name
+ON memories (
+    name,
+    COALESCE(agent_id, 0),
+    COALESCE(user_id, 0),
+    COALESCE(session_id, '00000000-0000-0000-0000-000000000000'::uuid)
+);
+
+COMMENT ON INDEX idx_memories_scope_name IS 'One memory per name and agent/user/session scope; conflict target of batched memory upserts';
@@ -0,0 +1,12 @@
+-- Migration: Add memory listing indexes
+-- Description: Lets GET /memories read a sorted page of an agent's memories from an index instead of sorting the whole table
+-- Created at: 2026-10-19 10:15:00
+
+CREATE INDEX IF NOT EXISTS idx_memories_agent_created_at
+ON memories (agent_id, created_at, id);
+
+CREATE INDEX IF NOT EXISTS idx_memories_agent_updated_at
+ON memories (agent_id, updated_at, id);
+
+CREATE INDEX IF NOT EXISTS idx_memories_created_at
+ON memories (created_at, id);
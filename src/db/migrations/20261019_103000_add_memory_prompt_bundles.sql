@@ -0,0 +1,107 @@
+-- Migration: Add memory prompt bundles
+-- Description: Keeps one precomputed name-to-content map of system prompt memories per agent and user, refreshed by triggers on memories
+-- Created at: 2026-10-19 10:30:00
+
+-- user_id 0 holds the agent's shared memories (user_id IS NULL)
+CREATE TABLE IF NOT EXISTS memory_prompt_bundles (
+    agent_id INTEGER NOT NULL REFERENCES agents(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL DEFAULT 0,
+    memories JSONB NOT NULL DEFAULT '{}'::jsonb,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (agent_id, user_id)
+);
+
+COMMENT ON TABLE memory_prompt_bundles IS 'System prompt memories of an agent and user, rendered as one name-to-content map';
+COMMENT ON COLUMN memory_prompt_bundles.version IS 'Incremented every time the bundle is rebuilt';
+
+-- Rebuild the bundle of one agent and user from its system prompt memories
+CREATE OR REPLACE FUNCTION refresh_memory_prompt_bundle(p_agent_id INTEGER, p_user_id INTEGER) RETURNS void AS $$
+BEGIN
+    IF p_agent_id IS NULL OR NOT EXISTS (SELECT 1 FROM agents WHERE id = p_agent_id) THEN
+        RETURN;
+    END IF;
+
+    -- Serialize rebuilds of a bundle; the query below then sees the other writer's rows
+    PERFORM pg_advisory_xact_lock(hashtext('memory_prompt_bundle:' || p_agent_id || ':' || COALESCE(p_user_id, 0)));
+
+    INSERT INTO memory_prompt_bundles (agent_id, user_id, memories, version, updated_at)
+    SELECT p_agent_id, COALESCE(p_user_id, 0), COALESCE(jsonb_object_agg(m.name, m.content), '{}'::jsonb), 1, NOW()
+    FROM (
+        SELECT DISTINCT ON (name) name, content
+        FROM memories
+        WHERE agent_id = p_agent_id
+          AND user_id IS NOT DISTINCT FROM p_user_id
+          AND session_id IS NULL
+          AND read_mode = 'system_prompt'
+        ORDER BY name, updated_at DESC
+    ) m
+    ON CONFLICT (agent_id, user_id) DO UPDATE SET
+        memories = EXCLUDED.memories,
+        version = memory_prompt_bundles.version + 1,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level, so a batch write rebuilds each affected bundle once
+CREATE OR REPLACE FUNCTION refresh_memory_prompt_bundles() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_memory_prompt_bundle(s.agent_id, s.user_id)
+        FROM (
+            SELECT DISTINCT agent_id, user_id FROM new_rows
+            WHERE read_mode = 'system_prompt' AND session_id IS NULL
+        ) s;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_memory_prompt_bundle(s.agent_id, s.user_id)
+        FROM (
+            SELECT DISTINCT agent_id, user_id FROM old_rows
+            WHERE read_mode = 'system_prompt' AND session_id IS NULL
+        ) s;
+    ELSE
+        -- Only rebuild for changes that affect a bundle (e.g. not embedding updates)
+        PERFORM refresh_memory_prompt_bundle(s.agent_id, s.user_id)
+        FROM (
+            SELECT n.agent_id, n.user_id
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.read_mode = 'system_prompt' AND n.session_id IS NULL
+              AND (n.name, n.content, n.read_mode, n.agent_id, n.user_id, n.session_id)
+                  IS DISTINCT FROM (o.name, o.content, o.read_mode, o.agent_id, o.user_id, o.session_id)
+            UNION
+            SELECT o.agent_id, o.user_id
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE o.read_mode = 'system_prompt' AND o.session_id IS NULL
+              AND (n.name, n.content, n.read_mode, n.agent_id, n.user_id, n.session_id)
+                  IS DISTINCT FROM (o.name, o.content, o.read_mode, o.agent_id, o.user_id, o.session_id)
+        ) s;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS memories_refresh_prompt_bundles_insert ON memories;
+DROP TRIGGER IF EXISTS memories_refresh_prompt_bundles_update ON memories;
+DROP TRIGGER IF EXISTS memories_refresh_prompt_bundles_delete ON memories;
+
+CREATE TRIGGER memories_refresh_prompt_bundles_insert
+AFTER INSERT ON memories
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_memory_prompt_bundles();
+
+CREATE TRIGGER memories_refresh_prompt_bundles_update
+AFTER UPDATE ON memories
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_memory_prompt_bundles();
+
+CREATE TRIGGER memories_refresh_prompt_bundles_delete
+AFTER DELETE ON memories
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_memory_prompt_bundles();
+
+-- Build bundles for existing memories
+SELECT refresh_memory_prompt_bundle(s.agent_id, s.user_id)
+FROM (
+    SELECT DISTINCT agent_id, user_id FROM memories
+    WHERE read_mode = 'system_prompt' AND session_id IS NULL AND agent_id IS NOT NULL
+) s;
@@ -0,0 +1,46 @@
+-- Migration: Add expires_at to memories table
+-- Description: Lets memories expire (session memories by default) so a background sweeper can delete them
+-- Created at: 2026-10-19 10:45:00
+
+ALTER TABLE memories
+ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITH TIME ZONE;
+
+COMMENT ON COLUMN memories.expires_at IS 'Time after which the memory is hidden from reads and deleted by the sweeper; NULL never expires';
+
+-- Only expiring rows are indexed, so the sweeper finds them without scanning long-lived memories
+CREATE INDEX IF NOT EXISTS idx_memories_expires_at
+ON memories (expires_at)
+WHERE expires_at IS NOT NULL;
+
+-- Existing rows keep expires_at NULL and never expire. Session memories get the
+-- configured AM_SESSION_MEMORY_TTL on their next update, or all at once with the
+-- opt-in `automagik-agents db expire-session-memories` command.
+
+-- Bundles rebuilt between a memory expiring and being swept leave it out too
+CREATE OR REPLACE FUNCTION refresh_memory_prompt_bundle(p_agent_id INTEGER, p_user_id INTEGER) RETURNS void AS $$
+BEGIN
+    IF p_agent_id IS NULL OR NOT EXISTS (SELECT 1 FROM agents WHERE id = p_agent_id) THEN
+        RETURN;
+    END IF;
+
+    -- Serialize rebuilds of a bundle; the query below then sees the other writer's rows
+    PERFORM pg_advisory_xact_lock(hashtext('memory_prompt_bundle:' || p_agent_id || ':' || COALESCE(p_user_id, 0)));
+
+    INSERT INTO memory_prompt_bundles (agent_id, user_id, memories, version, updated_at)
+    SELECT p_agent_id, COALESCE(p_user_id, 0), COALESCE(jsonb_object_agg(m.name, m.content), '{}'::jsonb), 1, NOW()
+    FROM (
+        SELECT DISTINCT ON (name) name, content
+        FROM memories
+        WHERE agent_id = p_agent_id
+          AND user_id IS NOT DISTINCT FROM p_user_id
+          AND session_id IS NULL
+          AND read_mode = 'system_prompt'
+          AND (expires_at IS NULL OR expires_at > NOW())
+        ORDER BY name, updated_at DESC
+    ) m
+    ON CONFLICT (agent_id, user_id) DO UPDATE SET
+        memories = EXCLUDED.memories,
+        version = memory_prompt_bundles.version + 1,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
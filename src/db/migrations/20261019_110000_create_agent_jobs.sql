@@ -0,0 +1,28 @@
+-- Migration: Create agent_jobs table
+-- Description: Persists asynchronous agent runs so queued and unfinished jobs survive restarts
+-- Created at: 2026-10-19 11:00:00
+
+CREATE TABLE IF NOT EXISTS agent_jobs (
+    id UUID PRIMARY KEY,
+    agent_name VARCHAR(255) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    request JSONB NOT NULL,
+    result JSONB,
+    error TEXT,
+    callback_url TEXT,
+    callback_delivered_at TIMESTAMP WITH TIME ZONE,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT agent_jobs_status_check CHECK (status IN ('queued', 'running', 'succeeded', 'failed'))
+);
+
+COMMENT ON TABLE agent_jobs IS 'Agent runs submitted through the job API and executed by the in-process worker pool';
+COMMENT ON COLUMN agent_jobs.request IS 'AgentRunRequest payload the job runs';
+COMMENT ON COLUMN agent_jobs.attempts IS 'Number of times a worker claimed the job; jobs orphaned by a restart are retried until AM_JOB_MAX_ATTEMPTS';
+
+-- Workers claim the oldest queued job and recover stale running ones
+CREATE INDEX IF NOT EXISTS idx_agent_jobs_status_created_at
+ON agent_jobs (status, created_at);
@@ -0,0 +1,21 @@
+-- Migration: Create llm_response_cache table
+-- Description: Shares exact-match LLM responses of opted-in agents between workers
+-- Created at: 2026-10-19 11:30:00
+
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    key CHAR(64) PRIMARY KEY,
+    response JSONB NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_used_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+COMMENT ON TABLE llm_response_cache IS 'Agent responses keyed by a SHA-256 hash of the model request (model, settings, tools, system prompt, history, input)';
+
+-- Pruning removes expired rows first, then the least recently used beyond the size limit
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at
+ON llm_response_cache (expires_at);
+
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used_at
+ON llm_response_cache (last_used_at);
@@ -95,6 +95,8 @@ class Message(BaseDBModel):
     user_feedback: Optional[str] = Field(None, description="User feedback")
     flagged: Optional[str] = Field(None, description="Flagged status")
     context: Optional[Dict[str, Any]] = Field(None, description="Message context")
+    native_messages: Optional[List[Dict[str, Any]]] = Field(None, description="Native pydantic-ai messages for this row")
+    message_seq: Optional[int] = Field(None, description="Insertion sequence within the messages table")
     created_at: Optional[datetime] = Field(None, description="Created at timestamp")
     updated_at: Optional[datetime] = Field(None, description="Updated at timestamp")
 
@@ -120,10 +122,51 @@ class Memory(BaseDBModel):
     metadata: Optional[Dict[str, Any]] = Field(None, description="Additional metadata")
     created_at: Optional[datetime] = Field(None, description="Created at timestamp")
     updated_at: Optional[datetime] = Field(None, description="Updated at timestamp")
+    expires_at: Optional[datetime] = Field(None, description="Time after which the memory is hidden and swept (None for never)")
 
     @classmethod
     def from_db_row(cls, row: Dict[str, Any]) -> "Memory":
         """Create a Memory instance from a database row dictionary."""
         if not row:
             return None
-        return cls(**row)
\ No newline at end of file
+        return cls(**row)
+
+
+class MemoryPromptBundle(BaseDBModel):
+    """Precomputed system prompt memories of an agent and user (memory_prompt_bundles table)."""
+    agent_id: int = Field(..., description="Agent ID")
+    user_id: int = Field(0, description="User ID (0 for memories shared by all users)")
+    memories: Dict[str, Any] = Field(default_factory=dict, description="System prompt memory contents by name")
+    version: int = Field(1, description="Incremented each time the bundle is rebuilt")
+    updated_at: Optional[datetime] = Field(None, description="Updated at timestamp")
+
+    @classmethod
+    def from_db_row(cls, row: Dict[str, Any]) -> "MemoryPromptBundle":
+        """Create a MemoryPromptBundle instance from a database row dictionary."""
+        if not row:
+            return None
+        return cls(**row)
+
+
+class AgentJob(BaseDBModel):
+    """Asynchronous agent run corresponding to the agent_jobs table."""
+    id: Optional[uuid.UUID] = Field(None, description="Job ID")
+    agent_name: str = Field(..., description="Name of the agent to run")
+    status: str = Field("queued", description="Job status (queued, running, succeeded, failed)")
+    request: Dict[str, Any] = Field(default_factory=dict, description="Agent run request payload")
+    result: Optional[Dict[str, Any]] = Field(None, description="Agent run result once succeeded")
+    error: Optional[str] = Field(None, description="Error message once failed")
+    callback_url: Optional[str] = Field(None, description="URL the result is posted to when the job finishes")
+    callback_delivered_at: Optional[datetime] = Field(None, description="When the callback was delivered")
+    attempts: int = Field(0, description="Number of times a worker claimed the job")
+    created_at: Optional[datetime] = Field(None, description="Created at timestamp")
+    started_at: Optional[datetime] = Field(None, description="Started at timestamp of the latest attempt")
+    finished_at: Optional[datetime] = Field(None, description="Finished at timestamp")
+    updated_at: Optional[datetime] = Field(None, description="Updated at timestamp")
+
+    @classmethod
+    def from_db_row(cls, row: Dict[str, Any]) -> "AgentJob":
+        """Create an AgentJob instance from a database row dictionary."""
+        if not row:
+            return None
+        return cls(**row)
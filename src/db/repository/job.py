@@ -0,0 +1,238 @@
+"""Agent job repository functions for database operations."""
+
+import uuid
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from src.db.connection import execute_query
+from src.db.models import AgentJob
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+def create_job(agent_name: str, request: Dict[str, Any], callback_url: Optional[str] = None) -> Optional[AgentJob]:
+    """Create a queued agent job.
+    
+    Args:
+        agent_name: Name of the agent to run
+        request: Agent run request payload
+        callback_url: URL the result is posted to when the job finishes
+        
+    Returns:
+        The created AgentJob if successful, None otherwise
+    """
+    try:
+        result = execute_query(
+            """
+            INSERT INTO agent_jobs (id, agent_name, status, request, callback_url, created_at, updated_at)
+            VALUES (%s, %s, 'queued', %s, %s, NOW(), NOW())
+            RETURNING *
+            """,
+            (str(uuid.uuid4()), agent_name, json.dumps(request, default=str), callback_url)
+        )
+        return AgentJob.from_db_row(result[0]) if result else None
+    except Exception as e:
+        logger.error(f"Error creating job for agent {agent_name}: {str(e)}")
+        return None
+
+
+def get_job(job_id: uuid.UUID) -> Optional[AgentJob]:
+    """Get an agent job by ID.
+    
+    Args:
+        job_id: The job ID
+        
+    Returns:
+        AgentJob object if found, None otherwise
+    """
+    try:
+        result = execute_query(
+            "SELECT * FROM agent_jobs WHERE id = %s",
+            (str(job_id),)
+        )
+        return AgentJob.from_db_row(result[0]) if result else None
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {str(e)}")
+        return None
+
+
+def claim_next_job() -> Optional[AgentJob]:
+    """Mark the oldest queued job as running and return it.
+    
+    Rows locked by another worker are skipped, so several processes can
+    claim from the same table without running a job twice.
+    
+    Returns:
+        The claimed AgentJob, or None if no job is queued
+    """
+    try:
+        result = execute_query(
+            """
+            UPDATE agent_jobs
+            SET status = 'running', attempts = attempts + 1, started_at = NOW(), updated_at = NOW()
+            WHERE id = (
+                SELECT id FROM agent_jobs
+                WHERE status = 'queued'
+                ORDER BY created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+            """
+        )
+        return AgentJob.from_db_row(result[0]) if result else None
+    except Exception as e:
+        logger.error(f"Error claiming next job: {str(e)}")
+        return None
+
+
+def complete_job(job_id: uuid.UUID, result: Dict[str, Any], attempts: int) -> bool:
+    """Mark a job as succeeded with its result.
+    
+    Only the claim that is still running the job may finish it, so a run
+    that outlived a stale recovery can't overwrite the newer claim's outcome.
+    
+    Args:
+        job_id: The job ID
+        result: Agent run result
+        attempts: Attempt number of the claim finishing the job
+        
+    Returns:
+        True if the job was updated, False otherwise
+    """
+    try:
+        rows = execute_query(
+            """
+            UPDATE agent_jobs
+            SET status = 'succeeded', result = %s, error = NULL, finished_at = NOW(), updated_at = NOW()
+            WHERE id = %s AND status = 'running' AND attempts = %s
+            RETURNING id
+            """,
+            (json.dumps(result, default=str), str(job_id), attempts)
+        )
+        return bool(rows)
+    except Exception as e:
+        logger.error(f"Error completing job {job_id}: {str(e)}")
+        return False
+
+
+def fail_job(job_id: uuid.UUID, error: str, attempts: int) -> bool:
+    """Mark a job as failed, if the given claim is still running it.
+    
+    Args:
+        job_id: The job ID
+        error: Error message
+        attempts: Attempt number of the claim finishing the job
+        
+    Returns:
+        True if the job was updated, False otherwise
+    """
+    try:
+        rows = execute_query(
+            """
+            UPDATE agent_jobs
+            SET status = 'failed', error = %s, finished_at = NOW(), updated_at = NOW()
+            WHERE id = %s AND status = 'running' AND attempts = %s
+            RETURNING id
+            """,
+            (error, str(job_id), attempts)
+        )
+        return bool(rows)
+    except Exception as e:
+        logger.error(f"Error failing job {job_id}: {str(e)}")
+        return False
+
+
+def requeue_job(job_id: uuid.UUID) -> bool:
+    """Put a running job back in the queue, e.g. when its worker shuts down.
+    
+    Args:
+        job_id: The job ID
+        
+    Returns:
+        True if the job was requeued, False otherwise
+    """
+    try:
+        rows = execute_query(
+            "UPDATE agent_jobs SET status = 'queued', updated_at = NOW() WHERE id = %s AND status = 'running' RETURNING id",
+            (str(job_id),)
+        )
+        return bool(rows)
+    except Exception as e:
+        logger.error(f"Error requeuing job {job_id}: {str(e)}")
+        return False
+
+
+def mark_job_callback_delivered(job_id: uuid.UUID) -> bool:
+    """Record that a job's result was delivered to its callback URL.
+    
+    Args:
+        job_id: The job ID
+        
+    Returns:
+        True if the job was updated, False otherwise
+    """
+    try:
+        rows = execute_query(
+            "UPDATE agent_jobs SET callback_delivered_at = NOW(), updated_at = NOW() WHERE id = %s RETURNING id",
+            (str(job_id),)
+        )
+        return bool(rows)
+    except Exception as e:
+        logger.error(f"Error marking callback delivered for job {job_id}: {str(e)}")
+        return False
+
+
+def requeue_stale_jobs(stale_after: float, max_attempts: int) -> int:
+    """Recover running jobs whose worker went away.
+    
+    A job still running longer than the job timeout was orphaned (its process
+    stopped or crashed). It is queued again, or failed once it used up its
+    attempts.
+    
+    Args:
+        stale_after: Seconds after which a running job is considered orphaned
+        max_attempts: Maximum number of times a job is claimed
+        
+    Returns:
+        Number of jobs recovered
+    """
+    try:
+        rows = execute_query(
+            """
+            UPDATE agent_jobs
+            SET status = CASE WHEN attempts < %s THEN 'queued' ELSE 'failed' END,
+                error = CASE WHEN attempts < %s THEN error ELSE 'Job was interrupted too many times' END,
+                finished_at = CASE WHEN attempts < %s THEN NULL ELSE NOW() END,
+                updated_at = NOW()
+            WHERE status = 'running' AND started_at < NOW() - make_interval(secs => %s)
+            RETURNING id
+            """,
+            (max_attempts, max_attempts, max_attempts, stale_after)
+        )
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error requeuing stale jobs: {str(e)}")
+        return 0
+
+
+def count_jobs(status: str) -> int:
+    """Count jobs with a status.
+    
+    Args:
+        status: Job status (queued, running, succeeded, failed)
+        
+    Returns:
+        Number of jobs with the status
+    """
+    try:
+        result = execute_query(
+            "SELECT COUNT(*) as count FROM agent_jobs WHERE status = %s",
+            (status,)
+        )
+        return result[0]["count"] if result else 0
+    except Exception as e:
+        logger.error(f"Error counting {status} jobs: {str(e)}")
+        return 0
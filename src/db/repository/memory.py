@@ -1,16 +1,42 @@
 """Memory repository functions for database operations."""
 
+import base64
 import uuid
 import json
 import logging
-from typing import List, Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Tuple
 
-from src.db.connection import execute_query
-from src.db.models import Memory
+from src.config import settings
+from src.db.connection import execute_query, execute_batch
+from src.db.models import Memory, MemoryPromptBundle
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Filter applied by every read; expired rows stay until the sweeper deletes them
+NOT_EXPIRED_CONDITION = "(expires_at IS NULL OR expires_at > NOW())"
+
+
+def memory_expires_at(memory: Memory) -> Optional[datetime]:
+    """Get the expiry to store for a memory being written.
+    
+    An explicit expires_at is kept. Session-scoped memories without one
+    expire AM_SESSION_MEMORY_TTL seconds after they are written, so session
+    scratch data doesn't outlive the conversation.
+    
+    Args:
+        memory: The memory being written
+        
+    Returns:
+        The expiry timestamp, or None if the memory doesn't expire
+    """
+    if memory.expires_at is not None:
+        return memory.expires_at
+    if memory.session_id is not None and settings.AM_SESSION_MEMORY_TTL > 0:
+        return datetime.now(timezone.utc) + timedelta(seconds=settings.AM_SESSION_MEMORY_TTL)
+    return None
+
 
 def get_memory(memory_id: uuid.UUID) -> Optional[Memory]:
     """Get a memory by ID.
@@ -23,11 +49,11 @@ def get_memory(memory_id: uuid.UUID) -> Optional[Memory]:
     """
     try:
         result = execute_query(
-            """
+            f"""
             SELECT id, name, description, content, session_id, user_id, agent_id,
-                   read_mode, access, metadata, created_at, updated_at
+                   read_mode, access, metadata, created_at, updated_at, expires_at
             FROM memories 
-            WHERE id = %s
+            WHERE id = %s AND {NOT_EXPIRED_CONDITION}
             """,
             (str(memory_id),)
         )
@@ -52,11 +78,11 @@ def get_memory_by_name(name: str, agent_id: Optional[int] = None,
         Memory object if found, None otherwise
     """
     try:
-        query = """
+        query = f"""
             SELECT id, name, description, content, session_id, user_id, agent_id,
-                   read_mode, access, metadata, created_at, updated_at
+                   read_mode, access, metadata, created_at, updated_at, expires_at
             FROM memories 
-            WHERE name = %s
+            WHERE name = %s AND {NOT_EXPIRED_CONDITION}
         """
         params = [name]
         
@@ -98,11 +124,11 @@ def list_memories(agent_id: Optional[int] = None,
         List of Memory objects
     """
     try:
-        query = """
+        query = f"""
             SELECT id, name, description, content, session_id, user_id, agent_id,
-                   read_mode, access, metadata, created_at, updated_at
+                   read_mode, access, metadata, created_at, updated_at, expires_at
             FROM memories 
-            WHERE 1=1
+            WHERE {NOT_EXPIRED_CONDITION}
         """
         params = []
         
@@ -132,9 +158,495 @@ def list_memories(agent_id: Optional[int] = None,
         return []
 
 
+# Columns GET /memories can sort by; id breaks ties so keyset pages are stable
+MEMORY_SORT_COLUMNS = ("created_at", "updated_at", "name")
+
+
+def _memory_filters(agent_id: Optional[int], user_id: Optional[int],
+                    session_id: Optional[uuid.UUID], read_mode: Optional[str]) -> Tuple[str, List[Any]]:
+    """Build the WHERE clause shared by list_memories_page and count_memories."""
+    conditions = [NOT_EXPIRED_CONDITION]
+    params: List[Any] = []
+    if agent_id is not None:
+        conditions.append("agent_id = %s")
+        params.append(agent_id)
+    if user_id is not None:
+        conditions.append("user_id = %s")
+        params.append(user_id)
+    if session_id is not None:
+        conditions.append("session_id = %s")
+        params.append(str(session_id))
+    if read_mode is not None:
+        conditions.append("read_mode = %s")
+        params.append(read_mode)
+    return " WHERE " + " AND ".join(conditions), params
+
+
+def encode_memory_cursor(memory: Memory, sort_by: str) -> str:
+    """Encode the position of a memory as an opaque keyset cursor.
+    
+    Args:
+        memory: Last memory of a page
+        sort_by: Column the page was sorted by
+        
+    Returns:
+        URL-safe cursor string
+    """
+    value = getattr(memory, sort_by)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, value, str(memory.id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_memory_cursor(cursor: str, sort_by: str) -> Tuple[Any, str]:
+    """Decode a keyset cursor produced by encode_memory_cursor.
+    
+    Args:
+        cursor: The cursor string
+        sort_by: Column the current request sorts by
+        
+    Returns:
+        Tuple of (sort column value, memory ID) of the last row seen
+        
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort column
+    """
+    try:
+        cursor_sort_by, value, memory_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        uuid.UUID(memory_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if cursor_sort_by != sort_by:
+        raise ValueError(f"Cursor was issued for sort_by={cursor_sort_by}, not {sort_by}")
+    return value, memory_id
+
+
+def list_memories_page(agent_id: Optional[int] = None,
+                       user_id: Optional[int] = None,
+                       session_id: Optional[uuid.UUID] = None,
+                       read_mode: Optional[str] = None,
+                       limit: int = 50,
+                       offset: int = 0,
+                       sort_by: str = "created_at",
+                       sort_desc: bool = True,
+                       after: Optional[Tuple[Any, str]] = None) -> List[Memory]:
+    """List one page of memories, sorted and paginated in SQL.
+    
+    Pages can be addressed by offset or, more cheaply for deep pages, by a
+    keyset position: the (sort value, id) of the last row of the previous page.
+    
+    Args:
+        agent_id: Optional agent ID filter
+        user_id: Optional user ID filter
+        session_id: Optional session ID filter
+        read_mode: Optional read mode filter
+        limit: Maximum number of memories to return
+        offset: Number of memories to skip (ignored when after is given)
+        sort_by: Column to sort by, one of MEMORY_SORT_COLUMNS
+        sort_desc: Sort in descending order if True
+        after: Optional (sort value, memory ID) keyset position to continue from
+        
+    Returns:
+        List of Memory objects
+    """
+    if sort_by not in MEMORY_SORT_COLUMNS:
+        logger.error(f"Invalid memory sort column: {sort_by}")
+        return []
+    
+    try:
+        where, params = _memory_filters(agent_id, user_id, session_id, read_mode)
+        direction = "DESC" if sort_desc else "ASC"
+        
+        if after is not None:
+            value_type = "text" if sort_by == "name" else "timestamptz"
+            where += f" AND ({sort_by}, id) {'<' if sort_desc else '>'} (%s::{value_type}, %s::uuid)"
+            params.extend(after)
+        
+        query = f"""
+            SELECT id, name, description, content, session_id, user_id, agent_id,
+                   read_mode, access, metadata, created_at, updated_at, expires_at
+            FROM memories{where}
+            ORDER BY {sort_by} {direction}, id {direction}
+            LIMIT %s
+        """
+        params.append(limit)
+        if after is None and offset > 0:
+            query += " OFFSET %s"
+            params.append(offset)
+        
+        result = execute_query(query, params)
+        return [Memory.from_db_row(row) for row in result] if result else []
+    except Exception as e:
+        logger.error(f"Error listing memory page: {str(e)}")
+        return []
+
+
+def count_memories(agent_id: Optional[int] = None,
+                   user_id: Optional[int] = None,
+                   session_id: Optional[uuid.UUID] = None,
+                   read_mode: Optional[str] = None) -> int:
+    """Count memories matching the given filters.
+    
+    Without filters the planner's row estimate (which includes expired rows
+    not yet swept) is returned instead of an exact count, so counting the
+    whole table doesn't scan it.
+    
+    Args:
+        agent_id: Optional agent ID filter
+        user_id: Optional user ID filter
+        session_id: Optional session ID filter
+        read_mode: Optional read mode filter
+        
+    Returns:
+        Number of matching memories (0 on error)
+    """
+    try:
+        if agent_id is None and user_id is None and session_id is None and read_mode is None:
+            # reltuples is -1 (or 0) until the table has been analyzed
+            result = execute_query("SELECT reltuples::bigint AS estimate FROM pg_class WHERE oid = 'memories'::regclass")
+            if result and result[0]["estimate"] > 0:
+                return int(result[0]["estimate"])
+        
+        where, params = _memory_filters(agent_id, user_id, session_id, read_mode)
+        result = execute_query(f"SELECT COUNT(*) AS count FROM memories{where}", params)
+        return int(result[0]["count"]) if result else 0
+    except Exception as e:
+        logger.error(f"Error counting memories: {str(e)}")
+        return 0
+
+
+def _notify_memory_change(agent_id: Optional[int], user_id: Optional[int]) -> None:
+    """Invalidate this process's cached memories for an agent and user.
+    
+    Other processes learn about the change from the memories table trigger.
+    """
+    from src.memory.memory_versions import notify_memory_change
+    notify_memory_change(agent_id, user_id)
+
+
+def get_or_create_memories_by_name(names: List[str], agent_id: int,
+                                   user_id: Optional[int] = None,
+                                   defaults: Optional[Dict[str, Tuple[str, str]]] = None,
+                                   read_mode: str = "system_prompt",
+                                   access: str = "read_write") -> Dict[str, Memory]:
+    """Fetch memories by name for an agent and user, creating any that are missing.
+    
+    Everything happens in a single statement: existing rows are selected and
+    the missing names are inserted with their default description and content.
+    An expired row that hasn't been swept yet counts as missing and is
+    replaced by the new one.
+    As with get_memory_by_name, a None user_id matches memories of any user.
+    
+    Args:
+        names: Memory names to fetch
+        agent_id: The agent ID
+        user_id: Optional user ID
+        defaults: Optional mapping of name to (description, content) for new rows
+        read_mode: Read mode for newly created memories
+        access: Access permissions for newly created memories
+        
+    Returns:
+        Dictionary mapping each found or created memory name to its Memory
+    """
+    names = list(dict.fromkeys(name for name in names if name))
+    if not names:
+        return {}
+    
+    defaults = defaults or {}
+    
+    try:
+        wanted_rows = []
+        params: List[Any] = []
+        for name in names:
+            description, content = defaults.get(name, (None, None))
+            wanted_rows.append("(%s::uuid, %s, %s, %s)")
+            params.extend([str(uuid.uuid4()), name, description, content])
+        
+        params.extend([agent_id, user_id, user_id, user_id, agent_id, read_mode, access])
+        
+        query = f"""
+            WITH wanted (id, name, description, content) AS (
+                VALUES {", ".join(wanted_rows)}
+            ),
+            existing AS (
+                SELECT DISTINCT ON (m.name)
+                       m.id, m.name, m.description, m.content, m.session_id, m.user_id, m.agent_id,
+                       m.read_mode, m.access, m.metadata, m.created_at, m.updated_at, m.expires_at
+                FROM memories m
+                JOIN wanted w ON w.name = m.name
+                WHERE m.agent_id = %s
+                  AND {NOT_EXPIRED_CONDITION}
+                  AND (%s::integer IS NULL OR m.user_id = %s)
+                ORDER BY m.name, m.session_id NULLS FIRST, m.updated_at DESC
+            ),
+            inserted AS (
+                INSERT INTO memories (
+                    id, name, description, content, user_id, agent_id,
+                    read_mode, access, created_at, updated_at
+                )
+                SELECT w.id, w.name, w.description, w.content, %s, %s, %s, %s, NOW(), NOW()
+                FROM wanted w
+                WHERE NOT EXISTS (SELECT 1 FROM existing e WHERE e.name = w.name)
+                ON CONFLICT (
+                    name,
+                    COALESCE(agent_id, 0),
+                    COALESCE(user_id, 0),
+                    COALESCE(session_id, '00000000-0000-0000-0000-000000000000'::uuid)
+                )
+                -- An expired row the sweeper hasn't deleted yet is recreated in place
+                DO UPDATE SET
+                    description = EXCLUDED.description,
+                    content = EXCLUDED.content,
+                    read_mode = EXCLUDED.read_mode,
+                    access = EXCLUDED.access,
+                    metadata = NULL,
+                    embedding = NULL,
+                    expires_at = NULL,
+                    created_at = NOW(),
+                    updated_at = NOW()
+                WHERE memories.expires_at <= NOW()
+                RETURNING id, name, description, content, session_id, user_id, agent_id,
+                          read_mode, access, metadata, created_at, updated_at, expires_at
+            )
+            SELECT *, false AS created FROM existing
+            UNION ALL
+            SELECT *, true AS created FROM inserted
+        """
+        
+        result = execute_query(query, params) or []
+        memories = {row["name"]: Memory.from_db_row(row) for row in result}
+        if any(row.get("created") for row in result):
+            _notify_memory_change(agent_id, user_id)
+        logger.debug(f"Fetched {len(memories)} memories by name for agent {agent_id}, user {user_id}")
+        return memories
+    except Exception as e:
+        logger.error(f"Error fetching memories by name for agent {agent_id}, user {user_id}: {str(e)}")
+        return {}
+
+
+def get_memory_prompt_bundle(agent_id: int, user_id: Optional[int] = None) -> Optional[MemoryPromptBundle]:
+    """Get the precomputed system prompt memories of an agent and user.
+    
+    Bundles are maintained by triggers on the memories table, so this is a
+    single primary-key read.
+    
+    Args:
+        agent_id: The agent ID
+        user_id: Optional user ID (None reads the agent's shared memories)
+        
+    Returns:
+        The bundle, or None if it doesn't exist or on error
+    """
+    try:
+        result = execute_query(
+            """
+            SELECT agent_id, user_id, memories, version, updated_at
+            FROM memory_prompt_bundles
+            WHERE agent_id = %s AND user_id = %s
+            """,
+            (agent_id, user_id or 0)
+        )
+        return MemoryPromptBundle.from_db_row(result[0]) if result else None
+    except Exception as e:
+        logger.error(f"Error getting memory prompt bundle for agent {agent_id}, user {user_id}: {str(e)}")
+        return None
+
+
+def list_memory_versions(agent_id: int, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """List the IDs and versions of a scope's memories, without their contents.
+    
+    Args:
+        agent_id: The agent ID
+        user_id: Optional user ID (None lists memories of any user)
+        
+    Returns:
+        List of rows with id and updated_at
+    """
+    try:
+        query = f"""
+            SELECT id, updated_at
+            FROM memories
+            WHERE agent_id = %s AND {NOT_EXPIRED_CONDITION}
+        """
+        params: List[Any] = [agent_id]
+        if user_id is not None:
+            query += " AND user_id = %s"
+            params.append(user_id)
+        
+        return execute_query(query, params) or []
+    except Exception as e:
+        logger.error(f"Error listing memory versions for agent {agent_id}, user {user_id}: {str(e)}")
+        return []
+
+
+def list_memory_embeddings(agent_id: int, user_id: Optional[int] = None,
+                           memory_ids: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+    """List memories with their embeddings for building a semantic index.
+    
+    Args:
+        agent_id: The agent ID
+        user_id: Optional user ID (None lists memories of any user)
+        memory_ids: Optional IDs to restrict the listing to
+        
+    Returns:
+        List of rows with id, name, content, embedding, embedding_model and updated_at
+    """
+    if memory_ids is not None and not memory_ids:
+        return []
+    
+    try:
+        query = f"""
+            SELECT id, name, content, embedding, embedding_model, updated_at
+            FROM memories
+            WHERE agent_id = %s AND {NOT_EXPIRED_CONDITION}
+        """
+        params: List[Any] = [agent_id]
+        if user_id is not None:
+            query += " AND user_id = %s"
+            params.append(user_id)
+        if memory_ids is not None:
+            query += " AND id = ANY(%s::uuid[])"
+            params.append([str(memory_id) for memory_id in memory_ids])
+        
+        return execute_query(query, params) or []
+    except Exception as e:
+        logger.error(f"Error listing memory embeddings for agent {agent_id}, user {user_id}: {str(e)}")
+        return []
+
+
+def update_memory_embeddings(embeddings: List[Tuple[uuid.UUID, List[float]]], model: str) -> bool:
+    """Store embeddings for several memories in one statement.
+    
+    Args:
+        embeddings: List of (memory ID, embedding) pairs
+        model: Name of the embedder that produced the embeddings
+        
+    Returns:
+        True if successful, False otherwise
+    """
+    if not embeddings:
+        return True
+    
+    try:
+        execute_batch(
+            """
+            UPDATE memories AS m
+            SET embedding = v.embedding::real[], embedding_model = v.model
+            FROM (VALUES %s) AS v (id, embedding, model)
+            WHERE m.id = v.id::uuid
+            """,
+            [(str(memory_id), embedding, model) for memory_id, embedding in embeddings]
+        )
+        logger.debug(f"Stored {len(embeddings)} memory embeddings")
+        return True
+    except Exception as e:
+        logger.error(f"Error storing memory embeddings: {str(e)}")
+        return False
+
+
+def upsert_memories(memories: List[Memory], keep_settings: bool = True) -> List[Memory]:
+    """Create or update several memories by name in one statement.
+    
+    Rows are matched on name and agent/user/session scope (the unique
+    idx_memories_scope_name index). Existing rows get the new content and,
+    when given, description and metadata. If the same memory appears more
+    than once, the last occurrence wins. Memories referring to an agent,
+    user or session that doesn't exist are skipped rather than failing the
+    whole statement, so they are simply missing from the result.
+    
+    Args:
+        memories: The memories to write
+        keep_settings: If True, existing rows keep their read mode and access;
+            otherwise they are replaced when the new memory sets them
+        
+    Returns:
+        The written memories as stored, or an empty list on error
+    """
+    latest: Dict[Tuple[Any, ...], Memory] = {}
+    for memory in memories:
+        latest[memory_scope_key(memory)] = memory
+    if not latest:
+        return []
+    
+    settings_update = "" if keep_settings else """
+                read_mode = COALESCE(EXCLUDED.read_mode, memories.read_mode),
+                access = COALESCE(EXCLUDED.access, memories.access),"""
+    
+    try:
+        result = execute_batch(
+            f"""
+            INSERT INTO memories (
+                id, name, description, content, session_id, user_id, agent_id,
+                read_mode, access, metadata, expires_at, created_at, updated_at
+            )
+            SELECT v.id::uuid, v.name, v.description, v.content, v.session_id::uuid,
+                   v.user_id::integer, v.agent_id::integer, v.read_mode, v.access,
+                   v.metadata::jsonb, v.expires_at::timestamptz, NOW(), NOW()
+            FROM (VALUES %s) AS v (
+                id, name, description, content, session_id, user_id, agent_id,
+                read_mode, access, metadata, expires_at
+            )
+            WHERE (v.agent_id IS NULL OR EXISTS (SELECT 1 FROM agents a WHERE a.id = v.agent_id::integer))
+              AND (v.user_id IS NULL OR EXISTS (SELECT 1 FROM users u WHERE u.id = v.user_id::integer))
+              AND (v.session_id IS NULL OR EXISTS (SELECT 1 FROM sessions s WHERE s.id = v.session_id::uuid))
+            ON CONFLICT (
+                name,
+                COALESCE(agent_id, 0),
+                COALESCE(user_id, 0),
+                COALESCE(session_id, '00000000-0000-0000-0000-000000000000'::uuid)
+            )
+            DO UPDATE SET
+                content = EXCLUDED.content,
+                description = COALESCE(EXCLUDED.description, memories.description),
+                metadata = COALESCE(EXCLUDED.metadata, memories.metadata),{settings_update}
+                embedding = CASE WHEN memories.content IS DISTINCT FROM EXCLUDED.content
+                                 THEN NULL ELSE memories.embedding END,
+                expires_at = CASE WHEN EXCLUDED.expires_at IS NOT NULL THEN EXCLUDED.expires_at
+                                  WHEN memories.expires_at <= NOW() THEN NULL
+                                  ELSE memories.expires_at END,
+                updated_at = NOW()
+            RETURNING id, name, description, content, session_id, user_id, agent_id,
+                      read_mode, access, metadata, created_at, updated_at, expires_at
+            """,
+            [
+                (
+                    str(memory.id or uuid.uuid4()),
+                    memory.name,
+                    memory.description,
+                    memory.content,
+                    str(memory.session_id) if memory.session_id else None,
+                    memory.user_id,
+                    memory.agent_id,
+                    memory.read_mode,
+                    memory.access,
+                    json.dumps(memory.metadata) if memory.metadata else None,
+                    memory_expires_at(memory)
+                )
+                for memory in latest.values()
+            ],
+            fetch=True
+        ) or []
+        
+        for agent_id, user_id in {(row["agent_id"], row["user_id"]) for row in result}:
+            _notify_memory_change(agent_id, user_id)
+        logger.info(f"Upserted {len(result)} of {len(latest)} memories")
+        return [Memory.from_db_row(row) for row in result]
+    except Exception as e:
+        logger.error(f"Error upserting {len(latest)} memories: {str(e)}")
+        return []
+
+
+def memory_scope_key(memory: Memory) -> Tuple[Any, ...]:
+    """Get the (name, agent_id, user_id, session_id) key a memory is unique by."""
+    return (memory.name, memory.agent_id, memory.user_id, str(memory.session_id) if memory.session_id else None)
+
+
 def create_memory(memory: Memory) -> Optional[uuid.UUID]:
     """Create a new memory or update an existing one.
     
+    An expired memory that hasn't been swept yet is replaced by the new one.
+    
     Args:
         memory: The memory to create
         
@@ -144,7 +656,7 @@ def create_memory(memory: Memory) -> Optional[uuid.UUID]:
     try:
         # Check if a memory with this name already exists for the same context
         if memory.name:
-            query = "SELECT id FROM memories WHERE name = %s"
+            query = f"SELECT id FROM memories WHERE name = %s AND {NOT_EXPIRED_CONDITION}"
             params = [memory.name]
             
             # Add optional filters
@@ -177,11 +689,29 @@ def create_memory(memory: Memory) -> Optional[uuid.UUID]:
             """
             INSERT INTO memories (
                 id, name, description, content, session_id, user_id, agent_id,
-                read_mode, access, metadata, created_at, updated_at
+                read_mode, access, metadata, expires_at, created_at, updated_at
             ) VALUES (
                 %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, NOW(), NOW()
-            ) RETURNING id
+                %s, %s, %s, %s, NOW(), NOW()
+            )
+            ON CONFLICT (
+                name,
+                COALESCE(agent_id, 0),
+                COALESCE(user_id, 0),
+                COALESCE(session_id, '00000000-0000-0000-0000-000000000000'::uuid)
+            )
+            DO UPDATE SET
+                description = EXCLUDED.description,
+                content = EXCLUDED.content,
+                read_mode = EXCLUDED.read_mode,
+                access = EXCLUDED.access,
+                metadata = EXCLUDED.metadata,
+                embedding = NULL,
+                expires_at = EXCLUDED.expires_at,
+                created_at = NOW(),
+                updated_at = NOW()
+            WHERE memories.expires_at <= NOW()
+            RETURNING id
             """,
             (
                 str(memory.id),
@@ -193,11 +723,13 @@ def create_memory(memory: Memory) -> Optional[uuid.UUID]:
                 memory.agent_id,
                 memory.read_mode,
                 memory.access,
-                metadata_json
+                metadata_json,
+                memory_expires_at(memory)
             )
         )
         
         memory_id = uuid.UUID(result[0]["id"]) if result else None
+        _notify_memory_change(memory.agent_id, memory.user_id)
         logger.info(f"Created memory {memory.name} with ID {memory_id}")
         return memory_id
     except Exception as e:
@@ -208,6 +740,11 @@ def create_memory(memory: Memory) -> Optional[uuid.UUID]:
 def update_memory(memory: Memory) -> Optional[uuid.UUID]:
     """Update an existing memory.
     
+    The stored expiry is kept unless the memory sets an explicit one; a
+    session-scoped memory that never expired gets the default session expiry.
+    A memory that has already expired but hasn't been swept yet is revived
+    with the expiry of a new memory, as upsert_memories does.
+    
     Args:
         memory: The memory to update
         
@@ -217,7 +754,7 @@ def update_memory(memory: Memory) -> Optional[uuid.UUID]:
     try:
         if not memory.id:
             # Try to find by name and context
-            query = "SELECT id FROM memories WHERE name = %s"
+            query = f"SELECT id FROM memories WHERE name = %s AND {NOT_EXPIRED_CONDITION}"
             params = [memory.name]
             
             # Add optional filters
@@ -253,6 +790,9 @@ def update_memory(memory: Memory) -> Optional[uuid.UUID]:
                 read_mode = %s,
                 access = %s,
                 metadata = %s,
+                embedding = CASE WHEN content IS DISTINCT FROM %s THEN NULL ELSE embedding END,
+                expires_at = CASE WHEN expires_at <= NOW() THEN %s::timestamptz
+                                  ELSE COALESCE(%s::timestamptz, expires_at, %s::timestamptz) END,
                 updated_at = NOW()
             WHERE id = %s
             """,
@@ -266,11 +806,16 @@ def update_memory(memory: Memory) -> Optional[uuid.UUID]:
                 memory.read_mode,
                 memory.access,
                 metadata_json,
+                memory.content,
+                memory_expires_at(memory),
+                memory.expires_at,
+                memory_expires_at(memory),
                 str(memory.id)
             ),
             fetch=False
         )
         
+        _notify_memory_change(memory.agent_id, memory.user_id)
         logger.info(f"Updated memory {memory.name} with ID {memory.id}")
         return memory.id
     except Exception as e:
@@ -278,6 +823,76 @@ def update_memory(memory: Memory) -> Optional[uuid.UUID]:
         return None
 
 
+def expire_session_memories() -> int:
+    """Give session-scoped memories without an expiry the default session expiry.
+    
+    Session memories written before expiry existed never expire. This opt-in
+    backfill sets them to expire AM_SESSION_MEMORY_TTL seconds from now.
+    
+    Returns:
+        Number of memories updated (0 on error or if AM_SESSION_MEMORY_TTL is 0)
+    """
+    if settings.AM_SESSION_MEMORY_TTL <= 0:
+        return 0
+    
+    try:
+        result = execute_query(
+            """
+            UPDATE memories
+            SET expires_at = NOW() + make_interval(secs => %s)
+            WHERE session_id IS NOT NULL AND expires_at IS NULL
+            RETURNING agent_id, user_id
+            """,
+            (settings.AM_SESSION_MEMORY_TTL,)
+        ) or []
+        
+        for agent_id, user_id in {(row["agent_id"], row["user_id"]) for row in result}:
+            _notify_memory_change(agent_id, user_id)
+        logger.info(f"Set an expiry on {len(result)} session memories")
+        return len(result)
+    except Exception as e:
+        logger.error(f"Error setting session memory expiry: {str(e)}")
+        return 0
+
+
+def delete_expired_memories(batch_size: int = 500) -> int:
+    """Delete up to batch_size expired memories.
+    
+    Small batches keep each delete short, and SKIP LOCKED lets several
+    sweepers run without waiting on each other.
+    
+    Args:
+        batch_size: Maximum number of memories to delete
+        
+    Returns:
+        Number of memories deleted (0 on error)
+    """
+    try:
+        result = execute_query(
+            """
+            DELETE FROM memories
+            WHERE id IN (
+                SELECT id FROM memories
+                WHERE expires_at <= NOW()
+                ORDER BY expires_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING agent_id, user_id
+            """,
+            (batch_size,)
+        ) or []
+        
+        for agent_id, user_id in {(row["agent_id"], row["user_id"]) for row in result}:
+            _notify_memory_change(agent_id, user_id)
+        if result:
+            logger.info(f"Deleted {len(result)} expired memories")
+        return len(result)
+    except Exception as e:
+        logger.error(f"Error deleting expired memories: {str(e)}")
+        return 0
+
+
 def delete_memory(memory_id: uuid.UUID) -> bool:
     """Delete a memory.
     
@@ -288,11 +903,12 @@ def delete_memory(memory_id: uuid.UUID) -> bool:
         True if successful, False otherwise
     """
     try:
-        execute_query(
-            "DELETE FROM memories WHERE id = %s",
-            (str(memory_id),),
-            fetch=False
+        result = execute_query(
+            "DELETE FROM memories WHERE id = %s RETURNING agent_id, user_id",
+            (str(memory_id),)
         )
+        for row in result or []:
+            _notify_memory_change(row["agent_id"], row["user_id"])
         logger.info(f"Deleted memory with ID {memory_id}")
         return True
     except Exception as e:
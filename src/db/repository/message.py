@@ -7,7 +7,7 @@ from typing import List, Optional, Dict, Any, Tuple, Union
 from datetime import datetime
 from pydantic import BaseModel
 
-from src.db.connection import execute_query
+from src.db.connection import execute_query, execute_batch
 from src.db.models import Message
 from src.db.repository.session import get_session
 
@@ -15,6 +15,40 @@ from src.db.repository.session import get_session
 logger = logging.getLogger(__name__)
 
 
+_MESSAGE_INSERT_COLUMNS = """id, session_id, user_id, agent_id, role, text_content, 
+                message_type, raw_payload, tool_calls, tool_outputs,
+                context, system_prompt, created_at, updated_at, channel_payload,
+                native_messages"""
+
+
+def _message_insert_params(message: Message) -> List[Any]:
+    """Build the INSERT parameters for a message, serializing JSON fields.
+    
+    Args:
+        message: The Message object to insert
+        
+    Returns:
+        List of parameters in _MESSAGE_INSERT_COLUMNS order
+    """
+    def _to_json(value: Any) -> Any:
+        if value is not None and not isinstance(value, str):
+            return json.dumps(value)
+        return value
+    
+    # Use current time if not provided
+    created_at = message.created_at or datetime.now()
+    updated_at = message.updated_at or datetime.now()
+    
+    return [
+        message.id, message.session_id, message.user_id, message.agent_id,
+        message.role, message.text_content, message.message_type,
+        _to_json(message.raw_payload), _to_json(message.tool_calls), _to_json(message.tool_outputs),
+        _to_json(message.context), message.system_prompt, created_at, updated_at,
+        _to_json(message.channel_payload), _to_json(message.native_messages)
+    ]
+
+
+
 def get_message(message_id: Union[uuid.UUID, str]) -> Optional[Message]:
     """Get a message by ID.
     
@@ -54,7 +88,7 @@ def list_messages(session_id: uuid.UUID, offset: int = 0,
         session_id: The UUID of the session
         offset: Number of messages to skip
         limit: Maximum number of messages to return (None for all)
-        sort_desc: Sort by descending created_at if True
+        sort_desc: Sort newest first if True
         
     Returns:
         List of Message objects
@@ -62,7 +96,7 @@ def list_messages(session_id: uuid.UUID, offset: int = 0,
     try:
         # Build query with pagination and sorting
         sort_direction = "DESC" if sort_desc else "ASC"
-        query = f"SELECT * FROM messages WHERE session_id = %s ORDER BY created_at {sort_direction}"
+        query = f"SELECT * FROM messages WHERE session_id = %s ORDER BY message_seq {sort_direction}"
         params = [session_id]
         
         # Add limit clause if specified
@@ -130,53 +164,19 @@ def create_message(message: Message) -> Optional[uuid.UUID]:
                     f"user_id={message.user_id}, agent_id={message.agent_id}, "
                     f"message_type={message.message_type}, text_length={len(message.text_content or '') if message.text_content else 0}")
         
-        # Prepare raw_payload, tool_calls, and tool_outputs for storage
-        raw_payload = message.raw_payload
-        if raw_payload is not None and not isinstance(raw_payload, str):
-            raw_payload = json.dumps(raw_payload)
-            
-        tool_calls = message.tool_calls
-        if tool_calls is not None and not isinstance(tool_calls, str):
-            tool_calls = json.dumps(tool_calls)
-            
-        tool_outputs = message.tool_outputs
-        if tool_outputs is not None and not isinstance(tool_outputs, str):
-            tool_outputs = json.dumps(tool_outputs)
-            
-        channel_payload = message.channel_payload
-        if channel_payload is not None and not isinstance(channel_payload, str):
-            channel_payload = json.dumps(channel_payload)
-        
-        # Handle context and system_prompt
-        context = message.context
-        if context is not None and not isinstance(context, str):
-            context = json.dumps(context)
-            
-        system_prompt = message.system_prompt
-        
-        # Use current time if not provided
-        created_at = message.created_at or datetime.now()
-        updated_at = message.updated_at or datetime.now()
-        
-        query = """
+        query = f"""
             INSERT INTO messages (
-                id, session_id, user_id, agent_id, role, text_content, 
-                message_type, raw_payload, tool_calls, tool_outputs,
-                context, system_prompt, created_at, updated_at, channel_payload
+                {_MESSAGE_INSERT_COLUMNS}
             ) VALUES (
                 %s, %s, %s, %s, %s, %s, 
                 %s, %s, %s, %s,
-                %s, %s, %s, %s, %s
+                %s, %s, %s, %s, %s,
+                %s
             )
             RETURNING id
         """
         
-        params = [
-            message.id, message.session_id, message.user_id, message.agent_id,
-            message.role, message.text_content, message.message_type,
-            raw_payload, tool_calls, tool_outputs,
-            context, system_prompt, created_at, updated_at, channel_payload
-        ]
+        params = _message_insert_params(message)
         
         # Log the SQL query and parameters for debugging
         logger.debug(f"Executing message creation query: {query}")
@@ -205,6 +205,53 @@ def create_message(message: Message) -> Optional[uuid.UUID]:
         return None
 
 
+def create_messages(messages: List[Message]) -> List[uuid.UUID]:
+    """Create several messages in the database with a single multi-row INSERT.
+    
+    Rows are inserted in list order, so their message_seq values follow the
+    order of the input list.
+    
+    Args:
+        messages: The Message objects to create, in conversation order
+        
+    Returns:
+        List of created message UUIDs in input order, or an empty list on failure
+    """
+    if not messages:
+        return []
+    
+    try:
+        query = f"""
+            INSERT INTO messages (
+                {_MESSAGE_INSERT_COLUMNS}
+            ) VALUES %s
+            RETURNING id, message_seq
+        """
+        
+        params_list = [tuple(_message_insert_params(message)) for message in messages]
+        
+        logger.debug(f"Creating {len(messages)} messages in one statement for sessions "
+                     f"{sorted({str(m.session_id) for m in messages})}")
+        
+        result = execute_batch(query, params_list, fetch=True)
+        
+        # RETURNING follows VALUES order, but sort on the sequence to be explicit
+        rows = sorted(result or [], key=lambda row: row.get('message_seq') or 0)
+        message_ids = [row.get('id') for row in rows]
+        
+        if len(message_ids) != len(messages):
+            logger.error(f"Error creating messages: expected {len(messages)} rows, got {len(message_ids)}")
+            return []
+        
+        logger.info(f"Successfully created {len(message_ids)} messages")
+        return message_ids
+    except Exception as e:
+        logger.error(f"Error creating messages: {str(e)}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return []
+
+
 def update_message(message: Message) -> Optional[uuid.UUID]:
     """Update an existing message in the database.
     
@@ -233,6 +280,10 @@ def update_message(message: Message) -> Optional[uuid.UUID]:
         if context is not None and not isinstance(context, str):
             context = json.dumps(context)
             
+        native_messages = message.native_messages
+        if native_messages is not None and not isinstance(native_messages, str):
+            native_messages = json.dumps(native_messages)
+            
         system_prompt = message.system_prompt
         
         # Use current time for updated_at
@@ -251,6 +302,7 @@ def update_message(message: Message) -> Optional[uuid.UUID]:
                 tool_outputs = %s,
                 context = %s,
                 system_prompt = %s,
+                native_messages = %s,
                 updated_at = %s
             WHERE id = %s
             RETURNING id
@@ -260,7 +312,7 @@ def update_message(message: Message) -> Optional[uuid.UUID]:
             message.session_id, message.user_id, message.agent_id,
             message.role, message.text_content, message.message_type,
             raw_payload, tool_calls, tool_outputs,
-            context, system_prompt, updated_at, message.id
+            context, system_prompt, native_messages, updated_at, message.id
         ]
         
         result = execute_query(query, params)
@@ -365,7 +417,7 @@ def get_system_prompt(session_id: Union[uuid.UUID, str]) -> Optional[str]:
         query = """
             SELECT text_content FROM messages 
             WHERE session_id = %s AND role = 'system'
-            ORDER BY created_at DESC
+            ORDER BY message_seq DESC
             LIMIT 1
         """
         
@@ -410,7 +462,7 @@ def list_session_messages(session_id: uuid.UUID, page: int = 1, page_size: int =
         query = f"""
             SELECT * FROM messages 
             WHERE session_id = %s 
-            ORDER BY created_at {sort_direction}
+            ORDER BY message_seq {sort_direction}
             LIMIT %s OFFSET %s
         """
         
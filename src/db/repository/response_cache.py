@@ -0,0 +1,96 @@
+"""LLM response cache repository functions for database operations."""
+
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from src.db.connection import execute_query
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+def get_cached_response(key: str) -> Optional[Dict[str, Any]]:
+    """Get an unexpired cached response and record the hit.
+    
+    Args:
+        key: Cache key (hex SHA-256 of the model request)
+        
+    Returns:
+        The stored response fields, or None if there is no valid entry
+    """
+    try:
+        result = execute_query(
+            """
+            UPDATE llm_response_cache
+            SET hits = hits + 1, last_used_at = NOW()
+            WHERE key = %s AND expires_at > NOW()
+            RETURNING response
+            """,
+            (key,)
+        )
+        return result[0]["response"] if result else None
+    except Exception as e:
+        logger.error(f"Error getting cached response {key}: {str(e)}")
+        return None
+
+
+def set_cached_response(key: str, response: Dict[str, Any], ttl: float) -> bool:
+    """Store a response, replacing any previous entry for the key.
+    
+    Args:
+        key: Cache key (hex SHA-256 of the model request)
+        response: Response fields to store
+        ttl: Seconds the response stays valid
+        
+    Returns:
+        True if the response was stored, False otherwise
+    """
+    try:
+        execute_query(
+            """
+            INSERT INTO llm_response_cache (key, response, created_at, last_used_at, expires_at)
+            VALUES (%s, %s, NOW(), NOW(), NOW() + make_interval(secs => %s))
+            ON CONFLICT (key) DO UPDATE
+            SET response = EXCLUDED.response,
+                last_used_at = NOW(),
+                expires_at = EXCLUDED.expires_at
+            """,
+            (key, json.dumps(response, default=str), ttl),
+            fetch=False
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error storing cached response {key}: {str(e)}")
+        return False
+
+
+def prune_response_cache(max_entries: int) -> int:
+    """Delete expired responses and the least recently used beyond a size limit.
+    
+    Args:
+        max_entries: Number of entries to keep at most
+        
+    Returns:
+        Number of entries deleted
+    """
+    try:
+        expired = execute_query(
+            "DELETE FROM llm_response_cache WHERE expires_at <= NOW() RETURNING key"
+        )
+        excess = execute_query(
+            """
+            DELETE FROM llm_response_cache
+            WHERE key IN (
+                SELECT key FROM llm_response_cache
+                ORDER BY last_used_at DESC
+                OFFSET %s
+            )
+            RETURNING key
+            """,
+            (max_entries,)
+        )
+        return len(expired) + len(excess)
+    except Exception as e:
+        logger.error(f"Error pruning response cache: {str(e)}")
+        return 0
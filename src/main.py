@@ -16,6 +16,14 @@ from src.api.models import HealthResponse
 from src.api.routes import main_router as api_router
 from src.agents.models.agent_factory import AgentFactory
 from src.db import ensure_default_user_exists
+from src.memory.turn_writer import shutdown_turn_writer
+from src.memory.memory_versions import start_memory_change_listener, stop_memory_change_listener
+from src.memory.memory_sweeper import start_memory_sweeper, stop_memory_sweeper
+from src.agents.models.agent_pool import shutdown_agent_pool
+from src.api.job_runner import start_job_runner, stop_job_runner
+from src.utils.metrics import get_metrics
+from src.agents.common.tool_policy import get_tool_stats
+from src.utils.tracing import start_trace_exporter, stop_trace_exporter
 
 # Configure logging
 configure_logging()
@@ -72,8 +80,23 @@ def create_app() -> FastAPI:
     async def lifespan(app: FastAPI):
         # Initialize all agents at startup
         initialize_all_agents()
+        # Invalidate cached memories when other workers change them
+        start_memory_change_listener()
+        # Delete expired memories in the background
+        start_memory_sweeper()
+        # Export run traces, if configured
+        start_trace_exporter()
+        # Run queued agent jobs, including ones left unfinished by a restart
+        await start_job_runner()
         yield
-        # Cleanup can be done here if needed
+        await stop_job_runner()
+        stop_trace_exporter()
+        stop_memory_sweeper()
+        stop_memory_change_listener()
+        # Clean up warm agent instances
+        await shutdown_agent_pool()
+        # Flush any conversation turns still queued for deferred persistence
+        shutdown_turn_writer()
     
     # Create the FastAPI app
     app = FastAPI(
@@ -295,6 +318,10 @@ def setup_routes(app: FastAPI):
             environment=settings.AM_ENV
         )
 
+    @app.get("/metrics", tags=["System"], summary="Metrics", description="Returns runtime metrics of this worker process")
+    async def get_runtime_metrics():
+        return {**get_metrics().snapshot(), "tools": get_tool_stats()}
+
     # Include API router (with versioned prefix)
     app.include_router(api_router, prefix="/api/v1")
 
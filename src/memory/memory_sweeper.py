@@ -0,0 +1,101 @@
+"""Background deletion of expired memories.
+
+Reads already hide memories past their expires_at; the sweeper removes them
+so the table doesn't keep growing with session scratch data. It deletes in
+small batches, pausing between them, so a large backlog never holds locks or
+the connection pool for long.
+"""
+
+import logging
+import threading
+from typing import Optional
+
+from src.config import settings
+from src.utils.metrics import metrics
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+class MemorySweeper(threading.Thread):
+    """Background thread deleting expired memories in batches."""
+
+    def __init__(self, interval: float = 60.0, batch_size: int = 500, batch_pause: float = 0.1):
+        """Initialize the sweeper.
+
+        Args:
+            interval: Seconds between sweeps
+            batch_size: Maximum number of memories deleted per statement
+            batch_pause: Seconds to wait between batches of one sweep
+        """
+        super().__init__(name="memory-sweeper", daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Memory sweeper error: {str(e)}")
+
+    def sweep(self) -> int:
+        """Delete all currently expired memories, one batch at a time.
+
+        Returns:
+            Number of memories deleted
+        """
+        from src.db.repository.memory import delete_expired_memories
+
+        total = 0
+        while not self._stop_event.is_set():
+            deleted = delete_expired_memories(self.batch_size)
+            total += deleted
+            if deleted < self.batch_size:
+                break
+            self._stop_event.wait(self.batch_pause)
+
+        if total:
+            metrics.increment("memories_expired_deleted", total)
+            logger.info(f"Swept {total} expired memories")
+        return total
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop sweeping and wait for the thread to finish."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+# Global sweeper, created on start
+_memory_sweeper: Optional[MemorySweeper] = None
+
+
+def start_memory_sweeper() -> Optional[MemorySweeper]:
+    """Start sweeping expired memories if enabled.
+
+    Returns:
+        The running sweeper, or None if AM_MEMORY_SWEEP_INTERVAL is 0
+    """
+    global _memory_sweeper
+
+    if settings.AM_MEMORY_SWEEP_INTERVAL <= 0:
+        return None
+    if _memory_sweeper is None:
+        _memory_sweeper = MemorySweeper(
+            interval=settings.AM_MEMORY_SWEEP_INTERVAL,
+            batch_size=settings.AM_MEMORY_SWEEP_BATCH_SIZE
+        )
+        _memory_sweeper.start()
+    return _memory_sweeper
+
+
+def stop_memory_sweeper() -> None:
+    """Stop the memory sweeper if it is running."""
+    global _memory_sweeper
+
+    if _memory_sweeper is not None:
+        _memory_sweeper.stop()
+        _memory_sweeper = None
@@ -0,0 +1,253 @@
+"""Versioning and cross-process invalidation for cached memories.
+
+Every (agent_id, user_id) scope has a version number that only ever grows.
+Writes bump the version of the scope they touch, and caches remember the
+version they were filled at: an entry is fresh exactly while its version is
+unchanged, so no cache ever has to be cleared explicitly.
+
+Versions are drawn from one process-wide clock and at most
+AM_MEMORY_CACHE_MAX_SCOPES scopes are tracked. A scope that isn't tracked
+(never written, or evicted as least recently used) reads the highest version
+evicted so far, so its token never goes back to a value seen before a write.
+
+Writes made by this process bump versions directly. Writes made by other
+worker processes arrive through Postgres LISTEN/NOTIFY: a trigger on the
+memories table publishes each change on the ``memory_changes`` channel and
+the MemoryChangeListener thread bumps the matching versions here.
+"""
+
+import json
+import logging
+import select
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from src.config import settings
+from src.utils.lru import LRUDict
+from src.utils.metrics import metrics
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+MEMORY_CHANGES_CHANNEL = "memory_changes"
+
+# Scope key covering the memories of every user of an agent
+ANY_USER = "*"
+
+
+class MemoryVersionRegistry:
+    """Monotonic versions per (agent_id, user_id) memory scope."""
+
+    def __init__(self, require_listener: bool = False):
+        """Initialize the registry.
+
+        Args:
+            require_listener: If True, versions are only trusted while the
+                change listener is connected, since other processes' writes
+                would otherwise go unnoticed
+        """
+        self.require_listener = require_listener
+        self._lock = threading.Lock()
+        self._versions: LRUDict[Tuple[Any, Any], int] = LRUDict(
+            settings.AM_MEMORY_CACHE_MAX_SCOPES, on_evict=self._evicted
+        )
+        # Last version handed out, and highest version of an evicted scope
+        self._clock = 0
+        self._floor = 0
+        self._epoch = 0
+        self._listening = False
+
+    def bump(self, agent_id: Optional[int], user_id: Optional[int]) -> None:
+        """Record a change to the memories of an agent and user.
+
+        Args:
+            agent_id: Agent the changed memory belongs to
+            user_id: User the changed memory belongs to (None for shared memories)
+        """
+        with self._lock:
+            for key in ((agent_id, user_id), (agent_id, ANY_USER)):
+                self._clock += 1
+                self._versions[key] = self._clock
+
+    def _evicted(self, key: Tuple[Any, Any], version: int) -> None:
+        # Called from bump with the lock held
+        self._floor = max(self._floor, version)
+
+    def bump_all(self) -> None:
+        """Invalidate every scope at once, e.g. after missed notifications."""
+        with self._lock:
+            self._epoch += 1
+
+    def token(self, agent_id: Optional[int], user_id: Optional[int]) -> Optional[Tuple[int, int]]:
+        """Get the current version token of a scope.
+
+        A user_id of None means "memories of any user", matching how the
+        repository filters memories.
+
+        Args:
+            agent_id: The agent ID
+            user_id: Optional user ID
+
+        Returns:
+            Version token, or None if cached data can't be trusted right now
+        """
+        key = (agent_id, ANY_USER if user_id is None else user_id)
+        with self._lock:
+            if self.require_listener and not self._listening:
+                return None
+            return (self._epoch, self._versions.get(key, self._floor))
+
+    def set_listening(self, listening: bool) -> None:
+        """Record whether cross-process notifications are being received."""
+        with self._lock:
+            if listening and not self._listening:
+                # Changes made while we were not listening are unknown
+                self._epoch += 1
+            self._listening = listening
+
+
+def notify_memory_change(agent_id: Optional[int], user_id: Optional[int]) -> None:
+    """Bump the local version for a memory written by this process.
+
+    Args:
+        agent_id: Agent the changed memory belongs to
+        user_id: User the changed memory belongs to
+    """
+    get_memory_versions().bump(agent_id, user_id)
+
+
+class MemoryChangeListener(threading.Thread):
+    """Background thread applying memory change notifications from Postgres."""
+
+    def __init__(self, registry: MemoryVersionRegistry, poll_timeout: float = 5.0, retry_delay: float = 5.0):
+        """Initialize the listener.
+
+        Args:
+            registry: Version registry to bump on notifications
+            poll_timeout: Seconds to wait for notifications before checking for shutdown
+            retry_delay: Seconds to wait before reconnecting after an error
+        """
+        super().__init__(name="memory-change-listener", daemon=True)
+        self.registry = registry
+        self.poll_timeout = poll_timeout
+        self.retry_delay = retry_delay
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                self.registry.set_listening(True)
+                logger.info(f"Listening for memory changes on channel {MEMORY_CHANGES_CHANNEL}")
+
+                while not self._stop_event.is_set():
+                    if select.select([connection], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self.handle_payload(connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Memory change listener error: {str(e)}")
+            finally:
+                self.registry.set_listening(False)
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+            self._stop_event.wait(self.retry_delay)
+
+    def handle_payload(self, payload: str) -> None:
+        """Apply one notification payload to the registry.
+
+        Args:
+            payload: JSON payload published by the memories trigger
+        """
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed memory change payload: {payload}")
+            return
+
+        self.registry.bump(change.get("agent_id"), change.get("user_id"))
+        metrics.increment("memory_cache_remote_invalidations")
+
+        # Time between the write and this process learning about it
+        if change.get("ts"):
+            metrics.observe("memory_cache_staleness_seconds", max(0.0, time.time() - float(change["ts"])))
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop listening and wait for the thread to finish."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    @staticmethod
+    def _connect():
+        """Open a dedicated autocommit connection subscribed to the channel."""
+        from src.db.connection import get_db_config
+
+        if settings.DATABASE_URL:
+            connection = psycopg2.connect(settings.DATABASE_URL)
+        else:
+            config = get_db_config()
+            connection = psycopg2.connect(
+                host=config["host"],
+                port=config["port"],
+                user=config["user"],
+                password=config["password"],
+                database=config["database"],
+            )
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {MEMORY_CHANGES_CHANNEL}")
+        return connection
+
+
+# Global registry and listener, created on first use
+_memory_versions: Optional[MemoryVersionRegistry] = None
+_memory_change_listener: Optional[MemoryChangeListener] = None
+
+
+def get_memory_versions() -> MemoryVersionRegistry:
+    """Get the global memory version registry.
+
+    Returns:
+        The global MemoryVersionRegistry instance
+    """
+    global _memory_versions
+
+    if _memory_versions is None:
+        _memory_versions = MemoryVersionRegistry(require_listener=settings.AM_MEMORY_CACHE_LISTEN)
+    return _memory_versions
+
+
+def start_memory_change_listener() -> Optional[MemoryChangeListener]:
+    """Start listening for memory changes from other processes if enabled.
+
+    Returns:
+        The running listener, or None if listening is disabled
+    """
+    global _memory_change_listener
+
+    if not settings.AM_MEMORY_CACHE_LISTEN:
+        return None
+    if _memory_change_listener is None:
+        _memory_change_listener = MemoryChangeListener(get_memory_versions())
+        _memory_change_listener.start()
+    return _memory_change_listener
+
+
+def stop_memory_change_listener() -> None:
+    """Stop the memory change listener if it is running."""
+    global _memory_change_listener
+
+    if _memory_change_listener is not None:
+        _memory_change_listener.stop()
+        _memory_change_listener = None
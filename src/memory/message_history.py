@@ -7,6 +7,7 @@ message history methods.
 
 import logging
 import uuid
+from dataclasses import replace
 from typing import List, Optional, Dict, Any, Union, Tuple
 from datetime import datetime, timezone
 
@@ -19,12 +20,14 @@ from pydantic_ai.messages import (
     UserPromptPart, 
     TextPart,
     ToolCallPart,
-    ToolReturnPart
+    ToolReturnPart,
+    ModelMessagesTypeAdapter
 )
 
 # Import repository functions
 from src.db.repository.message import (
     create_message,
+    create_messages,
     get_message,
     list_messages,
     delete_session_messages,
@@ -38,6 +41,7 @@ from src.db.repository.session import (
     delete_session
 )
 from src.db.models import Message, Session
+from src.memory.turn_writer import get_turn_writer
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -65,6 +69,47 @@ def is_valid_uuid(value: Any) -> bool:
         return False
 
 
+def dump_model_messages(messages: List[ModelMessage]) -> Optional[List[Dict[str, Any]]]:
+    """Serialize pydantic-ai messages to their native JSON-compatible form.
+    
+    Args:
+        messages: List of ModelMessage objects
+        
+    Returns:
+        List of JSON-compatible dictionaries, or None if there is nothing to store
+    """
+    if not messages:
+        return None
+    try:
+        return ModelMessagesTypeAdapter.dump_python(messages, mode="json")
+    except Exception as e:
+        logger.warning(f"Error serializing native messages: {str(e)}")
+        return None
+
+
+def split_native_turn(native_messages: Optional[List[Dict[str, Any]]]) -> Tuple[Optional[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]]:
+    """Split the serialized messages of one agent run into user and assistant payloads.
+    
+    The first message of a run is the user request; everything after it (model
+    responses, tool calls and tool returns) belongs to the assistant row. System
+    prompt parts are dropped from the user request because the system prompt is
+    re-added on every run.
+    
+    Args:
+        native_messages: Serialized messages produced by a single run (result.new_messages())
+        
+    Returns:
+        Tuple of (user payload, assistant payload), either of which may be None
+    """
+    if not native_messages:
+        return None, None
+    
+    request, *rest = native_messages
+    parts = [part for part in request.get("parts", []) if part.get("part_kind") != "system-prompt"]
+    user_payload = [{**request, "parts": parts}] if parts else None
+    return user_payload, (rest or None)
+
+
 class MessageHistory:
     """Maintains a history of messages between the user and the agent.
     
@@ -204,7 +249,8 @@ class MessageHistory:
             # Return a basic system message as fallback
             return ModelRequest(parts=[SystemPromptPart(content=content)])
     
-    def add(self, content: str, agent_id: Optional[int] = None, context: Optional[Dict] = None, channel_payload: Optional[Dict] = None) -> ModelMessage:
+    def add(self, content: str, agent_id: Optional[int] = None, context: Optional[Dict] = None, channel_payload: Optional[Dict] = None,
+            native_messages: Optional[List[Dict[str, Any]]] = None) -> ModelMessage:
         """Add a user message to the history.
         
         Args:
@@ -212,24 +258,13 @@ class MessageHistory:
             agent_id: Optional agent ID associated with the message.
             context: Optional context data to include with the message.
             channel_payload: Optional channel payload to include with the message.
+            native_messages: Optional serialized pydantic-ai messages for this row.
         Returns:
             The created user message.
         """
         try:
             # Create a user message in the database
-            message = Message(
-                id=uuid.uuid4(),
-                session_id=uuid.UUID(self.session_id),
-                user_id=self.user_id,
-                agent_id=agent_id,
-                role="user",
-                text_content=content,
-                message_type="text",
-                context=context,
-                channel_payload=channel_payload,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc)
-            )
+            message = self._build_user_row(content, agent_id, context, channel_payload, native_messages)
             
             # Log before attempting to create message
             logger.info(f"Adding user message to history for session {self.session_id}, user {self.user_id}")
@@ -263,7 +298,8 @@ class MessageHistory:
         tool_calls: Optional[List[Dict]] = None, 
         tool_outputs: Optional[List[Dict]] = None,
         agent_id: Optional[int] = None,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        native_messages: Optional[List[Dict[str, Any]]] = None
     ) -> ModelMessage:
         """Add an assistant response message to the history.
         
@@ -274,90 +310,28 @@ class MessageHistory:
             tool_outputs: Optional list of outputs from tool calls.
             agent_id: Optional agent ID associated with the message.
             system_prompt: Optional system prompt to store directly with the message.
+            native_messages: Optional serialized pydantic-ai messages for this row.
             
         Returns:
             The created assistant response message.
         """
         try:
-            # Prepare tool calls and outputs for storage
-            tool_calls_dict = {}
-            tool_outputs_dict = {}
-            
-            if tool_calls:
-                for i, tc in enumerate(tool_calls):
-                    if isinstance(tc, dict) and "tool_name" in tc:
-                        tool_calls_dict[str(i)] = tc
-            
-            if tool_outputs:
-                for i, to in enumerate(tool_outputs):
-                    if isinstance(to, dict) and "tool_name" in to:
-                        tool_outputs_dict[str(i)] = to
-            
-            # Prepare raw payload
-            raw_payload = {
-                "content": content,
-                "assistant_name": assistant_name,
-                "tool_calls": tool_calls,
-                "tool_outputs": tool_outputs,
-            }
-            
-            # If system_prompt isn't directly provided or is None, try to get it from:
-            # 1. Session metadata
-            # 2. Last system prompt in the message history
-            # 3. Agent configuration (through agent_id)
-            if not system_prompt:
-                try:
-                    # Try to get from session metadata first
-                    session_system_prompt = get_system_prompt(uuid.UUID(self.session_id))
-                    if session_system_prompt:
-                        system_prompt = session_system_prompt
-                        logger.debug(f"Using system prompt from session metadata")
-                    else:
-                        # If not found, try other sources
-                        if agent_id:
-                            # Try to get system prompt from agent configuration
-                            from src.db.repository.agent import get_agent
-                            agent = get_agent(agent_id)
-                            if agent and agent.system_prompt:
-                                system_prompt = agent.system_prompt
-                                logger.debug(f"Using system prompt from agent configuration")
-                except Exception as e:
-                    logger.error(f"Error getting system prompt: {str(e)}")
+            message = self._build_assistant_row(
+                content, assistant_name, tool_calls, tool_outputs, agent_id, system_prompt, native_messages
+            )
             
             # Log message details - reduced logging
-            tool_calls_count = len(tool_calls_dict) if tool_calls_dict else 0
-            tool_outputs_count = len(tool_outputs_dict) if tool_outputs_dict else 0
+            tool_calls_count = len(message.tool_calls) if message.tool_calls else 0
+            tool_outputs_count = len(message.tool_outputs) if message.tool_outputs else 0
             content_length = len(content) if content else 0
             
             # For INFO level, just log basic info
             logger.info(f"Adding assistant response to MessageHistory in the database")
-            logger.info(f"System prompt status: {'Present' if system_prompt else 'Not provided'}")
+            logger.info(f"System prompt status: {'Present' if message.system_prompt else 'Not provided'}")
             
             # For DEBUG level (verbose logging), add more details
             logger.debug(f"Adding assistant response to history for session {self.session_id}, user {self.user_id}")
             logger.debug(f"Assistant response details: tool_calls={tool_calls_count}, tool_outputs={tool_outputs_count}, content_length={content_length}")
-            
-            # Create message in database
-            logger.debug(f"Creating message with parameters: session_id={self.session_id}, role=assistant, user_id={self.user_id}, agent_id={agent_id}, message_type=text, text_length={content_length}")
-            
-            message = Message(
-                id=uuid.uuid4(),
-                session_id=uuid.UUID(self.session_id),
-                user_id=self.user_id,
-                agent_id=agent_id,
-                role="assistant",
-                text_content=content,
-                message_type="text",
-                raw_payload=raw_payload,
-                tool_calls=tool_calls_dict,
-                tool_outputs=tool_outputs_dict,
-                system_prompt=system_prompt,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc)
-            )
-            
-            # Log query only in debug mode
-            logger.debug("Executing message creation query: \n            INSERT INTO messages (\n                id, session_id, user_id, agent_id, role, text_content, \n                message_type, raw_payload, tool_calls, tool_outputs, \n                context, system_prompt, created_at, updated_at\n            ) VALUES (\n                %s, %s, %s, %s, %s, %s, \n                %s, %s, %s, %s, \n                %s, %s, %s, %s\n            )\n            RETURNING id\n         ")
             logger.debug(f"Query parameters: id={message.id}, session_id={self.session_id}, user_id={self.user_id}, agent_id={agent_id}")
             
             # Create the message in the database
@@ -371,35 +345,8 @@ class MessageHistory:
                 logger.info(f"Successfully created message {message_id} for session {self.session_id}")
                 logger.debug(f"Successfully added assistant message {message_id} to history for session {self.session_id}")
             
-            # Create parts for PydanticAI message
-            parts = [TextPart(content=content)]
-            
-            # Add tool call parts
-            if tool_calls:
-                for tc in tool_calls:
-                    if isinstance(tc, dict) and "tool_name" in tc and "args" in tc:
-                        parts.append(
-                            ToolCallPart(
-                                tool_name=tc["tool_name"],
-                                args=tc["args"],
-                                tool_call_id=tc.get("tool_call_id", "")
-                            )
-                        )
-            
-            # Add tool output parts
-            if tool_outputs:
-                for to in tool_outputs:
-                    if isinstance(to, dict) and "tool_name" in to and "content" in to:
-                        parts.append(
-                            ToolReturnPart(
-                                tool_name=to["tool_name"],
-                                content=to["content"],
-                                tool_call_id=to.get("tool_call_id", "")
-                            )
-                        )
-            
             # Create and return PydanticAI message
-            return ModelResponse(parts=parts)
+            return self._build_model_response(content, tool_calls, tool_outputs)
         except Exception as e:
             import traceback
             logger.error(f"Exception adding assistant message: {str(e)}")
@@ -409,6 +356,242 @@ class MessageHistory:
             # Return a basic assistant message as fallback to maintain backward compatibility
             return ModelResponse(parts=[TextPart(content=content)])
     
+    def add_turn(self, messages: List[Dict[str, Any]]) -> List[ModelMessage]:
+        """Add all messages of a conversation turn in a single database round trip.
+        
+        Each dictionary uses the same keys as add_message. Messages are stored
+        in list order, which is also the order they are read back in.
+        
+        Args:
+            messages: Message dictionaries in conversation order (e.g. user, then assistant)
+            
+        Returns:
+            The created ModelMessage objects, in the same order
+        """
+        rows = []
+        model_messages = []
+        
+        try:
+            for message in messages:
+                role = message.get("role", "")
+                content = message.get("content", "")
+                agent_id = message.get("agent_id")
+                
+                if role == "assistant":
+                    tool_calls = message.get("tool_calls", [])
+                    tool_outputs = message.get("tool_outputs", [])
+                    rows.append(self._build_assistant_row(
+                        content,
+                        tool_calls=tool_calls,
+                        tool_outputs=tool_outputs,
+                        agent_id=agent_id,
+                        system_prompt=message.get("system_prompt", None),
+                        native_messages=message.get("native_messages", None),
+                        context=message.get("context", None)
+                    ))
+                    model_messages.append(self._build_model_response(content, tool_calls, tool_outputs))
+                else:
+                    if role != "user":
+                        logger.warning(f"Unknown message role: {role}")
+                    rows.append(self._build_user_row(
+                        content,
+                        agent_id=agent_id,
+                        channel_payload=message.get("channel_payload", None),
+                        native_messages=message.get("native_messages", None)
+                    ))
+                    model_messages.append(ModelRequest(parts=[UserPromptPart(content=content)]))
+            
+            # Hand the turn to the background writer when deferred persistence is on
+            writer = get_turn_writer()
+            if writer:
+                writer.enqueue_messages(rows)
+                logger.info(f"Queued turn with {len(rows)} messages for session {self.session_id}, user {self.user_id}")
+                return model_messages
+            
+            logger.info(f"Adding turn with {len(rows)} messages to history for session {self.session_id}, user {self.user_id}")
+            message_ids = create_messages(rows)
+            
+            if len(message_ids) != len(rows):
+                # Don't raise exception to maintain backward compatibility, but log the error
+                logger.error(f"Failed to create turn messages in database: session_id={self.session_id}, user_id={self.user_id}, expected={len(rows)}, created={len(message_ids)}")
+            else:
+                logger.info(f"Successfully added {len(message_ids)} turn messages to history for session {self.session_id}")
+        except Exception as e:
+            import traceback
+            logger.error(f"Exception adding turn messages: {str(e)}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+        
+        return model_messages
+    
+    def _build_user_row(
+        self,
+        content: str,
+        agent_id: Optional[int] = None,
+        context: Optional[Dict] = None,
+        channel_payload: Optional[Dict] = None,
+        native_messages: Optional[List[Dict[str, Any]]] = None
+    ) -> Message:
+        """Build the database row for a user message.
+        
+        Args:
+            content: The message content.
+            agent_id: Optional agent ID associated with the message.
+            context: Optional context data to include with the message.
+            channel_payload: Optional channel payload to include with the message.
+            native_messages: Optional serialized pydantic-ai messages for this row.
+            
+        Returns:
+            Message object ready to be inserted
+        """
+        return Message(
+            id=uuid.uuid4(),
+            session_id=uuid.UUID(self.session_id),
+            user_id=self.user_id,
+            agent_id=agent_id,
+            role="user",
+            text_content=content,
+            message_type="text",
+            context=context,
+            channel_payload=channel_payload,
+            native_messages=native_messages,
+            created_at=datetime.now(timezone.utc),
+            updated_at=datetime.now(timezone.utc)
+        )
+    
+    def _build_assistant_row(
+        self,
+        content: str,
+        assistant_name: Optional[str] = None,
+        tool_calls: Optional[List[Dict]] = None,
+        tool_outputs: Optional[List[Dict]] = None,
+        agent_id: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+        native_messages: Optional[List[Dict[str, Any]]] = None,
+        context: Optional[Dict[str, Any]] = None
+    ) -> Message:
+        """Build the database row for an assistant response.
+        
+        Args:
+            content: The text content of the assistant's response.
+            assistant_name: Optional name of the assistant.
+            tool_calls: Optional list of tool calls made during processing.
+            tool_outputs: Optional list of outputs from tool calls.
+            agent_id: Optional agent ID associated with the message.
+            system_prompt: Optional system prompt to store directly with the message.
+            native_messages: Optional serialized pydantic-ai messages for this row.
+            context: Optional per-run context stored with the message.
+            
+        Returns:
+            Message object ready to be inserted
+        """
+        # Prepare tool calls and outputs for storage
+        tool_calls_dict = {}
+        tool_outputs_dict = {}
+        
+        if tool_calls:
+            for i, tc in enumerate(tool_calls):
+                if isinstance(tc, dict) and "tool_name" in tc:
+                    tool_calls_dict[str(i)] = tc
+        
+        if tool_outputs:
+            for i, to in enumerate(tool_outputs):
+                if isinstance(to, dict) and "tool_name" in to:
+                    tool_outputs_dict[str(i)] = to
+        
+        # Prepare raw payload
+        raw_payload = {
+            "content": content,
+            "assistant_name": assistant_name,
+            "tool_calls": tool_calls,
+            "tool_outputs": tool_outputs,
+        }
+        
+        # If system_prompt isn't directly provided or is None, try to get it from:
+        # 1. Session metadata
+        # 2. Last system prompt in the message history
+        # 3. Agent configuration (through agent_id)
+        if not system_prompt:
+            try:
+                # Try to get from session metadata first
+                session_system_prompt = get_system_prompt(uuid.UUID(self.session_id))
+                if session_system_prompt:
+                    system_prompt = session_system_prompt
+                    logger.debug(f"Using system prompt from session metadata")
+                else:
+                    # If not found, try other sources
+                    if agent_id:
+                        # Try to get system prompt from agent configuration
+                        from src.db.repository.agent import get_agent
+                        agent = get_agent(agent_id)
+                        if agent and agent.system_prompt:
+                            system_prompt = agent.system_prompt
+                            logger.debug(f"Using system prompt from agent configuration")
+            except Exception as e:
+                logger.error(f"Error getting system prompt: {str(e)}")
+        
+        return Message(
+            id=uuid.uuid4(),
+            session_id=uuid.UUID(self.session_id),
+            user_id=self.user_id,
+            agent_id=agent_id,
+            role="assistant",
+            text_content=content,
+            message_type="text",
+            raw_payload=raw_payload,
+            tool_calls=tool_calls_dict,
+            tool_outputs=tool_outputs_dict,
+            system_prompt=system_prompt,
+            context=context,
+            native_messages=native_messages,
+            created_at=datetime.now(timezone.utc),
+            updated_at=datetime.now(timezone.utc)
+        )
+    
+    def _build_model_response(
+        self,
+        content: str,
+        tool_calls: Optional[List[Dict]] = None,
+        tool_outputs: Optional[List[Dict]] = None
+    ) -> ModelResponse:
+        """Build the PydanticAI message returned for an assistant response.
+        
+        Args:
+            content: The text content of the assistant's response.
+            tool_calls: Optional list of tool calls made during processing.
+            tool_outputs: Optional list of outputs from tool calls.
+            
+        Returns:
+            PydanticAI ModelResponse
+        """
+        # Create parts for PydanticAI message
+        parts = [TextPart(content=content)]
+        
+        # Add tool call parts
+        if tool_calls:
+            for tc in tool_calls:
+                if isinstance(tc, dict) and "tool_name" in tc and "args" in tc:
+                    parts.append(
+                        ToolCallPart(
+                            tool_name=tc["tool_name"],
+                            args=tc["args"],
+                            tool_call_id=tc.get("tool_call_id", "")
+                        )
+                    )
+        
+        # Add tool output parts
+        if tool_outputs:
+            for to in tool_outputs:
+                if isinstance(to, dict) and "tool_name" in to and "content" in to:
+                    parts.append(
+                        ToolReturnPart(
+                            tool_name=to["tool_name"],
+                            content=to["content"],
+                            tool_call_id=to.get("tool_call_id", "")
+                        )
+                    )
+        
+        return ModelResponse(parts=parts)
+    
     def clear(self) -> None:
         """Clear all messages in the current session."""
         try:
@@ -435,7 +618,12 @@ class MessageHistory:
             
             if role == "user":
                 # Handle user message
-                return self.add(content, agent_id=agent_id, channel_payload=message.get("channel_payload", None))
+                return self.add(
+                    content,
+                    agent_id=agent_id,
+                    channel_payload=message.get("channel_payload", None),
+                    native_messages=message.get("native_messages", None)
+                )
             elif role == "assistant":
                 # Handle assistant message with potential tool calls and outputs
                 tool_calls = message.get("tool_calls", [])
@@ -445,7 +633,8 @@ class MessageHistory:
                     tool_calls=tool_calls, 
                     tool_outputs=tool_outputs,
                     agent_id=agent_id,
-                    system_prompt=message.get("system_prompt", None)
+                    system_prompt=message.get("system_prompt", None),
+                    native_messages=message.get("native_messages", None)
                 )
             else:
                 logger.warning(f"Unknown message role: {role}")
@@ -474,7 +663,10 @@ class MessageHistory:
             # Get all messages from the database
             logger.debug(f"Retrieving all messages for session {self.session_id}")
             # IMPORTANT: Use sort_desc=False to get messages in chronological order (oldest first)
-            db_messages = list_messages(uuid.UUID(self.session_id), sort_desc=False)
+            pending = self._pending_messages()
+            db_messages = self._with_pending_messages(
+                list_messages(uuid.UUID(self.session_id), sort_desc=False), pending
+            )
             
             # Convert to PydanticAI format - only log detailed info in debug mode
             messages = self._convert_db_messages_to_model_messages(db_messages)
@@ -538,6 +730,9 @@ class MessageHistory:
             List of PydanticAI ModelMessage objects
         """
         try:
+            # Snapshot uncommitted turns before querying, so none fall in between
+            pending = self._pending_messages()
+            
             # Get the last N messages from the database (most recent first)
             logger.debug(f"Retrieving latest {limit} messages for session {self.session_id}")
             db_messages = list_messages(
@@ -550,6 +745,9 @@ class MessageHistory:
             # This is important for proper context in conversation
             db_messages.reverse()
             
+            # Include turns still queued in the background writer
+            db_messages = self._with_pending_messages(db_messages, pending, limit)
+            
             # Convert to PydanticAI format
             messages = self._convert_db_messages_to_model_messages(db_messages)
             logger.debug(f"Retrieved and converted {len(messages)} messages for session {self.session_id}")
@@ -689,11 +887,52 @@ class MessageHistory:
         """
         return self.all_messages_json()
     
+    def _pending_messages(self) -> List[Message]:
+        """Snapshot the rows queued for this session but not yet committed.
+        
+        Take the snapshot before querying the database: a row committed in
+        between is then in the query result, the snapshot or both, never in
+        neither.
+        
+        Returns:
+            Pending messages in conversation order
+        """
+        writer = get_turn_writer()
+        if not writer:
+            return []
+        return writer.pending_messages(self.session_id)
+    
+    def _with_pending_messages(self, db_messages: List[Message], pending: List[Message],
+                               limit: Optional[int] = None) -> List[Message]:
+        """Append pending rows to committed ones, dropping rows present in both.
+        
+        Args:
+            db_messages: Committed messages in chronological order
+            pending: Pending rows snapshotted before the database query
+            limit: Optional maximum number of (most recent) messages to keep
+            
+        Returns:
+            Messages in chronological order, including pending ones
+        """
+        if not pending:
+            return db_messages
+        
+        committed_ids = {message.id for message in db_messages}
+        merged = db_messages + [message for message in pending if message.id not in committed_ids]
+        
+        if limit is not None and len(merged) > limit:
+            merged = merged[-limit:]
+        return merged
+    
     # Helper methods for converting between database and PydanticAI models
     
     def _convert_db_messages_to_model_messages(self, db_messages: List[Message], include_tools: bool = False) -> List[ModelMessage]:
         """Convert database messages to PydanticAI ModelMessage objects.
         
+        Rows that carry a native pydantic-ai payload are decoded together in a
+        single ModelMessagesTypeAdapter call; legacy rows without one are rebuilt
+        from their text and tool columns.
+        
         Args:
             db_messages: List of database Message objects
             include_tools: Whether to include tool calls and tool outputs (default: False)
@@ -701,56 +940,112 @@ class MessageHistory:
         Returns:
             List of PydanticAI ModelMessage objects
         """
-        model_messages = []
+        # Collect all native payloads so they can be validated in one batch
+        native_batch = []
+        native_spans = {}
+        for index, db_message in enumerate(db_messages):
+            payload = db_message.native_messages
+            if payload:
+                native_spans[index] = (len(native_batch), len(native_batch) + len(payload))
+                native_batch.extend(payload)
         
-        for db_message in db_messages:
-            # Convert database message to ModelMessage
-            if db_message.role == "system":
-                # Create system message
-                model_messages.append(
-                    ModelRequest(parts=[SystemPromptPart(content=db_message.text_content or "")])
-                )
-            elif db_message.role == "user":
-                # Create user message
-                model_messages.append(
-                    ModelRequest(parts=[UserPromptPart(content=db_message.text_content or "")])
-                )
-            elif db_message.role == "assistant":
-                # Create assistant message with potential tool calls and outputs
-                parts = [TextPart(content=db_message.text_content or "")]
-                
-                # Add tool calls if present and include_tools is True
-                if include_tools and db_message.tool_calls:
-                    tool_calls = db_message.tool_calls
-                    if isinstance(tool_calls, dict):
-                        for tc in tool_calls.values():
-                            if isinstance(tc, dict) and "tool_name" in tc and "args" in tc:
-                                parts.append(
-                                    ToolCallPart(
-                                        tool_name=tc["tool_name"],
-                                        args=tc["args"],
-                                        tool_call_id=tc.get("tool_call_id", "")
-                                    )
-                                )
-                
-                # Add tool outputs if present and include_tools is True
-                if include_tools and db_message.tool_outputs:
-                    tool_outputs = db_message.tool_outputs
-                    if isinstance(tool_outputs, dict):
-                        for to in tool_outputs.values():
-                            if isinstance(to, dict) and "tool_name" in to and "content" in to:
-                                parts.append(
-                                    ToolReturnPart(
-                                        tool_name=to["tool_name"],
-                                        content=to["content"],
-                                        tool_call_id=to.get("tool_call_id", "")
-                                    )
-                                )
-                
-                # Create and add assistant message
-                model_messages.append(ModelResponse(parts=parts))
+        native_messages = []
+        if native_batch:
+            try:
+                native_messages = ModelMessagesTypeAdapter.validate_python(native_batch)
+            except Exception as e:
+                logger.warning(f"Error decoding native messages, falling back to reconstruction: {str(e)}")
+                native_spans = {}
+        
+        model_messages = []
+        for index, db_message in enumerate(db_messages):
+            span = native_spans.get(index)
+            if span:
+                decoded = native_messages[span[0]:span[1]]
+                if not include_tools:
+                    decoded = self._without_tool_parts(decoded)
+                model_messages.extend(decoded)
+                continue
+            
+            legacy_message = self._convert_legacy_db_message(db_message, include_tools)
+            if legacy_message:
+                model_messages.append(legacy_message)
         
         return model_messages
+    
+    @staticmethod
+    def _without_tool_parts(messages: List[ModelMessage]) -> List[ModelMessage]:
+        """Drop tool calls and tool returns from decoded messages.
+        
+        Messages left without parts (a response that only called tools, the
+        request carrying their returns) are dropped entirely.
+        
+        Args:
+            messages: Decoded PydanticAI messages
+            
+        Returns:
+            The messages without tool parts
+        """
+        stripped = []
+        for message in messages:
+            parts = [part for part in message.parts if not isinstance(part, (ToolCallPart, ToolReturnPart))]
+            if len(parts) == len(message.parts):
+                stripped.append(message)
+            elif parts:
+                stripped.append(replace(message, parts=parts))
+        return stripped
+    
+    def _convert_legacy_db_message(self, db_message: Message, include_tools: bool = False) -> Optional[ModelMessage]:
+        """Rebuild a PydanticAI message from a row stored without a native payload.
+        
+        Args:
+            db_message: Database Message object
+            include_tools: Whether to include tool calls and tool outputs (default: False)
+            
+        Returns:
+            PydanticAI ModelMessage, or None for unknown roles
+        """
+        if db_message.role == "system":
+            return ModelRequest(parts=[SystemPromptPart(content=db_message.text_content or "")])
+        
+        if db_message.role == "user":
+            return ModelRequest(parts=[UserPromptPart(content=db_message.text_content or "")])
+        
+        if db_message.role != "assistant":
+            return None
+        
+        # Create assistant message with potential tool calls and outputs
+        parts = [TextPart(content=db_message.text_content or "")]
+        
+        # Add tool calls if present and include_tools is True
+        if include_tools and db_message.tool_calls:
+            tool_calls = db_message.tool_calls
+            if isinstance(tool_calls, dict):
+                for tc in tool_calls.values():
+                    if isinstance(tc, dict) and "tool_name" in tc and "args" in tc:
+                        parts.append(
+                            ToolCallPart(
+                                tool_name=tc["tool_name"],
+                                args=tc["args"],
+                                tool_call_id=tc.get("tool_call_id", "")
+                            )
+                        )
+        
+        # Add tool outputs if present and include_tools is True
+        if include_tools and db_message.tool_outputs:
+            tool_outputs = db_message.tool_outputs
+            if isinstance(tool_outputs, dict):
+                for to in tool_outputs.values():
+                    if isinstance(to, dict) and "tool_name" in to and "content" in to:
+                        parts.append(
+                            ToolReturnPart(
+                                tool_name=to["tool_name"],
+                                content=to["content"],
+                                tool_call_id=to.get("tool_call_id", "")
+                            )
+                        )
+        
+        return ModelResponse(parts=parts)
 
     def get_session_info(self) -> Optional[Dict[str, Any]]:
         """Get information about the current session.
@@ -0,0 +1,88 @@
+"""Cached access to precomputed system prompt memory bundles.
+
+The memory_prompt_bundles table holds, per (agent_id, user_id), a map of the
+names and contents of all system prompt memories. Triggers on the memories
+table rebuild a bundle whenever one of its memories changes, so filling a
+system prompt takes one primary-key read. Bundles read here are kept in
+process until the scope's memory version changes, so a warm prompt fill
+takes no query at all. At most AM_MEMORY_CACHE_MAX_SCOPES bundles are kept;
+the least recently used are evicted.
+"""
+
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import settings
+from src.memory.memory_versions import get_memory_versions
+from src.utils.lru import LRUDict
+from src.utils.metrics import metrics
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+class PromptBundleCache:
+    """In-process cache of memory prompt bundles validated by memory versions."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Bundles kept before the least recently used is evicted
+                (defaults to AM_MEMORY_CACHE_MAX_SCOPES)
+        """
+        if max_entries is None:
+            max_entries = settings.AM_MEMORY_CACHE_MAX_SCOPES
+        self._entries: LRUDict[Tuple[int, Optional[int]], Tuple[Any, Dict[str, Any]]] = LRUDict(max_entries)
+
+    def get(self, agent_id: int, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get the system prompt memories of an agent and user.
+
+        Args:
+            agent_id: The agent ID
+            user_id: Optional user ID (None reads the agent's shared memories)
+
+        Returns:
+            Memory contents by name, or None if no bundle exists yet
+        """
+        from src.db.repository.memory import get_memory_prompt_bundle
+
+        scope = (agent_id, user_id)
+        # Read before loading, so writes racing with the load invalidate the entry
+        token = get_memory_versions().token(agent_id, user_id)
+
+        entry = self._entries.get(scope)
+        if entry is not None and token is not None and entry[0] == token:
+            metrics.increment("memory_prompt_bundle_cache_hits")
+            return entry[1]
+
+        bundle = get_memory_prompt_bundle(agent_id, user_id)
+        metrics.increment("memory_prompt_bundle_reads")
+        if bundle is None:
+            return None
+
+        if token is not None:
+            self._entries[scope] = (token, bundle.memories)
+        logger.debug(f"Loaded memory prompt bundle v{bundle.version} for agent {agent_id}, user {user_id}")
+        return bundle.memories
+
+    def clear(self) -> None:
+        """Drop all cached bundles."""
+        self._entries.clear()
+
+
+# Global bundle cache, created on first use
+_prompt_bundle_cache: Optional[PromptBundleCache] = None
+
+
+def get_prompt_bundle_cache() -> PromptBundleCache:
+    """Get the global memory prompt bundle cache.
+
+    Returns:
+        The global PromptBundleCache instance
+    """
+    global _prompt_bundle_cache
+
+    if _prompt_bundle_cache is None:
+        _prompt_bundle_cache = PromptBundleCache()
+    return _prompt_bundle_cache
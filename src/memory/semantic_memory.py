@@ -0,0 +1,464 @@
+"""Semantic retrieval over stored memories.
+
+Memories are embedded when agents write them, and the embeddings are kept in
+the memories table. For searching, each (agent_id, user_id) scope gets an
+in-process vector index that is loaded once and then updated incrementally:
+when the scope's memory version changes, the IDs and updated_at of the
+scope's rows are listed, only rows whose updated_at differs from the indexed
+copy are re-read with their embeddings, and rows that disappeared are
+dropped. Rows without an embedding (written through other paths or by a
+different embedder) are embedded in one batch during that refresh. The
+least recently used indexes are evicted past AM_MEMORY_CACHE_MAX_SCOPES.
+
+The index uses a NumPy matrix when NumPy is installed and falls back to plain
+Python lists otherwise. Embedders are pluggable: ``openai`` calls the OpenAI
+embeddings API and ``hashing`` is a deterministic offline stand-in.
+"""
+
+import hashlib
+import logging
+import math
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.memory.memory_versions import get_memory_versions
+from src.utils.lru import LRUDict
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Scopes share this many locks, so the lock table stays bounded as scopes come and go
+_SCOPE_LOCK_STRIPES = 64
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0:
+        return list(vector)
+    return [value / norm for value in vector]
+
+
+def memory_text(name: str, content: Any) -> str:
+    """Get the text embedded for a memory."""
+    return f"{name}: {content}"
+
+
+class Embedder:
+    """Base class for embedders turning texts into normalized vectors."""
+
+    name: str = "embedder"
+    dimensions: int = 0
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One L2-normalized vector per text
+        """
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic bag-of-words embedder using the hashing trick.
+
+    It needs no network access or model, which makes it suitable for tests
+    and offline deployments; similarity is purely lexical.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        """Initialize the embedder.
+
+        Args:
+            dimensions: Number of hash buckets
+        """
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimensions
+            for token in _TOKEN_PATTERN.findall(text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vector[bucket] += sign
+            vectors.append(_normalize(vector))
+        return vectors
+
+
+class OpenAIEmbedder(Embedder):
+    """Embedder backed by the OpenAI embeddings API."""
+
+    def __init__(self, model: str = "text-embedding-3-small"):
+        """Initialize the embedder.
+
+        Args:
+            model: OpenAI embedding model name
+        """
+        self.model = model
+        self.name = f"openai:{model}"
+        self._client = None
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=settings.OPENAI_API_KEY)
+
+        response = self._client.embeddings.create(model=self.model, input=texts)
+        vectors = [_normalize(item.embedding) for item in sorted(response.data, key=lambda item: item.index)]
+        if vectors:
+            self.dimensions = len(vectors[0])
+        return vectors
+
+
+def create_embedder(kind: Optional[str] = None) -> Embedder:
+    """Create the embedder configured in settings.
+
+    Args:
+        kind: Optional embedder name overriding AM_EMBEDDER ("openai" or "hashing")
+
+    Returns:
+        The embedder
+    """
+    kind = kind or settings.AM_EMBEDDER
+    if kind == "hashing":
+        return HashingEmbedder()
+    if kind == "openai":
+        return OpenAIEmbedder(settings.AM_EMBEDDING_MODEL)
+    raise ValueError(f"Unknown embedder: {kind}")
+
+
+@dataclass
+class MemorySearchResult:
+    """A memory returned by a semantic search."""
+    memory_id: str
+    name: str
+    content: Any
+    score: float
+
+
+class MemoryVectorIndex:
+    """Vector index over the memories of one (agent_id, user_id) scope."""
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._entries: List[Tuple[str, Any]] = []
+        self._versions: Dict[str, Any] = {}
+        self._vectors: Any = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def version_of(self, memory_id: str) -> Any:
+        """Get the version (updated_at) the index holds for a memory."""
+        return self._versions.get(memory_id)
+
+    def memory_ids(self) -> List[str]:
+        """Get the IDs of all indexed memories."""
+        return list(self._ids)
+
+    def upsert(self, memory_id: str, name: str, content: Any, vector: List[float], version: Any = None) -> None:
+        """Add or replace one memory's vector.
+
+        Args:
+            memory_id: Memory ID
+            name: Memory name
+            content: Memory content
+            vector: Normalized embedding
+            version: Optional version marker (e.g. updated_at) for incremental refreshes
+        """
+        row = self._rows.get(memory_id)
+        if row is None:
+            row = self._size
+            self._append_row(vector)
+            self._ids.append(memory_id)
+            self._entries.append((name, content))
+            self._rows[memory_id] = row
+            self._size += 1
+        else:
+            self._set_row(row, vector)
+            self._entries[row] = (name, content)
+        self._versions[memory_id] = version
+
+    def remove(self, memory_id: str) -> None:
+        """Remove a memory by moving the last row into its place.
+
+        Args:
+            memory_id: Memory ID
+        """
+        row = self._rows.pop(memory_id, None)
+        self._versions.pop(memory_id, None)
+        if row is None:
+            return
+
+        last = self._size - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._ids[row] = moved_id
+            self._entries[row] = self._entries[last]
+            self._set_row(row, self._get_row(last))
+            self._rows[moved_id] = row
+
+        self._ids.pop()
+        self._entries.pop()
+        if NUMPY_AVAILABLE:
+            self._vectors[last] = 0
+        else:
+            self._vectors.pop()
+        self._size -= 1
+
+    def search(self, vector: List[float], k: int) -> List[MemorySearchResult]:
+        """Find the k memories most similar to a normalized query vector.
+
+        Args:
+            vector: Normalized query embedding
+            k: Maximum number of results
+
+        Returns:
+            Results ordered by decreasing cosine similarity
+        """
+        if not self._size or k <= 0:
+            return []
+
+        k = min(k, self._size)
+        if NUMPY_AVAILABLE:
+            query = np.asarray(vector, dtype=np.float32)
+            if query.shape[0] != self._vectors.shape[1]:
+                return []
+            scores = self._vectors[:self._size] @ query
+            top = np.argpartition(-scores, k - 1)[:k]
+            ranked = sorted(((float(scores[row]), int(row)) for row in top), reverse=True)
+        else:
+            ranked = sorted(
+                ((sum(a * b for a, b in zip(row_vector, vector)), row) for row, row_vector in enumerate(self._vectors)),
+                reverse=True
+            )[:k]
+
+        results = []
+        for score, row in ranked:
+            name, content = self._entries[row]
+            results.append(MemorySearchResult(memory_id=self._ids[row], name=name, content=content, score=score))
+        return results
+
+    def _append_row(self, vector: List[float]) -> None:
+        if not NUMPY_AVAILABLE:
+            if self._vectors is None:
+                self._vectors = []
+            self._vectors.append(list(vector))
+            return
+
+        if self._vectors is None:
+            self._vectors = np.zeros((16, len(vector)), dtype=np.float32)
+        elif self._size == self._vectors.shape[0]:
+            # Grow geometrically so appends stay amortized O(1)
+            grown = np.zeros((self._vectors.shape[0] * 2, self._vectors.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+        self._vectors[self._size] = vector
+
+    def _set_row(self, row: int, vector: Any) -> None:
+        if NUMPY_AVAILABLE:
+            self._vectors[row] = vector
+        else:
+            self._vectors[row] = list(vector)
+
+    def _get_row(self, row: int) -> Any:
+        if NUMPY_AVAILABLE:
+            return self._vectors[row].copy()
+        return self._vectors[row]
+
+
+class SemanticMemory:
+    """Keeps a vector index per memory scope in sync with the memories table."""
+
+    def __init__(self, embedder: Embedder):
+        """Initialize semantic memory.
+
+        Args:
+            embedder: Embedder used for memories and queries
+        """
+        self.embedder = embedder
+        self._scope_locks = [threading.Lock() for _ in range(_SCOPE_LOCK_STRIPES)]
+        self._indexes: LRUDict[Tuple[int, Optional[int]], Tuple[MemoryVectorIndex, Any]] = LRUDict(
+            settings.AM_MEMORY_CACHE_MAX_SCOPES
+        )
+
+    def search(self, agent_id: int, user_id: Optional[int], query: str, k: Optional[int] = None) -> List[MemorySearchResult]:
+        """Find the memories of a scope most relevant to a query.
+
+        Args:
+            agent_id: The agent ID
+            user_id: Optional user ID (None searches memories of any user)
+            query: Text to search for
+            k: Maximum number of results (defaults to AM_SEMANTIC_MEMORY_TOP_K)
+
+        Returns:
+            Results ordered by decreasing relevance
+        """
+        if not query or not agent_id:
+            return []
+
+        k = k or settings.AM_SEMANTIC_MEMORY_TOP_K
+        scope = (agent_id, user_id)
+        index = self._get_index(agent_id, user_id)
+        if not len(index):
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        # Writers update the index from worker threads; don't search a half-applied change
+        with self._scope_lock(scope):
+            return index.search(query_vector, k)
+
+    def index_memory(self, memory_id: Any, agent_id: int, user_id: Optional[int], name: str, content: Any) -> bool:
+        """Embed a memory that was just written and store its embedding.
+
+        Args:
+            memory_id: ID of the written memory
+            agent_id: Agent the memory belongs to
+            user_id: User the memory belongs to
+            name: Memory name
+            content: Memory content
+
+        Returns:
+            True if the embedding was stored
+        """
+        from src.db.repository.memory import update_memory_embeddings
+
+        if not memory_id:
+            return False
+
+        vector = self.embedder.embed([memory_text(name, content)])[0]
+        stored = update_memory_embeddings([(memory_id, vector)], self.embedder.name)
+
+        # Add the vector to loaded indexes right away so searches in the same
+        # turn already find it; their next refresh picks up the stored row
+        for scope in ((agent_id, user_id), (agent_id, None)):
+            entry = self._indexes.get(scope)
+            if entry is not None:
+                index = entry[0]
+                with self._scope_lock(scope):
+                    index.upsert(str(memory_id), name, content, vector, index.version_of(str(memory_id)))
+        return stored
+
+    def _scope_lock(self, scope: Tuple[int, Optional[int]]) -> threading.Lock:
+        return self._scope_locks[hash(scope) % _SCOPE_LOCK_STRIPES]
+
+    def _get_index(self, agent_id: int, user_id: Optional[int]) -> MemoryVectorIndex:
+        """Get a scope's index, refreshing it if the scope's memories changed."""
+        scope = (agent_id, user_id)
+        token = get_memory_versions().token(agent_id, user_id)
+
+        # Scopes refresh independently, so a slow embedding call only blocks its own lock stripe
+        with self._scope_lock(scope):
+            entry = self._indexes.get(scope)
+            if entry is not None and token is not None and entry[1] == token:
+                return entry[0]
+            index = entry[0] if entry is not None else MemoryVectorIndex()
+
+            self._refresh(index, agent_id, user_id, full=entry is None)
+            self._indexes[scope] = (index, token)
+            return index
+
+    def _refresh(self, index: MemoryVectorIndex, agent_id: int, user_id: Optional[int], full: bool = False) -> None:
+        """Apply changed, new and deleted rows of a scope to its index.
+
+        Args:
+            index: The scope's index
+            agent_id: The agent ID
+            user_id: Optional user ID
+            full: Load every row at once (for a new index) instead of listing versions first
+        """
+        from src.db.repository.memory import (
+            list_memory_embeddings,
+            list_memory_versions,
+            update_memory_embeddings,
+        )
+
+        if full:
+            rows = list_memory_embeddings(agent_id, user_id)
+            seen = {str(row["id"]) for row in rows}
+        else:
+            versions = list_memory_versions(agent_id, user_id)
+            seen = {str(row["id"]) for row in versions}
+            changed = [
+                row["id"] for row in versions
+                if index.version_of(str(row["id"])) is None or index.version_of(str(row["id"])) != row.get("updated_at")
+            ]
+            rows = list_memory_embeddings(agent_id, user_id, memory_ids=changed) if changed else []
+
+        to_embed = []
+        for row in rows:
+            memory_id = str(row["id"])
+            if index.version_of(memory_id) is not None and index.version_of(memory_id) == row.get("updated_at"):
+                continue
+
+            embedding = row.get("embedding")
+            if embedding and row.get("embedding_model") == self.embedder.name:
+                index.upsert(memory_id, row["name"], row["content"], embedding, row.get("updated_at"))
+            else:
+                to_embed.append(row)
+
+        if to_embed:
+            vectors = self.embedder.embed([memory_text(row["name"], row["content"]) for row in to_embed])
+            for row, vector in zip(to_embed, vectors):
+                index.upsert(str(row["id"]), row["name"], row["content"], vector, row.get("updated_at"))
+            update_memory_embeddings([(row["id"], vector) for row, vector in zip(to_embed, vectors)], self.embedder.name)
+            logger.info(f"Embedded {len(to_embed)} memories for agent {agent_id}, user {user_id}")
+
+        for memory_id in index.memory_ids():
+            if memory_id not in seen:
+                index.remove(memory_id)
+
+
+def format_relevant_memories(results: List[MemorySearchResult]) -> str:
+    """Format search results for a system prompt or tool response.
+
+    Args:
+        results: Search results
+
+    Returns:
+        One "- name: content" line per memory, or "None" if there are no results
+    """
+    if not results:
+        return "None"
+    return "\n".join(f"- {result.name}: {result.content}" for result in results)
+
+
+# Global semantic memory, created on first use
+_semantic_memory: Optional[SemanticMemory] = None
+
+
+def get_semantic_memory() -> Optional[SemanticMemory]:
+    """Get the global semantic memory if it is enabled.
+
+    Returns:
+        The SemanticMemory instance, or None if AM_SEMANTIC_MEMORY is off
+    """
+    global _semantic_memory
+
+    if not settings.AM_SEMANTIC_MEMORY:
+        return None
+    if _semantic_memory is None:
+        _semantic_memory = SemanticMemory(create_embedder())
+    return _semantic_memory
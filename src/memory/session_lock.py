@@ -0,0 +1,182 @@
+"""Per-session turn serialization.
+
+Two messages for the same session arriving at once would otherwise load the
+same history, run the LLM in parallel and write interleaved turns. The
+SessionTurnLock makes turns for one session run one after another while
+different sessions stay fully concurrent.
+
+Two backends are available:
+
+- ``local``: an asyncio.Lock per session, enough for a single worker process.
+- ``postgres``: the local lock plus a Postgres session-level advisory lock, so
+  turns are also serialized across worker processes and hosts. The advisory
+  lock is held on a connection from a dedicated pool of
+  AM_SESSION_LOCK_POOL_SIZE connections; a turn that can't get one before its
+  timeout fails like any other lock timeout.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from psycopg2.pool import PoolError
+
+from src.config import settings
+from src.memory.turn_writer import get_turn_writer
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# First key of the two-key advisory lock form, so session locks don't collide
+# with advisory locks taken by other parts of the system
+ADVISORY_LOCK_NAMESPACE = 0x616D7331  # "ams1"
+
+
+class SessionLockTimeout(Exception):
+    """Raised when a session's turn lock could not be acquired in time."""
+
+
+class SessionTurnLock:
+    """Serializes agent turns per session."""
+
+    def __init__(self, backend: str = "local", timeout: float = 30.0, poll_interval: float = 0.05):
+        """Initialize the lock manager.
+
+        Args:
+            backend: "local" for in-process locking or "postgres" for advisory locks
+            timeout: Maximum number of seconds to wait for a session's lock
+            poll_interval: Seconds between advisory lock attempts
+        """
+        if backend not in ("local", "postgres"):
+            raise ValueError(f"Unknown session lock backend: {backend}")
+
+        self.backend = backend
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+        # Per-session locks with the number of turns holding or waiting for each
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._waiters: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def acquire(self, session_id: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold the turn lock for a session.
+
+        Args:
+            session_id: The session ID to lock
+            timeout: Optional override of the configured wait timeout
+
+        Raises:
+            SessionLockTimeout: If the lock could not be acquired in time
+        """
+        key = str(session_id)
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(lock.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise SessionLockTimeout(f"Timed out after {timeout}s waiting for session {key}")
+
+            try:
+                connection = None
+                if self.backend == "postgres":
+                    connection = await self._acquire_advisory(key, deadline)
+                try:
+                    yield
+                finally:
+                    if connection is not None:
+                        await self._release_advisory(key, connection)
+            finally:
+                lock.release()
+        finally:
+            self._waiters[key] -= 1
+            if self._waiters[key] <= 0:
+                self._waiters.pop(key, None)
+                self._locks.pop(key, None)
+
+    async def _acquire_advisory(self, key: str, deadline: float):
+        """Poll for the session's advisory lock on a connection of the lock pool."""
+        from src.db.connection import get_lock_connection_pool
+
+        pool = get_lock_connection_pool()
+        while True:
+            try:
+                connection = await asyncio.to_thread(pool.getconn)
+                break
+            except PoolError:
+                # Every lock connection is held by a running turn
+                if time.monotonic() >= deadline:
+                    raise SessionLockTimeout(f"Timed out waiting for a lock connection for session {key}")
+                await asyncio.sleep(self.poll_interval)
+        try:
+            while True:
+                acquired = await asyncio.to_thread(self._try_advisory_lock, connection, key)
+                if acquired:
+                    logger.debug(f"Acquired advisory turn lock for session {key}")
+                    return connection
+                if time.monotonic() >= deadline:
+                    raise SessionLockTimeout(f"Timed out waiting for advisory lock on session {key}")
+                await asyncio.sleep(self.poll_interval)
+        except BaseException:
+            pool.putconn(connection)
+            raise
+
+    async def _release_advisory(self, key: str, connection) -> None:
+        """Release the session's advisory lock once its turn is durable."""
+        from src.db.connection import get_lock_connection_pool
+
+        try:
+            # Another worker must see this turn in the database before it can take the lock
+            writer = get_turn_writer()
+            if writer and writer.has_pending(key):
+                await asyncio.to_thread(writer.flush, self.timeout)
+
+            await asyncio.to_thread(self._advisory_unlock, connection, key)
+            logger.debug(f"Released advisory turn lock for session {key}")
+        except Exception as e:
+            logger.error(f"Error releasing advisory lock for session {key}: {str(e)}")
+            # Closing the connection drops any session-level lock it still holds
+            connection.close()
+        finally:
+            get_lock_connection_pool().putconn(connection)
+
+    @staticmethod
+    def _try_advisory_lock(connection, key: str) -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s))", (ADVISORY_LOCK_NAMESPACE, key))
+            acquired = cursor.fetchone()[0]
+        # Session-level advisory locks survive the end of the transaction
+        connection.commit()
+        return bool(acquired)
+
+    @staticmethod
+    def _advisory_unlock(connection, key: str) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", (ADVISORY_LOCK_NAMESPACE, key))
+        connection.commit()
+
+
+# Global lock manager, created on first use
+_session_turn_lock: Optional[SessionTurnLock] = None
+
+
+def get_session_turn_lock() -> SessionTurnLock:
+    """Get the global session turn lock configured from settings.
+
+    Returns:
+        The global SessionTurnLock instance
+    """
+    global _session_turn_lock
+
+    if _session_turn_lock is None:
+        _session_turn_lock = SessionTurnLock(
+            backend=settings.AM_SESSION_LOCK_BACKEND,
+            timeout=settings.AM_SESSION_LOCK_TIMEOUT
+        )
+    return _session_turn_lock
@@ -0,0 +1,310 @@
+"""Deferred persistence of conversation turns.
+
+When AM_ASYNC_PERSISTENCE is enabled, MessageHistory hands finished turns to a
+single in-process TurnWriter instead of inserting them on the request path.
+The writer runs in a background thread and every few milliseconds drains
+everything queued so far, across all sessions, into one multi-row INSERT.
+
+Because there is exactly one writer and it processes its queue in FIFO order,
+messages (and any deferred session updates) keep their per-session order.
+Rows stay visible through pending_messages() until they are committed, so a
+session's history window is readable immediately after enqueueing.
+
+Only turn rows and calls queued with enqueue_call (such as linking a session
+to its agent) are deferred. Looking up or creating the session and storing
+its system prompt still write on the request path.
+
+Rows of a session whose insert fails go back to the front of the queue and
+are retried up to ``max_attempts`` times; after that they are dropped and
+counted in the ``turn_writer_dropped_messages`` metric.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from src.config import settings
+from src.db.models import Message
+from src.db.repository.message import create_messages
+from src.utils.metrics import metrics
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Queue items are either a list of message rows or a deferred call
+_QueueItem = Union[List[Message], Tuple[Callable[..., Any], tuple, dict]]
+
+
+class TurnWriter:
+    """Background writer that batches conversation turns across sessions."""
+
+    def __init__(self, flush_interval_ms: int = 5, max_batch_size: int = 500, max_attempts: int = 3):
+        """Initialize the writer.
+
+        Args:
+            flush_interval_ms: How long the writer waits to collect a batch
+            max_batch_size: Maximum number of message rows per INSERT
+            max_attempts: Times a session's rows are tried before they are dropped
+        """
+        self.flush_interval = max(flush_interval_ms, 1) / 1000.0
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_attempts = max(max_attempts, 1)
+
+        self._queue: Deque[_QueueItem] = deque()
+        self._pending: Dict[str, List[Message]] = {}
+        # Failed attempts of requeued rows, by id() of the row
+        self._attempts: Dict[int, int] = {}
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the background writer thread if it is not running."""
+        with self._condition:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="turn-writer", daemon=True)
+            self._thread.start()
+            logger.info(f"Started turn writer (flush interval {self.flush_interval * 1000:.0f}ms, "
+                        f"max batch {self.max_batch_size})")
+
+    def enqueue_messages(self, rows: List[Message]) -> None:
+        """Queue message rows for insertion.
+
+        Args:
+            rows: Message rows in conversation order
+        """
+        if not rows:
+            return
+        with self._condition:
+            for row in rows:
+                self._pending.setdefault(str(row.session_id), []).append(row)
+            self._queue.append(list(rows))
+            self._condition.notify()
+
+    def enqueue_call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """Queue a write (e.g. a session update) to run after previously queued items.
+
+        Args:
+            func: Repository function to call from the writer thread
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+        """
+        with self._condition:
+            self._queue.append((func, args, kwargs))
+            self._condition.notify()
+
+    def pending_messages(self, session_id: str) -> List[Message]:
+        """Return rows queued for a session that have not been committed yet.
+
+        Args:
+            session_id: The session ID
+
+        Returns:
+            List of pending Message rows in conversation order
+        """
+        with self._condition:
+            return list(self._pending.get(str(session_id), []))
+
+    def has_pending(self, session_id: str) -> bool:
+        """Check whether a session still has uncommitted rows.
+
+        Args:
+            session_id: The session ID
+
+        Returns:
+            True if rows for the session are queued or being written
+        """
+        with self._condition:
+            return bool(self._pending.get(str(session_id)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far has been written.
+
+        Args:
+            timeout: Maximum number of seconds to wait (None waits forever)
+
+        Returns:
+            True if the queue was drained, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._queue or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.notify_all()
+                self._condition.wait(remaining if remaining is not None else 0.1)
+        return True
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Flush queued writes and stop the writer thread.
+
+        Args:
+            timeout: Maximum number of seconds to wait for the flush
+        """
+        if not self.flush(timeout):
+            logger.error(f"Turn writer did not drain within {timeout}s; {len(self._queue)} items left unwritten")
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("Stopped turn writer")
+
+    def _run(self) -> None:
+        """Writer loop: wait for work, collect for one interval, write a batch."""
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopping:
+                    self._condition.wait()
+                if self._stopping and not self._queue:
+                    return
+
+            # Let concurrent requests pile up so one INSERT covers many turns
+            time.sleep(self.flush_interval)
+
+            with self._condition:
+                batch = self._take_batch()
+                self._in_flight = len(batch)
+
+            try:
+                self._write(batch)
+            finally:
+                with self._condition:
+                    self._in_flight = 0
+                    self._condition.notify_all()
+
+    def _take_batch(self) -> List[_QueueItem]:
+        """Pop queued items up to max_batch_size message rows. Caller holds the lock."""
+        batch = []
+        row_count = 0
+        while self._queue:
+            item = self._queue[0]
+            if isinstance(item, list):
+                if batch and row_count + len(item) > self.max_batch_size:
+                    break
+                row_count += len(item)
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _write(self, batch: List[_QueueItem]) -> None:
+        """Write a batch, inserting consecutive rows together and running calls in order."""
+        rows: List[Message] = []
+        for item in batch:
+            if isinstance(item, list):
+                rows.extend(item)
+                continue
+
+            # Rows queued before a call must land first
+            self._insert(rows)
+            rows = []
+
+            func, args, kwargs = item
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Deferred write {getattr(func, '__name__', func)} failed: {str(e)}")
+
+        self._insert(rows)
+
+    def _insert(self, rows: List[Message]) -> None:
+        """Insert rows in one statement, falling back to per-session inserts on failure."""
+        if not rows:
+            return
+
+        start = time.monotonic()
+        message_ids = create_messages(rows)
+        done = rows
+        retries: List[List[Message]] = []
+        if len(message_ids) == len(rows):
+            logger.debug(f"Turn writer committed {len(rows)} messages in {(time.monotonic() - start) * 1000:.1f}ms")
+        else:
+            # One bad session (e.g. a deleted one) must not drop everybody else's turns
+            logger.warning(f"Turn writer batch of {len(rows)} messages failed, retrying per session")
+            by_session: Dict[str, List[Message]] = {}
+            for row in rows:
+                by_session.setdefault(str(row.session_id), []).append(row)
+            done = []
+            for session_id, session_rows in by_session.items():
+                # A batch of one session has just failed as a whole
+                if len(by_session) > 1 and len(create_messages(session_rows)) == len(session_rows):
+                    done.extend(session_rows)
+                    continue
+                attempts = max(self._attempts.get(id(row), 0) for row in session_rows) + 1
+                if attempts < self.max_attempts:
+                    logger.warning(f"Turn writer failed to write {len(session_rows)} messages for session "
+                                   f"{session_id} (attempt {attempts} of {self.max_attempts}), requeueing")
+                    for row in session_rows:
+                        self._attempts[id(row)] = attempts
+                    retries.append(session_rows)
+                else:
+                    logger.error(f"Turn writer dropped {len(session_rows)} messages for session {session_id} "
+                                 f"after {attempts} attempts")
+                    metrics.increment("turn_writer_dropped_messages", len(session_rows))
+                    done.extend(session_rows)
+
+        with self._condition:
+            # Retried rows go first so they stay ahead of the session's later turns
+            self._queue.extendleft(reversed(retries))
+            for row in done:
+                self._attempts.pop(id(row), None)
+                session_rows = self._pending.get(str(row.session_id))
+                if session_rows:
+                    try:
+                        session_rows.remove(row)
+                    except ValueError:
+                        pass
+                    if not session_rows:
+                        del self._pending[str(row.session_id)]
+
+
+# Global writer instance, created on first use
+_turn_writer: Optional[TurnWriter] = None
+_turn_writer_lock = threading.Lock()
+
+
+def get_turn_writer() -> Optional[TurnWriter]:
+    """Get the running turn writer, or None if asynchronous persistence is disabled.
+
+    Returns:
+        The global TurnWriter instance when AM_ASYNC_PERSISTENCE is enabled
+    """
+    global _turn_writer
+
+    if not settings.AM_ASYNC_PERSISTENCE:
+        return None
+
+    if _turn_writer is None:
+        with _turn_writer_lock:
+            if _turn_writer is None:
+                writer = TurnWriter(
+                    flush_interval_ms=settings.AM_PERSISTENCE_FLUSH_INTERVAL_MS,
+                    max_batch_size=settings.AM_PERSISTENCE_MAX_BATCH_SIZE
+                )
+                writer.start()
+                atexit.register(writer.stop)
+                _turn_writer = writer
+    return _turn_writer
+
+
+def shutdown_turn_writer(timeout: Optional[float] = 10.0) -> None:
+    """Flush and stop the global turn writer if it was started.
+
+    Args:
+        timeout: Maximum number of seconds to wait for queued writes
+    """
+    global _turn_writer
+
+    with _turn_writer_lock:
+        writer = _turn_writer
+        _turn_writer = None
+
+    if writer:
+        writer.stop(timeout)
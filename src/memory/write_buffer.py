@@ -0,0 +1,177 @@
+"""Turn-scoped buffering of memory writes.
+
+Agents often write the same memory several times in one turn. While a turn
+runs inside ``buffered_memory_writes()``, the memory tools put their writes
+into a MemoryWriteBuffer instead of the database: later writes to the same
+memory replace earlier ones, reads made by the tools see the buffered values,
+and when the turn ends the final values are flushed with a single upsert.
+
+The buffer lives in a context variable, so concurrent turns never share one
+and tool calls running as tasks of the turn see the turn's buffer.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.db.models import Memory
+from src.db.repository.memory import memory_scope_key
+from src.utils.metrics import metrics
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+_current_write_buffer: ContextVar[Optional["MemoryWriteBuffer"]] = ContextVar("memory_write_buffer", default=None)
+
+
+class MemoryWriteBuffer:
+    """Final values of the memories written during one turn."""
+
+    def __init__(self):
+        """Initialize an empty buffer."""
+        self._writes: Dict[Tuple, Memory] = {}
+        self.write_count = 0
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def put(self, memory: Memory) -> Memory:
+        """Buffer a memory write, replacing any earlier write of the same memory.
+
+        The first write's ID and read mode are kept so a memory keeps one
+        identity for the whole turn.
+
+        Args:
+            memory: The memory as it should be stored
+
+        Returns:
+            The buffered memory
+        """
+        key = memory_scope_key(memory)
+        previous = self._writes.get(key)
+        if previous is not None:
+            memory.id = previous.id
+            memory.read_mode = previous.read_mode
+            if memory.description is None:
+                memory.description = previous.description
+        self._writes[key] = memory
+        self.write_count += 1
+        metrics.increment("memory_writes_buffered")
+        return memory
+
+    def find(self, name: str, agent_id: Optional[int] = None, user_id: Optional[int] = None) -> Optional[Memory]:
+        """Find the latest buffered write of a memory.
+
+        Args:
+            name: Memory name
+            agent_id: Optional agent ID to match
+            user_id: Optional user ID to match
+
+        Returns:
+            The buffered memory, or None if it wasn't written in this turn
+        """
+        for memory in reversed(list(self._writes.values())):
+            if memory.name != name:
+                continue
+            if agent_id is not None and memory.agent_id != agent_id:
+                continue
+            if user_id is not None and memory.user_id != user_id:
+                continue
+            return memory
+        return None
+
+    def get(self, memory: Memory) -> Optional[Memory]:
+        """Get the buffered write of the same memory (same name and scope).
+
+        Args:
+            memory: A stored or buffered memory
+
+        Returns:
+            The buffered memory, or None if it wasn't written in this turn
+        """
+        return self._writes.get(memory_scope_key(memory))
+
+    def find_by_id(self, memory_id: Any) -> Optional[Memory]:
+        """Find a buffered write by memory ID.
+
+        Args:
+            memory_id: Memory ID
+
+        Returns:
+            The buffered memory, or None if no buffered write has this ID
+        """
+        for memory in self._writes.values():
+            if memory.id is not None and str(memory.id) == str(memory_id):
+                return memory
+        return None
+
+    def discard(self, memory: Memory) -> None:
+        """Drop the buffered write of a memory that is about to be written directly.
+
+        Args:
+            memory: A stored or buffered memory
+        """
+        self._writes.pop(memory_scope_key(memory), None)
+
+    def pending(self) -> List[Memory]:
+        """Get the buffered memories in the order they were first written."""
+        return list(self._writes.values())
+
+    def flush(self) -> List[Memory]:
+        """Write all buffered memories in one upsert and clear the buffer.
+
+        Returns:
+            The stored memories, or an empty list if nothing was written
+        """
+        from src.db.repository.memory import upsert_memories
+
+        pending = self.pending()
+        if not pending:
+            return []
+
+        self._writes = {}
+        stored = upsert_memories(pending)
+
+        metrics.increment("memory_write_flushes")
+        metrics.increment("memory_writes_coalesced", self.write_count - len(pending))
+        logger.info(f"Flushed {len(pending)} buffered memories from {self.write_count} writes")
+        self.write_count = 0
+        return stored
+
+
+def get_write_buffer() -> Optional[MemoryWriteBuffer]:
+    """Get the memory write buffer of the current turn.
+
+    Returns:
+        The active MemoryWriteBuffer, or None if writes go straight to the database
+    """
+    return _current_write_buffer.get()
+
+
+@asynccontextmanager
+async def buffered_memory_writes() -> AsyncIterator[Optional[MemoryWriteBuffer]]:
+    """Buffer memory tool writes until the block exits, then flush them.
+
+    The buffer is flushed even if the block raises, since the writes were
+    already acknowledged to the model. Nested blocks share the outer buffer.
+
+    Yields:
+        The active buffer, or None if AM_MEMORY_WRITE_BUFFER is off
+    """
+    if not settings.AM_MEMORY_WRITE_BUFFER or _current_write_buffer.get() is not None:
+        yield _current_write_buffer.get()
+        return
+
+    buffer = MemoryWriteBuffer()
+    token = _current_write_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _current_write_buffer.reset(token)
+        try:
+            await asyncio.to_thread(buffer.flush)
+        except Exception as e:
+            logger.error(f"Error flushing buffered memory writes: {str(e)}")
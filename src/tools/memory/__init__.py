@@ -15,7 +15,8 @@ from src.tools.memory.tool import (
     # SimpleAgent compatibility functions
     get_memory_tool,
     store_memory_tool,
-    list_memories_tool
+    list_memories_tool,
+    search_memories_tool
 )
 
 # Import schemas
@@ -39,6 +40,7 @@ from src.tools.memory.interface import (
 # Import provider
 from src.tools.memory.provider import (
     MemoryProvider,
+    get_memory_provider,
     get_memory_provider_for_agent
 )
 
@@ -85,6 +87,7 @@ __all__ = [
     'get_memory_tool',
     'store_memory_tool', 
     'list_memories_tool',
+    'search_memories_tool',
     
     # Schemas
     'MemoryReadResult',
@@ -100,5 +103,6 @@ __all__ = [
     'validate_memory_name',
     'format_memory_content',
     'MemoryProvider',
+    'get_memory_provider',
     'get_memory_provider_for_agent'
 ] 
\ No newline at end of file
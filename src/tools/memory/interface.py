@@ -26,8 +26,12 @@ def invalidate_memory_cache(func: Callable) -> Callable:
         # Call the original function
         result = await func(*args, **kwargs)
         
-        # Get the memory provider
-        from src.tools.memory.provider import get_memory_provider_for_agent
+        from src.memory.memory_versions import notify_memory_change
+        from src.memory.write_buffer import get_write_buffer
+        
+        # Buffered writes invalidate the cache once, when they are flushed
+        if get_write_buffer() is not None:
+            return result
         
         # Try to extract agent_id from args/kwargs
         agent_id = None
@@ -109,12 +113,11 @@ def invalidate_memory_cache(func: Callable) -> Callable:
         
         # If we found an agent_id, invalidate its cache
         if agent_id:
-            provider = get_memory_provider_for_agent(agent_id)
-            if provider:
-                provider.invalidate_cache()
-                logger.info(f"Invalidated memory cache for agent {agent_id}")
-            else:
-                logger.warning(f"No memory provider found for agent {agent_id}")
+            user_id = None
+            if args and hasattr(args[0], 'deps'):
+                user_id = getattr(args[0].deps, 'user_id', None)
+            notify_memory_change(agent_id, user_id)
+            logger.info(f"Invalidated memory cache for agent {agent_id}, user {user_id}")
         else:
             logger.warning(f"Could not determine agent_id for cache invalidation in {func.__name__}")
         
@@ -1,27 +1,59 @@
 """Memory provider for the memory tool.
 
 This module provides a class to manage memory retrieval and caching.
+
+Caches are scoped to an (agent_id, user_id) pair and validated against the
+memory version registry, so a write by any worker invalidates them without
+waiting for the TTL to expire.
 """
-from typing import Dict, Any, Optional, List, Callable, Set
+from typing import Dict, Any, Optional, Callable, Tuple
 import logging
-from functools import lru_cache
-from datetime import datetime, timedelta
+import threading
+import time
+
+from src.config import settings
+from src.memory.memory_versions import get_memory_versions
+from src.utils.lru import LRUDict
+from src.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
-# Global registry of memory providers by agent ID
-_memory_providers: Dict[int, "MemoryProvider"] = {}
+# Global registry of memory providers by (agent ID, user ID), least recently used evicted
+_memory_providers: LRUDict[Tuple[int, Optional[int]], "MemoryProvider"] = LRUDict(settings.AM_MEMORY_CACHE_MAX_SCOPES)
+_registry_lock = threading.Lock()
 
-def get_memory_provider_for_agent(agent_id: int) -> Optional["MemoryProvider"]:
-    """Get a memory provider for a specific agent.
+def get_memory_provider_for_agent(agent_id: int, user_id: Optional[int] = None) -> Optional["MemoryProvider"]:
+    """Get a memory provider for a specific agent and user.
     
     Args:
         agent_id: The numeric ID of the agent
+        user_id: Optional user ID (None covers memories of any user)
         
     Returns:
         MemoryProvider instance or None
     """
-    return _memory_providers.get(agent_id)
+    return _memory_providers.get((agent_id, user_id))
+
+def get_memory_provider(agent_id: int, user_id: Optional[int] = None) -> "MemoryProvider":
+    """Get or create the memory provider for an agent and user.
+    
+    Args:
+        agent_id: The numeric ID of the agent
+        user_id: Optional user ID (None covers memories of any user)
+        
+    Returns:
+        MemoryProvider instance
+    """
+    with _registry_lock:
+        provider = _memory_providers.get((agent_id, user_id))
+    return provider or MemoryProvider(agent_id, user_id)
+
+def _record_lookup(hit: bool) -> None:
+    """Count a cache lookup and update the hit ratio."""
+    metrics.increment("memory_cache_hits" if hit else "memory_cache_misses")
+    hits = metrics.get_counter("memory_cache_hits")
+    misses = metrics.get_counter("memory_cache_misses")
+    metrics.set_gauge("memory_cache_hit_ratio", hits / (hits + misses))
 
 class MemoryProvider:
     """Provider interface for memory-related system prompt functions.
@@ -30,19 +62,24 @@ class MemoryProvider:
     and pydantic-ai's dynamic system prompt functions.
     """
     
-    def __init__(self, agent_id: int):
+    def __init__(self, agent_id: int, user_id: Optional[int] = None):
         """Initialize the memory provider.
         
         Args:
             agent_id: The ID of the agent this provider serves
+            user_id: Optional ID of the user this provider serves
         """
         self.agent_id = agent_id
-        self._cache_expiry = datetime.now()
-        self._memory_cache = {}
-        self._cache_ttl = timedelta(seconds=30)  # 30-second TTL by default
+        self.user_id = user_id
+        self._lock = threading.Lock()
+        self._memory_cache: Dict[str, Any] = {}
+        self._cache_token: Optional[Tuple[int, int]] = None
+        self._cache_filled_at = 0.0
+        self._cache_ttl = settings.AM_MEMORY_CACHE_TTL
         
         # Register this provider in the global registry
-        _memory_providers[agent_id] = self
+        with _registry_lock:
+            _memory_providers[(agent_id, user_id)] = self
         
     def set_cache_ttl(self, seconds: int) -> None:
         """Set the cache time-to-live in seconds.
@@ -50,38 +87,58 @@ class MemoryProvider:
         Args:
             seconds: Cache TTL in seconds
         """
-        self._cache_ttl = timedelta(seconds=seconds)
+        self._cache_ttl = seconds
     
     def invalidate_cache(self) -> None:
-        """Invalidate the memory cache to force fresh fetches."""
-        self._cache_expiry = datetime.now()
-        self._memory_cache = {}
-        logger.debug(f"Memory cache for agent {self.agent_id} invalidated")
+        """Invalidate cached memories of this scope in every provider and process."""
+        get_memory_versions().bump(self.agent_id, self.user_id)
+        logger.debug(f"Memory cache for agent {self.agent_id}, user {self.user_id} invalidated")
     
-    def _should_refresh_cache(self) -> bool:
-        """Check if the cache should be refreshed."""
-        return datetime.now() > self._cache_expiry
+    def _get_cache(self) -> Dict[str, Any]:
+        """Get the cached memories, reloading them if their version changed."""
+        token = get_memory_versions().token(self.agent_id, self.user_id)
+        
+        with self._lock:
+            age = time.monotonic() - self._cache_filled_at
+            if token is not None and token == self._cache_token and age < self._cache_ttl:
+                _record_lookup(hit=True)
+                metrics.observe("memory_cache_entry_age_seconds", age)
+                return self._memory_cache
+        
+        _record_lookup(hit=False)
+        return self._refresh_cache(token)
     
-    def _refresh_cache(self) -> None:
-        """Refresh the memory cache from database."""
+    def _refresh_cache(self, token: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+        """Refresh the memory cache from database.
+        
+        Args:
+            token: Version token read before loading, so writes racing with
+                the load invalidate the new entry
+        """
         from src.db import list_memories
         
         try:
-            memories = list_memories(agent_id=self.agent_id)
+            memories = list_memories(agent_id=self.agent_id, user_id=self.user_id)
             
-            # Build a new cache
+            # Build a new cache, preferring memories that aren't session-scoped
             new_cache = {}
             for memory in memories:
-                if hasattr(memory, 'name') and memory.name:
-                    new_cache[memory.name] = memory.content
+                if not getattr(memory, 'name', None):
+                    continue
+                if memory.name in new_cache and memory.session_id is not None:
+                    continue
+                new_cache[memory.name] = memory.content
             
-            # Update the cache and expiry
-            self._memory_cache = new_cache
-            self._cache_expiry = datetime.now() + self._cache_ttl
-            logger.debug(f"Refreshed memory cache for agent {self.agent_id} with {len(new_cache)} items")
+            with self._lock:
+                self._memory_cache = new_cache
+                self._cache_token = token
+                self._cache_filled_at = time.monotonic()
+            logger.debug(f"Refreshed memory cache for agent {self.agent_id}, user {self.user_id} with {len(new_cache)} items")
+            return new_cache
             
         except Exception as e:
             logger.error(f"Error refreshing memory cache for agent {self.agent_id}: {str(e)}")
+            return self._memory_cache
     
     def get_memory(self, name: str, default: Any = None) -> Any:
         """Get a memory value by name.
@@ -93,12 +150,7 @@ class MemoryProvider:
         Returns:
             Memory content or default value
         """
-        # Refresh cache if needed
-        if self._should_refresh_cache():
-            self._refresh_cache()
-        
-        # Return from cache
-        return self._memory_cache.get(name, default)
+        return self._get_cache().get(name, default)
     
     def get_all_memories(self) -> Dict[str, Any]:
         """Get all memories as a dictionary.
@@ -106,11 +158,7 @@ class MemoryProvider:
         Returns:
             Dictionary of all memory name-value pairs
         """
-        # Refresh cache if needed
-        if self._should_refresh_cache():
-            self._refresh_cache()
-        
-        return self._memory_cache.copy()
+        return self._get_cache().copy()
     
     def get_memories_by_prefix(self, prefix: str) -> Dict[str, Any]:
         """Get all memories with names starting with the given prefix.
@@ -121,12 +169,8 @@ class MemoryProvider:
         Returns:
             Dictionary of matching memory name-value pairs
         """
-        # Refresh cache if needed
-        if self._should_refresh_cache():
-            self._refresh_cache()
-        
         return {
-            name: value for name, value in self._memory_cache.items() 
+            name: value for name, value in self._get_cache().items() 
             if name.startswith(prefix)
         }
     
@@ -3,6 +3,7 @@
 This module provides the core functionality for reading, creating,
 and updating memories for agents.
 """
+import asyncio
 import logging
 import json
 import os
@@ -20,8 +21,10 @@ from src.db import get_memory as get_memory_in_db
 from src.db import update_memory as update_memory_in_db
 from src.db.repository.memory import get_memory_by_name as db_get_memory_by_name
 from src.db.repository.memory import create_memory as db_create_memory
+from src.db.repository.memory import memory_scope_key
 from src.db.models import Memory as DBMemory
 from src.agents.models.agent_factory import AgentFactory
+from src.memory.write_buffer import get_write_buffer
 
 from .schema import (
     ReadMemoryInput, CreateMemoryInput, UpdateMemoryInput,
@@ -253,6 +256,14 @@ async def get_memory_tool(ctx: dict, key: str) -> str:
         user_id = ctx.get("user_id") if isinstance(ctx, dict) else None
         logger.info(f"Using user_id from context: {user_id}")
         
+        # Values written earlier in this turn haven't been flushed yet
+        write_buffer = get_write_buffer()
+        if write_buffer is not None:
+            agent_id = ctx.get("agent_id") if isinstance(ctx, dict) else None
+            buffered = write_buffer.find(key, agent_id=agent_id, user_id=user_id)
+            if buffered:
+                return buffered.content
+        
         # Try to get memory by name with user_id filter if provided
         memory = db_get_memory_by_name(name=key, user_id=user_id)
         if memory:
@@ -335,6 +346,24 @@ async def store_memory_tool(key: str, content: str, ctx: dict = None) -> str:
         
         logger.info(f"Using values: agent_id={agent_id}, user_id={user_id}, session_id=None")
         
+        # Within a turn, keep only the final value; it is flushed when the turn ends
+        # (an existing memory's read_mode is preserved by the upsert)
+        write_buffer = get_write_buffer()
+        if write_buffer is not None:
+            write_buffer.put(DBMemory(
+                id=uuid.uuid4(),
+                name=key,
+                content=content,
+                description=f"Memory created by Agent {agent_id}",
+                agent_id=agent_id,
+                user_id=user_id,
+                read_mode="tool_calling",
+                metadata={"created_at": str(datetime.now())}
+            ))
+            result = f"Memory stored with key '{key}'"
+            logger.info(result)
+            return result
+        
         # Check if this memory already exists and get its read_mode
         read_mode = "tool_calling"  # Default for new memories
         try:
@@ -370,6 +399,7 @@ async def store_memory_tool(key: str, content: str, ctx: dict = None) -> str:
         
         # Format response in a standard way to avoid OpenAI pydantic-ai issues
         if memory_id:
+            await _index_memory_write(memory_id, agent_id, user_id, key, content)
             result = f"Memory stored with key '{key}'"
             logger.info(result)
             return result
@@ -382,6 +412,51 @@ async def store_memory_tool(key: str, content: str, ctx: dict = None) -> str:
         logger.error(error_msg)
         return error_msg
 
+async def _index_memory_write(memory_id: Any, agent_id: int, user_id: Optional[int], name: str, content: Any) -> None:
+    """Embed a memory written by a tool when semantic memory is enabled."""
+    from src.memory.semantic_memory import get_semantic_memory
+    
+    semantic_memory = get_semantic_memory()
+    if semantic_memory is None:
+        return
+    
+    try:
+        await asyncio.to_thread(semantic_memory.index_memory, memory_id, agent_id, user_id, name, content)
+    except Exception as e:
+        # The memory is embedded on the next index refresh instead
+        logger.warning(f"Could not embed memory '{name}': {str(e)}")
+
+async def search_memories_tool(ctx: dict, query: str, limit: Optional[int] = None) -> str:
+    """Find the stored memories most relevant to a query.
+    
+    Args:
+        ctx: The context dictionary with agent and user information
+        query: What to search for, in natural language
+        limit: Optional maximum number of memories to return
+        
+    Returns:
+        The most relevant memories, one per line, or a message if none were found
+    """
+    from src.memory.semantic_memory import get_semantic_memory, format_relevant_memories
+    
+    semantic_memory = get_semantic_memory()
+    if semantic_memory is None:
+        return "Semantic memory search is not enabled"
+    
+    agent_id = ctx.get("agent_id") if isinstance(ctx, dict) else None
+    user_id = ctx.get("user_id") if isinstance(ctx, dict) else None
+    logger.info(f"Searching memories for agent_id={agent_id}, user_id={user_id}: {query}")
+    
+    try:
+        results = await asyncio.to_thread(semantic_memory.search, agent_id, user_id, query, limit)
+        if not results:
+            return f"No memories found for '{query}'"
+        return format_relevant_memories(results)
+    except Exception as e:
+        error_msg = f"Error searching memories: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+
 async def list_memories_tool(prefix: Optional[str] = None) -> str:
     """List available memories, optionally filtered by prefix.
     
@@ -416,6 +491,23 @@ async def list_memories_tool(prefix: Optional[str] = None) -> str:
         logger.error(error_msg)
         return error_msg
 
+def _with_buffered_writes(memories: List[DBMemory], write_buffer: Any, agent_id: int) -> List[DBMemory]:
+    """Overlay an agent's memories written earlier in this turn on stored ones.
+    
+    Args:
+        memories: Memories read from the database
+        write_buffer: The turn's MemoryWriteBuffer
+        agent_id: Agent whose buffered writes are included
+        
+    Returns:
+        The memories with buffered values replacing stored ones and new memories appended
+    """
+    buffered = [memory for memory in write_buffer.pending() if memory.agent_id == agent_id]
+    if not buffered:
+        return memories
+    buffered_keys = {memory_scope_key(memory) for memory in buffered}
+    return [memory for memory in memories if memory_scope_key(memory) not in buffered_keys] + buffered
+
 @invalidate_memory_cache
 async def read_memory(ctx: RunContext[Dict], memory_id: Optional[str] = None, 
                 name: Optional[str] = None, list_all: bool = False) -> Dict[str, Any]:
@@ -452,11 +544,16 @@ async def read_memory(ctx: RunContext[Dict], memory_id: Optional[str] = None,
         # Log context
         logger.info(f"Context: agent_id={agent_id}, user_id={user_id}, session_id={session_id}")
         
+        # Values written earlier in this turn haven't been flushed yet
+        write_buffer = get_write_buffer()
+        
         # If list_all is True, return all memories
         if list_all:
             try:
                 # Use direct database call with proper parameter
                 memories = list_memories_in_db(agent_id=agent_id)
+                if write_buffer is not None:
+                    memories = _with_buffered_writes(memories, write_buffer, agent_id)
                 
                 # Convert to Memory objects
                 memory_objects = []
@@ -486,17 +583,27 @@ async def read_memory(ctx: RunContext[Dict], memory_id: Optional[str] = None,
         try:
             # Determine how to retrieve the memory
             if memory_id:
-                # Get memory by ID
-                memory = get_memory_in_db(memory_id=memory_id)
+                # Get memory by ID, preferring a value written earlier in this turn
+                memory = write_buffer.find_by_id(memory_id) if write_buffer is not None else None
+                if memory is None:
+                    memory = get_memory_in_db(memory_id=memory_id)
+                    if memory and write_buffer is not None:
+                        memory = write_buffer.get(memory) or memory
             elif name:
-                # Get memory by name - ensure we pass both agent_id and user_id
-                logger.info(f"Querying memory by name '{name}' with agent_id={agent_id}, user_id={user_id}")
-                memories = list_memories_in_db(agent_id=agent_id, user_id=user_id, name_pattern=name)
-                if not memories and user_id:
-                    # If no memories found with specific user_id, try with just agent_id
-                    logger.info(f"No memory found with user_id={user_id}, trying with just agent_id={agent_id}")
-                    memories = list_memories_in_db(agent_id=agent_id, name_pattern=name)
-                memory = memories[0] if memories else None
+                memory = None
+                if write_buffer is not None:
+                    memory = write_buffer.find(name, agent_id=agent_id, user_id=user_id) if user_id else None
+                    memory = memory or write_buffer.find(name, agent_id=agent_id)
+                
+                if memory is None:
+                    # Get memory by name - ensure we pass both agent_id and user_id
+                    logger.info(f"Querying memory by name '{name}' with agent_id={agent_id}, user_id={user_id}")
+                    memories = list_memories_in_db(agent_id=agent_id, user_id=user_id, name_pattern=name)
+                    if not memories and user_id:
+                        # If no memories found with specific user_id, try with just agent_id
+                        logger.info(f"No memory found with user_id={user_id}, trying with just agent_id={agent_id}")
+                        memories = list_memories_in_db(agent_id=agent_id, name_pattern=name)
+                    memory = memories[0] if memories else None
             else:
                 memory = None
             
@@ -594,29 +701,34 @@ async def create_memory(ctx: RunContext[Dict], name: str, content: Union[str, Di
         
         # Create the memory
         try:
-            # Use direct database call
-            memory_data = {
-                "name": name,
-                "content": processed_content,
-                "agent_id": agent_id,
-                "user_id": memory_user_id,
-                "session_id": memory_session_id,
-                "read_mode": read_mode,
-                "description": description
-            }
+            memory = DBMemory(
+                id=uuid.uuid4(),
+                name=name,
+                content=processed_content,
+                description=description,
+                agent_id=agent_id,
+                user_id=memory_user_id,
+                session_id=memory_session_id,
+                read_mode=read_mode,
+                metadata=metadata if isinstance(metadata, dict) else None
+            )
             
-            # Add metadata if provided
-            if metadata is not None:
-                if isinstance(metadata, dict):
-                    memory_data["metadata"] = json.dumps(metadata)
-                else:
-                    memory_data["metadata"] = metadata
+            # Within a turn, buffer the write so later reads and writes of the memory see it
+            write_buffer = get_write_buffer()
+            if write_buffer is not None:
+                memory = write_buffer.put(memory)
+                return MemoryCreateResponse(
+                    success=True,
+                    message="Memory created successfully",
+                    id=str(memory.id),
+                    name=memory.name
+                ).dict()
             
             # Create memory in database
-            memory = create_memory_in_db(**memory_data)
+            created_id = create_memory_in_db(memory)
             
             # Check if memory was created
-            if not memory or not hasattr(memory, 'id'):
+            if not created_id:
                 return MemoryCreateResponse(
                     success=False,
                     message="Memory creation failed"
@@ -626,7 +738,7 @@ async def create_memory(ctx: RunContext[Dict], name: str, content: Union[str, Di
             return MemoryCreateResponse(
                 success=True,
                 message="Memory created successfully",
-                id=str(memory.id),
+                id=str(created_id),
                 name=memory.name
             ).dict()
         except Exception as e:
@@ -682,32 +794,75 @@ async def update_memory(ctx: RunContext[Dict], content: Union[str, Dict[str, Any
         # Determine which memory to update
         try:
             if memory_id:
-                # Get memory by ID first to make sure it exists
-                memory = get_memory_in_db(memory_id=memory_id)
-                if not memory:
+                write_buffer = get_write_buffer()
+                
+                # Get the memory by ID first to make sure it exists, preferring this turn's value
+                stored = get_memory_in_db(memory_id=memory_id)
+                buffered = None
+                if write_buffer is not None:
+                    buffered = write_buffer.find_by_id(memory_id) or (write_buffer.get(stored) if stored else None)
+                if buffered is None and stored is None:
                     return MemoryUpdateResponse(
                         success=False,
                         message=f"Memory with ID {memory_id} not found"
                     ).dict()
                 
-                # Update memory
+                current = buffered or stored
                 update_data = {"content": processed_content}
                 if description is not None:
                     update_data["description"] = description
                 if name is not None:
                     update_data["name"] = name
+                updated = current.model_copy(update=update_data)
+                
+                if write_buffer is not None:
+                    if updated.name == current.name or stored is None:
+                        # Buffer the update until the turn ends
+                        write_buffer.discard(current)
+                        write_buffer.put(updated)
+                        return MemoryUpdateResponse(
+                            success=True,
+                            message="Memory updated successfully",
+                            id=str(memory_id),
+                            name=updated.name
+                        ).dict()
+                    
+                    # A rename can't be upserted by name; write it now and drop the
+                    # stale buffered value so the flush doesn't overwrite it
+                    write_buffer.discard(current)
                 
                 # Update memory in database
-                updated_memory = update_memory_in_db(memory_id=memory_id, **update_data)
+                updated_id = update_memory_in_db(updated.model_copy(update={"id": stored.id}))
+                if not updated_id:
+                    return MemoryUpdateResponse(
+                        success=False,
+                        message=f"Failed to update memory with ID {memory_id}"
+                    ).dict()
                 
                 # Return response
                 return MemoryUpdateResponse(
                     success=True,
                     message="Memory updated successfully",
-                    id=str(updated_memory.id),
-                    name=updated_memory.name
+                    id=str(updated_id),
+                    name=updated.name
                 ).dict()
             elif name:
+                write_buffer = get_write_buffer()
+                
+                # A memory written earlier in this turn is updated in the buffer
+                buffered = write_buffer.find(name, agent_id=agent_id) if write_buffer is not None else None
+                if buffered is not None:
+                    buffered = write_buffer.put(buffered.model_copy(update={
+                        "content": processed_content,
+                        "description": description if description is not None else buffered.description
+                    }))
+                    return MemoryUpdateResponse(
+                        success=True,
+                        message="Memory updated successfully",
+                        id=str(buffered.id),
+                        name=buffered.name
+                    ).dict()
+                
                 # Find memory by name
                 memories = list_memories_in_db(agent_id=agent_id, name_pattern=name)
                 if not memories:
@@ -719,6 +874,26 @@ async def update_memory(ctx: RunContext[Dict], content: Union[str, Dict[str, Any
                 # Use the first matching memory
                 memory = memories[0]
                 
+                # Buffer the update until the turn ends
+                if write_buffer is not None:
+                    buffered = write_buffer.put(DBMemory(
+                        id=memory.id,
+                        name=memory.name,
+                        content=processed_content,
+                        description=description,
+                        session_id=memory.session_id,
+                        user_id=memory.user_id,
+                        agent_id=memory.agent_id,
+                        read_mode=memory.read_mode,
+                        access=memory.access
+                    ))
+                    return MemoryUpdateResponse(
+                        success=True,
+                        message="Memory updated successfully",
+                        id=str(buffered.id),
+                        name=buffered.name
+                    ).dict()
+                
                 # Update memory
                 update_data = {"content": processed_content}
                 if description is not None:
@@ -0,0 +1,82 @@
+"""Bounded least-recently-used mapping.
+
+Per-process caches keyed by agent and user grow with the number of users;
+LRUDict keeps the most recently used entries and evicts the others.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Iterator, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUDict(Generic[K, V]):
+    """Thread-safe dict that evicts its least recently used entries past a size limit."""
+
+    def __init__(self, max_entries: int, on_evict: Optional[Callable[[K, V], None]] = None):
+        """Initialize an empty mapping.
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted (0 for no limit)
+            on_evict: Optional function called with the key and value of each evicted entry
+        """
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[K, V]" = OrderedDict()
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """Get a value and mark it as recently used."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def __getitem__(self, key: K) -> V:
+        with self._lock:
+            value = self._entries[key]
+            self._entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: K, value: V) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while self.max_entries > 0 and len(self._entries) > self.max_entries:
+                evicted_key, evicted_value = self._entries.popitem(last=False)
+                if self.on_evict is not None:
+                    self.on_evict(evicted_key, evicted_value)
+
+    def __delitem__(self, key: K) -> None:
+        with self._lock:
+            del self._entries[key]
+
+    def pop(self, key: K, default: Any = None) -> Any:
+        """Remove a key and return its value, or default if missing."""
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self) -> Iterator[K]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def items(self) -> list:
+        """Snapshot of the entries, least recently used first."""
+        with self._lock:
+            return list(self._entries.items())
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
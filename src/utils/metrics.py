@@ -0,0 +1,94 @@
+"""In-process metrics registry.
+
+Components record counters, gauges and summaries here; the /metrics endpoint
+returns a snapshot of everything recorded by the current worker process.
+"""
+
+import threading
+from typing import Any, Dict
+
+
+class MetricsRegistry:
+    """Thread-safe store for counters, gauges and summaries."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        """Add to a counter.
+
+        Args:
+            name: Metric name
+            amount: Amount to add
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to a value.
+
+        Args:
+            name: Metric name
+            value: Current value
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record an observation in a summary (count, sum, max).
+
+        Args:
+            name: Metric name
+            value: Observed value
+        """
+        with self._lock:
+            summary = self._summaries.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def get_counter(self, name: str) -> float:
+        """Get the current value of a counter."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of all metrics.
+
+        Returns:
+            Dictionary with counters, gauges and summaries (including averages)
+        """
+        with self._lock:
+            summaries = {}
+            for name, summary in self._summaries.items():
+                avg = summary["sum"] / summary["count"] if summary["count"] else 0.0
+                summaries[name] = {**summary, "avg": avg}
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": summaries,
+            }
+
+    def reset(self) -> None:
+        """Clear all metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+# Global registry for this process
+metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get the global metrics registry.
+
+    Returns:
+        The process-wide MetricsRegistry instance
+    """
+    return metrics
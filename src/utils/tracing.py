@@ -0,0 +1,350 @@
+"""Lightweight span tracing of agent runs.
+
+A trace is started per agent request; code along the run path wraps its
+steps in spans (``with span("db.query"): ...``). Spans nest through context
+variables, so they follow the request across awaits and ``asyncio.to_thread``
+without passing anything around, and cost almost nothing when no trace is
+active.
+
+The part of a span name before the first dot is its category (db, llm, tool,
+prep, ...). A finished trace gives the time spent per category, which is
+returned in the Server-Timing header and stored with the assistant message,
+and can be exported as OpenTelemetry (OTLP/JSON) spans to a file or collector.
+"""
+
+import inspect
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.config import settings
+from src.utils.metrics import metrics
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "automagik-agents"
+
+
+@dataclass
+class Span:
+    """One timed step of a trace."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def category(self) -> str:
+        """Span name up to the first dot."""
+        return self.name.split(".", 1)[0]
+
+    @property
+    def duration_ms(self) -> float:
+        """Duration in milliseconds (up to now while the span is open)."""
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Convert the span to its OTLP/JSON representation."""
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """Convert one span attribute to an OTLP key/value pair."""
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Trace:
+    """Spans recorded while handling one request."""
+
+    def __init__(self, name: str, **attributes: Any):
+        """Start a trace with its root span.
+
+        Args:
+            name: Name of the root span
+            **attributes: Attributes of the root span
+        """
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span(name, self.trace_id, secrets.token_hex(8), None, time.time_ns(), attributes=attributes)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        """Record a finished span."""
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self) -> Dict[str, float]:
+        """Time spent per span category so far, in milliseconds.
+
+        A span nested in another span of its category isn't counted again.
+        Different categories can overlap (a db query inside a prep stage
+        counts for both), so they don't add up to the total.
+
+        Returns:
+            Milliseconds by category, plus "total" for the whole trace
+        """
+        with self._lock:
+            spans = list(self.spans)
+        by_id = {span.span_id: span for span in spans}
+        totals: Dict[str, float] = {}
+        for span in spans:
+            parent = by_id.get(span.parent_id)
+            while parent is not None and parent.category != span.category:
+                parent = by_id.get(parent.parent_id)
+            if parent is None:
+                totals[span.category] = totals.get(span.category, 0.0) + span.duration_ms
+        totals = {category: round(ms, 1) for category, ms in totals.items()}
+        totals["total"] = round(self.root.duration_ms, 1)
+        return totals
+
+    def server_timing(self) -> str:
+        """Format the breakdown as a Server-Timing header value."""
+        return ", ".join(f"{category};dur={ms}" for category, ms in self.breakdown().items())
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Convert the trace to an OTLP/JSON ExportTraceServiceRequest."""
+        with self._lock:
+            spans = [self.root] + self.spans
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def get_current_trace() -> Optional[Trace]:
+    """Get the trace of the current request.
+
+    Returns:
+        The active Trace, or None outside a traced request
+    """
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Optional[Trace]]:
+    """Trace a block as the root of a new trace.
+
+    The finished trace's breakdown is recorded in the metrics registry and
+    the trace is handed to the exporter, if one is configured.
+
+    Args:
+        name: Name of the root span
+        **attributes: Attributes of the root span
+
+    Yields:
+        The new Trace, or None if tracing is disabled
+    """
+    if not settings.AM_TRACING_ENABLED:
+        yield None
+        return
+
+    trace = Trace(name, **attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except Exception as e:
+        trace.root.error = str(e)
+        raise
+    finally:
+        trace.root.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        for category, ms in trace.breakdown().items():
+            metrics.observe(f"trace_{category}_ms", ms)
+        if _trace_exporter is not None:
+            _trace_exporter.export(trace)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time a block as a span of the current trace.
+
+    Args:
+        name: Span name, starting with its category (e.g. "db.query")
+        **attributes: Span attributes
+
+    Yields:
+        The new Span, or None outside a traced request
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name, trace.trace_id, secrets.token_hex(8), parent.span_id if parent else None,
+        time.time_ns(), attributes=attributes
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = str(e) or type(e).__name__
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.add(current)
+
+
+def traced(name: str) -> Callable:
+    """Decorate a function, sync or async, so each call is a span.
+
+    Args:
+        name: Span name, starting with its category
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TraceExporter(threading.Thread):
+    """Background thread exporting finished traces as OTLP/JSON."""
+
+    def __init__(self, exporter: str, path: Optional[str] = None, endpoint: Optional[str] = None,
+                 max_queue: int = 1000):
+        """Initialize the exporter.
+
+        Args:
+            exporter: "file" to append JSON lines to path, "otlp" to POST to endpoint
+            path: File traces are appended to
+            endpoint: OTLP/HTTP traces endpoint of a collector
+            max_queue: Traces waiting for export before new ones are dropped
+        """
+        super().__init__(name="trace-exporter", daemon=True)
+        self.exporter = exporter
+        self.path = path
+        self.endpoint = endpoint
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=max_queue)
+
+    def export(self, trace: Trace) -> None:
+        """Queue a finished trace without blocking the request."""
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            metrics.increment("traces_dropped")
+
+    def run(self) -> None:
+        client = None
+        if self.exporter == "otlp":
+            import httpx
+            client = httpx.Client(timeout=5)
+        try:
+            while True:
+                trace = self._queue.get()
+                if trace is None:
+                    break
+                try:
+                    self._write(trace, client)
+                    metrics.increment("traces_exported")
+                except Exception as e:
+                    metrics.increment("traces_dropped")
+                    logger.error(f"Error exporting trace {trace.trace_id}: {str(e)}")
+        finally:
+            if client is not None:
+                client.close()
+
+    def _write(self, trace: Trace, client: Any) -> None:
+        payload = trace.to_otlp()
+        if client is not None:
+            client.post(self.endpoint, json=payload).raise_for_status()
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload) + "\n")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Export the queued traces and stop the thread."""
+        self._queue.put(None)
+        if self.is_alive():
+            self.join(timeout)
+
+
+# Global exporter, created on start
+_trace_exporter: Optional[TraceExporter] = None
+
+
+def start_trace_exporter() -> Optional[TraceExporter]:
+    """Start exporting traces if AM_TRACE_EXPORTER is file or otlp.
+
+    Returns:
+        The running exporter, or None if traces aren't exported
+    """
+    global _trace_exporter
+
+    exporter = settings.AM_TRACE_EXPORTER
+    if not settings.AM_TRACING_ENABLED or exporter not in ("file", "otlp"):
+        return None
+    if _trace_exporter is None:
+        if exporter == "file":
+            os.makedirs(os.path.dirname(settings.AM_TRACE_EXPORT_PATH) or ".", exist_ok=True)
+        _trace_exporter = TraceExporter(
+            exporter,
+            path=settings.AM_TRACE_EXPORT_PATH,
+            endpoint=settings.AM_TRACE_OTLP_ENDPOINT
+        )
+        _trace_exporter.start()
+    return _trace_exporter
+
+
+def stop_trace_exporter() -> None:
+    """Stop the trace exporter if it is running."""
+    global _trace_exporter
+
+    if _trace_exporter is not None:
+        _trace_exporter.stop()
+        _trace_exporter = None
@@ -0,0 +1,84 @@
+"""Tests for admission control of agent runs."""
+
+import asyncio
+
+import pytest
+
+from src.api import admission
+from src.api.admission import AdmissionController, AdmissionRejected
+from src.api.controllers import agent_controller
+from src.api.models import AgentRunRequest
+from src.utils.metrics import metrics
+
+
+class TestAdmissionController:
+    """Tests for AdmissionController."""
+
+    @pytest.mark.asyncio
+    async def test_queued_run_gets_freed_slot_and_overflow_is_rejected(self):
+        """Test that a full limit queues one run and rejects the next with Retry-After."""
+        controller = AdmissionController(limits={"user": 1}, queue_size=1, queue_timeout=1.0)
+        first = await controller.acquire("simple", 1)
+        waiting = asyncio.create_task(controller.acquire("simple", 1))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("simple", 1)
+        assert rejected.value.status_code == 429 and rejected.value.scope == "user"
+        assert int(rejected.value.headers["Retry-After"]) >= 1
+        assert metrics.snapshot()["gauges"]["admission_user_queued"] == 1
+
+        first.release()
+        second = await waiting
+        assert metrics.snapshot()["gauges"]["admission_user_active"] == 1
+
+        # Other users have their own limit
+        other = await controller.acquire("simple", 2)
+        second.release()
+        other.release()
+        assert controller._limiters == {}
+
+    @pytest.mark.asyncio
+    async def test_wait_times_out_and_releases_earlier_slots(self):
+        """Test that a run rejected on one scope gives back the slots it already took."""
+        controller = AdmissionController(limits={"agent": 5, "user": 1}, queue_timeout=0.05)
+        held = await controller.acquire("simple", 1)
+
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("simple", 1)
+
+        assert controller._limiters[("agent", "simple")].active == 1
+        held.release()
+
+    @pytest.mark.asyncio
+    async def test_handle_agent_run_rejects_before_running(self, monkeypatch):
+        """Test that a rejected request never reaches the agent turn."""
+        controller = AdmissionController(limits={"api_key": 1}, queue_size=0)
+        monkeypatch.setattr(admission, "_admission_controller", controller)
+        turns = []
+
+        async def run_agent_turn(agent_name, requests):
+            turns.append(requests)
+            return {"message": "ok"}
+
+        monkeypatch.setattr(agent_controller, "run_agent_turn", run_agent_turn)
+        held = await controller.acquire(api_key="key")
+
+        with pytest.raises(AdmissionRejected):
+            await agent_controller.handle_agent_run("simple", AgentRunRequest(message_content="hi"), api_key="key")
+        held.release()
+        result = await agent_controller.handle_agent_run("simple", AgentRunRequest(message_content="hi"), api_key="key")
+
+        assert result == {"message": "ok"} and len(turns) == 1
+
+    @pytest.mark.asyncio
+    async def test_rejection_log_hides_api_key(self, caplog):
+        """Test that a rejected API key is logged by hash only."""
+        controller = AdmissionController(limits={"api_key": 1}, queue_size=0)
+        held = await controller.acquire("simple", 1, api_key="secret-key")
+
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("simple", 1, api_key="secret-key")
+        held.release()
+
+        assert "Rejected run: api_key" in caplog.text and "secret-key" not in caplog.text
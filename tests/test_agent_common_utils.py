@@ -19,10 +19,12 @@ from src.agents.common import (
     parse_model_settings,
     create_model_settings,
     create_usage_limits,
+    add_system_message_to_history,
     PromptBuilder,
     MemoryHandler,
     ToolRegistry
 )
+from src.utils.metrics import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -216,6 +218,64 @@ class TestPromptBuilder:
         assert "Hello John, welcome to" in filled_prompt
         assert "[No data for service]" in filled_prompt
 
+    def test_compiled_template_renders_in_one_pass(self):
+        """Test that values containing placeholders are not substituted again."""
+        compiled = PromptBuilder.compile_template("{{a}} and {{b}} in run {{run_id}}")
+
+        assert compiled is PromptBuilder.compile_template("{{a}} and {{b}} in run {{run_id}}")
+        assert compiled.variables == ["a", "b", "run_id"]
+        assert compiled.render({"a": "{{b}}", "b": {"x": 1}}, run_id="7") == '{{b}} and {\n  "x": 1\n} in run 7'
+
+    def test_memo_key_ignores_unused_run_id(self):
+        """Test that the run ID only splits memoized prompts that contain it."""
+        static = PromptBuilder.compile_template("Hello {{name}}")
+        per_run = PromptBuilder.compile_template("Hello {{name}} ({{run_id}})")
+
+        assert static.memo_key("v1", "1") == static.memo_key("v1", "2")
+        assert per_run.memo_key("v1", "1") != per_run.memo_key("v1", "2")
+
+        layout = static.render_layout({"name": "John"})
+        static.remember(static.memo_key("v1", "1"), layout)
+        assert static.lookup(static.memo_key("v1", "2")) is layout
+        assert static.lookup(static.memo_key("v2", "2")) is None
+
+    def test_prefix_cache_layout_keeps_prefix_stable(self):
+        """Test that memory changes only alter the trailing dynamic section."""
+        compiled = PromptBuilder.compile_template("You help {{name}}.\nRun {{run_id}}.\nBe brief.")
+
+        first = compiled.render_layout({"name": "John"}, run_id="1", layout="prefix_cache")
+        second = compiled.render_layout({"name": "Jane"}, run_id="2", layout="prefix_cache")
+
+        assert first.static_prefix == second.static_prefix
+        assert first.prefix_hash == second.prefix_hash
+        assert "John" not in first.static_prefix and "Be brief." in first.static_prefix
+        assert first.dynamic_section.endswith("<name>\nJohn\n</name>\n\n<run_id>\n1\n</run_id>")
+        assert first.text.startswith(first.static_prefix)
+
+        inline = compiled.render_layout({"name": "John"}, run_id="1")
+        assert inline.text == "You help John.\nRun 1.\nBe brief." and inline.dynamic_section is None
+        assert inline.prefix_hash == ""
+
+    def test_system_message_parts(self):
+        """Test that the dynamic section is sent as a second system part."""
+        history = add_system_message_to_history([], "static", dynamic_context="dynamic")
+        assert [part.content for part in history[0].parts] == ["static", "dynamic"]
+
+        history = add_system_message_to_history([], "static")
+        assert [part.content for part in history[0].parts] == ["static"]
+
+    def test_record_prefix_hash(self):
+        """Test that prefix stability is tracked per agent and user."""
+        assert PromptBuilder.record_prefix_hash(901, 1, "a") is False
+        assert PromptBuilder.record_prefix_hash(901, 1, "a") is True
+        assert PromptBuilder.record_prefix_hash(901, 1, "b") is False
+
+    def test_prompt_without_prefix_is_not_counted(self):
+        """Test that inline prompts with variables don't affect prefix stability."""
+        runs = metrics.get_counter("prompt_prefix_runs")
+        assert PromptBuilder.record_prefix_hash(902, 1, "") is False
+        assert metrics.get_counter("prompt_prefix_runs") == runs
+
 class TestToolRegistry:
     """Tests for ToolRegistry."""
     
@@ -235,6 +295,66 @@ class TestToolRegistry:
         assert "test_tool" in registry._registered_tools
         assert registry._registered_tools["test_tool"] == test_tool
 
+    def test_tool_catalog_is_built_once_per_owner(self):
+        """Test that instances of one agent class share converted tools."""
+        class Owner:
+            pass
+        
+        async def catalog_tool(x: int) -> int:
+            """Return x."""
+            return x
+        
+        first, second = ToolRegistry(), ToolRegistry()
+        first.register_tool(catalog_tool)
+        second.register_tool(catalog_tool)
+        
+        catalog = first.get_tool_catalog(Owner)
+        assert [tool.name for tool in catalog] == ["catalog_tool"]
+        assert second.get_tool_catalog(Owner) is catalog
+        assert first.get_tool_catalog(object) is not catalog
+    
+    def test_default_tools_read_context_from_deps(self):
+        """Test that the shared memory tools take their context from the run dependencies."""
+        from types import SimpleNamespace
+        from src.agents.common.tool_registry import _tool_context
+        from src.agents.models.dependencies import AutomagikAgentsDependencies
+        
+        deps = AutomagikAgentsDependencies().for_run(5, user_id=7, context={"agent_id": 5, "user_id": 7})
+        assert _tool_context(SimpleNamespace(deps=deps)) == {"agent_id": 5, "user_id": 7}
+        assert _tool_context(SimpleNamespace(deps=None)) == {}
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_runs_have_their_own_retry_counts(self):
+        """Test that runs sharing catalog tools don't share PydanticAI retry budgets."""
+        from pydantic_ai import Agent, ModelRetry, RunContext
+        from pydantic_ai.models.test import TestModel
+        
+        class Owner:
+            pass
+        
+        first_calls = set()
+        both_called = asyncio.Event()
+        
+        async def flaky_lookup(ctx: RunContext[str]) -> str:
+            """Fail the first call of each run, once both runs have made it."""
+            if ctx.deps not in first_calls:
+                first_calls.add(ctx.deps)
+                if len(first_calls) == 2:
+                    both_called.set()
+                await asyncio.wait_for(both_called.wait(), 1)
+                raise ModelRetry("try again")
+            return f"found for {ctx.deps}"
+        
+        registry = ToolRegistry()
+        registry.register_tool(flaky_lookup)
+        tools = registry.get_tool_catalog(Owner)
+        tools[0].max_retries = 1
+        agent = Agent(TestModel(call_tools=["flaky_lookup"]), tools=tools, deps_type=str)
+        
+        # Shared counts would reach 2 > max_retries when the second run fails
+        first, second = await asyncio.gather(agent.run("go", deps="a"), agent.run("go", deps="b"))
+        assert "found for a" in first.data and "found for b" in second.data
+
 if __name__ == "__main__":
     """Run the tests."""
     pytest.main(["-xvs", __file__]) 
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""Tests for the agent instance pool."""
+
+import pytest
+
+from src.agents.models.agent_factory import AgentFactory
+from src.agents.models.agent_pool import AgentPool, pool_key
+from src.agents.models.automagik_agent import AutomagikAgent
+
+
+class FakeAgent(AutomagikAgent):
+    """Agent that records its cleanup instead of holding real resources."""
+
+    def __init__(self, config):
+        super().__init__(config, "Hello {{name}}")
+        self.cleaned_up = False
+
+    async def run(self, input_text, **kwargs):
+        return None
+
+    async def cleanup(self):
+        self.cleaned_up = True
+
+
+@pytest.fixture
+def created(monkeypatch):
+    """Replace agent construction with FakeAgent and record every instance."""
+    agents = []
+
+    def create_agent(agent_type, config=None):
+        agent = FakeAgent(config or {})
+        agents.append(agent)
+        return agent
+
+    monkeypatch.setattr(AgentFactory, "create_agent", staticmethod(create_agent))
+    return agents
+
+
+class TestAgentPool:
+    """Tests for AgentPool."""
+
+    def test_pool_key_normalizes_type_and_parameters(self):
+        """Test that the key ignores the _agent suffix and parameter order."""
+        assert pool_key("simple_agent", {"b": 1, "a": 2}) == pool_key("simple", {"a": 2, "b": 1})
+        assert pool_key("simple", {"a": 1}) != pool_key("simple", {"a": 2})
+
+    @pytest.mark.asyncio
+    async def test_agents_are_shared_per_key(self, created):
+        """Test that concurrent and later requests with the same key share one instance."""
+        pool = AgentPool(max_size=4, idle_ttl=60)
+
+        first = await pool.acquire("simple", {"model": "x"})
+        second = await pool.acquire("simple_agent", {"model": "x"})
+        assert first is second and len(created) == 1
+        await pool.release(first)
+        await pool.release(second)
+
+        assert await pool.acquire("simple", {"model": "x"}) is first
+        other = await pool.acquire("simple", {"model": "y"})
+        assert other is not first and len(created) == 2
+
+    @pytest.mark.asyncio
+    async def test_eviction(self, created):
+        """Test that unused instances are evicted by size and by idle time."""
+        pool = AgentPool(max_size=1, idle_ttl=60)
+        first = await pool.acquire("simple", {"n": 1})
+        second = await pool.acquire("simple", {"n": 2})
+        assert len(pool) == 2
+
+        await pool.release(first)
+        assert len(pool) == 1 and first.cleaned_up
+        await pool.release(second)
+        assert not second.cleaned_up
+
+        pool.idle_ttl = -1
+        third = await pool.acquire("simple", {"n": 3})
+        assert second.cleaned_up and third is not second
+
+        await pool.release(third)
+        await pool.close()
+        assert len(pool) == 0 and third.cleaned_up
@@ -0,0 +1,66 @@
+"""Tests for streaming agent responses."""
+
+import json
+
+import pytest
+from pydantic_ai.models.test import TestModel
+
+from src.agents.models.response import AgentResponse
+from src.agents.simple.simple_agent.agent import SimpleAgent
+from src.api.controllers import agent_controller
+from src.api.models import AgentRunRequest
+
+
+def parse_sse(chunks):
+    """Parse SSE-formatted strings into (event, data) pairs."""
+    events = []
+    for chunk in chunks:
+        event_line, data_line = chunk.strip().split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+class FakeStreamingAgent:
+    """Agent streaming two deltas and a tool call."""
+
+    async def process_message_stream(self, user_message, **kwargs):
+        yield {"event": "text_delta", "data": {"delta": "Hel"}}
+        yield {"event": "tool_call", "data": {"tool_name": "t", "args": {}, "tool_call_id": "1"}}
+        yield {"event": "text_delta", "data": {"delta": "lo"}}
+        yield {"event": "response", "data": AgentResponse(text="Hello", usage={"total_tokens": 3})}
+
+
+class TestAgentStream:
+    """Tests for SimpleAgent.run_stream and the SSE controller."""
+
+    @pytest.mark.asyncio
+    async def test_simple_agent_streams_tool_events_and_text(self):
+        """Test that the stream reports tool calls, text deltas and a final response."""
+        agent = SimpleAgent({"model": "test"})
+        await agent._initialize_pydantic_agent()
+
+        with agent._agent_instance.override(model=TestModel(call_tools=["get_current_date"])):
+            events = [event async for event in agent.process_message_stream("hi", user_id=1)]
+
+        names = [event["event"] for event in events]
+        assert names[:2] == ["tool_call", "tool_result"]
+        assert names[-1] == "response" and "text_delta" in names
+
+        response = events[-1]["data"]
+        deltas = "".join(event["data"]["delta"] for event in events if event["event"] == "text_delta")
+        assert response.success and deltas == response.text
+        assert response.usage["requests"] == 2
+
+    @pytest.mark.asyncio
+    async def test_controller_emits_sse_events(self, monkeypatch):
+        """Test that agent events are sent as SSE with a final done event."""
+        async def prepare_agent_turn(agent_name, request):
+            return FakeStreamingAgent(), 1, "session-1", None
+
+        monkeypatch.setattr(agent_controller, "prepare_agent_turn", prepare_agent_turn)
+
+        stream = await agent_controller.handle_agent_run_stream("simple", AgentRunRequest(message_content="hi"))
+        events = parse_sse([chunk async for chunk in stream])
+
+        assert [name for name, _ in events] == ["text_delta", "tool_call", "text_delta", "done"]
+        assert events[-1][1] == {"session_id": "session-1", "message": "Hello", "success": True, "usage": {"total_tokens": 3}}
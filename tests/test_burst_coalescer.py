@@ -0,0 +1,109 @@
+"""Tests for burst coalescing of agent run requests."""
+
+import asyncio
+
+import pytest
+
+from src.api.models import AgentRunRequest
+from src.api.burst_coalescer import BurstCoalescer, get_burst_key
+
+
+def _request(text, session_id="6f1c1b7e-8a55-4c52-9a8e-3c3c1c9e1f00", payload=None):
+    return AgentRunRequest(message_content=text, session_id=session_id, channel_payload=payload)
+
+
+class TestBurstCoalescer:
+    """Test cases for BurstCoalescer."""
+
+    @pytest.mark.asyncio
+    async def test_burst_runs_one_turn_with_shared_response(self):
+        """Test that messages inside the window become one turn for everyone."""
+        coalescer = BurstCoalescer()
+        turns = []
+
+        async def run_turn(requests):
+            turns.append([r.message_content for r in requests])
+            return {"message": "answer", "session_id": "s", "success": True}
+
+        async def send(text, delay):
+            await asyncio.sleep(delay)
+            return await coalescer.submit("agent:s", _request(text), 50, run_turn)
+
+        results = await asyncio.gather(send("hi", 0), send("are you", 0.01), send("there?", 0.02))
+
+        assert turns == [["hi", "are you", "there?"]]
+        assert all(r["message"] == "answer" for r in results)
+        assert all(r["coalesced_messages"] == 3 for r in results)
+
+    @pytest.mark.asyncio
+    async def test_last_policy_releases_earlier_requests(self):
+        """Test that under the "last" policy only the newest request gets the answer."""
+        coalescer = BurstCoalescer()
+
+        async def run_turn(requests):
+            return {"message": "answer", "session_id": "s", "success": True}
+
+        async def send(text, delay):
+            await asyncio.sleep(delay)
+            return await coalescer.submit("agent:s", _request(text), 50, run_turn, policy="last")
+
+        first, last = await asyncio.gather(send("one", 0), send("two", 0.01))
+
+        assert first["message"] == "" and first["coalesced"] is True
+        assert last["message"] == "answer"
+
+    @pytest.mark.asyncio
+    async def test_last_policy_by_session_name_returns_resolved_session_id(self):
+        """Test that superseded requests of a named session get the session ID the turn resolved."""
+        coalescer = BurstCoalescer()
+
+        async def run_turn(requests):
+            return {"message": "answer", "session_id": "resolved-id", "success": True}
+
+        async def send(text, delay):
+            await asyncio.sleep(delay)
+            request = AgentRunRequest(message_content=text, session_name="support")
+            return await coalescer.submit("agent:name:support:1", request, 50, run_turn, policy="last")
+
+        first, last = await asyncio.gather(send("one", 0), send("two", 0.01))
+
+        assert first["message"] == "" and first["session_id"] == "resolved-id"
+        assert last["message"] == "answer"
+
+    @pytest.mark.asyncio
+    async def test_separate_sessions_are_not_merged(self):
+        """Test that different burst keys run independently."""
+        coalescer = BurstCoalescer()
+        turns = []
+
+        async def run_turn(requests):
+            turns.append(len(requests))
+            return {"message": "ok"}
+
+        await asyncio.gather(
+            coalescer.submit("agent:a", _request("a"), 20, run_turn),
+            coalescer.submit("agent:b", _request("b"), 20, run_turn),
+        )
+
+        assert turns == [1, 1]
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_request(self):
+        """Test that a failing turn fails all coalesced requests."""
+        coalescer = BurstCoalescer()
+
+        async def run_turn(requests):
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            coalescer.submit("agent:s", _request("a"), 20, run_turn),
+            coalescer.submit("agent:s", _request("b"), 20, run_turn),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_requests_without_session_are_not_coalesced(self):
+        """Test that temporary sessions never share a burst."""
+        assert get_burst_key("simple", AgentRunRequest(message_content="hi")) is None
+        assert get_burst_key("simple", _request("hi")).startswith("simple:id:")
@@ -0,0 +1,205 @@
+"""Tests for the asynchronous agent job runner."""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from src.api import job_runner as job_runner_module
+from src.api.admission import AdmissionController
+from src.api.job_runner import JobRunner, run_agent_job
+from src.api.models import AgentJobRequest
+from src.db.models import AgentJob
+from src.utils.metrics import metrics
+
+
+class FakeJobStore:
+    """In-memory stand-in for the agent_jobs repository functions."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.queue = []
+
+    def create_job(self, agent_name, request, callback_url=None):
+        job = AgentJob(id=uuid.uuid4(), agent_name=agent_name, request=request,
+                       callback_url=callback_url, created_at=datetime.now())
+        self.jobs[job.id] = job
+        self.queue.append(job.id)
+        return job
+
+    def claim_next_job(self):
+        if not self.queue:
+            return None
+        job = self.jobs[self.queue.pop(0)]
+        job.status = "running"
+        job.attempts += 1
+        job.started_at = job.created_at + timedelta(milliseconds=5)
+        return job.model_copy()
+
+    def _is_claim(self, job_id, attempts):
+        return self.jobs[job_id].status == "running" and self.jobs[job_id].attempts == attempts
+
+    def complete_job(self, job_id, result, attempts):
+        if not self._is_claim(job_id, attempts):
+            return False
+        self.jobs[job_id].status, self.jobs[job_id].result = "succeeded", result
+        return True
+
+    def fail_job(self, job_id, error, attempts):
+        if not self._is_claim(job_id, attempts):
+            return False
+        self.jobs[job_id].status, self.jobs[job_id].error = "failed", error
+        return True
+
+    def requeue_job(self, job_id):
+        self.jobs[job_id].status = "queued"
+        self.queue.append(job_id)
+        return True
+
+    def requeue_stale_jobs(self, stale_after, max_attempts):
+        return 0
+
+    def count_jobs(self, status):
+        return len(self.queue) if status == "queued" else 0
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Replace the job repository with an in-memory store."""
+    fake = FakeJobStore()
+    for name in ("create_job", "claim_next_job", "complete_job", "fail_job",
+                 "requeue_job", "requeue_stale_jobs", "count_jobs"):
+        monkeypatch.setattr(job_runner_module.job_repo, name, getattr(fake, name))
+    return fake
+
+
+class TestJobRunner:
+    """Tests for JobRunner."""
+
+    @pytest.mark.asyncio
+    async def test_workers_bound_concurrency_and_store_results(self, store):
+        """Test that queued jobs all finish with at most `concurrency` running at once."""
+        active = []
+        peak = []
+
+        async def run_job(job):
+            active.append(job.id)
+            peak.append(len(active))
+            await asyncio.sleep(0.05)
+            active.remove(job.id)
+            return {"message": job.request["message_content"]}
+
+        runner = JobRunner(concurrency=2, poll_interval=0.01, run_job=run_job)
+        await runner.start()
+        jobs = [await runner.submit("simple", AgentJobRequest(message_content=str(i))) for i in range(4)]
+        while any(store.jobs[job.id].status != "succeeded" for job in jobs):
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+        assert max(peak) == 2
+        assert [store.jobs[job.id].result for job in jobs] == [{"message": str(i)} for i in range(4)]
+        assert metrics.snapshot()["summaries"]["agent_job_wait_ms"]["max"] >= 5
+        assert metrics.snapshot()["gauges"]["agent_jobs_queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_run_records_error(self, store):
+        """Test that an HTTP error from the run fails the job with its detail."""
+        async def run_job(job):
+            raise HTTPException(status_code=409, detail="Session busy")
+
+        runner = JobRunner(run_job=run_job)
+        job = await runner.submit("simple", AgentJobRequest(message_content="hi"))
+
+        finished = await runner.execute(store.claim_next_job())
+
+        assert finished.status == "failed" and store.jobs[job.id].error == "Session busy"
+
+    @pytest.mark.asyncio
+    async def test_stop_requeues_running_jobs(self, store):
+        """Test that a job cancelled by shutdown goes back to the queue."""
+        async def run_job(job):
+            await asyncio.sleep(10)
+
+        runner = JobRunner(concurrency=1, poll_interval=0.01, run_job=run_job)
+        await runner.start()
+        job = await runner.submit("simple", AgentJobRequest(message_content="hi"))
+        while store.jobs[job.id].status != "running":
+            await asyncio.sleep(0.01)
+
+        await runner.stop(grace=0.05)
+
+        assert store.jobs[job.id].status == "queued" and store.queue == [job.id]
+
+    @pytest.mark.asyncio
+    async def test_invalid_callback_url_does_not_stop_worker(self, store):
+        """Test that invalid callback URLs are rejected and a stored one can't kill a worker."""
+        with pytest.raises(ValidationError):
+            AgentJobRequest(message_content="hi", callback_url="not a url")
+
+        async def run_job(job):
+            return {"message": job.request["message_content"]}
+
+        runner = JobRunner(concurrency=1, poll_interval=0.01, run_job=run_job)
+        broken = store.create_job("simple", {"message_content": "first"}, callback_url="http://[invalid")
+        job = await runner.submit("simple", AgentJobRequest(message_content="second"))
+        await runner.start()
+        while store.jobs[job.id].status != "succeeded":
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+        assert store.jobs[broken.id].status == "succeeded"
+
+    @pytest.mark.asyncio
+    async def test_outcome_of_superseded_claim_is_discarded(self, store):
+        """Test that a run finishing after its job was claimed again doesn't overwrite the new claim."""
+        release = asyncio.Event()
+
+        async def run_job(job):
+            if job.attempts == 1:
+                await release.wait()
+                return {"message": "stale"}
+            return {"message": "fresh"}
+
+        runner = JobRunner(run_job=run_job)
+        job = await runner.submit("simple", AgentJobRequest(message_content="hi"))
+        first = asyncio.create_task(runner.execute(store.claim_next_job()))
+        await asyncio.sleep(0)
+
+        # Recovered as stale while the first run is still going
+        store.requeue_job(job.id)
+        await runner.execute(store.claim_next_job())
+        release.set()
+        await first
+
+        assert store.jobs[job.id].result == {"message": "fresh"}
+        assert metrics.snapshot()["counters"]["agent_jobs_superseded"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_job_runs_take_admission_slots(self, store, monkeypatch):
+        """Test that job runs are held to the per-user admission limit."""
+        controller = AdmissionController(limits={"agent": 0, "user": 1, "api_key": 0},
+                                         queue_size=0, queue_timeout=0.01)
+        monkeypatch.setattr(job_runner_module, "get_admission_controller", lambda: controller)
+        running = asyncio.Event()
+        release = asyncio.Event()
+
+        async def run_agent_turn(agent_name, requests):
+            running.set()
+            await release.wait()
+            return {"message": requests[0].message_content}
+
+        monkeypatch.setattr("src.api.controllers.agent_controller.run_agent_turn", run_agent_turn)
+        runner = JobRunner(run_job=run_agent_job)
+        for _ in range(2):
+            await runner.submit("simple", AgentJobRequest(message_content="hi", user_id=1))
+        first = asyncio.create_task(runner.execute(store.claim_next_job()))
+        await running.wait()
+
+        second = await runner.execute(store.claim_next_job())
+        release.set()
+
+        assert second.status == "failed" and "Too many concurrent runs" in second.error
+        assert (await first).status == "succeeded"
@@ -0,0 +1,60 @@
+"""Tests for set-based batch memory creation.
+
+Database calls are patched out, so these tests do not need a database.
+"""
+
+import uuid
+
+import pytest
+
+import src.api.memory_routes as memory_routes
+from src.api.memory_models import MemoryBatchResponse, MemoryCreate
+from src.db.models import Memory
+from src.db.repository import memory as memory_repository
+
+
+class TestMemoryBatch:
+    """Test cases for the batch memory endpoint and upsert."""
+
+    def test_upsert_is_one_statement(self, monkeypatch):
+        """Test that a batch is written with a single execute_batch call."""
+        calls = []
+
+        def fake_execute_batch(query, params_list, commit=True, fetch=False):
+            calls.append((query, params_list))
+            return []
+
+        monkeypatch.setattr(memory_repository, "execute_batch", fake_execute_batch)
+
+        memories = [Memory(name=f"m{i}", content=str(i), agent_id=1) for i in range(1000)]
+        memories.append(Memory(name="m0", content="last", agent_id=1))
+        memory_repository.upsert_memories(memories, keep_settings=False)
+
+        assert len(calls) == 1
+        query, params_list = calls[0]
+        assert "ON CONFLICT" in query and "RETURNING" in query
+        assert "read_mode = COALESCE(EXCLUDED.read_mode" in query
+        assert len(params_list) == 1000
+        assert params_list[0][3] == "last"
+
+    @pytest.mark.asyncio
+    async def test_results_are_reported_per_item(self, monkeypatch):
+        """Test that invalid and unwritten memories fail individually."""
+        def fake_upsert_memories(memories, keep_settings=True):
+            # The database skips memories of unknown agents
+            return [memory.model_copy(update={"created_at": "2026-10-19T10:00:00", "updated_at": "2026-10-19T10:00:00"})
+                    for memory in memories if memory.agent_id != 404]
+
+        monkeypatch.setattr(memory_routes, "repo_upsert_memories", fake_upsert_memories)
+
+        response = MemoryBatchResponse(**await memory_routes.create_memories_batch([
+            MemoryCreate(name="likes", content="tea", agent_id=1, user_id=7),
+            MemoryCreate(name="bad_session", content="x", agent_id=1, session_id="not-a-uuid"),
+            MemoryCreate(name="orphan", content="x", agent_id=404),
+        ]))
+
+        assert [result.success for result in response.results] == [True, False, False]
+        assert response.results[0].memory.name == "likes"
+        assert "session_id" in response.results[1].error
+        assert "does not exist" in response.results[2].error
+        assert (response.succeeded, response.failed) == (1, 2)
@@ -0,0 +1,128 @@
+"""Tests for the versioned, user-scoped memory cache.
+
+Memory listing is patched out, so these tests do not need a database.
+"""
+
+import json
+import time
+import uuid
+
+import pytest
+
+import src.db
+from src.db.models import Memory
+from src.memory import memory_versions
+from src.memory.memory_versions import MemoryChangeListener, MemoryVersionRegistry
+from src.tools.memory import provider as provider_module
+from src.tools.memory.provider import MemoryProvider, get_memory_provider_for_agent
+from src.utils.lru import LRUDict
+from src.utils.metrics import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = MemoryVersionRegistry()
+    monkeypatch.setattr(memory_versions, "_memory_versions", registry)
+    return registry
+
+
+@pytest.fixture
+def list_calls(monkeypatch):
+    calls = []
+
+    def fake_list_memories(agent_id=None, user_id=None, **kwargs):
+        calls.append((agent_id, user_id))
+        return [Memory(id=uuid.uuid4(), name="likes", content=f"tea for {user_id}", agent_id=agent_id, user_id=user_id)]
+
+    monkeypatch.setattr(src.db, "list_memories", fake_list_memories)
+    return calls
+
+
+class TestMemoryCache:
+    """Test cases for MemoryProvider caching and invalidation."""
+
+    def test_cache_is_scoped_per_user(self, registry, list_calls):
+        """Test that two users of one agent get separate cache entries."""
+        alice = MemoryProvider(1, user_id=10)
+        bob = MemoryProvider(1, user_id=20)
+
+        assert alice.get_memory("likes") == "tea for 10"
+        assert bob.get_memory("likes") == "tea for 20"
+        assert alice.get_memory("likes") == "tea for 10"
+
+        assert list_calls == [(1, 10), (1, 20)]
+
+    def test_provider_registry_evicts_least_recently_used(self, monkeypatch):
+        """Test that the provider registry stays bounded as users grow."""
+        monkeypatch.setattr(provider_module, "_memory_providers", LRUDict(2))
+        MemoryProvider(1, user_id=10)
+        MemoryProvider(1, user_id=20)
+        get_memory_provider_for_agent(1, 10)
+        MemoryProvider(1, user_id=30)
+
+        assert get_memory_provider_for_agent(1, 10) is not None
+        assert get_memory_provider_for_agent(1, 20) is None
+        assert get_memory_provider_for_agent(1, 30) is not None
+
+    def test_version_registry_is_bounded_without_reusing_tokens(self, monkeypatch):
+        """Test that evicted scopes never return to a token seen before their last write."""
+        monkeypatch.setattr(memory_versions.settings, "AM_MEMORY_CACHE_MAX_SCOPES", 2)
+        registry = MemoryVersionRegistry()
+        before_write = registry.token(1, 10)
+        registry.bump(1, 10)
+        after_write = registry.token(1, 10)
+
+        for user_id in (20, 30, 40):
+            registry.bump(2, user_id)
+        assert len(registry._versions) == 2
+
+        evicted = registry.token(1, 10)
+        assert evicted != before_write and evicted >= after_write
+        registry.bump(1, 10)
+        assert registry.token(1, 10) not in (before_write, after_write, evicted)
+
+    def test_write_bumps_only_affected_scopes(self, registry, list_calls):
+        """Test that a write reloads its user's cache and the any-user cache only."""
+        alice = MemoryProvider(1, user_id=10)
+        bob = MemoryProvider(1, user_id=20)
+        everyone = MemoryProvider(1)
+        for provider in (alice, bob, everyone):
+            provider.get_all_memories()
+        list_calls.clear()
+
+        registry.bump(1, 10)
+        for provider in (alice, bob, everyone):
+            provider.get_all_memories()
+
+        assert list_calls == [(1, 10), (1, None)]
+
+    def test_untrusted_versions_bypass_cache(self, list_calls, monkeypatch):
+        """Test that nothing is cached while required notifications are unavailable."""
+        registry = MemoryVersionRegistry(require_listener=True)
+        monkeypatch.setattr(memory_versions, "_memory_versions", registry)
+        provider = MemoryProvider(2, user_id=10)
+
+        provider.get_all_memories()
+        provider.get_all_memories()
+        assert len(list_calls) == 2
+
+        registry.set_listening(True)
+        provider.get_all_memories()
+        provider.get_all_memories()
+        assert len(list_calls) == 3
+
+    def test_notification_invalidates_and_records_staleness(self, registry, list_calls):
+        """Test that a change from another process invalidates the local cache."""
+        provider = MemoryProvider(3, user_id=10)
+        provider.get_all_memories()
+        before = metrics.snapshot()["summaries"].get("memory_cache_staleness_seconds", {}).get("count", 0)
+
+        listener = MemoryChangeListener(registry)
+        listener.handle_payload(json.dumps({"agent_id": 3, "user_id": 10, "op": "UPDATE", "ts": time.time() - 0.5}))
+        provider.get_all_memories()
+
+        assert len(list_calls) == 2
+        staleness = metrics.snapshot()["summaries"]["memory_cache_staleness_seconds"]
+        assert staleness["count"] == before + 1
+        assert staleness["max"] >= 0.5
+        assert 0 <= metrics.snapshot()["gauges"]["memory_cache_hit_ratio"] <= 1
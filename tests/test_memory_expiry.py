@@ -0,0 +1,167 @@
+"""Tests for memory expiry and sweeping.
+
+The query helper is patched out, so these tests do not need a database.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.config import settings
+from src.db.models import Memory
+from src.db.repository import memory as memory_repository
+from src.memory.memory_sweeper import MemorySweeper
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    calls = []
+
+    def fake_execute_query(query, params=None, fetch=True, commit=True):
+        calls.append(" ".join(query.split()))
+        return []
+
+    monkeypatch.setattr(memory_repository, "execute_query", fake_execute_query)
+    return calls
+
+
+class FakeMemoryTable:
+    """Memories table answering the queries of create_memory, update_memory and get_memory_by_name."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, **values):
+        memory_id = uuid.uuid4()
+        now = datetime.now(timezone.utc)
+        self.rows[memory_id] = {
+            "id": memory_id, "description": None, "user_id": None, "read_mode": "tool_calling",
+            "access": "read_write", "metadata": None, "created_at": now, "updated_at": now, **values,
+        }
+        return memory_id
+
+    @staticmethod
+    def _expired(row):
+        return row["expires_at"] is not None and row["expires_at"] <= datetime.now(timezone.utc)
+
+    def _visible(self, query, row):
+        return memory_repository.NOT_EXPIRED_CONDITION not in query or not self._expired(row)
+
+    def execute_query(self, query, params=None, fetch=True, commit=True):
+        query = " ".join(query.split())
+        if query.startswith("INSERT INTO memories"):
+            name, session_id, agent_id = params[1], params[4], params[6]
+            for row in self.rows.values():
+                if (row["name"], str(row["session_id"]), row["agent_id"]) == (name, session_id, agent_id):
+                    if not ("WHERE memories.expires_at <= NOW()" in query and self._expired(row)):
+                        raise Exception("duplicate key value violates unique constraint")
+                    row.update(content=params[3], expires_at=params[10])
+                    return [{"id": str(row["id"])}]
+            memory_id = self.add(name=name, agent_id=agent_id, session_id=uuid.UUID(session_id),
+                                 content=params[3], expires_at=params[10])
+            return [{"id": str(memory_id)}]
+        if query.startswith("UPDATE memories"):
+            row = self.rows[uuid.UUID(str(params[-1]))]
+            revived, explicit, default = params[-4:-1]
+            if self._expired(row):
+                row["expires_at"] = revived
+            else:
+                row["expires_at"] = explicit or row["expires_at"] or default
+            row["content"] = params[2]
+            return []
+        name = params[0]
+        rows = [row for row in self.rows.values() if row["name"] == name and self._visible(query, row)]
+        if query.startswith("SELECT id FROM"):
+            return [{"id": row["id"]} for row in rows]
+        return [dict(row) for row in rows]
+
+
+class TestMemoryExpiry:
+    """Test cases for memory expiry."""
+
+    def test_session_memories_expire_by_default(self, monkeypatch):
+        """Test that only session memories get a default expiry."""
+        monkeypatch.setattr(settings, "AM_SESSION_MEMORY_TTL", 3600)
+        explicit = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+        session_expiry = memory_repository.memory_expires_at(Memory(name="scratch", session_id=uuid.uuid4()))
+        assert timedelta(minutes=59) < session_expiry - datetime.now(timezone.utc) <= timedelta(hours=1)
+        assert memory_repository.memory_expires_at(Memory(name="fact")) is None
+        assert memory_repository.memory_expires_at(Memory(name="fact", expires_at=explicit)) == explicit
+
+        monkeypatch.setattr(settings, "AM_SESSION_MEMORY_TTL", 0)
+        assert memory_repository.memory_expires_at(Memory(name="scratch", session_id=uuid.uuid4())) is None
+
+    def test_reads_hide_expired_memories(self, queries):
+        """Test that every read filters out expired rows."""
+        memory_repository.get_memory(uuid.uuid4())
+        memory_repository.get_memory_by_name("likes", agent_id=1)
+        memory_repository.list_memories(agent_id=1)
+        memory_repository.list_memories_page(agent_id=1)
+        memory_repository.count_memories(agent_id=1)
+
+        assert len(queries) == 5
+        assert all("(expires_at IS NULL OR expires_at > NOW())" in query for query in queries)
+
+    def test_update_keeps_stored_expiry(self, monkeypatch):
+        """Test that an update only replaces the expiry when one is given."""
+        monkeypatch.setattr(settings, "AM_SESSION_MEMORY_TTL", 3600)
+        calls = []
+
+        def fake_execute_query(query, params=None, fetch=True, commit=True):
+            calls.append((" ".join(query.split()), params))
+            return []
+
+        monkeypatch.setattr(memory_repository, "execute_query", fake_execute_query)
+        explicit = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+        memory_repository.update_memory(Memory(id=uuid.uuid4(), name="fact", agent_id=1))
+        memory_repository.update_memory(Memory(id=uuid.uuid4(), name="fact", agent_id=1, expires_at=explicit))
+        memory_repository.update_memory(Memory(id=uuid.uuid4(), name="scratch", agent_id=1, session_id=uuid.uuid4()))
+
+        assert all("ELSE COALESCE(%s::timestamptz, expires_at, %s::timestamptz) END" in query for query, _ in calls)
+        assert calls[0][1][-4:-1] == (None, None, None)
+        assert calls[1][1][-4:-1] == (explicit, explicit, explicit)
+        # A session memory keeps its expiry, falling back to the default only if it has none
+        assert calls[2][1][-3] is None and calls[2][1][-2] is not None
+
+    def test_rewriting_expired_unswept_memory_revives_it(self, monkeypatch):
+        """Test that writing a memory whose row expired but wasn't swept makes it readable again."""
+        monkeypatch.setattr(settings, "AM_SESSION_MEMORY_TTL", 3600)
+        table = FakeMemoryTable()
+        monkeypatch.setattr(memory_repository, "execute_query", table.execute_query)
+        session_id = uuid.uuid4()
+        expired_id = table.add(name="scratch", agent_id=1, session_id=session_id, content="old",
+                               expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+
+        memory_id = memory_repository.create_memory(
+            Memory(name="scratch", agent_id=1, session_id=session_id, content="new")
+        )
+
+        assert memory_id == expired_id
+        stored = memory_repository.get_memory_by_name("scratch", agent_id=1, session_id=session_id)
+        assert stored is not None and stored.content == "new"
+        assert stored.expires_at > datetime.now(timezone.utc) + timedelta(minutes=59)
+
+        # Updating by ID after the memory expired revives it the same way
+        table.rows[expired_id]["expires_at"] = datetime.now(timezone.utc) - timedelta(minutes=1)
+        memory_repository.update_memory(stored.model_copy(update={"content": "newer", "expires_at": None}))
+
+        stored = memory_repository.get_memory_by_name("scratch", agent_id=1, session_id=session_id)
+        assert stored is not None and stored.content == "newer"
+
+    def test_sweep_deletes_in_batches(self, monkeypatch):
+        """Test that a sweep keeps deleting batches until one comes back short."""
+        batches = [3, 3, 1]
+        calls = []
+
+        def fake_delete_expired_memories(batch_size):
+            calls.append(batch_size)
+            return batches.pop(0)
+
+        monkeypatch.setattr(memory_repository, "delete_expired_memories", fake_delete_expired_memories)
+
+        sweeper = MemorySweeper(batch_size=3, batch_pause=0)
+        assert sweeper.sweep() == 7
+        assert calls == [3, 3, 3]
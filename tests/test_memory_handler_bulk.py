@@ -0,0 +1,87 @@
+"""Tests for bulk loading of template memory variables.
+
+The query helper is patched out, so these tests do not need a database.
+"""
+
+import uuid
+from datetime import datetime
+
+import pytest
+
+from src.agents.common.memory_handler import MemoryHandler
+from src.db.repository import memory as memory_repository
+
+
+def _row(name, content, agent_id=1, user_id=7):
+    now = datetime.now()
+    return {
+        "id": uuid.uuid4(), "name": name, "description": None, "content": content,
+        "session_id": None, "user_id": user_id, "agent_id": agent_id,
+        "read_mode": "system_prompt", "access": "read_write", "metadata": None,
+        "created_at": now, "updated_at": now,
+    }
+
+
+class TestMemoryHandlerBulk:
+    """Test cases for bulk memory variable loading."""
+
+    @pytest.mark.asyncio
+    async def test_fetch_uses_one_query(self, monkeypatch):
+        """Test that all template variables are fetched or created in a single query."""
+        calls = []
+
+        def fake_execute_query(query, params=None, fetch=True, commit=True):
+            calls.append((query, params))
+            return [_row("personal_attributes", "likes tea"), _row("user_preferences", "None stored yet")]
+
+        monkeypatch.setattr(memory_repository, "execute_query", fake_execute_query)
+
+        result = await MemoryHandler.fetch_memory_vars(
+            ["personal_attributes", "run_id", "user_preferences", "missing"], agent_id=1, user_id=7
+        )
+
+        bulk_calls = [call for call in calls if "INSERT INTO memories" in call[0]]
+        assert len(bulk_calls) == 1
+        assert "run_id" not in bulk_calls[0][1]
+        assert result == {
+            "personal_attributes": "likes tea",
+            "user_preferences": "None stored yet",
+            "missing": "No data available",
+        }
+
+    def test_defaults_are_sent_for_missing_rows(self, monkeypatch):
+        """Test that default description and content are bound per variable."""
+        captured = {}
+
+        def fake_execute_query(query, params=None, fetch=True, commit=True):
+            captured["params"] = params
+            return []
+
+        monkeypatch.setattr(memory_repository, "execute_query", fake_execute_query)
+
+        MemoryHandler.load_memory_variables_sync(["technical_knowledge", "custom"], agent_id=1)
+
+        params = captured["params"]
+        assert params[1:4] == ["technical_knowledge", *MemoryHandler.get_default_memory_variable("technical_knowledge")]
+        assert params[5:8] == ["custom", "Auto-created template variable for SimpleAgent", "None stored yet"]
+
+    def test_no_agent_id_skips_query(self, monkeypatch):
+        """Test that nothing is queried without an agent ID."""
+        monkeypatch.setattr(memory_repository, "execute_query", lambda *a, **k: pytest.fail("queried"))
+
+        assert MemoryHandler.load_memory_variables_sync(["personal_attributes"], agent_id=None) == {}
+
+    def test_expired_rows_are_recreated(self, monkeypatch):
+        """Test that a name conflicting with an expired, unswept row replaces it instead of being skipped."""
+        captured = {}
+
+        def fake_execute_query(query, params=None, fetch=True, commit=True):
+            captured["query"] = " ".join(query.split())
+            return []
+
+        monkeypatch.setattr(memory_repository, "execute_query", fake_execute_query)
+
+        memory_repository.get_or_create_memories_by_name(["personal_attributes"], agent_id=1, user_id=7)
+
+        assert "ON CONFLICT DO NOTHING" not in captured["query"]
+        assert "DO UPDATE SET" in captured["query"] and "WHERE memories.expires_at <= NOW()" in captured["query"]
@@ -0,0 +1,80 @@
+"""Tests for database-side memory pagination.
+
+The query helper is patched out, so these tests do not need a database.
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from src.db.models import Memory
+from src.db.repository import memory as memory_repository
+from src.db.repository.memory import (
+    count_memories,
+    decode_memory_cursor,
+    encode_memory_cursor,
+    list_memories_page,
+)
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    calls = []
+
+    def fake_execute_query(query, params=None, fetch=True, commit=True):
+        calls.append((" ".join(query.split()), list(params or [])))
+        if "reltuples" in query:
+            return [{"estimate": 1200}]
+        if "COUNT(*)" in query:
+            return [{"count": 3}]
+        return []
+
+    monkeypatch.setattr(memory_repository, "execute_query", fake_execute_query)
+    return calls
+
+
+class TestMemoryPagination:
+    """Test cases for SQL pagination, sorting and counting of memories."""
+
+    def test_offset_page_is_limited_in_sql(self, queries):
+        """Test that sort, limit and offset are pushed into the query."""
+        list_memories_page(agent_id=1, limit=51, offset=100, sort_by="updated_at", sort_desc=False)
+
+        query, params = queries[0]
+        assert "AND agent_id = %s" in query
+        assert "ORDER BY updated_at ASC, id ASC LIMIT %s OFFSET %s" in query
+        assert params == [1, 51, 100]
+
+    def test_keyset_cursor_round_trip(self, queries):
+        """Test that a cursor continues after the last row without an offset."""
+        last = Memory(id=uuid.uuid4(), name="b", created_at=datetime(2026, 1, 2, tzinfo=timezone.utc))
+        cursor = encode_memory_cursor(last, "created_at")
+        after = decode_memory_cursor(cursor, "created_at")
+
+        list_memories_page(limit=10, offset=500, after=after)
+
+        query, params = queries[0]
+        assert "AND (created_at, id) < (%s::timestamptz, %s::uuid)" in query
+        assert "OFFSET" not in query
+        assert params == ["2026-01-02T00:00:00+00:00", str(last.id), 10]
+
+    def test_cursor_must_match_sort(self):
+        """Test that cursors are rejected for another sort column or when malformed."""
+        cursor = encode_memory_cursor(Memory(id=uuid.uuid4(), name="a"), "name")
+
+        with pytest.raises(ValueError):
+            decode_memory_cursor(cursor, "created_at")
+        with pytest.raises(ValueError):
+            decode_memory_cursor("not-a-cursor", "name")
+
+    def test_invalid_sort_column_is_not_queried(self, queries):
+        """Test that unknown sort columns never reach the SQL."""
+        assert list_memories_page(sort_by="content; DROP TABLE memories") == []
+        assert queries == []
+
+    def test_unfiltered_count_uses_estimate(self, queries):
+        """Test that only filtered counts scan the table."""
+        assert count_memories() == 1200
+        assert count_memories(agent_id=1) == 3
+        assert "reltuples" in queries[0][0] and "COUNT(*)" in queries[1][0]
@@ -0,0 +1,78 @@
+"""Tests for precomputed system prompt memory bundles.
+
+The query helper is patched out, so these tests do not need a database.
+"""
+
+import pytest
+
+from src.agents.common.memory_handler import MemoryHandler
+from src.db.repository import memory as memory_repository
+from src.memory import memory_versions, prompt_bundles
+from src.memory.memory_versions import MemoryVersionRegistry
+from src.memory.prompt_bundles import PromptBundleCache
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = MemoryVersionRegistry()
+    monkeypatch.setattr(memory_versions, "_memory_versions", registry)
+    monkeypatch.setattr(prompt_bundles, "_prompt_bundle_cache", PromptBundleCache())
+    return registry
+
+
+class TestMemoryPromptBundles:
+    """Test cases for filling prompts from memory prompt bundles."""
+
+    @pytest.mark.asyncio
+    async def test_fill_reads_one_row_then_none(self, registry, monkeypatch):
+        """Test that a cold fill is one primary-key read and a warm fill is none."""
+        calls = []
+
+        def fake_execute_query(query, params=None, fetch=True, commit=True):
+            calls.append(params)
+            assert "FROM memory_prompt_bundles" in query and "WHERE agent_id = %s AND user_id = %s" in query
+            return [{"agent_id": 1, "user_id": 7, "version": len(calls),
+                     "memories": {"personal_attributes": f"likes tea {len(calls)}", "user_preferences": "brief"}}]
+
+        monkeypatch.setattr(memory_repository, "execute_query", fake_execute_query)
+        template_vars = ["personal_attributes", "run_id", "user_preferences"]
+
+        first = await MemoryHandler.fetch_memory_vars(template_vars, agent_id=1, user_id=7)
+        second = await MemoryHandler.fetch_memory_vars(template_vars, agent_id=1, user_id=7)
+        assert first == second == {"personal_attributes": "likes tea 1", "user_preferences": "brief"}
+        assert calls == [(1, 7)]
+
+        # A write to the scope makes the next fill read the rebuilt bundle
+        registry.bump(1, 7)
+        third = await MemoryHandler.fetch_memory_vars(template_vars, agent_id=1, user_id=7)
+        assert third["personal_attributes"] == "likes tea 2"
+        assert len(calls) == 2
+
+    def test_shared_memories_use_user_zero(self, registry, monkeypatch):
+        """Test that a missing user reads the agent's shared bundle."""
+        calls = []
+
+        def fake_execute_query(query, params=None, fetch=True, commit=True):
+            calls.append(params)
+            return []
+
+        monkeypatch.setattr(memory_repository, "execute_query", fake_execute_query)
+
+        assert PromptBundleCache().get(3) is None
+        assert calls == [(3, 0)]
+
+    def test_cache_is_bounded(self, registry, monkeypatch):
+        """Test that the least recently used bundle is evicted past the size limit."""
+        calls = []
+
+        def fake_execute_query(query, params=None, fetch=True, commit=True):
+            calls.append(params)
+            return [{"agent_id": params[0], "user_id": params[1], "version": 1, "memories": {"name": "value"}}]
+
+        monkeypatch.setattr(memory_repository, "execute_query", fake_execute_query)
+        cache = PromptBundleCache(max_entries=2)
+
+        for user_id in (1, 2, 1, 3, 1, 2):
+            cache.get(1, user_id)
+        # User 2 was evicted by user 3 while user 1 stayed recently used
+        assert calls == [(1, 1), (1, 2), (1, 3), (1, 2)]
@@ -0,0 +1,112 @@
+"""Tests for turn-scoped memory write buffering.
+
+The upsert is patched out, so these tests do not need a database.
+"""
+
+import uuid
+
+import pytest
+
+from src.db.models import Memory
+from src.db.repository import memory as memory_repository
+from src.memory.write_buffer import buffered_memory_writes, get_write_buffer
+from src.tools.memory import tool as memory_tool
+
+
+@pytest.fixture
+def upserts(monkeypatch):
+    calls = []
+
+    def fake_upsert_memories(memories):
+        calls.append([(memory.name, memory.content) for memory in memories])
+        return memories
+
+    monkeypatch.setattr(memory_repository, "upsert_memories", fake_upsert_memories)
+    monkeypatch.setattr(memory_tool, "db_create_memory", lambda memory: pytest.fail("wrote during the turn"))
+    return calls
+
+
+class TestMemoryWriteBuffer:
+    """Test cases for coalescing memory writes within a turn."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_writes_flush_once(self, upserts):
+        """Test that the final value of each memory is flushed in one upsert."""
+        ctx = {"agent_id": 1, "user_id": 7}
+
+        async with buffered_memory_writes() as buffer:
+            await memory_tool.store_memory_tool("mood", "happy", ctx=ctx)
+            await memory_tool.store_memory_tool("mood", "tired", ctx=ctx)
+            await memory_tool.store_memory_tool("city", "Lisbon", ctx=ctx)
+
+            # Reads in the same turn see the buffered values
+            assert await memory_tool.get_memory_tool(ctx, "mood") == "tired"
+            assert len(buffer) == 2 and buffer.write_count == 3
+            assert upserts == []
+
+        assert upserts == [[("mood", "tired"), ("city", "Lisbon")]]
+        assert get_write_buffer() is None
+
+    @pytest.mark.asyncio
+    async def test_buffer_keeps_first_identity(self, upserts):
+        """Test that rewriting a memory keeps the ID it was first buffered with."""
+        ctx = {"agent_id": 1, "user_id": 7}
+
+        async with buffered_memory_writes() as buffer:
+            await memory_tool.store_memory_tool("mood", "happy", ctx=ctx)
+            first_id = buffer.find("mood").id
+            await memory_tool.store_memory_tool("mood", "tired", ctx=ctx)
+
+            assert buffer.find("mood", agent_id=1, user_id=7).id == first_id
+            assert buffer.find("mood", user_id=8) is None
+
+    @pytest.mark.asyncio
+    async def test_flushes_when_turn_fails(self, upserts):
+        """Test that acknowledged writes are stored even if the turn raises."""
+        with pytest.raises(RuntimeError):
+            async with buffered_memory_writes():
+                await memory_tool.store_memory_tool("mood", "happy", ctx={"agent_id": 1, "user_id": 7})
+                raise RuntimeError("model error")
+
+        assert upserts == [[("mood", "happy")]]
+
+    @pytest.mark.asyncio
+    async def test_memory_tools_read_and_write_through_the_buffer(self, upserts, monkeypatch):
+        """Test that create, read and update-by-ID see and write this turn's values."""
+        stored = Memory(id=uuid.uuid4(), name="city", content="Porto", agent_id=1, user_id=7)
+        monkeypatch.setattr(memory_tool, "map_agent_id", lambda ctx: (1, 7, None))
+        monkeypatch.setattr(memory_tool, "get_memory_in_db", lambda memory_id: stored if str(memory_id) == str(stored.id) else None)
+        monkeypatch.setattr(memory_tool, "list_memories_in_db", lambda **kwargs: [stored])
+        monkeypatch.setattr(memory_tool, "create_memory_in_db", lambda memory: pytest.fail("wrote during the turn"))
+        monkeypatch.setattr(memory_tool, "update_memory_in_db", lambda memory: pytest.fail("wrote during the turn"))
+
+        async with buffered_memory_writes():
+            created = await memory_tool.create_memory(None, "mood", "happy")
+            await memory_tool.store_memory_tool("city", "Lisbon", ctx={"agent_id": 1, "user_id": 7})
+
+            assert (await memory_tool.read_memory(None, memory_id=created["id"]))["content"] == "happy"
+            assert (await memory_tool.read_memory(None, memory_id=str(stored.id)))["content"] == "Lisbon"
+            listed = await memory_tool.read_memory(None, list_all=True)
+            assert sorted(m["content"] for m in listed["memories"]) == ["Lisbon", "happy"]
+
+            updated = await memory_tool.update_memory(None, "Braga", memory_id=str(stored.id))
+            assert updated["success"]
+            assert (await memory_tool.read_memory(None, name="city"))["content"] == "Braga"
+
+        assert upserts == [[("mood", "happy"), ("city", "Braga")]]
+
+    @pytest.mark.asyncio
+    async def test_rename_is_written_directly_and_not_overwritten(self, upserts, monkeypatch):
+        """Test that a rename by ID goes to the database and drops the stale buffered value."""
+        stored = Memory(id=uuid.uuid4(), name="city", content="Porto", agent_id=1, user_id=7)
+        renamed = []
+        monkeypatch.setattr(memory_tool, "map_agent_id", lambda ctx: (1, 7, None))
+        monkeypatch.setattr(memory_tool, "get_memory_in_db", lambda memory_id: stored)
+        monkeypatch.setattr(memory_tool, "update_memory_in_db", lambda memory: renamed.append(memory) or memory.id)
+
+        async with buffered_memory_writes():
+            await memory_tool.store_memory_tool("city", "Lisbon", ctx={"agent_id": 1, "user_id": 7})
+            await memory_tool.update_memory(None, "Faro", memory_id=str(stored.id), name="home_city")
+
+        assert [(m.id, m.name, m.content) for m in renamed] == [(stored.id, "home_city", "Faro")]
+        assert upserts == []
@@ -0,0 +1,166 @@
+"""Tests for MessageHistory persistence helpers.
+
+These tests exercise the serialization helpers, the row converter and turn
+batching with the repository patched out, so they do not need a database.
+"""
+
+import uuid
+
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    UserPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart
+)
+
+from src.db.models import Message
+from src.db.repository import message as message_repository
+from src.memory import message_history as message_history_module
+from src.memory.message_history import MessageHistory, dump_model_messages, split_native_turn
+
+
+def _run_messages():
+    return [
+        ModelRequest(parts=[SystemPromptPart(content="You are helpful"), UserPromptPart(content="Hi")]),
+        ModelResponse(parts=[ToolCallPart(tool_name="get_memory_tool", args={"key": "name"}, tool_call_id="call_1")]),
+        ModelRequest(parts=[ToolReturnPart(tool_name="get_memory_tool", content="John", tool_call_id="call_1")]),
+        ModelResponse(parts=[TextPart(content="Hello John")]),
+    ]
+
+
+def _history():
+    # The converter is database-free, so skip session bootstrapping
+    history = MessageHistory.__new__(MessageHistory)
+    history.session_id = str(uuid.uuid4())
+    history.user_id = 1
+    return history
+
+
+class TestNativeMessages:
+    """Test cases for native message payloads."""
+
+    def test_split_native_turn(self):
+        """Test splitting a run into user and assistant payloads."""
+        user_native, agent_native = split_native_turn(dump_model_messages(_run_messages()))
+
+        assert len(user_native) == 1
+        assert [p["part_kind"] for p in user_native[0]["parts"]] == ["user-prompt"]
+        assert len(agent_native) == 3
+
+    def test_split_native_turn_empty(self):
+        """Test splitting with no messages."""
+        assert split_native_turn(None) == (None, None)
+        assert split_native_turn([]) == (None, None)
+
+    def test_convert_native_rows_round_trip(self):
+        """Test that native rows decode back to the exact run messages."""
+        user_native, agent_native = split_native_turn(dump_model_messages(_run_messages()))
+        session_id = uuid.uuid4()
+        rows = [
+            Message(session_id=session_id, role="user", text_content="Hi", native_messages=user_native),
+            Message(session_id=session_id, role="assistant", text_content="Hello John", native_messages=agent_native),
+        ]
+
+        messages = _history()._convert_db_messages_to_model_messages(rows, include_tools=True)
+
+        assert len(messages) == 4
+        assert isinstance(messages[1].parts[0], ToolCallPart)
+        assert isinstance(messages[2].parts[0], ToolReturnPart)
+        assert messages[3].parts[0].content == "Hello John"
+
+    def test_convert_native_rows_without_tools(self):
+        """Test that native rows honor include_tools=False like legacy rows."""
+        user_native, agent_native = split_native_turn(dump_model_messages(_run_messages()))
+        session_id = uuid.uuid4()
+        rows = [
+            Message(session_id=session_id, role="user", text_content="Hi", native_messages=user_native),
+            Message(session_id=session_id, role="assistant", text_content="Hello John", native_messages=agent_native),
+        ]
+
+        messages = _history()._convert_db_messages_to_model_messages(rows)
+
+        assert len(messages) == 2
+        assert messages[0].parts[-1].content == "Hi"
+        assert messages[1].parts[0].content == "Hello John"
+
+    def test_convert_mixed_legacy_and_native_rows(self):
+        """Test that legacy rows keep their position between native rows."""
+        user_native, agent_native = split_native_turn(dump_model_messages(_run_messages()))
+        session_id = uuid.uuid4()
+        rows = [
+            Message(session_id=session_id, role="user", text_content="Old question"),
+            Message(session_id=session_id, role="assistant", text_content="Old answer"),
+            Message(session_id=session_id, role="user", text_content="Hi", native_messages=user_native),
+            Message(session_id=session_id, role="assistant", text_content="Hello John", native_messages=agent_native),
+        ]
+
+        messages = _history()._convert_db_messages_to_model_messages(rows, include_tools=True)
+
+        assert len(messages) == 6
+        assert messages[0].parts[0].content == "Old question"
+        assert messages[1].parts[0].content == "Old answer"
+        assert messages[2].parts[0].content == "Hi"
+        assert messages[5].parts[0].content == "Hello John"
+
+
+class TestAddTurn:
+    """Test cases for batched turn persistence."""
+
+    def test_add_turn_inserts_all_rows_once(self, monkeypatch):
+        """Test that a turn is written with a single create_messages call."""
+        calls = []
+
+        def fake_create_messages(rows):
+            calls.append(rows)
+            return [row.id for row in rows]
+
+        monkeypatch.setattr(message_history_module, "create_messages", fake_create_messages)
+
+        history = _history()
+        result = history.add_turn([
+            {"role": "user", "content": "Hi", "agent_id": 1, "channel_payload": {"from": "whatsapp"}},
+            {"role": "assistant", "content": "Hello", "agent_id": 1, "system_prompt": "Be nice",
+             "tool_calls": [{"tool_name": "t", "args": {}, "tool_call_id": "c1"}]},
+        ])
+
+        assert len(calls) == 1
+        rows = calls[0]
+        assert [row.role for row in rows] == ["user", "assistant"]
+        assert rows[0].channel_payload == {"from": "whatsapp"}
+        assert rows[1].system_prompt == "Be nice"
+        assert rows[1].tool_calls == {"0": {"tool_name": "t", "args": {}, "tool_call_id": "c1"}}
+        assert isinstance(result[0], ModelRequest)
+        assert isinstance(result[1], ModelResponse)
+
+    def test_create_messages_single_statement(self, monkeypatch):
+        """Test that create_messages issues one multi-row INSERT in input order."""
+        captured = {}
+
+        def fake_execute_batch(query, params_list, commit=True, fetch=False):
+            captured["query"] = query
+            captured["params"] = params_list
+            return [{"id": params[0], "message_seq": i + 10} for i, params in enumerate(params_list)]
+
+        monkeypatch.setattr(message_repository, "execute_batch", fake_execute_batch)
+
+        session_id = uuid.uuid4()
+        rows = [
+            Message(id=uuid.uuid4(), session_id=session_id, role="user", text_content="Hi"),
+            Message(id=uuid.uuid4(), session_id=session_id, role="assistant", text_content="Hello",
+                    tool_calls={"0": {"tool_name": "t"}}),
+        ]
+
+        message_ids = message_repository.create_messages(rows)
+
+        assert message_ids == [rows[0].id, rows[1].id]
+        assert "VALUES %s" in captured["query"]
+        assert len(captured["params"]) == 2
+        # JSON fields are serialized before insert
+        assert captured["params"][1][8] == '{"0": {"tool_name": "t"}}'
+
+    def test_create_messages_empty(self):
+        """Test that an empty batch does not touch the database."""
+        assert message_repository.create_messages([]) == []
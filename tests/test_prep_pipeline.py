@@ -0,0 +1,42 @@
+"""Tests for the concurrent run preparation pipeline."""
+
+import asyncio
+
+import pytest
+
+from src.agents.common.prep_pipeline import PreparationPipeline
+from src.utils.metrics import metrics
+
+
+class TestPreparationPipeline:
+    """Tests for PreparationPipeline."""
+
+    @pytest.mark.asyncio
+    async def test_stages_run_concurrently(self):
+        """Test that the pipeline takes as long as its slowest stage."""
+        async def slow(value, delay):
+            await asyncio.sleep(delay)
+            return value
+
+        pipeline = PreparationPipeline()
+        pipeline.add_stage("history", lambda: slow("h", 0.1)).add_stage("prompt", lambda: slow("p", 0.1))
+        before = metrics.snapshot()["summaries"].get("agent_prep_history_ms", {}).get("count", 0)
+
+        results = await pipeline.run()
+
+        assert results == {"history": "h", "prompt": "p"}
+        assert pipeline.timings["history"] >= 100 and pipeline.timings["prompt"] >= 100
+        assert pipeline.timings["total"] < 190
+        assert metrics.snapshot()["summaries"]["agent_prep_history_ms"]["count"] == before + 1
+
+    @pytest.mark.asyncio
+    async def test_stage_error_is_raised_and_timed(self):
+        """Test that a failing stage raises its error and still records its timing."""
+        async def fail():
+            raise ValueError("no history")
+
+        pipeline = PreparationPipeline().add_stage("history", fail)
+
+        with pytest.raises(ValueError):
+            await pipeline.run()
+        assert "history" in pipeline.timings
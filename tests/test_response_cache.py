@@ -0,0 +1,101 @@
+"""Tests for the exact-match LLM response cache."""
+
+import pytest
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import FunctionModel
+
+from src.agents.common import response_cache
+from src.agents.common.prompt_builder import PromptBuilder
+from src.agents.common.response_cache import InMemoryResponseCache, response_cache_key
+from src.agents.simple.simple_agent.agent import SimpleAgent
+
+
+class TestResponseCacheKey:
+    """Tests for response_cache_key."""
+
+    def test_key_ignores_timestamps_but_not_content(self):
+        """Test that only what the model sees changes the key."""
+        history = [{"parts": [{"content": "hi", "timestamp": "2026-01-01T00:00:00Z"}]}]
+        later = [{"parts": [{"content": "hi", "timestamp": "2026-02-01T00:00:00Z"}]}]
+        key = response_cache_key("openai:gpt-4o-mini", {"temperature": 0}, ["b", "a"], history, "q")
+
+        assert key == response_cache_key("openai:gpt-4o-mini", {"temperature": 0}, ["a", "b"], later, "q")
+        assert key != response_cache_key("openai:gpt-4o-mini", {"temperature": 0.7}, ["a", "b"], history, "q")
+        assert key != response_cache_key("openai:gpt-4o-mini", {"temperature": 0}, ["a", "b"], history, "q2")
+
+
+class TestInMemoryResponseCache:
+    """Tests for InMemoryResponseCache."""
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_and_ttl(self):
+        """Test that the least recently used entry is evicted and expired ones are misses."""
+        cache = InMemoryResponseCache(max_entries=2)
+        await cache.set("a", {"text": "A"}, ttl=60)
+        await cache.set("b", {"text": "B"}, ttl=60)
+        await cache.get("a")
+        await cache.set("c", {"text": "C"}, ttl=0)
+
+        assert await cache.get("a") == {"text": "A"}
+        assert await cache.get("b") is None
+        assert await cache.get("c") is None
+
+
+class FAQAgent(SimpleAgent):
+    """SimpleAgent with a fixed system prompt (the default one embeds the run ID)."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.system_prompt = "You answer questions about the shop."
+        self.prompt_template = PromptBuilder.compile_template(self.system_prompt)
+        self.template_vars = []
+
+
+class TestSimpleAgentResponseCache:
+    """Tests for response caching in SimpleAgent runs."""
+
+    @pytest.mark.asyncio
+    async def test_identical_run_is_served_from_cache(self, monkeypatch):
+        """Test that a repeated request returns the cached response without calling the model."""
+        monkeypatch.setattr(response_cache, "_response_cache", InMemoryResponseCache())
+        calls = []
+
+        def answer(messages, info):
+            calls.append(messages)
+            return ModelResponse(parts=[TextPart(content="Opening hours are 9-5")])
+
+        agent = FAQAgent({"model": "test", "response_cache": "true", "model_settings.temperature": 0})
+        await agent._initialize_pydantic_agent()
+
+        with agent._agent_instance.override(model=FunctionModel(answer)):
+            first = await agent.process_message("When are you open?", user_id=1)
+            second = await agent.process_message("When are you open?", user_id=1)
+            other = await agent.process_message("Where are you?", user_id=1)
+
+        assert len(calls) == 2
+        assert not first.cached and first.usage["requests"] == 1
+        assert second.cached and second.text == first.text
+        assert second.usage["total_tokens"] == 0
+        assert not other.cached
+
+    @pytest.mark.asyncio
+    async def test_runs_calling_tools_are_not_cached(self, monkeypatch):
+        """Test that a run that called a tool calls the model and the tool again next time."""
+        monkeypatch.setattr(response_cache, "_response_cache", InMemoryResponseCache())
+        calls = []
+
+        def answer(messages, info):
+            calls.append(messages)
+            if any(isinstance(part, ToolReturnPart) for part in messages[-1].parts):
+                return ModelResponse(parts=[TextPart(content="It's a weekday")])
+            return ModelResponse(parts=[ToolCallPart(tool_name="get_current_date", args={})])
+
+        agent = FAQAgent({"model": "test", "response_cache": "true", "model_settings.temperature": 0})
+        await agent._initialize_pydantic_agent()
+
+        with agent._agent_instance.override(model=FunctionModel(answer)):
+            first = await agent.process_message("What day is it?", user_id=1)
+            second = await agent.process_message("What day is it?", user_id=1)
+
+        assert first.tool_calls and first.text == "It's a weekday"
+        assert not second.cached and len(calls) == 4
@@ -0,0 +1,65 @@
+"""Tests for request-scoped agent run state."""
+
+import asyncio
+
+import pytest
+
+from src.agents.models.automagik_agent import AutomagikAgent
+from src.agents.models.dependencies import AutomagikAgentsDependencies
+from src.agents.models.response import AgentResponse
+from src.context import get_current_agent_id, get_current_user_id, resolve_tool_context
+
+
+class RecordingAgent(AutomagikAgent):
+    """Agent whose runs report the state they see."""
+
+    def __init__(self):
+        super().__init__({"agent_id": "5"}, "Hello")
+        self.dependencies = AutomagikAgentsDependencies()
+        self.dependencies.set_agent_id(self.db_id)
+
+    async def run(self, input_text, **kwargs):
+        # Let the concurrent run start before reading the state
+        await asyncio.sleep(0.01)
+        run = self.current_run()
+        seen = {
+            "user_id": run.user_id,
+            "deps_user_id": run.dependencies.user_id,
+            "tool_user_id": resolve_tool_context(self.context)["user_id"],
+            "current_user_id": get_current_user_id(),
+            "agent_id": get_current_agent_id(),
+        }
+        return AgentResponse(text=input_text, success=True, tool_calls=[seen])
+
+
+class TestRunContext:
+    """Tests for AgentRunContext and AutomagikAgent.current_run."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_runs_are_isolated(self):
+        """Test that two concurrent runs on one agent each see only their own state."""
+        agent = RecordingAgent()
+
+        first, second = await asyncio.gather(
+            agent.process_message("a", user_id=1, session_id="s1"),
+            agent.process_message("b", user_id=2, session_id="s2", agent_id=9),
+        )
+
+        assert first.tool_calls[0] == {
+            "user_id": 1, "deps_user_id": 1, "tool_user_id": 1, "current_user_id": 1, "agent_id": 5
+        }
+        assert second.tool_calls[0] == {
+            "user_id": 2, "deps_user_id": 2, "tool_user_id": 2, "current_user_id": 2, "agent_id": 9
+        }
+
+    @pytest.mark.asyncio
+    async def test_runs_leave_agent_state_unchanged(self):
+        """Test that a run doesn't mutate the shared agent."""
+        agent = RecordingAgent()
+        await agent.process_message("a", user_id=3, session_id="s", agent_id=9)
+
+        assert agent.db_id == 5
+        assert agent.context == {"agent_id": 5}
+        assert agent.dependencies.user_id is None
+        assert agent.current_run().agent_id == 5
+        assert get_current_user_id() is None and resolve_tool_context({"x": 1}) == {"x": 1}
@@ -0,0 +1,143 @@
+"""Tests for semantic memory retrieval.
+
+The embedding storage functions are patched out, so these tests do not need
+a database or network access.
+"""
+
+import uuid
+from datetime import datetime
+
+import pytest
+
+from src.db.repository import memory as memory_repository
+from src.memory import memory_versions
+from src.memory.memory_versions import MemoryVersionRegistry
+from src.memory.semantic_memory import (
+    HashingEmbedder,
+    MemoryVectorIndex,
+    SemanticMemory,
+    format_relevant_memories,
+)
+from src.utils.lru import LRUDict
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = MemoryVersionRegistry()
+    monkeypatch.setattr(memory_versions, "_memory_versions", registry)
+    return registry
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """In-memory stand-in for the embedding columns of the memories table."""
+    state = {"rows": {}, "lists": 0, "fetched": [], "updates": []}
+
+    def fake_list_memory_versions(agent_id, user_id=None):
+        state["lists"] += 1
+        return [{"id": row["id"], "updated_at": row["updated_at"]} for row in state["rows"].values()]
+
+    def fake_list_memory_embeddings(agent_id, user_id=None, memory_ids=None):
+        state["lists"] += 1
+        rows = [dict(row) for row in state["rows"].values() if memory_ids is None or row["id"] in memory_ids]
+        state["fetched"].append([row["id"] for row in rows])
+        return rows
+
+    def fake_update_memory_embeddings(embeddings, model):
+        state["updates"].append([memory_id for memory_id, _ in embeddings])
+        for memory_id, vector in embeddings:
+            if memory_id in state["rows"]:
+                state["rows"][memory_id].update(embedding=vector, embedding_model=model)
+        return True
+
+    monkeypatch.setattr(memory_repository, "list_memory_versions", fake_list_memory_versions)
+    monkeypatch.setattr(memory_repository, "list_memory_embeddings", fake_list_memory_embeddings)
+    monkeypatch.setattr(memory_repository, "update_memory_embeddings", fake_update_memory_embeddings)
+    return state
+
+
+def _add_row(store, name, content):
+    memory_id = uuid.uuid4()
+    store["rows"][memory_id] = {
+        "id": memory_id, "name": name, "content": content,
+        "embedding": None, "embedding_model": None, "updated_at": datetime.now(),
+    }
+    return memory_id
+
+
+class TestMemoryVectorIndex:
+    """Test cases for the vector index."""
+
+    def test_hashing_embedder_is_deterministic(self):
+        """Test that equal texts embed to equal normalized vectors."""
+        embedder = HashingEmbedder(64)
+        first, second = embedder.embed(["Likes green tea", "likes GREEN tea"])
+
+        assert first == second
+        assert abs(sum(value * value for value in first) - 1.0) < 1e-9
+
+    def test_upsert_remove_and_search(self):
+        """Test that search ranks by similarity and survives removals."""
+        embedder = HashingEmbedder()
+        index = MemoryVectorIndex()
+        texts = {"tea": "drinks green tea", "car": "drives a red car", "dog": "has a small dog"}
+        for memory_id, text in texts.items():
+            index.upsert(memory_id, memory_id, text, embedder.embed([text])[0])
+
+        query = embedder.embed(["green tea please"])[0]
+        assert index.search(query, 1)[0].memory_id == "tea"
+
+        index.remove("tea")
+        assert len(index) == 2
+        assert "tea" not in [result.memory_id for result in index.search(query, 5)]
+
+        index.upsert("car", "car", "green tea lover", embedder.embed(["green tea lover"])[0])
+        assert index.search(query, 1)[0].memory_id == "car"
+
+
+class TestSemanticMemory:
+    """Test cases for keeping indexes in sync with stored memories."""
+
+    def test_refresh_embeds_only_new_rows(self, registry, store):
+        """Test that unchanged rows are not embedded again after a write."""
+        semantic_memory = SemanticMemory(HashingEmbedder())
+        tea = _add_row(store, "drink", "green tea")
+        _add_row(store, "pet", "a small dog")
+
+        results = semantic_memory.search(1, 7, "what tea do I drink", k=1)
+        assert results[0].memory_id == str(tea)
+        assert len(store["updates"]) == 1 and len(store["updates"][0]) == 2
+
+        # Cached while the scope's version is unchanged
+        semantic_memory.search(1, 7, "dog")
+        assert store["lists"] == 1
+
+        car = _add_row(store, "car", "a red car")
+        registry.bump(1, 7)
+        assert semantic_memory.search(1, 7, "red car", k=1)[0].memory_id == str(car)
+        assert store["updates"][-1] == [car]
+        # Only the new row is read back with its embedding
+        assert store["fetched"][-1] == [car]
+
+    def test_deleted_rows_leave_the_index(self, registry, store):
+        """Test that memories removed from the table are dropped on refresh."""
+        semantic_memory = SemanticMemory(HashingEmbedder())
+        tea = _add_row(store, "drink", "green tea")
+        semantic_memory.search(1, 7, "tea")
+
+        del store["rows"][tea]
+        registry.bump(1, 7)
+
+        assert semantic_memory.search(1, 7, "tea") == []
+        assert format_relevant_memories([]) == "None"
+
+    def test_indexes_are_bounded(self, registry, store, monkeypatch):
+        """Test that the least recently used scope's index is evicted."""
+        semantic_memory = SemanticMemory(HashingEmbedder())
+        monkeypatch.setattr(semantic_memory, "_indexes", LRUDict(1))
+        _add_row(store, "drink", "green tea")
+
+        semantic_memory.search(1, 7, "tea")
+        semantic_memory.search(1, 8, "tea")
+
+        assert (1, 7) not in semantic_memory._indexes and (1, 8) in semantic_memory._indexes
@@ -0,0 +1,114 @@
+"""Tests for per-session turn serialization.
+
+The postgres backend is tested against a fake lock pool, so no database is needed.
+"""
+
+import asyncio
+
+import pytest
+from psycopg2.pool import PoolError
+
+from src.db import connection as connection_module
+from src.memory.session_lock import SessionTurnLock, SessionLockTimeout
+
+
+class TestSessionTurnLock:
+    """Test cases for SessionTurnLock."""
+
+    @pytest.mark.asyncio
+    async def test_same_session_runs_serially(self):
+        """Test that turns for one session never overlap."""
+        lock = SessionTurnLock(timeout=5)
+        events = []
+
+        async def turn(name):
+            async with lock.acquire("session-1"):
+                events.append(f"start-{name}")
+                await asyncio.sleep(0.02)
+                events.append(f"end-{name}")
+
+        await asyncio.gather(turn("a"), turn("b"))
+
+        assert events in (
+            ["start-a", "end-a", "start-b", "end-b"],
+            ["start-b", "end-b", "start-a", "end-a"],
+        )
+
+    @pytest.mark.asyncio
+    async def test_different_sessions_run_concurrently(self):
+        """Test that different sessions are not serialized."""
+        lock = SessionTurnLock(timeout=5)
+        both_inside = asyncio.Event()
+        inside = set()
+
+        async def turn(session_id):
+            async with lock.acquire(session_id):
+                inside.add(session_id)
+                if len(inside) == 2:
+                    both_inside.set()
+                await asyncio.wait_for(both_inside.wait(), 1)
+
+        await asyncio.gather(turn("session-1"), turn("session-2"))
+        assert both_inside.is_set()
+
+    @pytest.mark.asyncio
+    async def test_wait_timeout(self):
+        """Test that a waiting turn gives up after the timeout."""
+        lock = SessionTurnLock(timeout=0.05)
+
+        async with lock.acquire("session-1"):
+            with pytest.raises(SessionLockTimeout):
+                async with lock.acquire("session-1"):
+                    pass
+
+        # The lock is usable again and its bookkeeping was cleaned up
+        async with lock.acquire("session-1"):
+            pass
+        assert lock._locks == {}
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend is rejected."""
+        with pytest.raises(ValueError):
+            SessionTurnLock(backend="redis")
+
+
+class FakeLockPool:
+    """Lock pool handing out up to `size` fake connections."""
+
+    def __init__(self, size):
+        self.size = size
+        self.out = 0
+
+    def getconn(self):
+        if self.out >= self.size:
+            raise PoolError("connection pool exhausted")
+        self.out += 1
+        return object()
+
+    def putconn(self, connection):
+        self.out -= 1
+
+
+class TestPostgresSessionTurnLock:
+    """Test cases for the postgres backend."""
+
+    @pytest.mark.asyncio
+    async def test_exhausted_lock_pool_times_out(self, monkeypatch):
+        """Test that turns wait for a lock connection and time out instead of failing the query pool."""
+        pool = FakeLockPool(size=1)
+        monkeypatch.setattr(connection_module, "get_lock_connection_pool", lambda: pool)
+        monkeypatch.setattr(connection_module, "get_connection_pool",
+                            lambda: pytest.fail("session locks must not use the query pool"))
+        monkeypatch.setattr(SessionTurnLock, "_try_advisory_lock", staticmethod(lambda connection, key: True))
+        monkeypatch.setattr(SessionTurnLock, "_advisory_unlock", staticmethod(lambda connection, key: None))
+        lock = SessionTurnLock(backend="postgres", timeout=0.1, poll_interval=0.01)
+
+        async with lock.acquire("session-1"):
+            assert pool.out == 1
+            with pytest.raises(SessionLockTimeout):
+                async with lock.acquire("session-2"):
+                    pass
+
+        async with lock.acquire("session-2"):
+            pass
+        assert pool.out == 0
@@ -0,0 +1,164 @@
+"""Tests for tool timeouts, retries and circuit breakers."""
+
+import asyncio
+import time
+
+import pytest
+from pydantic_ai import Agent, ModelRetry
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.messages import ToolReturnPart
+from pydantic_ai.models.test import TestModel
+
+from src.agents.common import tool_policy
+from src.agents.common.tool_policy import CircuitBreaker, ToolPolicy, get_tool_stats
+from src.agents.common.tool_registry import ToolRegistry
+
+
+@pytest.fixture(autouse=True)
+def breakers(monkeypatch):
+    """Give every test its own circuit breakers."""
+    monkeypatch.setattr(tool_policy, "_breakers", {})
+
+
+async def run_tools(registry, tools):
+    """Run an agent that calls the given tools once and return their results by name."""
+    agent = Agent(TestModel(call_tools=tools), tools=registry.convert_to_pydantic_tools())
+    result = await agent.run("go")
+    return {
+        part.tool_name: part.content
+        for message in result.all_messages() for part in message.parts
+        if isinstance(part, ToolReturnPart)
+    }
+
+
+class TestToolPolicy:
+    """Tests for RegistryTool runs under a ToolPolicy."""
+
+    @pytest.mark.asyncio
+    async def test_tool_calls_run_concurrently_including_blocking_ones(self):
+        """Test that calls of one model response overlap, with blocking tools on threads."""
+        async def lookup_order() -> str:
+            """Look up the order."""
+            await asyncio.sleep(0.3)
+            return "order"
+
+        async def lookup_page() -> str:
+            """Look up the page with a synchronous client."""
+            time.sleep(0.3)
+            return "page"
+
+        async def lookup_block() -> str:
+            """Look up the block with a synchronous client."""
+            time.sleep(0.3)
+            return "block"
+
+        registry = ToolRegistry()
+        registry.register_tool(lookup_order)
+        registry.register_tool(lookup_page, ToolPolicy(blocking=True))
+        registry.register_tool(lookup_block, ToolPolicy(blocking=True))
+
+        start = time.perf_counter()
+        results = await run_tools(registry, ["lookup_order", "lookup_page", "lookup_block"])
+
+        assert results == {"lookup_order": "order", "lookup_page": "page", "lookup_block": "block"}
+        assert time.perf_counter() - start < 0.5
+
+    @pytest.mark.asyncio
+    async def test_hung_call_times_out_and_failed_call_is_retried(self):
+        """Test that the model gets a timeout error and a flaky tool succeeds on retry."""
+        attempts = []
+
+        async def hang() -> str:
+            """Never answer."""
+            await asyncio.sleep(10)
+
+        async def flaky() -> str:
+            """Fail the first time."""
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("reset")
+            return "ok"
+
+        registry = ToolRegistry()
+        registry.register_tool(hang, ToolPolicy(timeout=0.05))
+        registry.register_tool(flaky, ToolPolicy(retries=1, retry_backoff=0))
+
+        results = await run_tools(registry, ["hang", "flaky"])
+
+        assert results == {"hang": "Tool hang timed out after 0.05s", "flaky": "ok"}
+        stats = get_tool_stats()
+        assert stats["hang"]["timeouts"] >= 1 and stats["flaky"]["breaker"] == "closed"
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_fails_fast_until_probe_succeeds(self):
+        """Test that a tool failing repeatedly is short-circuited, then probed after the reset timeout."""
+        calls = []
+
+        async def send_message() -> str:
+            """Send a message."""
+            calls.append(1)
+            if len(calls) <= 2:
+                raise ConnectionError("gateway down")
+            return "sent"
+
+        registry = ToolRegistry()
+        registry.register_tool(send_message, ToolPolicy(failure_threshold=2, reset_timeout=0.1))
+
+        for _ in range(3):
+            results = await run_tools(registry, ["send_message"])
+        assert len(calls) == 2
+        assert "temporarily unavailable" in results["send_message"]
+        assert get_tool_stats()["send_message"]["breaker"] == "open"
+
+        await asyncio.sleep(0.1)
+        results = await run_tools(registry, ["send_message"])
+        assert results == {"send_message": "sent"}
+        assert get_tool_stats()["send_message"]["breaker"] == "closed"
+
+    @pytest.mark.asyncio
+    async def test_probe_without_verdict_lets_next_call_probe(self):
+        """Test that a probe ended by the model's invalid arguments doesn't leave the breaker half open."""
+        calls = []
+
+        async def send_message() -> str:
+            """Send a message."""
+            calls.append(1)
+            if len(calls) == 1:
+                raise ConnectionError("gateway down")
+            if len(calls) == 2:
+                raise ModelRetry("bad arguments")
+            return "sent"
+
+        registry = ToolRegistry()
+        registry.register_tool(send_message, ToolPolicy(failure_threshold=1, reset_timeout=0.05))
+
+        await run_tools(registry, ["send_message"])
+        await asyncio.sleep(0.05)
+        tools = registry.convert_to_pydantic_tools()
+        tools[0].max_retries = 0
+        agent = Agent(TestModel(call_tools=["send_message"]), tools=tools)
+        with pytest.raises(UnexpectedModelBehavior):
+            await agent.run("go")
+        assert get_tool_stats()["send_message"]["breaker"] == "open"
+
+        results = await run_tools(registry, ["send_message"])
+        assert results == {"send_message": "sent"}
+
+    def test_stale_probe_expires(self):
+        """Test that a probe that never reports back stops blocking calls after the reset timeout."""
+        breaker = CircuitBreaker("send_message", failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.05)
+
+        assert breaker.allow() and not breaker.allow()
+        time.sleep(0.05)
+        assert breaker.allow()
+
+    def test_blocking_tools_are_not_retried(self, monkeypatch):
+        """Test that blocking tools default to no retries and reject explicit ones."""
+        monkeypatch.setattr(tool_policy.settings, "AM_TOOL_RETRIES", 2)
+
+        assert ToolPolicy().retries == 2
+        assert ToolPolicy(blocking=True).retries == 0
+        with pytest.raises(ValueError):
+            ToolPolicy(blocking=True, retries=1)
@@ -0,0 +1,87 @@
+"""Tests for per-run span tracing."""
+
+import asyncio
+import json
+import time
+
+import pytest
+from pydantic_ai.models.test import TestModel
+
+from src.agents.simple.simple_agent.agent import SimpleAgent
+from src.utils.tracing import Trace, TraceExporter, span, start_trace
+
+
+class TestTrace:
+    """Tests for spans, breakdowns and OTLP conversion."""
+
+    @pytest.mark.asyncio
+    async def test_spans_nest_across_threads_and_categories_are_not_double_counted(self):
+        """Test that nested spans of one category count once and threads keep the parent."""
+        def query():
+            with span("db.query"):
+                time.sleep(0.01)
+
+        with start_trace("request.run") as trace:
+            with span("db.save_turn") as outer:
+                await asyncio.to_thread(query)
+            with span("llm.request"):
+                await asyncio.sleep(0.02)
+
+        inner = next(s for s in trace.spans if s.name == "db.query")
+        breakdown = trace.breakdown()
+        assert inner.parent_id == outer.span_id
+        assert breakdown["db"] == round(outer.duration_ms, 1)
+        assert breakdown["llm"] >= 20 and breakdown["total"] > breakdown["llm"]
+        assert trace.server_timing().startswith("db;dur=")
+
+    def test_otlp_export_format(self):
+        """Test that traces convert to OTLP/JSON with parent links and error status."""
+        with pytest.raises(ValueError):
+            with start_trace("request.run", agent="simple") as trace:
+                with span("tool.search", tool_call_id="1"):
+                    raise ValueError("boom")
+
+        spans = trace.to_otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        root, tool = spans
+        assert tool["parentSpanId"] == root["spanId"] and tool["traceId"] == root["traceId"] == trace.trace_id
+        assert tool["status"] == {"code": 2, "message": "boom"}
+        assert root["attributes"] == [{"key": "agent", "value": {"stringValue": "simple"}}]
+
+    def test_span_outside_trace_is_noop(self):
+        """Test that spans outside a traced request record nothing."""
+        with span("db.query") as current:
+            assert current is None
+
+
+class TestRunTracing:
+    """Tests for spans recorded along an agent run."""
+
+    @pytest.mark.asyncio
+    async def test_agent_run_records_llm_tool_and_prep_spans(self):
+        """Test that a run with a tool call reports model, tool and preparation time."""
+        agent = SimpleAgent({"model": "test"})
+        await agent._initialize_pydantic_agent()
+
+        with start_trace("request.run") as trace:
+            with agent._agent_instance.override(model=TestModel(call_tools=["get_current_date"])):
+                response = await agent.process_message("hi", user_id=1)
+            stored = agent._response_context(response)["trace"]
+
+        names = [s.name for s in trace.spans]
+        assert response.success
+        assert names.count("llm.request") == 2 and "tool.get_current_date" in names
+        assert {"prep", "llm", "tool", "agent", "total"} <= set(trace.breakdown())
+        assert stored["trace_id"] == trace.trace_id and stored["timings"]["llm"] > 0
+
+    def test_exporter_appends_otlp_json_lines(self, tmp_path):
+        """Test that the file exporter writes one OTLP payload per trace."""
+        path = tmp_path / "traces.jsonl"
+        exporter = TraceExporter("file", path=str(path))
+        exporter.start()
+        trace = Trace("request.run")
+        trace.root.end_ns = trace.root.start_ns + 1000
+        exporter.export(trace)
+        exporter.stop()
+
+        payload = json.loads(path.read_text().splitlines()[0])
+        assert payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["traceId"] == trace.trace_id
@@ -0,0 +1,167 @@
+"""Tests for the deferred turn writer.
+
+The repository insert is patched out, so these tests do not need a database.
+"""
+
+import threading
+import uuid
+
+from src.db.models import Message
+from src.memory import turn_writer as turn_writer_module
+from src.memory.turn_writer import TurnWriter
+from src.utils.metrics import metrics
+
+
+def _row(session_id, role, text):
+    return Message(id=uuid.uuid4(), session_id=session_id, role=role, text_content=text)
+
+
+class TestTurnWriter:
+    """Test cases for TurnWriter."""
+
+    def test_batches_across_sessions_in_order(self, monkeypatch):
+        """Test that turns from several sessions land in one ordered INSERT."""
+        batches = []
+        gate = threading.Event()
+
+        def fake_create_messages(rows):
+            gate.wait(5)
+            batches.append(list(rows))
+            return [row.id for row in rows]
+
+        monkeypatch.setattr(turn_writer_module, "create_messages", fake_create_messages)
+
+        session_a, session_b = uuid.uuid4(), uuid.uuid4()
+        writer = TurnWriter(flush_interval_ms=20)
+        writer.start()
+        try:
+            writer.enqueue_messages([_row(session_a, "user", "a1"), _row(session_a, "assistant", "a2")])
+            writer.enqueue_messages([_row(session_b, "user", "b1"), _row(session_b, "assistant", "b2")])
+            writer.enqueue_messages([_row(session_a, "user", "a3")])
+
+            # Pending rows are readable before they are committed
+            assert [m.text_content for m in writer.pending_messages(str(session_a))] == ["a1", "a2", "a3"]
+
+            gate.set()
+            assert writer.flush(timeout=5)
+        finally:
+            writer.stop()
+
+        assert len(batches) == 1
+        assert [m.text_content for m in batches[0]] == ["a1", "a2", "b1", "b2", "a3"]
+        assert writer.pending_messages(str(session_a)) == []
+
+    def test_calls_run_after_earlier_rows(self, monkeypatch):
+        """Test that deferred calls keep their position relative to queued rows."""
+        events = []
+
+        def fake_create_messages(rows):
+            events.append(("insert", [row.text_content for row in rows]))
+            return [row.id for row in rows]
+
+        monkeypatch.setattr(turn_writer_module, "create_messages", fake_create_messages)
+
+        session_id = uuid.uuid4()
+        writer = TurnWriter(flush_interval_ms=20)
+        writer.enqueue_messages([_row(session_id, "user", "first")])
+        writer.enqueue_call(lambda: events.append(("call", None)))
+        writer.enqueue_messages([_row(session_id, "user", "second")])
+        writer.start()
+        try:
+            assert writer.flush(timeout=5)
+        finally:
+            writer.stop()
+
+        assert events == [("insert", ["first"]), ("call", None), ("insert", ["second"])]
+
+    def test_failed_batch_retries_per_session(self, monkeypatch):
+        """Test that one failing session does not drop other sessions' turns."""
+        good, bad = uuid.uuid4(), uuid.uuid4()
+        committed = []
+        attempts = {}
+
+        def fake_create_messages(rows):
+            if any(row.session_id == bad for row in rows):
+                if len(rows) == 1:
+                    attempts[rows[0].text_content] = attempts.get(rows[0].text_content, 0) + 1
+                return []
+            committed.extend(row.text_content for row in rows)
+            return [row.id for row in rows]
+
+        monkeypatch.setattr(turn_writer_module, "create_messages", fake_create_messages)
+
+        writer = TurnWriter(flush_interval_ms=20)
+        writer.enqueue_messages([_row(bad, "user", "lost")])
+        writer.enqueue_messages([_row(good, "user", "kept")])
+        writer.start()
+        try:
+            assert writer.flush(timeout=5)
+        finally:
+            writer.stop()
+
+        assert committed == ["kept"]
+        assert not writer.has_pending(str(bad))
+        assert attempts == {"lost": 3}
+        assert metrics.snapshot()["counters"]["turn_writer_dropped_messages"] >= 1
+
+    def test_failed_session_is_requeued_ahead_of_later_turns(self, monkeypatch):
+        """Test that a session's rows that failed once are written before its next turn."""
+        session_id = uuid.uuid4()
+        committed = []
+        failures = [1]
+
+        def fake_create_messages(rows):
+            if failures:
+                failures.pop()
+                return []
+            committed.extend(row.text_content for row in rows)
+            return [row.id for row in rows]
+
+        monkeypatch.setattr(turn_writer_module, "create_messages", fake_create_messages)
+
+        writer = TurnWriter(flush_interval_ms=20)
+        writer.enqueue_messages([_row(session_id, "user", "first")])
+        writer.start()
+        try:
+            assert writer.flush(timeout=5)
+            writer.enqueue_messages([_row(session_id, "user", "second")])
+            assert writer.flush(timeout=5)
+        finally:
+            writer.stop()
+
+        assert committed == ["first", "second"]
+        assert not writer.has_pending(str(session_id))
+
+
+class TestPendingHistory:
+    """Test cases for merging pending rows into loaded history."""
+
+    def test_row_committed_during_query_is_not_lost(self, monkeypatch):
+        """Test that a row committed between the query and the pending check stays in the window."""
+        from src.memory import message_history as message_history_module
+        from src.memory.message_history import MessageHistory
+
+        session_id = uuid.uuid4()
+        committed = _row(session_id, "user", "earlier")
+        in_flight = _row(session_id, "user", "latest")
+        pending = [in_flight]
+
+        class FakeWriter:
+            def pending_messages(self, session):
+                return list(pending)
+
+        def fake_list_messages(session, sort_desc=False):
+            # The query reads before the writer commits, then the row leaves the pending set
+            rows = [committed]
+            pending.clear()
+            return rows
+
+        monkeypatch.setattr(message_history_module, "get_turn_writer", lambda: FakeWriter())
+        monkeypatch.setattr(message_history_module, "list_messages", fake_list_messages)
+        history = MessageHistory.__new__(MessageHistory)
+        history.session_id = str(session_id)
+        history.user_id = 1
+
+        messages = history.all_messages()
+
+        assert [m.parts[0].content for m in messages] == ["earlier", "latest"]